@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Fixed horizon vs stopping at convergence for Example A from x = 0.
+
+The notebook and test_ro_dynamics.py integrate to t = 50 and only keep the
+final state. With solve(..., kkt_tol=...) integration stops once the KKT
+residual of the saddle point falls below the tolerance. For each method the
+table reports the stopping time, RHS evaluations, wall time and the
+distance of the final x from the fixed-horizon result.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.examples import example_a
+
+# (method, solver options); RK45 needs tight tolerances for its integration
+# error to stay below the residual tolerances
+METHODS = (
+    ('odeint', {}),
+    ('LSODA', {}),
+    ('RK45', {'rtol': 1e-8, 'atol': 1e-10}),
+    ('DOP853', {'rtol': 1e-8, 'atol': 1e-10}),
+)
+KKT_TOLS = (None, 1e-3, 1e-6)
+
+
+def timed(function, repeat=5):
+    """(result, best wall time) of function()."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def run(t_final=50.0, n_samples=2000):
+    problem = example_a()
+    x0 = np.zeros(2)
+    t_span = np.linspace(0, t_final, n_samples)
+
+    print(f"Example A from x = 0, t_span = linspace(0, {t_final:g}, "
+          f"{n_samples})")
+    print(f"{'method':>7} {'kkt_tol':>8} {'t_stop':>7} {'nfev':>6} "
+          f"{'wall [ms]':>10} {'saved':>6} {'residual':>9} {'|dx|':>9}")
+    for method, options in METHODS:
+        for kkt_tol in KKT_TOLS:
+            solution, wall = timed(lambda: solve(
+                problem, x0, t_span, method=method, kkt_tol=kkt_tol,
+                **options))
+            if kkt_tol is None:
+                full, full_wall = solution, wall
+                residual = np.max(problem.make_dynamics().residuals(
+                    full.y[-1]))
+                print(f"{method:>7} {'-':>8} {full.t[-1]:>7.2f} "
+                      f"{full.nfev:>6} {1e3 * wall:>10.1f} {'':>6} "
+                      f"{residual:>9.1e} {'':>9}")
+                continue
+            error = np.linalg.norm(solution.final[0] - full.final[0])
+            print(f"{method:>7} {kkt_tol:>8.0e} {solution.t[-1]:>7.2f} "
+                  f"{solution.nfev:>6} {1e3 * wall:>10.1f} "
+                  f"{1 - wall / full_wall:>6.0%} "
+                  f"{solution.residual[-1]:>9.1e} {error:>9.1e}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Size and render time of the trajectory figure set (export_figures.py,
+rodynamics.figures) at 20000 output times per run.
+
+1. Total file size and serial render time of the five figures in EPS and
+   PDF: raw vector paths (no simplification at all, as the dense EPS
+   figures of the paper were written), matplotlib's own path
+   simplification, the Ramer-Douglas-Peucker simplification at 5e-4 of
+   each panel's range, and raw paths with curves rasterized at 150 dpi.
+2. The largest distance of the original points from the simplified
+   curves, as a fraction of the panel range.
+3. Wall time of the whole set serially and on worker processes, and of a
+   second export (all cached) and one after restyling a single figure.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from export_figures import figure_set
+from rodynamics.figures import export_figures, simplify_path
+
+TOLERANCE = 5e-4
+# (label, rcParams, export options)
+MODES = (
+    ('raw paths', {'path.simplify': False},
+     {'tolerance': None}),
+    ('matplotlib simplify', {'path.simplify': True},
+     {'tolerance': None}),
+    (f'RDP {TOLERANCE:g}', {'path.simplify': False},
+     {'tolerance': TOLERANCE}),
+    ('raw, rasterized', {'path.simplify': False},
+     {'tolerance': None, 'rasterize_above': 1000, 'dpi': 150}),
+)
+
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+
+def sizes(figures, directory):
+    print(f"{'mode':>22} {'format':>7} {'total KB':>9} {'largest KB':>11} "
+          f"{'render s':>9}")
+    for label, params, options in MODES:
+        for fmt in ('eps', 'pdf'):
+            with matplotlib.rc_context(params):
+                exports, wall = timed(lambda: export_figures(
+                    figures, directory, fmt=fmt, force=True, **options))
+            total = sum(export.size for export in exports)
+            largest = max(export.size for export in exports)
+            print(f"{label:>22} {fmt:>7} {total / 1024:>9.1f} "
+                  f"{largest / 1024:>11.1f} {wall:>9.2f}")
+
+
+def deviation(figures):
+    """Largest distance of dropped points from the simplified curves."""
+    worst = kept = total = 0
+    for figure in figures:
+        for curves in figure.curves:
+            if not curves:
+                continue
+            x_all = np.concatenate([x for x, _, _ in curves])
+            y_all = np.concatenate([y for _, y, _ in curves])
+            scale = [(v.min(), np.ptp(v) or 1.0) for v in (x_all, y_all)]
+            for x, y, _ in curves:
+                x = (x - scale[0][0]) / scale[0][1]
+                y = (y - scale[1][0]) / scale[1][1]
+                keep = simplify_path(x, y, TOLERANCE)
+                segment = np.searchsorted(keep, np.arange(len(x)),
+                                          side='right') - 1
+                segment = np.minimum(segment, len(keep) - 2)
+                x0, y0 = x[keep[segment]], y[keep[segment]]
+                dx = x[keep[segment + 1]] - x0
+                dy = y[keep[segment + 1]] - y0
+                distance = np.abs((x - x0) * dy - (y - y0) * dx) \
+                    / np.maximum(np.hypot(dx, dy), 1e-300)
+                worst = max(worst, distance.max())
+                kept += len(keep)
+                total += len(x)
+    print(f"\nRDP at {TOLERANCE:g}: {kept} of {total} points kept, largest "
+          f"distance {worst:.2e} of the panel range")
+
+
+def parallel(figures, directory):
+    print(f"\n{os.cpu_count()} CPU core(s)")
+    for workers in (None, 2, 4):
+        _, wall = timed(lambda: export_figures(
+            figures, directory, max_workers=workers, force=True))
+        label = 'serial' if workers is None else f'{workers} workers'
+        print(f"{label:>22} {wall:>9.2f} s")
+    exports, wall = timed(lambda: export_figures(figures, directory))
+    print(f"{'second export':>22} {wall:>9.3f} s "
+          f"({sum(export.cached for export in exports)} cached)")
+    figures[0].curves[0][0][2]['linewidth'] = 1.0
+    exports, wall = timed(lambda: export_figures(figures, directory))
+    print(f"{'one figure restyled':>22} {wall:>9.3f} s "
+          f"({sum(not export.cached for export in exports)} rendered)")
+
+
+def run():
+    figures, wall = timed(figure_set)
+    print(f"{len(figures)} figures integrated in {wall:.1f} s\n")
+    with tempfile.TemporaryDirectory() as directory:
+        sizes(figures, directory)
+        deviation(figures)
+        parallel(figures, directory)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Example A in high dimension with operator Q_j and P
+(rodynamics.OperatorEllipsoidIntersection).
+
+random_operator_problem() generates m = 5 diagonal, low-rank-plus-diagonal
+(rank 5) or sparse (about 10 off-diagonal nonzeros per row) ellipsoids in
+R^n with a sparse P = I. For each n the storage of the Q_j and P and the
+time of one RHS evaluation are compared with the same instance stored
+densely, as far as that fits, and the RHS of both are checked to agree.
+The largest low-rank instance is then integrated over a short horizon.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.benchmark import random_operator_problem
+
+
+def best_of(run, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def stored_bytes(value):
+    """Bytes of the arrays held by value and its attributes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if sparse.issparse(value):
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(stored_bytes(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return sum(stored_bytes(item) for item in vars(value).values())
+    return 0
+
+
+def rhs_time(problem, state, repeat):
+    dynamics = problem.make_dynamics(epsilon=0.01)
+    return dynamics, best_of(lambda: dynamics.evaluate(state, 0.0), repeat)
+
+
+def run(n_values=(100, 1000, 3000, 10000), m=5, max_dense=3000, repeat=20,
+        n_solve=10000, t_end=20.0, seed=0):
+    print(f"{'Q_j':>8} {'n':>6} {'memory [MB]':>12} {'dense [MB]':>11} "
+          f"{'RHS [ms]':>9} {'dense [ms]':>11} {'max |dRHS|':>11}")
+    for kind in ('diagonal', 'lowrank', 'sparse'):
+        for n in n_values:
+            problem = random_operator_problem(m, n,
+                                              np.random.default_rng(seed),
+                                              kind)
+            rng = np.random.default_rng(seed + 1)
+            state = np.abs(rng.standard_normal(problem.layout.size))
+            memory = stored_bytes([problem.constraint,
+                                   problem.uncertainty_set])
+            dynamics, wall = rhs_time(problem, state, repeat)
+            dense_memory = dense_wall = error = np.nan
+            if n <= max_dense:
+                dense = random_operator_problem(
+                    m, n, np.random.default_rng(seed), kind, dense=True)
+                dense_memory = stored_bytes([dense.constraint,
+                                             dense.uncertainty_set])
+                dense_dynamics, dense_wall = rhs_time(dense, state,
+                                                      max(repeat // 4, 1))
+                error = np.abs(dynamics.evaluate(state, 0.0)
+                               - dense_dynamics.evaluate(state, 0.0)).max()
+            print(f"{kind:>8} {n:>6} {memory / 1e6:>12.3f} "
+                  f"{dense_memory / 1e6:>11.1f} {1e3 * wall:>9.3f} "
+                  f"{1e3 * dense_wall:>11.3f} {error:>11.1e}")
+
+    problem = random_operator_problem(m, n_solve, np.random.default_rng(seed),
+                                      'lowrank')
+    start = time.perf_counter()
+    solution = solve(problem, np.zeros(n_solve), np.linspace(0.0, t_end, 5),
+                     method='RK45', epsilon=0.01, rtol=1e-6, atol=1e-8)
+    wall = time.perf_counter() - start
+    x, u = solution.final[0], solution.final[2]
+    h = problem.uncertainty_set.h_values(u)
+    print(f"\nlow-rank, n = {n_solve}, t in [0, {t_end:.0f}]: RK45 in "
+          f"{wall:.1f} s, {solution.nfev} RHS evaluations "
+          f"({1e3 * wall / solution.nfev:.2f} ms each); g(x, u) = "
+          f"{problem.constraint.value(x, u):.4f} with b = {problem.b}, "
+          f"max_j h_j(u) = {h.max():.1e}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Worst-case oracle max_{u in U} (a + Pu)^T x for Example A
+(rodynamics.oracle).
+
+At the saddle point reached by the RO dynamics, the oracle certifies the
+robust constraint and names the active ellipsoids. Batches of random x
+are timed against one SLSQP solve per x, which also checks the values.
+Along the RO trajectory (one x at a time, as an online monitor would) and
+over a grid of the (x1, x2) plane (one row at a time, as for a feasible-
+region plot), queries started from the previous maximizers are compared
+with cold starts.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import minimize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import WorstCaseOracle, solve
+from rodynamics.examples import example_a
+
+
+def slsqp_worst_case(problem, x):
+    """Reference: one SLSQP solve of max_u g(x, u) s.t. h(u) <= 0."""
+    uset = problem.uncertainty_set
+    result = minimize(lambda u: -problem.constraint.value(x, u),
+                      np.zeros(uset.n_u), method='SLSQP',
+                      constraints={'type': 'ineq',
+                                   'fun': lambda u: -uset.h_values(u)},
+                      options={'ftol': 1e-12})
+    return -result.fun
+
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+
+def run(batch_sizes=(1, 100, 10000, 100000), n_reference=200,
+        n_grid=300, seed=0):
+    problem = example_a()
+    oracle = WorstCaseOracle(problem)
+
+    solution = solve(problem, np.zeros(2), np.linspace(0, 50, 2000))
+    x_star = solution.final[0]
+    result = oracle(x_star, warm_start=False)
+    active = [f"Q{j + 1}" for j in np.flatnonzero(result.active[0])]
+    print(f"x* = {np.round(x_star, 4)}: max_u g = {result.value[0]:.6f}, "
+          f"margin {result.margin[0]:.1e}, worst case u = "
+          f"{np.round(result.u[0], 4)} (flow: "
+          f"{np.round(solution.final[2], 4)}), active {' and '.join(active)}")
+
+    rng = np.random.default_rng(seed)
+    X = rng.uniform([-1.0, -1.0], [4.0, 3.0], (max(batch_sizes), 2))
+    reference, slsqp_time = timed(lambda: np.array(
+        [slsqp_worst_case(problem, x) for x in X[:n_reference]]))
+    print(f"\nSLSQP: {1e6 * slsqp_time / n_reference:.0f} us per x")
+    print(f"{'batch':>7} {'time [ms]':>10} {'us per x':>9} {'iterations':>11} "
+          f"{'max |dg|':>9}")
+    for batch in batch_sizes:
+        result, wall = timed(lambda: oracle(X[:batch], warm_start=False))
+        assert result.converged.all()
+        count = min(batch, n_reference)
+        error = np.abs(result.value[:count] - reference[:count]).max()
+        print(f"{batch:>7} {1e3 * wall:>10.2f} {1e6 * wall / batch:>9.2f} "
+              f"{result.iterations.mean():>11.1f} {error:>9.1e}")
+
+    print(f"\n{'query':>34} {'time [ms]':>10} {'iterations':>11}")
+    trajectory = solution.x
+    for warm in (False, True):
+        oracle.u = None
+        start = time.perf_counter()
+        iterations = [oracle(x, warm_start=warm).iterations[0]
+                      for x in trajectory]
+        wall = time.perf_counter() - start
+        label = f"trajectory, {len(trajectory)} points, " + \
+            ('warm' if warm else 'cold')
+        print(f"{label:>34} {1e3 * wall:>10.1f} {np.mean(iterations):>11.1f}")
+
+    x1 = np.linspace(-1.0, 4.0, n_grid)
+    x2 = np.linspace(-1.0, 3.0, n_grid)
+    for warm in (False, True):
+        oracle.u = None
+        start = time.perf_counter()
+        rows = [oracle(np.column_stack([x1, np.full(n_grid, value)]),
+                       warm_start=warm) for value in x2]
+        wall = time.perf_counter() - start
+        iterations = np.mean([row.iterations.mean() for row in rows])
+        label = f"grid {n_grid}x{n_grid} by rows, " + \
+            ('warm' if warm else 'cold')
+        print(f"{label:>34} {1e3 * wall:>10.1f} {iterations:>11.1f}")
+    feasible = np.mean([row.feasible.mean() for row in rows])
+    print(f"\nrobustly feasible share of the grid: {feasible:.1%}")
+
+
+if __name__ == "__main__":
+    run()
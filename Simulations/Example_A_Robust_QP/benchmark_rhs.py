@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark RHS calls/sec of the batched RO dynamics against the original
+per-ellipsoid loop implementation for Example A style problems.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import AffineConstraint, EllipsoidIntersection, ROProblem
+from rodynamics.benchmark import random_ellipsoids
+
+
+def make_loop_ro_dynamics(objective_gradient, a, P, b, Q_matrices):
+    """Original implementation: one Python iteration per ellipsoid."""
+    n_x = len(a)
+    n_u = P.shape[1]
+    m = len(Q_matrices)
+
+    def h_functions(u):
+        h = np.zeros(m)
+        for j, Q in enumerate(Q_matrices):
+            h[j] = u @ Q @ u - 1.0
+        return h
+
+    def ro_dynamics(state, t, epsilon=0.0):
+        x = state[0:n_x]
+        lambda_val = state[n_x]
+        u = state[n_x+1:n_x+1+n_u]
+        v = state[n_x+1+n_u:]
+
+        dx = -objective_gradient(x) - (lambda_val + epsilon) * (a + P @ u)
+
+        h_vals = h_functions(u)
+        lambda_dot_arg = (a + P @ u) @ x - b - v @ h_vals
+        if lambda_val + epsilon > 0 or lambda_dot_arg > 0:
+            dlambda = lambda_dot_arg
+        else:
+            dlambda = 0
+
+        du = P.T @ x
+        for j, Q in enumerate(Q_matrices):
+            du -= 2 * v[j] * Q @ u
+
+        dv = np.zeros(m)
+        for j in range(m):
+            v_dot_arg = (lambda_val + epsilon) * h_vals[j]
+            if v[j] > 0 or v_dot_arg > 0:
+                dv[j] = v_dot_arg
+            else:
+                dv[j] = 0
+
+        return np.concatenate([dx, [dlambda], du, dv])
+
+    return ro_dynamics
+
+
+def calls_per_second(rhs, state, min_time=0.5):
+    """Call rhs repeatedly for at least min_time seconds."""
+    n_calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for _ in range(100):
+            rhs(state, 0.0)
+        n_calls += 100
+        elapsed = time.perf_counter() - start
+    return n_calls / elapsed
+
+
+def run(m_values=(5, 50, 500), n_values=(2, 20), seed=0):
+    rng = np.random.default_rng(seed)
+    print(f"{'m':>5} {'n':>4} {'loop [calls/s]':>16} {'batched [calls/s]':>18} {'speedup':>8}")
+    for n in n_values:
+        a = np.ones(n)
+        P = np.eye(n)
+        b = 5.0
+        hess = np.linspace(2.0, 8.0, n)
+        c = np.full(n, 8.0)
+
+        def objective_gradient(x):
+            return hess * x - c
+
+        for m in m_values:
+            Q_stack = random_ellipsoids(m, n, rng)
+            loop_rhs = make_loop_ro_dynamics(objective_gradient, a, P, b, list(Q_stack))
+            problem = ROProblem(objective_gradient, AffineConstraint(a, P),
+                                EllipsoidIntersection(Q_stack), b)
+            batched_rhs = problem.make_dynamics()
+
+            state = rng.uniform(0.0, 0.5, 2 * n + 1 + m)
+            assert np.allclose(loop_rhs(state, 0.0), batched_rhs(state, 0.0))
+
+            loop_rate = calls_per_second(loop_rhs, state)
+            batched_rate = calls_per_second(batched_rhs, state)
+            print(f"{m:>5} {n:>4} {loop_rate:>16.0f} {batched_rate:>18.0f} "
+                  f"{batched_rate / loop_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+RO dynamics vs the scenario approach of Calafiore and Campi on Example A.
+
+The paper compares against a scenario program with 1115 samples of the
+ellipsoid intersection. This benchmark reproduces it with
+rodynamics.scenario: uniform (rejection) and boundary samples, solved by
+constraint generation over chunks of 10^5 samples up to 10^6 scenarios,
+and the whole program handed to SLSQP at once ('full') where that is still
+practical. Times are best of repeat runs; 'sample' is the time spent
+generating samples (regenerated on every pass over the chunks, once for
+'full') and 'solve' the rest. |x - x_RO| is the distance from the RO dynamics result.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import ScenarioSampler, solve, solve_scenario
+from rodynamics.examples import example_a
+
+SIZES = (1115, 10**4, 10**5, 10**6)
+FULL_SIZES = (1115, 10**4)
+
+
+def best_of(function, repeat):
+    """(result, best wall time) of function()."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def report(label, n, result, x_ro, sample_time, solve_time):
+    print(f"{label:>16} {n:>8} {sample_time:>8.3f} {solve_time:>8.3f} "
+          f"{result.n_rounds:>6} {result.n_working:>8} "
+          f"{result.objective:>10.4f} "
+          f"{np.linalg.norm(result.x - x_ro):>9.2e}")
+
+
+def run(repeat=3, seed=0):
+    problem = example_a()
+    t_span = np.linspace(0, 50, 2000)
+    ro, ro_time = best_of(lambda: solve(problem, np.zeros(2), t_span),
+                          repeat)
+    x_ro = ro.final[0]
+    stopped, stopped_time = best_of(lambda: solve(
+        problem, np.zeros(2), t_span, method='RK45', rtol=1e-8, atol=1e-10,
+        kkt_tol=1e-6), repeat)
+    print(f"RO dynamics (odeint, t = 50):         x = {np.round(x_ro, 4)}, "
+          f"f = {problem.objective(x_ro):.4f}, {ro_time:.3f} s")
+    print(f"RO dynamics (RK45, kkt_tol = 1e-6):   x = "
+          f"{np.round(stopped.final[0], 4)}, "
+          f"f = {problem.objective(stopped.final[0]):.4f}, "
+          f"{stopped_time:.3f} s")
+
+    print(f"\n{'sampling':>16} {'N':>8} {'sample':>8} {'solve':>8} "
+          f"{'rounds':>6} {'working':>8} {'f(x)':>10} {'|x - x_RO|':>9}")
+    for method in ('rejection', 'boundary'):
+        for n in SIZES:
+            sampler = ScenarioSampler(problem.uncertainty_set, n,
+                                      method=method, seed=seed)
+            result, _ = best_of(lambda: solve_scenario(problem, sampler),
+                                1 if n >= 10**6 else repeat)
+            report(method, n, result, x_ro, result.sample_time,
+                   result.solve_time)
+        for n in FULL_SIZES:
+            samples, sample_time = best_of(ScenarioSampler(
+                problem.uncertainty_set, n, method=method,
+                seed=seed).samples, repeat)
+            result, _ = best_of(lambda: solve_scenario(problem, samples,
+                                                       full=True), repeat)
+            report(f"{method} (full)", n, result, x_ro, sample_time,
+                   result.solve_time)
+
+
+if __name__ == "__main__":
+    run()
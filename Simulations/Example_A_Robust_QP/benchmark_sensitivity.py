@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Parametric sensitivities of Example A (rodynamics.sensitivity).
+
+1. dx(T)/dtheta at T = 50 for growing parameter sets (b; a; P; the Q_j;
+   epsilon, 28 entries in all) from the forward sensitivity ODE, from the
+   adjoint one and from central differences of re-solved perturbed
+   problems (two solves per entry), all at rtol = 1e-8: wall time, RHS
+   evaluations and the largest deviation from central differences at
+   rtol = 1e-12 (the reference).
+2. The saddle-point sensitivity dx*/dtheta against the perturbed runs of
+   benchmark_warmstart.py (b = 4.9 and 5.1, a + 2%, Q_j x 1.05) and the
+   epsilon values of the paper (0.001, 0.01): the change of x* from the
+   nominal run next to its first-order prediction dx*/dtheta dtheta.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve, solve_sensitivity
+from rodynamics.examples import EXAMPLE_A_Q, example_a
+
+T_FINAL = 50.0
+EPSILON = 0.01
+STEP = 1e-5
+OPTIONS = {'method': 'RK45', 'rtol': 1e-8, 'atol': 1e-10}
+REFERENCE = {'method': 'RK45', 'rtol': 1e-12, 'atol': 1e-14}
+NOMINAL = {'a': np.array([1.0, 1.0]), 'P': np.eye(2), 'b': 5.0,
+           'Q': np.array(EXAMPLE_A_Q)}
+PARAMETER_SETS = (('b',), ('b', 'a'), ('b', 'a', 'P'), ('b', 'a', 'P', 'Q'),
+                  ('b', 'a', 'P', 'Q', 'epsilon'))
+
+
+def make_problem(a, P, b, Q):
+    return example_a(a, P, b, list(Q))
+
+
+def final_x(params, epsilon, options=OPTIONS):
+    return solve(make_problem(**params), np.zeros(2), [0.0, T_FINAL],
+                 epsilon=epsilon, **options).x[-1]
+
+
+def finite_differences(names, options=OPTIONS):
+    """Central differences of x(T), one column per parameter entry."""
+    columns = []
+    for name in names:
+        value = EPSILON if name == 'epsilon' else NOMINAL[name]
+        value = np.asarray(value, dtype=float)
+        for k in range(value.size):
+            pair = []
+            for sign in (1.0, -1.0):
+                perturbed = value.copy()
+                perturbed.flat[k] += sign * STEP
+                if name == 'epsilon':
+                    pair.append(final_x(NOMINAL, float(perturbed), options))
+                else:
+                    pair.append(final_x(dict(NOMINAL, **{name: perturbed}),
+                                        EPSILON, options))
+            columns.append((pair[0] - pair[1]) / (2 * STEP))
+    return np.column_stack(columns)
+
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+
+def cost_and_accuracy():
+    problem = make_problem(**NOMINAL)
+    print(f"{'parameters':>28} {'entries':>8} {'FD [s]':>8} "
+          f"{'forward [s]':>12} {'adjoint [s]':>12} {'nfev FD':>8} "
+          f"{'fwd':>6} {'adj':>6} {'error FD':>9} {'fwd':>8} {'adj':>8}")
+    reference = finite_differences(PARAMETER_SETS[-1], REFERENCE)
+    columns = {}
+    for name in PARAMETER_SETS[-1]:
+        size = np.size(EPSILON if name == 'epsilon' else NOMINAL[name])
+        columns[name] = reference[:, :size]
+        reference = reference[:, size:]
+    for names in PARAMETER_SETS:
+        exact = np.hstack([columns[name] for name in names])
+        differences, fd_time = timed(lambda: finite_differences(names))
+        runs = {}
+        for mode in ('forward', 'adjoint'):
+            runs[mode] = timed(lambda: solve_sensitivity(
+                problem, np.zeros(2), [0.0, T_FINAL], names, mode=mode,
+                epsilon=EPSILON, equilibrium=False, **OPTIONS))
+        nominal = solve(problem, np.zeros(2), [0.0, T_FINAL],
+                        epsilon=EPSILON, **OPTIONS)
+        fd_nfev = 2 * exact.shape[1] * nominal.nfev
+        errors = [np.abs(values - exact).max() for values in (
+            differences, runs['forward'][0].dx_final,
+            runs['adjoint'][0].dx_final)]
+        print(f"{', '.join(names):>28} {exact.shape[1]:>8} "
+              f"{fd_time:>8.2f} {runs['forward'][1]:>12.2f} "
+              f"{runs['adjoint'][1]:>12.2f} {fd_nfev:>8} "
+              f"{runs['forward'][0].nfev:>6} {runs['adjoint'][0].nfev:>6} "
+              f"{errors[0]:>9.1e} {errors[1]:>8.1e} {errors[2]:>8.1e}")
+
+
+def perturbed_runs():
+    problem = make_problem(**NOMINAL)
+    sensitivity = solve_sensitivity(
+        problem, np.zeros(2), [0.0, T_FINAL], ('b', 'a', 'Q', 'epsilon'),
+        mode='adjoint', epsilon=EPSILON, **OPTIONS)
+    dx_star = sensitivity.dx_star
+    x_nominal = sensitivity.y[-1, problem.layout.x]
+    print(f"\nx* = {np.round(x_nominal, 4)} at eps = {EPSILON:g}, KKT "
+          f"residual {sensitivity.kkt:.1e}")
+    print(f"{'instance':>14} {'x* - x*_nominal':>24} "
+          f"{'dx*/dtheta dtheta':>24} {'difference':>11}")
+
+    def delta(name, value):
+        """Parameter change as a vector over the sensitivity columns."""
+        change = np.zeros(sensitivity.n_params)
+        base = EPSILON if name == 'epsilon' else NOMINAL[name]
+        change[sensitivity.slices[name]] = np.ravel(value - np.asarray(base))
+        return change
+
+    instances = (
+        ('b = 4.9', {'b': 4.9}, EPSILON, delta('b', 4.9)),
+        ('b = 5.1', {'b': 5.1}, EPSILON, delta('b', 5.1)),
+        ('a + 2%', {'a': np.array([1.02, 0.98])}, EPSILON,
+         delta('a', np.array([1.02, 0.98]))),
+        ('Q_j x 1.05', {'Q': 1.05 * NOMINAL['Q']}, EPSILON,
+         delta('Q', 1.05 * NOMINAL['Q'])),
+        ('eps = 0.001', {}, 0.001, delta('epsilon', 0.001)),
+    )
+    for label, changes, epsilon, change in instances:
+        actual = final_x(dict(NOMINAL, **changes), epsilon) - x_nominal
+        predicted = dx_star @ change
+        print(f"{label:>14} {np.array2string(actual, precision=5):>24} "
+              f"{np.array2string(predicted, precision=5):>24} "
+              f"{np.abs(actual - predicted).max():>11.1e}")
+
+
+def run():
+    cost_and_accuracy()
+    perturbed_runs()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Integration time to tolerance for perturbed Example A instances, started
+cold from zero (as in the notebook) or warm from the nearest cached saddle
+point (SolutionCache seeded with the nominal solution), and for
+continuation in epsilon and in the ellipsoid radius rho (Q_j / rho^2).
+
+t_tol is the simulated time after which x stays within TOL of its final
+value. The wall time and nfev are those of integrating [0, t_tol] only,
+i.e. what a solver that stops at tolerance would spend.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.examples import EXAMPLE_A_Q, example_a
+from rodynamics.sweep import settling_time
+from rodynamics.warmstart import SolutionCache, continuation, solve_warm
+
+TOL = 1e-3
+T_FINAL = 50.0
+# LSODA and Radau chatter on the projection boundaries of some instances
+OPTIONS = {'method': 'RK45', 'rtol': 1e-8, 'atol': 1e-10}
+
+NOMINAL = {'a': np.array([1.0, 1.0]), 'P': np.eye(2), 'b': 5.0,
+           'Q': np.array(EXAMPLE_A_Q)}
+
+# (label, parameter changes, epsilon)
+INSTANCES = (
+    ('b = 4.9', {'b': 4.9}, 0.0),
+    ('b = 5.1', {'b': 5.1}, 0.0),
+    ('a + 2%', {'a': np.array([1.02, 0.98])}, 0.0),
+    ('Q_j x 1.05', {'Q': 1.05 * np.array(EXAMPLE_A_Q)}, 0.0),
+    ('eps = 0.001', {}, 0.001),
+    ('eps = 0.01', {}, 0.01),
+)
+
+
+def make_problem(a, P, b, Q):
+    return example_a(a, P, b, list(Q))
+
+
+def time_to_tolerance(problem, state0, epsilon, t_span):
+    """(t_tol, wall time, nfev) of reaching TOL from state0."""
+    solution = solve(problem, state0, t_span, epsilon=epsilon, **OPTIONS)
+    t_tol = float(settling_time(solution.t, solution.x, TOL))
+    start = time.perf_counter()
+    partial = solve(problem, state0, [0.0, max(t_tol, t_span[1])],
+                    epsilon=epsilon, **OPTIONS)
+    return t_tol, time.perf_counter() - start, partial.nfev
+
+
+def report(label, cold, warm):
+    print(f"{label:>14} {cold[0]:>8.2f} {warm[0]:>8.2f} "
+          f"{1e3 * cold[1]:>10.1f} {1e3 * warm[1]:>10.1f} {cold[2]:>6} "
+          f"{warm[2]:>6} {1 - warm[1] / cold[1]:>8.0%}")
+
+
+def header(title):
+    print(f"\n{title}")
+    print(f"{'':>14} {'t_tol':>8} {'':>8} {'wall [ms]':>10} {'':>10} "
+          f"{'nfev':>6} {'':>6}")
+    print(f"{'instance':>14} {'cold':>8} {'warm':>8} {'cold':>10} "
+          f"{'warm':>10} {'cold':>6} {'warm':>6} {'saved':>8}")
+
+
+def run():
+    t_span = np.linspace(0, T_FINAL, 2000)
+    x0 = np.zeros(2)
+    cache = SolutionCache()
+    solve_warm(make_problem(**NOMINAL), NOMINAL, x0, t_span, cache,
+               **OPTIONS)
+
+    header(f"Perturbed instances (cache seeded with the nominal solution, "
+           f"tolerance {TOL:g})")
+    for label, changes, epsilon in INSTANCES:
+        params = dict(NOMINAL, **changes)
+        problem = make_problem(**params)
+        cold_state = problem.initial_state(x0)
+        warm_state = cache.initial_state(dict(params, epsilon=epsilon),
+                                         cold_state)
+        report(label, time_to_tolerance(problem, cold_state, epsilon, t_span),
+               time_to_tolerance(problem, warm_state, epsilon, t_span))
+
+    header("Continuation, each step warm-started from the previous one")
+    walks = (
+        ('eps', 'epsilon', (0.01, 0.003, 0.001, 0.0),
+         lambda **p: make_problem(**NOMINAL)),
+        ('rho', 'rho', (1.0, 0.95, 0.9, 0.85, 0.8),
+         lambda rho: make_problem(**dict(NOMINAL, Q=NOMINAL['Q'] / rho**2))),
+    )
+    for short, name, values, factory in walks:
+        solutions = continuation(factory, x0, t_span, values, name=name,
+                                 **OPTIONS)
+        assert all(solution.success for solution in solutions)
+        for k, value in enumerate(values):
+            problem = factory() if name == 'epsilon' else factory(value)
+            epsilon = value if name == 'epsilon' else 0.0
+            previous = (problem.initial_state(x0) if k == 0
+                        else solutions[k - 1].y[-1])
+            report(f"{short} = {value:g}",
+                   time_to_tolerance(problem, problem.initial_state(x0),
+                                     epsilon, t_span),
+                   time_to_tolerance(problem, previous, epsilon, t_span))
+
+
+if __name__ == "__main__":
+    run()
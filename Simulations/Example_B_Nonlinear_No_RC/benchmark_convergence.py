@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Fixed horizon vs stopping at convergence for Example B.
+
+test_nonlinear.py integrates to t = 100 and test_nonlinear_fixed.py to
+t = 50, both keeping only the final state. With solve(..., kkt_tol=...)
+odeint stops at the first checked output time where the KKT residual is
+below the tolerance. The table reports the stopping time, RHS evaluations,
+wall time and the distance of the final x from the fixed-horizon result.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.examples import EXAMPLE_B_SAFEGUARDS, example_b
+
+x_star_expected = np.array([0.5271, 0.7916])
+u_star_expected = np.array([1.4020, 1.6824])
+KKT_TOLS = (None, 1e-3, 1e-6)
+
+
+def basic_case():
+    """test_nonlinear.py: calibrated b from all ones, t in [0, 100]."""
+    problem = example_b()
+    problem.b = problem.constraint.value(x_star_expected, u_star_expected)
+    return (problem, np.ones(7), np.linspace(0, 100, 5000),
+            {'epsilon': 0.0, 'rtol': 1e-8, 'atol': 1e-10})
+
+
+def fixed_case():
+    """test_nonlinear_fixed.py: b = 5 with the safeguards, t in [0, 50]."""
+    problem = example_b(b=5.0, variant='fixed')
+    return (problem, np.array([0.5, 0.8, 0.5, 1.0, 1.5, 0.5, 0.5]),
+            np.linspace(0, 50, 2000),
+            {'epsilon': 0.01, 'rtol': 1e-6, 'atol': 1e-8,
+             'dynamics_options': EXAMPLE_B_SAFEGUARDS})
+
+
+def run(repeat=5):
+    print(f"{'case':>6} {'kkt_tol':>8} {'t_stop':>7} {'nfev':>6} "
+          f"{'wall [ms]':>10} {'saved':>6} {'residual':>9} {'|dx|':>9}")
+    for name, case in (('basic', basic_case), ('fixed', fixed_case)):
+        problem, state0, t_span, options = case()
+        for kkt_tol in KKT_TOLS:
+            wall = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                solution = solve(problem, state0, t_span, kkt_tol=kkt_tol,
+                                 **options)
+                wall = min(wall, time.perf_counter() - start)
+            if kkt_tol is None:
+                full, full_wall = solution, wall
+                print(f"{name:>6} {'-':>8} {full.t[-1]:>7.2f} "
+                      f"{full.nfev:>6} {1e3 * wall:>10.1f}")
+                continue
+            error = np.linalg.norm(solution.final[0] - full.final[0])
+            print(f"{name:>6} {kkt_tol:>8.0e} {solution.t[-1]:>7.2f} "
+                  f"{solution.nfev:>6} {1e3 * wall:>10.1f} "
+                  f"{1 - wall / full_wall:>6.0%} "
+                  f"{solution.residual[-1]:>9.1e} {error:>9.1e}")
+
+
+if __name__ == "__main__":
+    run()
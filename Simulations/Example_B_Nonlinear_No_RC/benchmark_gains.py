@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Per-block gains (rodynamics.preconditioning) for Example B.
+
+The curvature of the Lagrangian in x is 1 + (lambda + eps) u_j exp(x_j^2)
+(2 + 4 x_j^2) and in u it carries the second derivatives of exp(u_j^2)
+and u_j exp(1/u_j), so both blocks are unevenly curved.
+estimate_gains() at the initial state of test_nonlinear_fixed.py gives
+Jacobi gains for x and u and a gain for lambda from the reduced
+curvature. The runs start there with eps = 0.01 and stop at KKT residual
+1e-4 (rtol 1e-6, atol 1e-8), for the smooth variant and for the fixed
+variant with its safeguards. The table gives the stopping time in time
+units, the best of 3 wall times, the RHS evaluations and the distance of
+the final x from the unit-gain result.
+"""
+
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import estimate_gains, solve
+from rodynamics.examples import EXAMPLE_B_SAFEGUARDS, example_b
+
+FIXED_START = np.array([0.5, 0.8, 0.5, 1.0, 1.5, 0.5, 0.5])
+OPTIONS = {'epsilon': 0.01, 'rtol': 1e-6, 'atol': 1e-8, 'kkt_tol': 1e-4}
+
+
+def best_of(run, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def describe(gains):
+    return ', '.join(f"{name} {np.round(value, 2).tolist()}"
+                     for name, value in gains.items()) or 'unit'
+
+
+def run(methods=('odeint', 'RK45'), repeat=3):
+    warnings.simplefilter('ignore')
+    t_span = np.linspace(0, 100, 4001)
+    print(f"{'variant':>7} {'method':>7} {'gains':>20} {'t_conv':>7} "
+          f"{'saved':>6} {'wall [s]':>9} {'saved':>6} {'nfev':>6} "
+          f"{'|x - x_1|':>10}")
+    for variant, safeguards in (('smooth', {}),
+                                ('fixed', EXAMPLE_B_SAFEGUARDS)):
+        problem = example_b(b=5.0, variant=variant)
+        estimated = estimate_gains(problem, FIXED_START,
+                                   epsilon=OPTIONS['epsilon'])
+        print(f"{variant} estimated gains: {describe(estimated)}")
+        configurations = [
+            ('unit gains', {}),
+            ('estimated', estimated),
+            ('estimated, v gain 2', dict(estimated, v=2.0)),
+        ]
+        for method in methods:
+            for name, gains in configurations:
+                solution, wall = best_of(
+                    lambda: solve(problem, FIXED_START, t_span, method=method,
+                                  dynamics_options=dict(safeguards,
+                                                        gains=gains),
+                                  **OPTIONS),
+                    repeat)
+                if not gains:
+                    base_t, base_wall = solution.t_converged, wall
+                    x_base = solution.final[0]
+                error = np.abs(solution.final[0] - x_base).max()
+                print(f"{variant:>7} {method:>7} {name:>20} "
+                      f"{solution.t_converged:>7.2f} "
+                      f"{1 - solution.t_converged / base_t:>6.0%} "
+                      f"{wall:>9.3f} {1 - wall / base_wall:>6.0%} "
+                      f"{solution.nfev:>6} {error:>10.1e}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Instrumented odeint and RK45 runs of Example B, and the cost of the
+instrumentation.
+
+For both cases of benchmark_jacobian.py, the run is timed without and with
+an Instrumentation (best of 5 each), and the report of the instrumented
+run shows where the time goes: the RHS blocks, the step sizes (and for
+odeint how often LSODA was in its stiff mode), the active projections,
+rate limits and clipped exponents. The trace of the last run is written to
+a temporary JSON lines file and its records are counted.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark_jacobian import basic_case, fixed_case
+from rodynamics import Instrumentation, solve
+
+
+def best_of(run, repeat=5):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(t_final=100.0, n_points=5000, methods=('odeint', 'RK45')):
+    initial_state = np.ones(7)
+    t_span = np.linspace(0, t_final, n_points)
+    with tempfile.TemporaryDirectory() as directory:
+        trace = os.path.join(directory, 'trace.jsonl')
+        for name, case in (('test_nonlinear', basic_case),
+                           ('test_nonlinear_fixed', fixed_case)):
+            problem, options = case()
+            for method in methods:
+                off = best_of(lambda: solve(problem, initial_state, t_span,
+                                            method=method, **options))
+                on = best_of(lambda: solve(problem, initial_state, t_span,
+                                           method=method, **options,
+                                           instrument=Instrumentation()))
+                instrumentation = Instrumentation(trace=trace)
+                solve(problem, initial_state, t_span, method=method,
+                      **options, instrument=instrumentation)
+                with open(trace) as f:
+                    events = Counter(json.loads(line)['event'] for line in f)
+                print(f"\n{name}, {method}: {off:.3f} s plain, {on:.3f} s "
+                      f"instrumented ({on / off - 1:+.0%})")
+                print(instrumentation.report())
+                print("  trace records    " + '  '.join(
+                    f"{event} {count}" for event, count in events.items()))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark wall time and RHS evaluation counts of the stiff integrators for
+Example B with finite-difference Jacobians, the declared sparsity pattern
+and the analytic (generalized) Jacobian of the RO dynamics.
+
+nfev is the integrator's own count, which for solve_ivp leaves out the
+finite-difference Jacobian columns. 'RHS evals' counts every evaluation of
+the vector field, including those columns and the one evaluation inside
+each analytic Jacobian.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.examples import EXAMPLE_B_SAFEGUARDS, example_b
+
+x_star_expected = np.array([0.5271, 0.7916])
+u_star_expected = np.array([1.4020, 1.6824])
+
+# (method, jacobian) pairs; odeint cannot take a sparsity pattern
+CONFIGURATIONS = (
+    ('odeint', None),
+    ('odeint', 'analytic'),
+    ('BDF', None),
+    ('BDF', 'sparsity'),
+    ('BDF', 'analytic'),
+    ('Radau', None),
+    ('Radau', 'sparsity'),
+    ('Radau', 'analytic'),
+)
+
+
+def basic_case():
+    """test_nonlinear.py: calibrated b, rtol=1e-8, atol=1e-10."""
+    problem = example_b()
+    problem.b = problem.constraint.value(x_star_expected, u_star_expected)
+    return problem, {'epsilon': 0.0, 'rtol': 1e-8, 'atol': 1e-10}
+
+
+def fixed_case():
+    """test_nonlinear_fixed.py: b = 5 with the rate limits and u floor."""
+    problem = example_b(b=5.0, variant='fixed')
+    return problem, {'epsilon': 0.01, 'rtol': 1e-6, 'atol': 1e-8,
+                     'dynamics_options': EXAMPLE_B_SAFEGUARDS}
+
+
+def count_rhs_evaluations(problem):
+    """Wrap grad f, which the RHS calls exactly once per evaluation."""
+    counter = [0]
+    objective_gradient = problem.objective_gradient
+
+    def counted(x, out=None):
+        counter[0] += 1
+        return objective_gradient(x, out=out)
+
+    problem.objective_gradient = counted
+    return counter
+
+
+def run(t_final=100.0, n_points=5000):
+    initial_state = np.ones(7)
+    t_span = np.linspace(0, t_final, n_points)
+    for name, case in (('test_nonlinear', basic_case),
+                       ('test_nonlinear_fixed', fixed_case)):
+        problem, options = case()
+        counter = count_rhs_evaluations(problem)
+        print(f"\n{name}")
+        print(f"{'method':>8} {'jacobian':>10} {'time [s]':>9} {'nfev':>7} "
+              f"{'RHS evals':>10} {'njev':>6} {'x error':>9}  status")
+        for method, jacobian in CONFIGURATIONS:
+            counter[0] = 0
+            start = time.perf_counter()
+            solution = solve(problem, initial_state, t_span, method=method,
+                             jacobian=jacobian, **options)
+            elapsed = time.perf_counter() - start
+            x_error = np.linalg.norm(solution.final[0] - x_star_expected)
+            status = 'ok' if solution.success else solution.message
+            print(f"{method:>8} {str(jacobian):>10} {elapsed:>9.3f} "
+                  f"{solution.nfev:>7} {counter[0]:>10} {solution.njev:>6} "
+                  f"{x_error:>9.2e}  {status}")
+
+
+if __name__ == "__main__":
+    run()
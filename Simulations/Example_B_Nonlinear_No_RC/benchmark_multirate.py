@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Multirate integration (rodynamics.multirate) against single-rate odeint
+for Example B.
+
+solve_multirate() sub-cycles the (u, v) block, whose dynamics carry the
+exp(u^2) and exp(1/u) gradients, inside the (x, lambda) steps. It runs
+here with the inner step size under its own error control (adaptive),
+with a fixed ratio of 4 inner steps per outer step, and with ratio 1, the
+same Heun scheme single-rate, on the setup of test_nonlinear_fixed.py
+(fixed variant with its safeguards) and on the smooth variant from the
+same start. For each, the table gives the best of 3 wall times, the full
+and (u, v)-only RHS evaluations, the accepted outer steps with the
+rejected ones (by the slow and fast block), and the largest distance of x
+from a tight reference over the trajectory.
+"""
+
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve, solve_multirate
+from rodynamics.examples import EXAMPLE_B_SAFEGUARDS, example_b
+
+FIXED_START = np.array([0.5, 0.8, 0.5, 1.0, 1.5, 0.5, 0.5])
+RUNS = [
+    ('odeint', None, {}),
+    ('multirate', 'adaptive', {}),
+    ('multirate', 'ratio 4', {'ratio': 4, 'adaptive': False}),
+    ('multirate', 'ratio 1', {'ratio': 1, 'adaptive': False}),
+]
+
+
+def best_of(run, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def rhs_costs(problem, state, repeat=20000, **options):
+    """Seconds per full and per (u, v)-only RHS evaluation at state."""
+    dynamics = problem.make_dynamics(**options)
+    costs = []
+    for evaluate in (dynamics.evaluate, dynamics.evaluate_uncertainty):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            evaluate(state)
+        costs.append((time.perf_counter() - start) / repeat)
+    return costs
+
+
+def compare(problem, state0, t_span, tolerances, options=None, repeat=3):
+    options = dict(options or {})
+    reference = solve(problem, state0, t_span, method='Radau', rtol=1e-10,
+                      atol=1e-12, **options)
+    print(f"{'rtol':>6} {'method':>9} {'mode':>8} {'time [s]':>9} "
+          f"{'nfev':>6} {'nfev (u,v)':>10} {'steps':>6} {'rejected':>9} "
+          f"{'|x - x_ref|':>12}")
+    for rtol, atol in tolerances:
+        for method, mode, extra in RUNS:
+            if method == 'odeint':
+                run = lambda: solve(problem, state0, t_span, rtol=rtol,
+                                    atol=atol, **options)
+            else:
+                run = lambda: solve_multirate(problem, state0, t_span,
+                                              rtol=rtol, atol=atol,
+                                              **options, **extra)
+            solution, wall = best_of(run, repeat)
+            error = np.abs(solution.x - reference.x).max()
+            if method == 'odeint':
+                counts = f"{'-':>10} {'-':>6} {'-':>9}"
+            else:
+                rejected = f"{solution.rejected['slow']}+" \
+                    f"{solution.rejected['fast']}"
+                counts = (f"{solution.nfev_fast:>10} {solution.n_steps:>6} "
+                          f"{rejected:>9}")
+            print(f"{rtol:>6.0e} {method:>9} {mode or '-':>8} {wall:>9.3f} "
+                  f"{solution.nfev:>6} {counts} {error:>12.1e}")
+
+
+def run(tolerances=((1e-4, 1e-6), (1e-6, 1e-8))):
+    warnings.simplefilter('ignore')
+    t_span = np.linspace(0, 50, 2000)
+    for variant, options in (('fixed', {'dynamics_options':
+                                        EXAMPLE_B_SAFEGUARDS}),
+                             ('smooth', {})):
+        problem = example_b(b=5.0, variant=variant)
+        full, partial = rhs_costs(problem, FIXED_START, epsilon=0.01,
+                                  **options.get('dynamics_options', {}))
+        print(f"\n{variant} variant, RHS: full {1e6 * full:.1f} us, "
+              f"(u, v) rows {1e6 * partial:.1f} us")
+        compare(problem, FIXED_START, t_span, tolerances,
+                dict(options, epsilon=0.01))
+
+
+if __name__ == "__main__":
+    run()
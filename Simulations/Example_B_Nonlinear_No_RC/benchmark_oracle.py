@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Worst-case oracle max_{u in U} u^T exp(x^2) for Example B
+(rodynamics.oracle).
+
+The oracle's maximizer at the paper's saddle point is compared with the
+u* of the RO dynamics, and batches of random x are timed against one
+SLSQP solve per x, which also checks the values, for each variant.
+
+The h_j of the basic and fixed variants are not convex for u_j < 0, where
+their sets extend as well, so their oracle starts at u = (1, 1). The
+smooth variant's barrier keeps U convex, and its oracle starts at the
+middle of the bounding box.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import minimize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import WorstCaseOracle
+from rodynamics.examples import example_b
+
+x_star_expected = np.array([0.5271, 0.7916])
+u_star_expected = np.array([1.4020, 1.6824])
+
+
+def slsqp_worst_case(problem, x, u0):
+    """Reference: one SLSQP solve of max_u g(x, u) s.t. h(u) <= 0."""
+    uset = problem.uncertainty_set
+    result = minimize(lambda u: -problem.constraint.value(x, u), u0,
+                      method='SLSQP',
+                      constraints={'type': 'ineq',
+                                   'fun': lambda u: -uset.h_values(u)},
+                      options={'ftol': 1e-12})
+    return -result.fun
+
+
+def run(batch_sizes=(1, 100, 10000), n_reference=100, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(-2.0, 2.0, (max(batch_sizes), 2))
+    print(f"{'variant':>8} {'batch':>6} {'time [ms]':>10} {'us per x':>9} "
+          f"{'iterations':>11} {'max |dg|':>9}")
+    for variant in ('basic', 'fixed', 'smooth'):
+        problem = example_b(b=5.0, variant=variant)
+        oracle = WorstCaseOracle(
+            problem, center=None if variant == 'smooth' else np.ones(2))
+        result = oracle(x_star_expected)
+        active = [f"h{j + 1}" for j in np.flatnonzero(result.active[0])]
+        error = np.abs(result.u[0] - u_star_expected).max()
+        print(f"{variant:>8} at x*: u = {np.round(result.u[0], 4)} "
+              f"(|u - u*| {error:.0e}), active {' and '.join(active)}, "
+              f"margin {result.margin[0]:.4f}")
+
+        start = time.perf_counter()
+        reference = np.array([slsqp_worst_case(problem, x, oracle.center)
+                              for x in X[:n_reference]])
+        slsqp = (time.perf_counter() - start) / n_reference
+        for batch in batch_sizes:
+            start = time.perf_counter()
+            result = oracle(X[:batch], warm_start=False)
+            wall = time.perf_counter() - start
+            assert result.converged.all()
+            count = min(batch, n_reference)
+            error = np.abs(result.value[:count] - reference[:count]).max()
+            print(f"{variant:>8} {batch:>6} {1e3 * wall:>10.2f} "
+                  f"{1e6 * wall / batch:>9.2f} "
+                  f"{result.iterations.mean():>11.1f} {error:>9.1e}")
+        print(f"{variant:>8} SLSQP {1e6 * slsqp:>20.0f} us per x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+The smooth (log-domain, barrier) variant of Example B against the clipped
+variants of test_nonlinear.py and test_nonlinear_fixed.py.
+
+Each case starts from the initial state of one of the scripts, or from a
+state that reaches the clipped regions: u near zero, where u exp(1/u)
+overflows, and |x| = 6, where exp(x^2) passes the exp(30) clip of the
+fixed variant. For odeint and RK45 the table gives the steps (accepted and
+rejected; odeint reports no rejections) and clipped exponents of an
+instrumented run over the whole horizon, the number of safeguard hits (rate
+limits and u floor), and the best of 3 wall times of the run stopped at
+KKT residual 1e-4 with its stopping time and its distance from a tight
+reference solution.
+"""
+
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import Instrumentation, solve
+from rodynamics.examples import EXAMPLE_B_SAFEGUARDS, example_b
+
+x_star_expected = np.array([0.5271, 0.7916])
+u_star_expected = np.array([1.4020, 1.6824])
+FIXED_START = np.array([0.5, 0.8, 0.5, 1.0, 1.5, 0.5, 0.5])
+FIXED_OPTIONS = {'epsilon': 0.01, 'rtol': 1e-6, 'atol': 1e-8}
+SAFEGUARDED = {'dynamics_options': EXAMPLE_B_SAFEGUARDS}
+
+
+def calibrated(variant):
+    """test_nonlinear.py: b calibrated at the paper's saddle point."""
+    problem = example_b(variant=variant)
+    problem.b = problem.constraint.value(x_star_expected, u_star_expected)
+    return problem
+
+
+def cases():
+    """(name, state0, t_span, options, [(variant, problem, extra options)])."""
+    b5 = [('fixed', example_b(b=5.0, variant='fixed'), SAFEGUARDED),
+          ('smooth', example_b(b=5.0, variant='smooth'), {})]
+    clipped = [('basic', example_b(b=5.0), {})] + b5
+    t_fixed = np.linspace(0, 50, 2000)
+    small_u = FIXED_START.copy()
+    small_u[3:5] = 0.02
+    large_x = FIXED_START.copy()
+    large_x[:2] = 6.0
+    return [
+        ('test_nonlinear', np.ones(7), np.linspace(0, 100, 5000),
+         {'epsilon': 0.0, 'rtol': 1e-8, 'atol': 1e-10},
+         [('basic', calibrated('basic'), {}),
+          ('smooth', calibrated('smooth'), {})]),
+        ('test_nonlinear_fixed', FIXED_START, t_fixed, FIXED_OPTIONS, b5),
+        ('u = 0.02', small_u, t_fixed, FIXED_OPTIONS, clipped),
+        ('x = 6', large_x, t_fixed, FIXED_OPTIONS, clipped),
+    ]
+
+
+def run(methods=('odeint', 'RK45'), kkt_tol=1e-4, repeat=3):
+    warnings.simplefilter('ignore')
+    print(f"{'case':>20} {'variant':>7} {'method':>7} {'steps':>11} "
+          f"{'clipped':>8} {'guards':>7} {'to-tol [s]':>11} {'t_conv':>7} "
+          f"{'|x - x_ref|':>12}")
+    for name, state0, t_span, options, variants in cases():
+        # Tight reference on the smooth variant, which has the saddle point
+        # of the others
+        reference = solve(variants[-1][1], state0, t_span, method='Radau',
+                          **dict(options, rtol=1e-10, atol=1e-12))
+        for variant, problem, extra in variants:
+            for method in methods:
+                instrumentation = Instrumentation()
+                full = solve(problem, state0, t_span, method=method,
+                             **options, **extra, instrument=instrumentation)
+                if not full.success:
+                    print(f"{name:>20} {variant:>7} {method:>7}  failed: "
+                          f"{full.message}")
+                    continue
+                summary = instrumentation.summary()
+                steps = f"{summary['accepted_steps']}"
+                if summary['rejected_steps'] is not None:
+                    steps += f"+{summary['rejected_steps']}"
+                clipped = (summary['exp_clipped_low']
+                           + summary['exp_clipped_high'])
+                guards = (sum(summary['rate_limited'].values())
+                          + summary['u_floored'])
+
+                wall = np.inf
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    solution = solve(problem, state0, t_span, method=method,
+                                     kkt_tol=kkt_tol, **options, **extra)
+                    wall = min(wall, time.perf_counter() - start)
+                error = np.abs(solution.final[0] - reference.final[0]).max()
+                t_conv = (f"{solution.t_converged:>7.2f}"
+                          if solution.t_converged is not None else f"{'-':>7}")
+                print(f"{name:>20} {variant:>7} {method:>7} {steps:>11} "
+                      f"{clipped:>8} {guards:>7} {wall:>11.3f} {t_conv} "
+                      f"{error:>12.1e}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark the kernels generated from the symbolic Example B
+(example_b_symbolic, needs sympy) against the hand-written functions of
+example_b(): RHS and Jacobian calls per second for one system, RHS calls
+per second for a batch, and whole integrations of both test scripts.
+
+The states are taken along the trajectory of test_nonlinear.py, so the
+projections switch and the caps are inactive as in a real run. 'max diff'
+is the largest relative difference of the outputs over those states.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.examples import (EXAMPLE_B_SAFEGUARDS, example_b,
+                                 example_b_symbolic)
+
+x_star_expected = np.array([0.5271, 0.7916])
+u_star_expected = np.array([1.4020, 1.6824])
+
+
+def cases():
+    """(name, hand-written problem, symbolic problem, solve options)."""
+    basic = example_b()
+    b = basic.constraint.value(x_star_expected, u_star_expected)
+    basic.b = b
+    yield ('test_nonlinear', basic, example_b_symbolic(b=b),
+           {'epsilon': 0.0, 'rtol': 1e-8, 'atol': 1e-10})
+    yield ('test_nonlinear_fixed', example_b(b=5.0, variant='fixed'),
+           example_b_symbolic(b=5.0, variant='fixed'),
+           {'epsilon': 0.01, 'rtol': 1e-6, 'atol': 1e-8,
+            'dynamics_options': EXAMPLE_B_SAFEGUARDS})
+
+
+def calls_per_second(function, states, repeat=5):
+    """Best of repeat passes of function over all states."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for state in states:
+            function(state)
+        best = min(best, time.perf_counter() - start)
+    return len(states) / best
+
+
+def max_difference(first, second, states):
+    return max(np.abs(first(state) - second(state)).max()
+               / (1.0 + np.abs(first(state)).max()) for state in states)
+
+
+def run(n_states=2000, batch_size=1000, n_batch_calls=200):
+    t_span = np.linspace(0, 100, 5000)
+    initial_state = np.ones(7)
+    for name, hand, symbolic, options in cases():
+        options = dict(options)
+        dynamics_options = options.pop('dynamics_options', {})
+        epsilon = options['epsilon']
+        reference = solve(hand, initial_state, t_span, **options,
+                          dynamics_options=dynamics_options)
+        states = reference.y[::len(t_span) // n_states][:n_states]
+
+        print(f"\n{name}")
+        print(f"{'':>22} {'hand':>10} {'generated':>10} {'speedup':>8} "
+              f"{'max diff':>9}")
+        dynamics = [problem.make_dynamics(epsilon=epsilon, **dynamics_options)
+                    for problem in (hand, symbolic)]
+        rows = []
+        rates = [calls_per_second(d.evaluate, states) for d in dynamics]
+        rows.append(('RHS calls/s', rates,
+                     max_difference(*(d.evaluate for d in dynamics),
+                                    states)))
+        rates = [calls_per_second(d.jacobian, states) for d in dynamics]
+        rows.append(('Jacobian calls/s', rates,
+                     max_difference(*(d.jacobian for d in dynamics),
+                                    states)))
+
+        rng = np.random.default_rng(0)
+        batch = states[rng.integers(len(states), size=batch_size)].ravel()
+        batch_dynamics = [problem.make_dynamics(
+            epsilon=epsilon, batch_size=batch_size, **dynamics_options)
+            for problem in (hand, symbolic)]
+        rates = [calls_per_second(d.evaluate, [batch] * n_batch_calls)
+                 for d in batch_dynamics]
+        rows.append((f'batch {batch_size} calls/s', rates,
+                     max_difference(*(d.evaluate for d in batch_dynamics),
+                                    [batch])))
+        for label, (hand_rate, generated_rate), difference in rows:
+            print(f"{label:>22} {hand_rate:>10.0f} {generated_rate:>10.0f} "
+                  f"{generated_rate / hand_rate:>7.1f}x {difference:>9.1e}")
+
+        print(f"{'odeint':>22} {'time [s]':>10} {'nfev':>10} "
+              f"{'x error':>9}")
+        for label, problem in (('hand', hand), ('generated', symbolic)):
+            start = time.perf_counter()
+            solution = solve(problem, initial_state, t_span, **options,
+                             dynamics_options=dynamics_options)
+            elapsed = time.perf_counter() - start
+            x_error = np.linalg.norm(solution.final[0] - x_star_expected)
+            print(f"{label:>22} {elapsed:>10.3f} {solution.nfev:>10} "
+                  f"{x_error:>9.2e}")
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    example_b_symbolic()
+    print(f"Generating the basic kernels: "
+          f"{time.perf_counter() - start:.2f} s")
+    run()
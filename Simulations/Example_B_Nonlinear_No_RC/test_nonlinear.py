@@ -3,10 +3,15 @@
 Test script to validate the nonlinear RO dynamics implementation for Example B
 """
 
-import numpy as np
-from scipy.integrate import odeint
+import os
 import sys
 
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.examples import example_b
+
 # Problem parameters
 rho1 = 10.0
 rho2 = 20.0
@@ -17,99 +22,14 @@ x_star_expected = np.array([0.5271, 0.7916])
 cost_expected = 0.8419
 u_star_expected = np.array([1.4020, 1.6824])
 
-def safe_exp(x, max_val=50):
-    """Safe exponential to avoid overflow."""
-    return np.exp(np.minimum(x, max_val))
-
-def safe_div(a, b, eps=1e-10):
-    """Safe division to avoid division by zero."""
-    return a / (b + eps * np.sign(b) + (b == 0) * eps)
-
-def objective_function(x):
-    return 0.5 * (x[0] - 1)**2 + 0.5 * (x[1] - 2)**2
-
-def objective_gradient(x):
-    return np.array([x[0] - 1, x[1] - 2])
-
-def constraint_function(x, u):
-    exp_x = np.array([safe_exp(x[0]**2), safe_exp(x[1]**2)])
-    return u @ exp_x
-
-def constraint_gradient_x(x, u):
-    return np.array([
-        2 * x[0] * safe_exp(x[0]**2) * u[0],
-        2 * x[1] * safe_exp(x[1]**2) * u[1]
-    ])
-
-def constraint_gradient_u(x):
-    return np.array([safe_exp(x[0]**2), safe_exp(x[1]**2)])
-
-def h_functions(u, rho):
-    h = np.zeros(2)
-    for j in range(2):
-        if abs(u[j]) < 1e-10:
-            h[j] = 1.0 - rho[j]
-        else:
-            exp_term1 = safe_exp(u[j]**2)
-            exp_term2 = u[j] * safe_exp(safe_div(1.0, u[j]))
-            h[j] = exp_term1 + exp_term2 - rho[j]
-    return h
-
-def h_gradients(u):
-    grad = np.zeros(2)
-    for j in range(2):
-        if abs(u[j]) < 1e-10:
-            grad[j] = 0.0
-        else:
-            term1 = 2 * u[j] * safe_exp(u[j]**2)
-            exp_inv = safe_exp(safe_div(1.0, u[j]))
-            term2 = exp_inv - safe_div(exp_inv, u[j])
-            grad[j] = term1 + term2
-    return grad
-
-def ro_dynamics_nonlinear(state, t, epsilon=0.0, b=5.0, rho=np.array([10.0, 20.0])):
-    # Unpack state [x(2), lambda(1), u(2), v(2)]
-    x = state[0:2]
-    lambda_val = state[2]
-    u = state[3:5]
-    v = state[5:7]
-    
-    # Compute values
-    g_val = constraint_function(x, u)
-    h_vals = h_functions(u, rho)
-    
-    # x dynamics
-    dx = -objective_gradient(x) - (lambda_val + epsilon) * constraint_gradient_x(x, u)
-    
-    # lambda dynamics
-    lambda_dot_arg = g_val - b - v @ h_vals
-    if lambda_val + epsilon > 0 or lambda_dot_arg > 0:
-        dlambda = lambda_dot_arg
-    else:
-        dlambda = 0
-    
-    # u dynamics
-    grad_g_u = constraint_gradient_u(x)
-    grad_h = h_gradients(u)
-    du = grad_g_u - grad_h * v
-    
-    # v dynamics
-    dv = np.zeros(2)
-    for j in range(2):
-        v_dot_arg = (lambda_val + epsilon) * h_vals[j]
-        if v[j] > 0 or v_dot_arg > 0:
-            dv[j] = v_dot_arg
-        else:
-            dv[j] = 0
-    
-    return np.concatenate([dx, [dlambda], du, dv])
-
 # Test the dynamics
 print("Testing RO Dynamics for Example B: Nonlinear Optimization with No RC")
 print("="*70)
 
 # Calibrate b value
-b_calibrated = constraint_function(x_star_expected, u_star_expected)
+problem = example_b(rho=rho)
+b_calibrated = problem.constraint.value(x_star_expected, u_star_expected)
+problem.b = b_calibrated
 print(f"Calibrated b value: {b_calibrated:.4f}")
 
 # Initial conditions (all ones as in paper)
@@ -118,20 +38,17 @@ t_span = np.linspace(0, 100, 5000)
 
 # Solve ODE
 print("\nSolving ODE system...")
-try:
-    solution = odeint(ro_dynamics_nonlinear, initial_state, t_span, 
-                     args=(0.0, b_calibrated, rho), rtol=1e-8, atol=1e-10)
+solution = solve(problem, initial_state, t_span, epsilon=0.0,
+                 rtol=1e-8, atol=1e-10)
+if solution.success:
     print("✓ ODE integration successful")
-except Exception as e:
-    print(f"✗ ODE integration failed: {e}")
+else:
+    print(f"✗ ODE integration failed: {solution.message}")
     sys.exit(1)
 
 # Extract final values
-x_final = solution[-1, 0:2]
-lambda_final = solution[-1, 2]
-u_final = solution[-1, 3:5]
-v_final = solution[-1, 5:7]
-cost_final = objective_function(x_final)
+x_final, lambda_final, u_final, v_final = solution.final
+cost_final = problem.objective(x_final)
 
 # Check results
 print("\nResults:")
@@ -152,7 +69,7 @@ else:
     print("\n⚠ Solution differs from expected (may need parameter tuning)")
     
 # Check constraint satisfaction
-g_final = constraint_function(x_final, u_final)
+g_final = problem.constraint.value(x_final, u_final)
 print(f"\nConstraint check: g(x*, u*) = {g_final:.4f} ≈ b = {b_calibrated:.4f}")
 if abs(g_final - b_calibrated) < 0.01:
     print("✓ Constraint is active (as expected)")
@@ -160,7 +77,7 @@ else:
     print("⚠ Constraint may not be exactly active")
 
 # Check if u is on boundary
-h_final = h_functions(u_final, rho)
+h_final = problem.uncertainty_set.h_values(u_final)
 print(f"\nBoundary check:")
 print(f"  h₁(u₁) = {h_final[0]:.6f} (should be ≈ 0 if on boundary)")
 print(f"  h₂(u₂) = {h_final[1]:.6f} (should be ≈ 0 if on boundary)")
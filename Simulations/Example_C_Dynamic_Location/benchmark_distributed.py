@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Partitioned multi-process execution of the Example C dynamics
+(rodynamics.distributed) against the monolithic solve().
+
+The first table times solve_distributed with 1, 2 and 4 worker processes
+on a random network and on a ring network with local links, and gives the
+number of cut agent-agent edges of each partition. The speedup is bounded
+by the number of cores (printed with the table). The second table shows
+how the trajectory degrades with the synchronization period and the
+staleness: the largest deviation of the agent positions from the
+monolithic run, over the whole trajectory and at the final time. These
+runs use the deterministic lockstep mode, which gives the same trajectory
+as the worker processes.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import MultiAgentProblem, solve
+from rodynamics.benchmark import random_network, ring_network
+from rodynamics.distributed import cut_edges, partition_agents, solve_distributed
+from rodynamics.examples import EXAMPLE_C_ANCHORS
+
+OPTIONS = {'method': 'RK45', 'epsilon': 0.01, 'rtol': 1e-6, 'atol': 1e-8}
+
+
+def location_problem(edges, n_agents):
+    return MultiAgentProblem(EXAMPLE_C_ANCHORS, n_agents, edges, a=(1.0, 1.0),
+                             P=(1.0, -1.0), b=2.5, rho=np.sqrt(0.1))
+
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+
+def run(n_agents=200, t_final=20.0, n_points=41, workers=(1, 2, 4),
+        periods=(1.0, 0.1, 0.01), staleness=(0, 1, 4), seed=0):
+    rng = np.random.default_rng(seed)
+    n_anchors = len(EXAMPLE_C_ANCHORS)
+    networks = {
+        'random': location_problem(
+            random_network(n_agents, 5 * n_agents, n_anchors, rng), n_agents),
+        'ring': location_problem(
+            ring_network(n_agents, n_anchors, rng), n_agents),
+    }
+    x0 = np.zeros((n_agents, 2))
+    t_span = np.linspace(0.0, t_final, n_points)
+    references = {}
+
+    print(f"{n_agents} agents, t in [0, {t_final:g}], sync_period 0.1, "
+          f"staleness 0, {os.cpu_count()} core(s)")
+    print(f"{'network':>8} {'workers':>8} {'cut':>6} {'wall [s]':>9} "
+          f"{'nfev':>8} {'wait [s]':>9} {'max |dx|':>9}")
+    for name, problem in networks.items():
+        reference, wall = timed(lambda: solve(problem, x0, t_span, **OPTIONS))
+        assert reference.success, reference.message
+        references[name] = reference
+        print(f"{name:>8} {'solve':>8} {'-':>6} {wall:>9.2f} "
+              f"{reference.nfev:>8} {'-':>9} {'-':>9}")
+        for n_workers in workers:
+            solution, wall = timed(lambda: solve_distributed(
+                problem, x0, t_span, n_workers=n_workers, sync_period=0.1,
+                **OPTIONS))
+            assert solution.success, solution.message
+            wait = max(worker['wait'] for worker in solution.workers)
+            error = np.abs(solution.x - reference.x).max()
+            print(f"{name:>8} {n_workers:>8} {solution.cut_edges:>6} "
+                  f"{wall:>9.2f} {solution.nfev:>8} {wait:>9.2f} "
+                  f"{error:>9.1e}")
+
+    problem = networks['ring']
+    reference = references['ring']
+    labels = partition_agents(problem, max(workers))
+    print(f"\nring network, {max(workers)} parts ({cut_edges(problem, labels)} "
+          f"cut edges), deviation from solve()")
+    print(f"{'period':>7} {'staleness':>10} {'max |dx|':>9} {'final |dx|':>11} "
+          f"{'nfev':>8}")
+    for period in periods:
+        for stale in staleness:
+            solution = solve_distributed(problem, x0, t_span, labels=labels,
+                                         sync_period=period, staleness=stale,
+                                         processes=False, **OPTIONS)
+            deviation = np.abs(solution.x - reference.x)
+            print(f"{period:>7g} {stale:>10} {deviation.max():>9.1e} "
+                  f"{deviation[-1].max():>11.1e} {solution.nfev:>8}")
+
+
+if __name__ == "__main__":
+    run()
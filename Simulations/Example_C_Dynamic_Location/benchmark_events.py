@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+RHS evaluations and accuracy of the Example C scenario integrated as one
+call, piecewise over the phase breakpoints t = 100, 250, 300, and
+piecewise with the projection switches of lambda_i and v_i located as
+events.
+
+The baseline is the single odeint call at its default tolerances that
+dynamic_location.ipynb made before the schedule API; each solve_ivp method
+is also run as a single call at every rtol. "saved" is the fraction of
+RHS evaluations saved against the odeint baseline, "vs single" against
+the single call of the same method and rtol. Errors are the largest
+deviation of the agent positions at the notebook's output times from a
+reference run (events, rtol=1e-11). nfev counts every evaluation of the
+vector field, including those spent locating events.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve, solve_scheduled
+from rodynamics.examples import example_c, example_c_schedule
+
+MODES = ('single call', 'breakpoints', 'events')
+
+
+def integrate(mode, problem, state0, t_span, method, rtol, atol):
+    options = {'method': method, 'epsilon': 0.01, 'rtol': rtol, 'atol': atol}
+    if method == 'odeint':
+        return solve(problem, state0, t_span, method='odeint', epsilon=0.01)
+    if mode == 'single call':
+        return solve(problem, state0, t_span, **options)
+    return solve_scheduled(problem, state0, t_span,
+                           schedule=example_c_schedule(),
+                           projection_events=(mode == 'events'), **options)
+
+
+def run(rtols=(1e-4, 1e-5, 1e-6, 1e-7, 5e-8, 1e-8),
+        methods=('RK45', 'DOP853')):
+    problem = example_c()
+    state0 = np.zeros(problem.layout.size)
+    t_span = np.linspace(0, 400, 2000)
+    reference = integrate('events', problem, state0, t_span, 'DOP853',
+                          1e-11, 1e-13)
+    print(f"reference: {reference.n_events} projection events, "
+          f"nfev {reference.nfev}")
+
+    start = time.perf_counter()
+    notebook = integrate('single call', problem, state0, t_span, 'odeint',
+                         None, None)
+    elapsed = time.perf_counter() - start
+    assert notebook.success, notebook.message
+    print(f"\nodeint single call (notebook, default tolerances): "
+          f"{elapsed:.3f} s, nfev {notebook.nfev}, x error "
+          f"{np.abs(notebook.x - reference.x).max():.2e}")
+
+    for method in methods:
+        print(f"\n{method}")
+        print(f"{'rtol':>7} {'mode':>12} {'time [s]':>9} {'nfev':>7} "
+              f"{'saved':>7} {'vs single':>9} {'events':>7} {'x error':>9}")
+        for rtol in rtols:
+            single = None
+            for mode in MODES:
+                start = time.perf_counter()
+                solution = integrate(mode, problem, state0, t_span, method,
+                                     rtol, 1e-2 * rtol)
+                elapsed = time.perf_counter() - start
+                assert solution.success, solution.message
+                if single is None:
+                    single = solution.nfev
+                error = np.abs(solution.x - reference.x).max()
+                events = getattr(solution, 'n_events', '-')
+                saved = 1 - solution.nfev / notebook.nfev
+                print(f"{rtol:>7.0e} {mode:>12} {elapsed:>9.3f} "
+                      f"{solution.nfev:>7} {saved:>7.1%} "
+                      f"{1 - solution.nfev / single:>9.1%} {events:>7} "
+                      f"{error:>9.2e}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+State layout and precision of the multi-agent RHS at increasing agent
+counts.
+
+On random networks with 5N edges, the interleaved state (MultiAgentLayout)
+and the structure-of-arrays state (state_order='blocks') are compared in
+float64 and float32 (MultiAgentDynamics(dtype=np.float32)): the time of
+one RHS evaluation, the throughput of an rk4 RealTimeStepper in agent
+updates per second, and the memory held by the dynamics and the stepper
+(traced at construction).
+
+The accuracy check runs the rk4 stepper at dt = 0.01 over t in [0, 100]
+for N = 1000 in both precisions, and reports the deviation of the float32
+positions from the float64 ones next to the deviation of the float64
+stepper from a tight RK45 reference and the float32 rounding unit at the
+largest position. It fails if the float32 deviation exceeds ACCURACY_RATIO
+times the float64 one.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import RealTimeStepper, solve
+from rodynamics.benchmark import random_multiagent_problem
+
+EPSILON = 0.01
+# Largest accepted float32 deviation, in units of the float64 rk4 error
+ACCURACY_RATIO = 10
+VARIANTS = (('interleaved', np.float64), ('blocks', np.float64),
+            ('interleaved', np.float32), ('blocks', np.float32))
+
+
+def best_of(run, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def build(problem, state0, dtype):
+    """Dynamics and rk4 stepper, with the bytes they hold."""
+    tracemalloc.start()
+    dynamics = problem.make_dynamics(epsilon=EPSILON, dtype=dtype)
+    stepper = RealTimeStepper(dynamics, state0, scheme='rk4')
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return dynamics, stepper, memory
+
+
+def throughput(n_values=(1000, 10000, 100000), n_steps=20, seed=0):
+    print(f"{'agents':>7} {'order':>12} {'dtype':>8} {'RHS [ms]':>9} "
+          f"{'rk4 [M agent-steps/s]':>22} {'memory [MB]':>12}")
+    for n in n_values:
+        rng = np.random.default_rng(seed)
+        base = random_multiagent_problem(n, rng)
+        x0 = rng.uniform(0.0, 3.0, (n, 2))
+        for order, dtype in VARIANTS:
+            problem = base.replace(state_order=order)
+            state = problem.initial_state(x0).astype(dtype)
+            dynamics, stepper, memory = build(problem, state, dtype)
+            rhs = best_of(lambda: dynamics.evaluate(state, 0.0), 10)
+            steps = best_of(lambda: [stepper.step(1e-3)
+                                     for _ in range(n_steps)], 3)
+            print(f"{n:>7} {order:>12} {np.dtype(dtype).name:>8} "
+                  f"{1e3 * rhs:>9.2f} {1e-6 * n * n_steps / steps:>22.2f} "
+                  f"{memory / 2**20:>12.1f}")
+
+
+def accuracy(n=1000, dt=0.01, t_final=100.0, seed=0):
+    rng = np.random.default_rng(seed)
+    problem = random_multiagent_problem(n, rng).replace(
+        state_order='blocks')
+    state0 = problem.initial_state(rng.uniform(0.0, 3.0, (n, 2)))
+    n_steps = int(round(t_final / dt))
+    final = {}
+    for dtype in (np.float64, np.float32):
+        stepper = RealTimeStepper(
+            problem.make_dynamics(epsilon=EPSILON, dtype=dtype), state0,
+            scheme='rk4')
+        for _ in range(n_steps):
+            stepper.step(dt)
+        final[dtype] = stepper.state.astype(float)
+    reference = solve(problem, state0, [0.0, t_final], method='RK45',
+                      epsilon=EPSILON, rtol=1e-10, atol=1e-12).final[0]
+    x64, x32 = (problem.layout.unpack(final[dtype])[0]
+                for dtype in (np.float64, np.float32))
+    rounding = np.abs(x32 - x64).max()
+    discretization = np.abs(x64 - reference).max()
+    print(f"\n{n} agents, rk4 at dt = {dt:g} over t in [0, {t_final:g}]:")
+    print(f"  max |x_float32 - x_float64|   {rounding:.1e}")
+    print(f"  max |x_float64 - x_RK45|      {discretization:.1e}")
+    print(f"  float32 eps * max |x|         "
+          f"{np.finfo(np.float32).eps * np.abs(x64).max():.1e}")
+    assert rounding < ACCURACY_RATIO * discretization, \
+        (f"float32 positions deviate by {rounding:.1e}, more than "
+         f"{ACCURACY_RATIO} times the rk4 error {discretization:.1e}")
+
+
+def run():
+    throughput()
+    accuracy()
+
+
+if __name__ == "__main__":
+    run()
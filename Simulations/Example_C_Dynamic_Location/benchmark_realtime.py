@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Per-tick latency of the fixed-step real-time mode (RealTimeStepper) for the
+Example C agents at 1 kHz, over the full three-phase scenario.
+
+For each scheme it reports the p50/p99/max wall time of step(dt), the share
+of the 1 ms budget used at p99, the ticks over budget, and the RHS
+evaluations per tick. It also reports the largest error in the agent
+positions against a tight solve_scheduled reference, sampled at the
+notebook's output times, and the traced memory of a tick: the peak
+transient and the net growth over 1000 ticks. The growth is the few
+hundred bytes held from the last tick, not an amount per tick.
+"""
+
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve_scheduled
+from rodynamics.examples import example_c, example_c_schedule
+from rodynamics.realtime import SCHEMES, RealTimeStepper, step_latencies
+
+EPSILON = 0.01
+
+
+def traced_memory(stepper, dt, n_steps=1000):
+    """(peak transient, net growth) in bytes over n_steps ticks."""
+    stepper.step(dt)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(n_steps):
+        stepper.step(dt)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - base, current - base
+
+
+def run(rate=1000.0, t_final=400.0, sample_every=0.2, schemes=tuple(SCHEMES)):
+    dt = 1.0 / rate
+    problem = example_c()
+    state0 = np.zeros(problem.layout.size)
+    n_steps = int(round(t_final * rate))
+    stride = int(round(sample_every * rate))
+    t_samples = np.arange(0, n_steps + 1, stride) * dt
+    reference = solve_scheduled(problem, state0, t_samples,
+                                schedule=example_c_schedule(),
+                                epsilon=EPSILON, rtol=1e-10, atol=1e-12)
+
+    budget = 1e6 * dt
+    print(f"Example C, {problem.n_agents} agents, {rate:g} Hz over "
+          f"t in [0, {t_final:g}] ({n_steps} ticks, budget {budget:g} us)")
+    print(f"{'scheme':>6} {'RHS/tick':>8} {'p50 [us]':>9} {'p99 [us]':>9} "
+          f"{'max [us]':>9} {'p99/budget':>10} {'overruns':>8} "
+          f"{'x error':>9} {'peak [B]':>9} {'growth':>7}")
+    for scheme in schemes:
+        stepper = RealTimeStepper(problem.make_dynamics(epsilon=EPSILON),
+                                  state0, scheme=scheme)
+        samples = [stepper.state.copy()]
+
+        def record(stepper):
+            if len(samples) * stride == round(stepper.t * rate):
+                samples.append(stepper.state.copy())
+
+        latencies = 1e6 * step_latencies(stepper, dt, n_steps, record)
+        x = problem.layout.unpack(np.array(samples))[0]
+        error = np.abs(x - reference.x).max()
+        p50, p99 = np.percentile(latencies, [50, 99])
+        peak, growth = traced_memory(stepper, dt)
+        print(f"{scheme:>6} {stepper.n_stages:>8} {p50:>9.1f} {p99:>9.1f} "
+              f"{latencies.max():>9.0f} {p99 / budget:>10.1%} "
+              f"{np.sum(latencies > budget):>8} {error:>9.2e} {peak:>9} "
+              f"{growth:>7}")
+
+
+if __name__ == "__main__":
+    run()
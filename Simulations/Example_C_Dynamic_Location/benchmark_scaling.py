@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark of the sparse multi-agent RO dynamics (Example C) over the
+number of agents N on random sensor networks with 5N edges, against the
+per-agent loop of the original notebook.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import MultiAgentProblem, solve
+from rodynamics.benchmark import random_network
+from rodynamics.examples import EXAMPLE_C_ANCHORS, example_c_rho
+
+
+def make_loop_dynamics(problem, epsilon=0.01):
+    """Original notebook implementation: one Python iteration per agent."""
+    N1, N2 = problem.n_anchors, problem.n_agents
+    adjacency = problem.adjacency_matrix().toarray()
+    a, P, b, w = problem.a, problem.P, problem.b, problem.w
+
+    def multi_agent_dynamics(state, t):
+        rho = problem.rho(t)
+        anchor_positions = problem.anchors_at(t)
+        d_state = np.zeros_like(state)
+        for i in range(N2):
+            idx = i * 6
+            x_i = state[idx:idx+2]
+            lambda_i = state[idx+2]
+            u_i = state[idx+3:idx+5]
+            v_i = state[idx+5]
+
+            agent_idx = N1 + i
+            neighbors = []
+            for j in range(N1):
+                if adjacency[agent_idx, j] > 0:
+                    neighbors.append(anchor_positions[j])
+            for j in range(N2):
+                if i != j and adjacency[agent_idx, N1+j] > 0:
+                    neighbors.append(state[j*6:j*6+2])
+
+            grad_obj = np.zeros(2)
+            for x_j in neighbors:
+                grad_obj += w * (x_i - x_j)
+            constraint_grad = a + P * u_i
+            dx_i = -grad_obj - (lambda_i + epsilon) * constraint_grad
+
+            constraint_val = (a + P * u_i) @ x_i - b
+            h_val = u_i @ u_i - rho**2
+            lambda_dot = constraint_val - v_i * h_val
+            if lambda_i + epsilon > 0 or lambda_dot > 0:
+                dlambda_i = lambda_dot
+            else:
+                dlambda_i = 0
+
+            du_i = P * x_i[0] + P * x_i[1] - 2 * v_i * u_i
+
+            v_dot = (lambda_i + epsilon) * h_val
+            if v_i > 0 or v_dot > 0:
+                dv_i = v_dot
+            else:
+                dv_i = 0
+
+            d_state[idx:idx+2] = dx_i
+            d_state[idx+2] = dlambda_i
+            d_state[idx+3:idx+5] = du_i
+            d_state[idx+5] = dv_i
+        return d_state
+
+    return multi_agent_dynamics
+
+
+def seconds_per_call(rhs, state, t=50.0, min_time=0.5):
+    """Average wall time of rhs(state, t) over at least min_time seconds."""
+    n_calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        rhs(state, t)
+        n_calls += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / n_calls
+
+
+def run(n_values=(10, 100, 1000, 10000), edges_per_agent=5, loop_max=1000,
+        t_final=10.0, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f"{'N':>6} {'edges':>7} {'loop [ms]':>10} {'sparse [ms]':>12} "
+          f"{'speedup':>8} {'solve [s]':>10} {'nfev':>7}")
+    for n in n_values:
+        edges = random_network(n, edges_per_agent * n, len(EXAMPLE_C_ANCHORS),
+                               rng)
+        problem = MultiAgentProblem(EXAMPLE_C_ANCHORS, n, edges,
+                                    a=(1.0, 1.0), P=(1.0, -1.0), b=2.5,
+                                    rho=example_c_rho)
+        sparse_rhs = problem.make_dynamics(epsilon=0.01)
+        state = problem.layout.pack(rng.uniform(0.0, 2.0, (n, 2)), lam=0.1,
+                                    u=rng.uniform(-0.3, 0.3, (n, 2)), v=0.1)
+        sparse_time = seconds_per_call(sparse_rhs, state)
+
+        if n <= loop_max:
+            loop_rhs = make_loop_dynamics(problem)
+            assert np.allclose(loop_rhs(state, 50.0), sparse_rhs(state, 50.0))
+            loop_time = seconds_per_call(loop_rhs, state)
+            loop_column = f"{1e3 * loop_time:>10.3f}"
+            speedup_column = f"{loop_time / sparse_time:>7.0f}x"
+        else:
+            loop_column = f"{'-':>10}"
+            speedup_column = f"{'-':>8}"
+
+        start = time.perf_counter()
+        solution = solve(problem, np.zeros((n, 2)),
+                         np.linspace(0.0, t_final, 11), method='RK45',
+                         epsilon=0.01, rtol=1e-6, atol=1e-8)
+        solve_time = time.perf_counter() - start
+        assert solution.success, solution.message
+
+        print(f"{n:>6} {len(problem.edges):>7} {loop_column} "
+              f"{1e3 * sparse_time:>12.3f} {speedup_column} "
+              f"{solve_time:>10.2f} {solution.nfev:>7}")
+    print(f"\nsolve: RK45 from the origin over t in [0, {t_final:g}]; its "
+          f"cost follows nfev, i.e. the stiffness of the random graph")
+
+
+if __name__ == "__main__":
+    run()
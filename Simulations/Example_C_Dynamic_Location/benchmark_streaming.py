@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Peak traced memory of dense vs streamed trajectories for random Example C
+networks (5N edges, as in benchmark_scaling.py), over the number of agents
+and over the horizon at a fixed output rate.
+
+'dense' is solve() returning the full (len(t_span), 6N) array. 'memmap'
+streams the agent positions to an .npy file with MemmapSink, every second
+output time, and 'ring' keeps the last 100 positions in a RingBufferSink.
+Both stream in windows of chunk_size output times. Pages of the memmap
+are file-backed and not traced.
+
+'error' is the largest deviation of the streamed run (saved positions and
+final state) from the dense one. Every window restarts RK45, so the two
+differ at the level of the integration error itself.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import (MemmapSink, MultiAgentProblem, RingBufferSink,
+                        layout_indices, load_trajectory, solve)
+from rodynamics.benchmark import random_network
+from rodynamics.examples import EXAMPLE_C_ANCHORS, example_c_rho
+
+OUTPUT_RATE = 20.0
+CHUNK_SIZE = 100
+
+
+def make_problem(n_agents, rng, edges_per_agent=5):
+    edges = random_network(n_agents, edges_per_agent * n_agents,
+                           len(EXAMPLE_C_ANCHORS), rng)
+    return MultiAgentProblem(EXAMPLE_C_ANCHORS, n_agents, edges,
+                             a=(1.0, 1.0), P=(1.0, -1.0), b=2.5,
+                             rho=example_c_rho)
+
+
+def traced(function):
+    """(result, peak traced MiB, wall time in s) of function()."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak / 2**20, elapsed
+
+
+def compare(problem, t_final, directory):
+    t_span = np.linspace(0.0, t_final, int(round(t_final * OUTPUT_RATE)) + 1)
+    x0 = np.zeros((problem.n_agents, 2))
+    options = {'method': 'RK45', 'epsilon': 0.01, 'rtol': 1e-4, 'atol': 1e-6}
+    positions = layout_indices(problem.layout, 'x')
+    path = os.path.join(directory, 'trajectory.npy')
+
+    dense, dense_peak, dense_time = traced(
+        lambda: solve(problem, x0, t_span, **options))
+    memmap = MemmapSink(path, select=positions, every=2)
+    streamed, memmap_peak, memmap_time = traced(
+        lambda: solve(problem, x0, t_span, sinks=memmap,
+                      chunk_size=CHUNK_SIZE, **options))
+    ring = RingBufferSink(100, select=positions)
+    _, ring_peak, _ = traced(
+        lambda: solve(problem, x0, t_span, sinks=ring,
+                      chunk_size=CHUNK_SIZE, **options))
+
+    t_saved, x_saved = load_trajectory(path)
+    error = np.abs(x_saved - dense.y[::2, positions]).max()
+    assert np.array_equal(t_saved, t_span[::2])
+    error = max(error, np.abs(streamed.y[-1] - dense.y[-1]).max())
+    return (len(t_span), dense_peak, memmap_peak, ring_peak, dense_time,
+            memmap_time, error)
+
+
+def report(label, row):
+    n_samples, dense, memmap, ring, dense_time, memmap_time, error = row
+    print(f"{label:>16} {n_samples:>8} {dense:>10.1f} {memmap:>11.1f} "
+          f"{ring:>9.1f} {dense_time:>8.2f} {memmap_time:>8.2f} "
+          f"{error:>9.1e}")
+
+
+def header():
+    print(f"{'':>16} {'samples':>8} {'dense MiB':>10} {'memmap MiB':>11} "
+          f"{'ring MiB':>9} {'dense s':>8} {'memmap s':>8} {'error':>9}")
+
+
+def run(n_values=(100, 400, 1600), horizons=(5.0, 20.0, 80.0), seed=0):
+    rng = np.random.default_rng(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Growing N, t in [0, 20] at {OUTPUT_RATE:g} outputs per unit "
+              f"time")
+        header()
+        for n in n_values:
+            report(f"N = {n}", compare(make_problem(n, rng), 20.0, directory))
+
+        print(f"\nGrowing horizon, N = {n_values[1]}")
+        header()
+        problem = make_problem(n_values[1], rng)
+        for t_final in horizons:
+            report(f"t = {t_final:g}", compare(problem, t_final, directory))
+
+
+if __name__ == "__main__":
+    run()
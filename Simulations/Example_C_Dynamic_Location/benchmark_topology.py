@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Agents and edges joining and leaving Example C mid-run
+(rodynamics.topology).
+
+At t = 50 agent 6 leaves, agents 100 and 101 join with five new edges and
+edge (7, 8) is dropped. The run resumed by solve_dynamic() is compared
+with a reference that integrates up to t = 50, rebuilds the problem of the
+new network and continues from the surviving agents' states.
+
+With the anchors of example_c() moving as Trajectories, a run of
+solve_dynamic() without changes is compared with solve(), and an anchor
+joining while the others rotate is checked to stay where it was placed.
+
+On random networks with 5N edges, one change (an agent leaves, another
+joins with 5 edges) applied in place is timed against rebuilding the
+problem, its dynamics and the state, and the RHS is timed with pending
+Laplacian corrections, after compaction and on the rebuilt problem.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import DynamicNetwork, NetworkChange, solve, solve_dynamic
+from rodynamics.benchmark import random_multiagent_problem
+from rodynamics.examples import example_c
+
+
+def best_of(run, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def resumed_vs_rebuilt(rtol=1e-10, atol=1e-12):
+    problem = example_c().replace(anchor_motion=None, rho=np.sqrt(0.1))
+    first = problem.n_anchors
+    change = NetworkChange(
+        50.0, add_agents={100: (1.0, 2.0), 101: (2.0, 1.0)},
+        remove=[first + 1],
+        add_edges=[(100, first), (100, 0), (101, 100), (101, first + 2),
+                   (101, 3)],
+        remove_edges=[(first + 2, first + 3)])
+    t_span = np.linspace(0, 100, 201)
+    options = {'method': 'RK45', 'epsilon': 0.01, 'rtol': rtol, 'atol': atol}
+    network = DynamicNetwork(problem)
+    solution = solve_dynamic(network, np.zeros((problem.n_agents, 2)), t_span,
+                             [change], **options)
+
+    before = solve(problem, np.zeros((problem.n_agents, 2)), t_span[:101],
+                   **options)
+    rebuilt, slots = network.to_problem()
+    reached = dict(zip(range(first, problem.n_nodes),
+                       problem.layout.agents(before.y[-1])))
+    state = rebuilt.layout.pack(0.0)
+    S = rebuilt.layout.agents(state)
+    for row, node in enumerate(network.agent_ids[slots]):
+        if node in reached:
+            S[row] = reached[node]
+        else:
+            S[row, rebuilt.layout.x] = change.add_agents[node]
+    after = solve(rebuilt, state, t_span[100:], **options)
+    X = network.layout.agents(solution.y)[..., network.layout.x]
+    error = max(np.abs(X[:100, :4] - before.x[:100]).max(),
+                np.abs(X[100:, slots] - after.x).max())
+    print(f"agents {solution.agent_ids[0][solution.agent_ids[0] >= 0]} -> "
+          f"{solution.agent_ids[-1][solution.agent_ids[-1] >= 0]} at t = 50; "
+          f"max |x - x_rebuilt| {error:.1e} (rtol {rtol:.0e}), "
+          f"{solution.nfev} RHS evaluations")
+
+
+def moving_anchors(rtol=1e-10, atol=1e-12):
+    problem = example_c()
+    t_span = np.linspace(0, 400, 801)
+    options = {'method': 'RK45', 'epsilon': 0.01, 'rtol': rtol, 'atol': atol}
+    network = DynamicNetwork(problem)
+    solution = solve_dynamic(network, np.zeros((problem.n_agents, 2)),
+                             t_span, **options)
+    reference = solve(problem, np.zeros((problem.n_agents, 2)), t_span,
+                      **options)
+    X = network.layout.agents(solution.y)[..., network.layout.x]
+    error = np.abs(X[:, :problem.n_agents] - reference.x).max()
+    print(f"moving anchors, no changes: max |x - x_solve| {error:.1e} "
+          f"(rtol {rtol:.0e})")
+
+    first = problem.n_anchors
+    change = NetworkChange(150.0, add_anchors={50: (1.0, 1.0)}, remove=[1],
+                           add_edges=[(50, first), (50, first + 3)])
+    network = DynamicNetwork(problem)
+    solution = solve_dynamic(network, np.zeros((problem.n_agents, 2)),
+                             t_span, [change], **options)
+    rebuilt, _ = network.to_problem()
+    anchor_ids = network.anchor_ids[network.anchor_ids >= 0]
+    for t in (150.0, 200.0):
+        moved = problem.anchors_at(t)
+        for node, position in zip(anchor_ids, rebuilt.anchors_at(t)):
+            expected = (1.0, 1.0) if node == 50 else moved[node]
+            assert np.allclose(position, expected), (t, node)
+    print(f"anchor 50 joins at t = 150 and anchor 1 leaves: "
+          f"{solution.nfev} RHS evaluations, the others keep rotating")
+
+
+def rebuild(problem, edges, leaving, joining_edges, state):
+    """Reference: new problem, dynamics and state without the agent."""
+    n_anchors = problem.n_anchors
+    keep = (edges != leaving).all(axis=1)
+    edges = np.where(edges > leaving, edges - 1, edges)[keep]
+    edges = np.vstack([edges, joining_edges])
+    rebuilt = problem.replace(n_agents=problem.n_agents, edges=edges)
+    dynamics = rebuilt.make_dynamics(epsilon=0.01)
+    S = problem.layout.agents(state)
+    rows = np.arange(problem.n_agents) != leaving - n_anchors
+    new_state = rebuilt.layout.pack(0.0)
+    rebuilt.layout.agents(new_state)[:-1] = S[rows]
+    return dynamics, new_state
+
+
+def change_cost(n_values=(100, 1000, 10000), n_changes=20, seed=0):
+    print(f"\n{'agents':>7} {'edges':>7} {'change [us]':>12} "
+          f"{'rebuild [ms]':>13} {'RHS [us]':>9} {'pending':>9} "
+          f"{'compacted':>10} {'rebuilt':>8}")
+    for n in n_values:
+        rng = np.random.default_rng(seed)
+        problem = random_multiagent_problem(n, rng)
+        n_anchors = problem.n_anchors
+        network = DynamicNetwork(problem, compact_fraction=np.inf)
+        dynamics = network.make_dynamics(epsilon=0.01)
+        state = network.initial_state(rng.uniform(0.0, 3.0, (n, 2)))
+        plain = best_of(lambda: dynamics.evaluate(state, 0.0), 20)
+
+        # n_changes changes, each an agent leaving and one joining with 5
+        # edges, applied in place
+        leaving = rng.choice(np.arange(n_anchors, n_anchors + n),
+                             n_changes, replace=False)
+        changes = []
+        for k, node in enumerate(leaving):
+            joining = 10 ** 6 + k
+            neighbours = rng.choice(np.arange(n_anchors, n_anchors + n), 5)
+            neighbours = [int(j) for j in neighbours if j not in leaving]
+            changes.append(NetworkChange(
+                0.0, add_agents={joining: (1.0, 1.0)}, remove=[int(node)],
+                add_edges=[(joining, j) for j in neighbours]))
+        start = time.perf_counter()
+        for change in changes:
+            state = network.apply(change, state)
+            network.update(dynamics)
+        change_time = (time.perf_counter() - start) / n_changes
+        pending = best_of(lambda: dynamics.evaluate(state, 0.0), 20)
+        network.compact()
+        network.update(dynamics)
+        compacted = best_of(lambda: dynamics.evaluate(state, 0.0), 20)
+
+        edges = problem.edges
+        joining = np.column_stack([np.full(5, n_anchors + n - 1),
+                                   np.arange(n_anchors, n_anchors + 5)])
+        rebuild_time = best_of(
+            lambda: rebuild(problem, edges, n_anchors + n // 2, joining,
+                            state[:problem.layout.size]), 3)
+        rebuilt, slots = network.to_problem()
+        rebuilt_dynamics = rebuilt.make_dynamics(epsilon=0.01)
+        compact_state = network.layout.agents(state)[slots].ravel()
+        rebuilt_time = best_of(
+            lambda: rebuilt_dynamics.evaluate(compact_state, 0.0), 20)
+        deviation = np.abs(
+            network.layout.agents(dynamics.evaluate(state, 0.0))[slots]
+            - rebuilt.layout.agents(rebuilt_dynamics.evaluate(compact_state,
+                                                              0.0))).max()
+        assert deviation < 1e-10, deviation
+        print(f"{n:>7} {len(network.edges()):>7} {1e6 * change_time:>12.1f} "
+              f"{1e3 * rebuild_time:>13.2f} {1e6 * plain:>9.1f} "
+              f"{1e6 * pending:>9.1f} {1e6 * compacted:>10.1f} "
+              f"{1e6 * rebuilt_time:>8.1f}")
+
+
+def run():
+    resumed_vs_rebuilt()
+    moving_anchors()
+    change_cost()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Time-varying anchors and rho as Trajectories (rodynamics.trajectories).
+
+1. Cost of the anchor positions per RHS call, against the number of
+   anchors: the Example C motion function (a rotation matrix built and
+   applied on every call) and the Switched/Rotation trajectory of
+   example_c, at a new t and at a repeated t (the cache).
+2. The Example C RHS with the functions and with the trajectories.
+3. Tracking lag with and without feed-forward: the largest distance of
+   the agent positions from the saddle point of the parameters at that
+   time (found by integrating with the parameters frozen), sampled while
+   the anchors rotate (t in [150, 250], at the Example C rate and five
+   times faster) and while rho^2 ramps from 0.1 to 1 over 10 time units.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rodynamics import solve
+from rodynamics.examples import (EXAMPLE_C_ANCHORS, EXAMPLE_C_CENTER,
+                                 example_c, example_c_anchor_motion,
+                                 example_c_rho)
+from rodynamics.trajectories import Rotation, Switched, Waypoints
+
+EPSILON = 0.01
+
+
+def best_of(run, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def per_call(function, times, repeat=5):
+    """Best time per call over a sweep of the given times."""
+    return best_of(lambda: [function(t) for t in times], repeat) / len(times)
+
+
+def anchor_cost(n_values=(9, 100, 1000, 10000), n_calls=2000, seed=0):
+    print(f"{'anchors':>8} {'function [us]':>14} {'trajectory [us]':>16} "
+          f"{'repeated t [us]':>16}")
+    rng = np.random.default_rng(seed)
+    times = np.linspace(101.0, 249.0, n_calls)
+    for n in n_values:
+        positions = rng.uniform(0.0, 3.0, (n, 2))
+        anchors = Switched([
+            (0.0, positions),
+            (100.0, Rotation(positions, EXAMPLE_C_CENTER, 0.01, t0=100.0)),
+            (250.0, positions)])
+        function = per_call(lambda t: example_c_anchor_motion(t, positions),
+                            times)
+        trajectory = per_call(anchors, times)
+        repeated = per_call(anchors, np.full(n_calls, 150.0))
+        print(f"{n:>8} {1e6 * function:>14.2f} {1e6 * trajectory:>16.2f} "
+              f"{1e6 * repeated:>16.2f}")
+
+
+def rhs_cost(n_calls=2000):
+    problem = example_c()
+    functions = problem.replace(rho=example_c_rho,
+                                anchor_motion=example_c_anchor_motion)
+    state = problem.initial_state(np.ones((problem.n_agents, 2)))
+    times = np.linspace(0.0, 400.0, n_calls)
+    print()
+    for name, p in (('functions', functions), ('trajectories', problem)):
+        dynamics = p.make_dynamics(epsilon=EPSILON)
+        cost = per_call(lambda t: dynamics.evaluate(state, t), times, 10)
+        print(f"Example C RHS with {name:<12} {1e6 * cost:.1f} us")
+
+
+def tracking_error(problem, samples, feedforward, settle=3000.0):
+    """Largest max |x(t) - x*(t)| over the sample times."""
+    options = {'method': 'RK45', 'epsilon': EPSILON, 'rtol': 1e-9,
+               'atol': 1e-11}
+    solution = solve(problem, np.zeros((problem.n_agents, 2)),
+                     np.concatenate([[0.0], samples]),
+                     dynamics_options={'feedforward': feedforward},
+                     **options)
+    error = 0.0
+    for t, state in zip(samples, solution.y[1:]):
+        frozen = problem.replace(
+            anchor_positions=np.array(problem.anchors_at(t)),
+            anchor_motion=None, rho=float(problem.rho(t)))
+        saddle = solve(frozen, state, [0.0, settle], **options).x[-1]
+        error = max(error, np.abs(frozen.layout.unpack(state)[0]
+                                  - saddle).max())
+    return error
+
+
+def tracking_lag():
+    base = example_c()
+    print(f"\n{'scenario':<28} {'window':>12} {'no feed-forward':>16} "
+          f"{'feed-forward':>13}")
+    for rate in (0.01, 0.05):
+        anchors = Switched([
+            (0.0, EXAMPLE_C_ANCHORS),
+            (100.0, Rotation(EXAMPLE_C_ANCHORS, EXAMPLE_C_CENTER, rate,
+                             t0=100.0))])
+        problem = base.replace(anchor_motion=anchors, rho=np.sqrt(0.1))
+        lag = [tracking_error(problem, np.linspace(150.0, 250.0, 5), ff)
+               for ff in (False, True)]
+        print(f"{f'rotation at {rate:g} rad/s':<28} {'[150, 250]':>12} "
+              f"{lag[0]:>16.2e} {lag[1]:>13.2e}")
+
+    rho = Waypoints([100.0, 110.0], [np.sqrt(0.1), 1.0])
+    problem = base.replace(anchor_motion=None, rho=rho)
+    lag = [tracking_error(problem, np.linspace(102.0, 110.0, 5), ff)
+           for ff in (False, True)]
+    print(f"{'rho^2 ramp 0.1 -> 1':<28} {'[100, 110]':>12} {lag[0]:>16.2e} "
+          f"{lag[1]:>13.2e}")
+
+
+def run():
+    anchor_cost()
+    rhs_cost()
+    tracking_lag()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite over the three examples with regression checks.
+
+Runs the synthetic scaling cases of rodynamics.benchmark (ellipsoid count m
+at n = 2 and 10 for Example A, batches of initial conditions for Example B,
+random networks of N agents and 5N edges for Example C), prints one row per
+case plus the empirical exponent of wall time over size per curve, writes
+the records to benchmark_results.json and compares them against
+benchmark_baseline.json. The columns are
+
+    wall s      best wall time of the fixed-horizon solve
+    RHS evals   evaluations of the vector field in that solve
+    peak MiB    its peak traced memory
+    to-tol s    wall time until the KKT residual is below kkt_tol
+    t_conv      integration time at which that happened
+
+Exits with status 1 if any metric regressed. --update-baseline replaces
+the baseline cases of the suites that were run; baselines are only
+comparable on the machine they were measured on.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from rodynamics.benchmark import (SUITES, compare, load_results,
+                                  run_benchmarks, save_results,
+                                  scaling_exponents)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'benchmark_baseline.json')
+RESULTS = os.path.join(HERE, 'benchmark_results.json')
+
+
+def report(record):
+    def optional(value, spec):
+        return format(value, spec) if value is not None else f"{'-':>8}"
+
+    print(f"{record['name']:>34} {record['wall_time']:>8.3f} "
+          f"{record['nfev']:>10} {record['peak_memory'] / 2**20:>9.2f} "
+          f"{optional(record['time_to_tolerance'], '>8.3f')} "
+          f"{optional(record['t_converged'], '>8.2f')}"
+          f"{'' if record['success'] else '  FAILED'}")
+
+
+def run(suites=tuple(SUITES), repeat=3, output=RESULTS, baseline=BASELINE,
+        update_baseline=False):
+    print(f"{'case':>34} {'wall s':>8} {'RHS evals':>10} {'peak MiB':>9} "
+          f"{'to-tol s':>8} {'t_conv':>8}")
+    records = []
+    for suite in suites:
+        records += run_benchmarks(SUITES[suite](), repeat=repeat,
+                                  progress=report)
+
+    print("\nWall time ~ size^p")
+    for suite, exponent in scaling_exponents(records).items():
+        print(f"{suite:>34} p = {exponent:.2f}")
+
+    save_results(output, records)
+    print(f"\nResults written to {output}")
+    if update_baseline or not os.path.exists(baseline):
+        # Cases that were not run keep their baseline record
+        merged = {}
+        if os.path.exists(baseline):
+            merged = {record['name']: record
+                      for record in load_results(baseline)['records']}
+        merged.update((record['name'], record) for record in records)
+        save_results(baseline, list(merged.values()))
+        print(f"Baseline written to {baseline}")
+        return 0
+
+    regressions = compare(records, load_results(baseline)['records'])
+    if not regressions:
+        print(f"No regressions against {baseline}")
+        return 0
+    print(f"\n{len(regressions)} regression(s) against {baseline}:")
+    for name, metric, before, after in regressions:
+        print(f"{name:>34} {metric:>18}: {before} -> {after}")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('suites', nargs='*', metavar='suite',
+                        help=f"suites to run (default: all of "
+                             f"{', '.join(SUITES)})")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs per timing, the best is kept")
+    parser.add_argument('--output', default=RESULTS)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    arguments = parser.parse_args()
+    for suite in arguments.suites:
+        if suite not in SUITES:
+            parser.error(f"unknown suite {suite!r}; expected one of "
+                         f"{', '.join(SUITES)}")
+    sys.exit(run(arguments.suites or tuple(SUITES), arguments.repeat,
+                 arguments.output, arguments.baseline,
+                 arguments.update_baseline))
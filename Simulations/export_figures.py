@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Render the trajectory figures of the three examples (rodynamics.figures).
+
+The figure set is Example A at eps = 0 and at the perturbed eps = 0.001
+and 0.01 of the paper, Example B (the fixed variant with its safeguards)
+and the agent paths of Example C, each integrated with RK45 on n_samples
+output times over the horizon of its notebook. Curves are simplified to
+--tolerance of each panel's range and written to figures/ as EPS by
+default; figures whose data, style and options are unchanged since the
+last export are skipped (--force renders them anyway). --workers renders
+on that many processes.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from rodynamics import solve
+from rodynamics.examples import (EXAMPLE_B_SAFEGUARDS, example_a, example_b,
+                                 example_c)
+from rodynamics.figures import (FIGURE_FORMATS, TrajectoryFigure,
+                                export_figures, trajectory_figure)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIGURES = os.path.join(HERE, 'figures')
+EXAMPLE_B_START = np.array([0.5, 0.8, 0.5, 1.0, 1.5, 0.5, 0.5])
+OPTIONS = {'method': 'RK45', 'rtol': 1e-8, 'atol': 1e-10}
+
+
+def agent_paths(name, solution, n_agents, figsize=(6.0, 5.0)):
+    """Planar paths of the agents of a multi-agent solution."""
+    figure = TrajectoryFigure(name, figsize=figsize)
+    for i in range(n_agents):
+        figure.curve(0, solution.x[:, i, 0], solution.x[:, i, 1],
+                     linewidth=1.5, label=f'agent {i + 1}')
+    return figure.panel(0, '$x_1$', '$x_2$', 'Agent Trajectories',
+                        legend={})
+
+
+def figure_set(n_samples=20000):
+    """The trajectory figures, from runs with n_samples output times."""
+    figures = []
+    t_span = np.linspace(0, 50, n_samples)
+    for name, epsilon in (('trajectories_intersection', 0.0),
+                          ('trajectories_intersection_perturbed_eps0.001',
+                           0.001),
+                          ('trajectories_intersection_perturbed_eps0.01',
+                           0.01)):
+        solution = checked(solve(example_a(), np.zeros(2), t_span,
+                                 epsilon=epsilon, **OPTIONS))
+        figures.append(trajectory_figure(name, solution))
+
+    solution = checked(solve(example_b(b=5.0, variant='fixed'),
+                             EXAMPLE_B_START, np.linspace(0, 100, n_samples),
+                             dynamics_options=EXAMPLE_B_SAFEGUARDS,
+                             **OPTIONS))
+    figures.append(trajectory_figure('trajectories_nonlinear_exp_no_RC',
+                                     solution))
+
+    problem = example_c()
+    solution = checked(solve(problem, np.zeros((problem.n_agents, 2)),
+                             np.linspace(0, 400, n_samples), epsilon=0.01,
+                             **OPTIONS))
+    figures.append(agent_paths('agent_trajectories', solution,
+                               problem.n_agents))
+    return figures
+
+
+def checked(solution):
+    if not solution.success:
+        raise RuntimeError(f"integration failed: {solution.message}")
+    return solution
+
+
+def run(directory=FIGURES, fmt='eps', tolerance=5e-4, rasterize_above=None,
+        dpi=300, max_workers=None, force=False, n_samples=20000):
+    start = time.perf_counter()
+    figures = figure_set(n_samples)
+    print(f"integrated {len(figures)} figures in "
+          f"{time.perf_counter() - start:.1f} s")
+    start = time.perf_counter()
+    exports = export_figures(figures, directory, fmt=fmt,
+                             tolerance=tolerance,
+                             rasterize_above=rasterize_above, dpi=dpi,
+                             max_workers=max_workers, force=force)
+    print(f"{'figure':>46} {'points':>8} {'drawn':>7} {'size KB':>8} "
+          f"{'render s':>9}")
+    for export in exports:
+        drawn = 'cached' if export.cached else export.points_drawn
+        print(f"{os.path.basename(export.path):>46} {export.points:>8} "
+              f"{drawn:>7} {export.size / 1024:>8.1f} "
+              f"{export.seconds:>9.2f}")
+    print(f"exported in {time.perf_counter() - start:.2f} s")
+    return exports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--directory', default=FIGURES)
+    parser.add_argument('--format', default='eps', choices=FIGURE_FORMATS)
+    parser.add_argument('--tolerance', type=float, default=5e-4,
+                        help="simplification tolerance as a fraction of "
+                             "each panel's range (0 keeps every point)")
+    parser.add_argument('--rasterize-above', type=int, default=None,
+                        help="rasterize curves with more points than this")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="render on this many processes")
+    parser.add_argument('--force', action='store_true',
+                        help="render figures even if cached")
+    parser.add_argument('--samples', type=int, default=20000,
+                        help="output times per run")
+    arguments = parser.parse_args()
+    run(arguments.directory, arguments.format, arguments.tolerance,
+        arguments.rasterize_above, arguments.dpi, arguments.workers,
+        arguments.force, arguments.samples)
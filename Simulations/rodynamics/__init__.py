@@ -0,0 +1,167 @@
+"""
+rodynamics: continuous-time RO saddle-point dynamics.
+
+Shared implementation of the projected primal-dual flow used by the three
+examples in Section VII of "Robust Optimization via Continuous-Time
+Dynamics". Problems are specified either from plain functions
+(ROProblem.from_functions) or from structured pieces such as
+AffineConstraint with EllipsoidIntersection / NormBall, and integrated with
+
+    solve(problem, x0, t_span, method='odeint')
+
+Implicit methods can use the exact generalized Jacobian of the flow or its
+declared sparsity pattern through solve(..., jacobian='analytic'/'sparsity').
+A 2-D x0 integrates a batch of runs as one ODE, and sweep() runs multi-start
+and parameter sweeps over chunks of such batches. solve_scheduled()
+integrates a Schedule of phases piecewise, with projection switches located
+as events. RealTimeStepper advances a state in place with a fixed-step
+projected Euler/RK scheme for online use. SolutionCache, solve_warm() and
+continuation() warm-start perturbed instances from nearby saddle points.
+With kkt_tol, solve() and solve_scheduled() stop once the KKT residual of
+the saddle point falls below the tolerance and return its history. With
+sinks (CallbackSink, RingBufferSink, MemmapSink), both stream the
+trajectory in windows instead of returning it, so memory stays flat over
+long horizons. SymbolicProblem declares f, g and h_j as sympy expressions
+(optional dependency) and generates CSE-optimized RHS and Jacobian kernels.
+ScenarioSampler and solve_scenario() are the scenario-sampling baseline.
+An Instrumentation passed as instrument= counts RHS and Jacobian calls,
+step sizes, active projections and clipped exponents of a run and times the
+blocks of the RHS. solve_distributed() partitions the agents of a
+MultiAgentProblem over worker processes that exchange boundary positions
+through shared memory with a bounded staleness. WorstCaseOracle evaluates
+max_u g(x, u) for batches of candidate x with warm starts and reports the
+active constraints. solve_multirate() sub-cycles the (u, v) block inside
+larger (x, lambda) steps with separate error control per block. Per-block
+gains (dynamics_options={'gains': ...}) rescale the derivatives of x,
+lambda, u and v without moving the saddle point, and estimate_gains()
+derives them from the diagonal curvature. OperatorEllipsoidIntersection
+and an AffineConstraint with a sparse or LinearOperator P keep the Q_j and
+P of high-dimensional problems as operators (e.g. LowRankDiagonal) instead
+of dense matrices. A DynamicNetwork lets agents, anchors and edges of a
+MultiAgentProblem join and leave at the times of NetworkChanges, updating
+the Laplacian and the agent slots in place, and solve_dynamic() resumes the
+run after each change. A MultiAgentProblem(state_order='blocks') stores
+the state as contiguous x, lambda, u and v blocks (BlockMultiAgentLayout),
+and MultiAgentDynamics(dtype=np.float32) evaluates it in single precision.
+Trajectories (Rotation, Waypoints, Track, Switched) describe moving
+anchors and rho schedules, evaluated for all anchors at once and cached
+per t, and MultiAgentDynamics(feedforward=True) adds their derivatives as
+a feed-forward term.
+solve_sensitivity() integrates the forward or adjoint sensitivity equations
+along the flow for dx(t)/dtheta with respect to epsilon, b, a, P, the Q_j
+or any factory parameter, and equilibrium_sensitivity() gives dx*/dtheta
+of the saddle point from its active set.
+export_figures() renders TrajectoryFigures with curves simplified within a
+tolerance of the panel range, optionally rasterized, on worker processes
+and skipping figures whose content hash is unchanged (matplotlib is an
+optional dependency).
+The benchmark submodule holds the synthetic problem generators and
+baseline regression checks used by benchmark_suite.py.
+"""
+
+from .convergence import ConvergenceMonitor, kkt_residual
+from .distributed import partition_agents, solve_distributed
+from .dynamics import (BatchRODynamics, ProjectionSwitching, RODynamics,
+                       project_positive)
+from .figures import (FigureExport, TrajectoryFigure, export_figures,
+                      simplify_path, trajectory_figure)
+from .instrument import Instrumentation
+from .multiagent import (BlockMultiAgentLayout, MultiAgentDynamics,
+                         MultiAgentLayout, MultiAgentProblem, rotate_anchors)
+from .multirate import solve_multirate
+from .oracle import WorstCase, WorstCaseOracle, worst_case
+from .preconditioning import estimate_gains
+from .problem import (AffineConstraint, CallableConstraint, ROProblem,
+                      StateLayout)
+from .realtime import RealTimeStepper, step_latencies
+from .scenario import ScenarioSampler, solve_scenario
+from .schedule import Phase, Schedule, solve_scheduled
+from .sensitivity import (ParameterJacobian, Sensitivity,
+                          equilibrium_sensitivity, solve_sensitivity)
+from .sinks import (CallbackSink, MemmapSink, RingBufferSink, TrajectorySink,
+                    layout_indices, load_trajectory)
+from .solve import ROSolution, solve
+from .sweep import SweepResult, parameter_grid, settling_time, sweep
+from .symbolic import SymbolicProblem
+from .topology import DynamicNetwork, NetworkChange, solve_dynamic
+from .trajectories import (Constant, Rotation, Switched, Track, Trajectory,
+                           Waypoints)
+from .uncertainty import (CallableSet, EllipsoidIntersection,
+                          LowRankDiagonal, NormBall,
+                          OperatorEllipsoidIntersection, SeparableSet,
+                          UncertaintySet)
+from .warmstart import SolutionCache, continuation, solve_warm
+
+__all__ = [
+    'AffineConstraint',
+    'BatchRODynamics',
+    'BlockMultiAgentLayout',
+    'CallableConstraint',
+    'CallableSet',
+    'CallbackSink',
+    'Constant',
+    'ConvergenceMonitor',
+    'DynamicNetwork',
+    'EllipsoidIntersection',
+    'FigureExport',
+    'Instrumentation',
+    'LowRankDiagonal',
+    'MemmapSink',
+    'MultiAgentDynamics',
+    'MultiAgentLayout',
+    'MultiAgentProblem',
+    'NetworkChange',
+    'NormBall',
+    'OperatorEllipsoidIntersection',
+    'ParameterJacobian',
+    'Phase',
+    'ProjectionSwitching',
+    'RODynamics',
+    'ROProblem',
+    'ROSolution',
+    'RealTimeStepper',
+    'RingBufferSink',
+    'Rotation',
+    'ScenarioSampler',
+    'Schedule',
+    'Sensitivity',
+    'SeparableSet',
+    'SolutionCache',
+    'StateLayout',
+    'SweepResult',
+    'Switched',
+    'SymbolicProblem',
+    'Track',
+    'Trajectory',
+    'TrajectoryFigure',
+    'TrajectorySink',
+    'UncertaintySet',
+    'Waypoints',
+    'WorstCase',
+    'WorstCaseOracle',
+    'continuation',
+    'equilibrium_sensitivity',
+    'estimate_gains',
+    'export_figures',
+    'kkt_residual',
+    'layout_indices',
+    'load_trajectory',
+    'parameter_grid',
+    'partition_agents',
+    'project_positive',
+    'rotate_anchors',
+    'settling_time',
+    'simplify_path',
+    'solve',
+    'solve_distributed',
+    'solve_dynamic',
+    'solve_multirate',
+    'solve_scenario',
+    'solve_scheduled',
+    'solve_sensitivity',
+    'solve_warm',
+    'step_latencies',
+    'sweep',
+    'trajectory_figure',
+    'worst_case',
+]
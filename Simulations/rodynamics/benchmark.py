@@ -0,0 +1,365 @@
+"""
+Benchmark harness for the RO dynamics with regression tracking.
+
+Synthetic generators scale each example along its natural size: the number
+m and dimension n of the ellipsoids of Example A (dense, or as diagonal,
+low-rank-plus-diagonal or sparse operators for large n), the number of
+initial conditions integrated as one batch for Example B, and the number of
+agents (with 5 edges per agent) for Example C. Every BenchmarkCase is measured for
+
+    wall_time           best wall time of solve() over the horizon [s]
+    nfev                RHS evaluations counted by the integrator
+    peak_memory         peak traced memory of that solve (tracemalloc) [B]
+    time_to_tolerance   wall time of solve(..., kkt_tol=...) [s], and
+    t_converged         the integration time at which it stopped
+
+and the records are saved as JSON together with the versions and platform
+they were measured on. compare() checks a run against a stored baseline
+and flags every metric that grew by more than its relative tolerance; wall
+times get a wide margin since they are noisy, counts a narrow one.
+"""
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+from scipy import sparse
+
+from .examples import EXAMPLE_B_SAFEGUARDS, EXAMPLE_C_ANCHORS, example_b
+from .multiagent import MultiAgentProblem
+from .problem import AffineConstraint, ROProblem
+from .solve import solve
+from .uncertainty import (EllipsoidIntersection, LowRankDiagonal,
+                          OperatorEllipsoidIntersection)
+
+METRICS = ('wall_time', 'nfev', 'peak_memory', 'time_to_tolerance')
+
+# Relative growth over the baseline that counts as a regression
+DEFAULT_TOLERANCES = {'wall_time': 0.5, 'nfev': 0.05, 'peak_memory': 0.2,
+                      'time_to_tolerance': 0.5}
+
+
+def random_ellipsoids(m, n, rng):
+    """Random symmetric positive definite Q_j with eigenvalues in [2, 8]."""
+    Q = np.empty((m, n, n))
+    for j in range(m):
+        V, _ = np.linalg.qr(rng.standard_normal((n, n)))
+        Q[j] = V @ np.diag(rng.uniform(2.0, 8.0, n)) @ V.T
+    return Q
+
+
+def random_ellipsoid_problem(m, n, rng, b=5.0):
+    """
+    Example A scaled to m ellipsoids in R^n: f(x) = sum_i (h_i x_i^2 / 2 -
+    8 x_i) with h_i from 2 to 8, and (1 + u)^T x <= b over the random
+    ellipsoid intersection.
+    """
+    hess = np.linspace(2.0, 8.0, n)
+    lin = np.full(n, 8.0)
+
+    def objective(x):
+        return 0.5 * np.sum(hess * x**2, axis=-1) - np.sum(lin * x, axis=-1)
+
+    def objective_gradient(x):
+        return hess * x - lin
+
+    return ROProblem(objective_gradient, AffineConstraint(np.ones(n),
+                                                          np.eye(n)),
+                     EllipsoidIntersection(random_ellipsoids(m, n, rng)), b,
+                     objective=objective, objective_hessian=np.diag(hess))
+
+
+def random_operator_ellipsoids(m, n, rng, kind='lowrank', rank=5,
+                               row_nonzeros=5):
+    """
+    m random positive definite Q_j in R^{n x n} without dense storage:
+    'diagonal' (eigenvalues in [2, 8]), 'lowrank' (a diagonal in [2, 6]
+    plus F F^T with r = rank Gaussian columns of squared norm about 2) or
+    'sparse' (symmetric with about 2 row_nonzeros off-diagonal entries per
+    row, made diagonally dominant so that the eigenvalues are >= 2).
+    """
+    Q = []
+    for _ in range(m):
+        if kind == 'diagonal':
+            Q.append(LowRankDiagonal(rng.uniform(2.0, 8.0, n)))
+        elif kind == 'lowrank':
+            Q.append(LowRankDiagonal(
+                rng.uniform(2.0, 6.0, n),
+                rng.standard_normal((n, rank)) * np.sqrt(2.0 / n)))
+        elif kind == 'sparse':
+            S = sparse.random(n, n, density=row_nonzeros / n, rng=rng,
+                              data_rvs=lambda k: rng.uniform(-1.0, 1.0, k))
+            S = (S + S.T).tocsr()
+            S.setdiag(0.0)
+            S.eliminate_zeros()
+            radius = np.asarray(abs(S).sum(axis=1)).ravel()
+            S.setdiag(radius + rng.uniform(2.0, 8.0, n))
+            Q.append(S)
+        else:
+            raise ValueError(f"unknown kind {kind!r}; expected 'diagonal', "
+                             f"'lowrank' or 'sparse'")
+    return Q
+
+
+def random_operator_problem(m, n, rng, kind='lowrank', dense=False, b=5.0,
+                            **shape):
+    """
+    Example A scaled to m operator ellipsoids (random_operator_ellipsoids)
+    in R^n with the objective of random_ellipsoid_problem and P = I as a
+    sparse identity. With dense=True the same instance is stored densely
+    (EllipsoidIntersection and a dense P), for comparison at moderate n.
+    """
+    hess = np.linspace(2.0, 8.0, n)
+    lin = np.full(n, 8.0)
+
+    def objective(x):
+        return 0.5 * np.sum(hess * x**2, axis=-1) - np.sum(lin * x, axis=-1)
+
+    def objective_gradient(x):
+        return hess * x - lin
+
+    Q = random_operator_ellipsoids(m, n, rng, kind, **shape)
+    if dense:
+        constraint = AffineConstraint(np.ones(n), np.eye(n))
+        uncertainty_set = EllipsoidIntersection([Q_j.toarray() for Q_j in Q])
+    else:
+        constraint = AffineConstraint(np.ones(n),
+                                      sparse.identity(n, format='csr'))
+        uncertainty_set = OperatorEllipsoidIntersection(Q)
+    # A callable Hessian, so that the (n, n) array is only built for the
+    # Jacobian
+    return ROProblem(objective_gradient, constraint, uncertainty_set, b,
+                     objective=objective,
+                     objective_hessian=lambda x: np.diag(hess))
+
+
+def random_initial_conditions(batch_size, rng, low=0.5, high=1.5):
+    """batch_size full Example B states drawn uniformly from [low, high]."""
+    return rng.uniform(low, high, (batch_size, 7))
+
+
+def random_network(n_agents, n_edges, n_anchors, rng):
+    """Agent chain (for connectivity) plus random edges over all nodes."""
+    agents = np.arange(n_anchors, n_anchors + n_agents)
+    chain = np.column_stack([agents[:-1], agents[1:]])
+    n_random = max(n_edges - len(chain), 0)
+    n_nodes = n_anchors + n_agents
+    random_edges = rng.integers(0, n_nodes, size=(n_random, 2))
+    # Anchor-anchor edges do not enter the agents' dynamics
+    random_edges[:, 1] = np.where(random_edges[:, 1] < n_anchors,
+                                  random_edges[:, 1] + n_anchors,
+                                  random_edges[:, 1])
+    return np.vstack([chain, random_edges])
+
+
+def ring_network(n_agents, n_anchors, rng, reach=5):
+    """
+    Agents on a line, each linked to the next reach agents, and every anchor
+    to one random agent: a sensor network with local links only.
+    """
+    agents = np.arange(n_anchors, n_anchors + n_agents)
+    local = [np.column_stack([agents[:-k], agents[k:]])
+             for k in range(1, min(reach, n_agents - 1) + 1)]
+    anchors = np.column_stack([np.arange(n_anchors),
+                               rng.choice(agents, n_anchors)])
+    return np.vstack(local + [anchors])
+
+
+def random_multiagent_problem(n_agents, rng, edges_per_agent=5,
+                              rho=np.sqrt(0.1)):
+    """Example C agents on a random network with edges_per_agent * N edges."""
+    edges = random_network(n_agents, edges_per_agent * n_agents,
+                           len(EXAMPLE_C_ANCHORS), rng)
+    return MultiAgentProblem(EXAMPLE_C_ANCHORS, n_agents, edges,
+                             a=(1.0, 1.0), P=(1.0, -1.0), b=2.5, rho=rho)
+
+
+class BenchmarkCase:
+    """
+    One benchmark configuration.
+
+    suite groups the cases of one scaling curve and size is the value it
+    scales with; params are recorded alongside. solve_options are passed
+    to solve() for both the fixed-horizon run and the kkt_tol run; with
+    kkt_tol=None the latter is skipped.
+    """
+
+    def __init__(self, suite, size, params, problem, x0, t_span, kkt_tol,
+                 **solve_options):
+        self.suite = suite
+        self.size = size
+        self.params = params
+        self.problem = problem
+        self.x0 = x0
+        self.t_span = t_span
+        self.kkt_tol = kkt_tol
+        self.solve_options = solve_options
+
+    @property
+    def name(self):
+        params = ','.join(f'{key}={value}'
+                          for key, value in self.params.items())
+        return f'{self.suite}[{params}]'
+
+
+def example_a_cases(m_values=(5, 20, 80), n_values=(2, 10), seed=0):
+    rng = np.random.default_rng(seed)
+    for n in n_values:
+        for m in m_values:
+            problem = random_ellipsoid_problem(m, n, rng)
+            yield BenchmarkCase(
+                f'example_a_n{n}', m, {'m': m, 'n': n}, problem,
+                np.zeros(n), np.linspace(0.0, 100.0, 2000), 1e-4,
+                method='RK45', rtol=1e-8, atol=1e-10)
+
+
+def example_b_cases(batch_sizes=(1, 10, 100), seed=0):
+    # RK45 rather than odeint: LSODA fails with excess work on batches of
+    # the fixed variant from some initial conditions
+    rng = np.random.default_rng(seed)
+    problem = example_b(b=5.0, variant='fixed')
+    for batch_size in batch_sizes:
+        yield BenchmarkCase(
+            'example_b', batch_size, {'batch': batch_size}, problem,
+            random_initial_conditions(batch_size, rng),
+            np.linspace(0.0, 20.0, 800), 1e-4, method='RK45', epsilon=0.01,
+            rtol=1e-6, atol=1e-8, dynamics_options=EXAMPLE_B_SAFEGUARDS)
+
+
+def example_c_cases(n_values=(10, 100, 1000), seed=0):
+    # No time-to-tolerance: on random networks the u_i of agents whose
+    # constraint is inactive stay outside the set once lambda_i + eps
+    # reaches zero (dv_i/dt = 0), so the KKT residual levels off
+    rng = np.random.default_rng(seed)
+    for n in n_values:
+        problem = random_multiagent_problem(n, rng)
+        yield BenchmarkCase(
+            'example_c', n, {'agents': n, 'edges': 5 * n}, problem,
+            np.zeros((n, 2)), np.linspace(0.0, 20.0, 11), None,
+            method='RK45', epsilon=0.01, rtol=1e-6, atol=1e-8)
+
+
+SUITES = {'example_a': example_a_cases, 'example_b': example_b_cases,
+          'example_c': example_c_cases}
+
+
+def measure(case, repeat=3):
+    """Record of the metrics of case (see the module docstring)."""
+    def run(**options):
+        return solve(case.problem, case.x0, case.t_span,
+                     **case.solve_options, **options)
+
+    wall_time = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        solution = run()
+        wall_time = min(wall_time, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    time_to_tolerance = t_converged = None
+    if case.kkt_tol is not None:
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stopped = run(kkt_tol=case.kkt_tol)
+            best = min(best, time.perf_counter() - start)
+        if stopped.t_converged is not None:
+            time_to_tolerance = best
+            t_converged = float(stopped.t_converged)
+    return {
+        'name': case.name,
+        'suite': case.suite,
+        'size': case.size,
+        'params': case.params,
+        'success': bool(solution.success),
+        'wall_time': wall_time,
+        'nfev': int(solution.nfev),
+        'peak_memory': int(peak_memory),
+        'kkt_tol': case.kkt_tol,
+        'time_to_tolerance': time_to_tolerance,
+        't_converged': t_converged,
+    }
+
+
+def run_benchmarks(cases, repeat=3, progress=None):
+    """Measure every case; progress(record) is called after each."""
+    records = []
+    for case in cases:
+        record = measure(case, repeat=repeat)
+        records.append(record)
+        if progress is not None:
+            progress(record)
+    return records
+
+
+def scaling_exponents(records, metric='wall_time'):
+    """
+    Least-squares slope of log(metric) over log(size) per suite: the
+    empirical exponent p of metric ~ size^p.
+    """
+    exponents = {}
+    for suite in dict.fromkeys(record['suite'] for record in records):
+        points = [(record['size'], record[metric]) for record in records
+                  if record['suite'] == suite and record[metric]]
+        if len(points) > 1:
+            size, value = np.log(np.array(points, dtype=float)).T
+            exponents[suite] = float(np.polyfit(size, value, 1)[0])
+    return exponents
+
+
+def environment():
+    return {'python': sys.version.split()[0], 'numpy': np.__version__,
+            'scipy': scipy.__version__, 'platform': platform.platform(),
+            'machine': platform.machine()}
+
+
+def save_results(path, records):
+    """Write the records with their environment and a timestamp as JSON."""
+    results = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'environment': environment(), 'records': records,
+               'scaling_exponents': scaling_exponents(records)}
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+        f.write('\n')
+    return results
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(records, baseline, tolerances=None):
+    """
+    Regressions of records against the baseline records.
+
+    Returns a list of (name, metric, baseline value, value) for each metric
+    that exceeds its baseline by more than tolerances[metric] (relative,
+    see DEFAULT_TOLERANCES), and for cases that no longer succeed or no
+    longer reach their kkt_tol. Cases missing from the baseline are
+    skipped.
+    """
+    tolerances = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+    reference = {record['name']: record for record in baseline}
+    regressions = []
+    for record in records:
+        old = reference.get(record['name'])
+        if old is None:
+            continue
+        if old['success'] and not record['success']:
+            regressions.append((record['name'], 'success', True, False))
+        for metric in METRICS:
+            before, after = old.get(metric), record.get(metric)
+            if before is None:
+                continue
+            if after is None or after > before * (1 + tolerances[metric]):
+                regressions.append((record['name'], metric, before, after))
+    return regressions
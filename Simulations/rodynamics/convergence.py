@@ -0,0 +1,116 @@
+"""
+KKT residuals of the RO saddle point, for stopping at convergence.
+
+At a saddle point of the projected flow
+
+    grad f(x) + (lambda + eps) grad_x g(x, u) = 0       (stationarity)
+    g(x, u) <= b,  h_j(u) <= 0                          (feasibility)
+    (lambda + eps)(g(x, u) - b) = 0,  v_j h_j(u) = 0    (complementarity)
+    grad_u g(x, u) - sum_j v_j grad h_j(u) = 0          (u_stationarity)
+
+and dynamics.residuals(state, t) returns the norms of the four left-hand
+sides, violations for the inequalities. The KKT residual is the largest
+of them (the largest over all members for a batch), so a tolerance bounds
+every term. solve(..., kkt_tol=...) and solve_scheduled(..., kkt_tol=...)
+stop integrating once it falls below the tolerance instead of running to a
+fixed horizon; ConvergenceMonitor is the solve_ivp event doing so.
+"""
+
+import numpy as np
+
+RESIDUAL_TERMS = ('stationarity', 'feasibility', 'complementarity',
+                  'u_stationarity')
+
+
+def kkt_residual(dynamics, state, t=0.0):
+    """Largest KKT residual term of state (over all members of a batch)."""
+    return float(np.max(dynamics.residuals(state, t)))
+
+
+def convergence_message(kkt_tol):
+    return f'KKT residual fell below kkt_tol = {kkt_tol:g}.'
+
+
+class ConvergenceMonitor:
+    """
+    Terminal solve_ivp event for KKT residual < kkt_tol that also records
+    the residual history.
+
+    solve_ivp evaluates events at every accepted step, and in between only
+    while locating a root, so the calls at increasing t are the history of
+    the residual terms along the integrator's steps. While not armed the
+    monitor only records, e.g. in phases that are followed by a parameter
+    change.
+
+    Passing fun instead of dynamics.fun to the integrator lets the monitor
+    reuse the RHS evaluation at the end of a step, which explicit
+    Runge-Kutta methods make last (first same as last), instead of
+    evaluating the vector field again. This requires every evaluation to go
+    through fun, so not with an analytic jac, which evaluates the field
+    itself.
+    """
+
+    terminal = True
+    direction = -1
+
+    def __init__(self, dynamics, kkt_tol, armed=True):
+        self.dynamics = dynamics
+        self.kkt_tol = kkt_tol
+        self.armed = armed
+        self.t = []
+        self.residuals = []
+        self._last_t = None
+        self._last_y = None
+
+    def fun(self, t, y):
+        """dynamics.fun(t, y), remembering the point of the evaluation."""
+        if self._last_y is None:
+            self._last_y = np.empty_like(y)
+        np.copyto(self._last_y, y)
+        self._last_t = t
+        return self.dynamics.fun(t, y)
+
+    def __call__(self, t, y):
+        current = t == self._last_t and np.array_equal(y, self._last_y)
+        if not current:
+            # The evaluation below replaces that of the remembered point
+            self._last_t = None
+        terms = self.dynamics.residuals(y, t, evaluate=not current)
+        if not self.t or t > self.t[-1]:
+            self.t.append(t)
+            self.residuals.append(terms)
+        if not self.armed:
+            return 1.0
+        return float(np.max(terms)) - self.kkt_tol
+
+    def truncate(self, t):
+        """Forget the records after t, where integration restarts."""
+        while self.t and self.t[-1] > t:
+            self.t.pop()
+            self.residuals.pop()
+
+    def history(self, t_stop=None, y_stop=None):
+        """
+        (t, residual terms) of the recorded steps, ending at t_stop with the
+        terms at y_stop if given (the state where the event fired).
+        """
+        t = np.array(self.t)
+        residuals = np.array(self.residuals)
+        if t_stop is not None:
+            keep = t < t_stop
+            t = np.append(t[keep], t_stop)
+            final = self.dynamics.residuals(y_stop, t_stop)
+            residuals = np.concatenate([residuals[keep], final[None]])
+        return t, residuals
+
+
+def residual_history(dynamics, t, y):
+    """
+    KKT residual terms at the samples (t[k], y[k]).
+
+    y holds flat states (len(t), size); the result has shape (len(t),
+    len(RESIDUAL_TERMS)), with a batch axis before the terms for a batch.
+    Each sample costs one evaluation of the vector field.
+    """
+    return np.array([dynamics.residuals(state, tk)
+                     for tk, state in zip(t, y)])
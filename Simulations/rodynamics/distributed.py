@@ -0,0 +1,323 @@
+"""
+Partitioned, message-passing execution of the multi-agent RO dynamics.
+
+solve_distributed() splits the agents of a MultiAgentProblem into parts
+and integrates each part in its own worker process. A worker holds the
+full state of its own agents only. The agents of other parts that are
+neighbours of its own (its halo) enter its dynamics as extra anchors,
+whose positions are the ones published by their owners.
+
+Time is cut into windows of length sync_period. At the end of each window
+a worker publishes the positions of its boundary agents (those with a
+neighbour in another part) to a shared-memory ring of slots, and during a
+window it holds its halo positions constant. With staleness s, a worker
+integrating window k only waits until its neighbour parts have published
+the positions at the start of window k - s, so parts may drift up to s
+windows apart. By default the halo is read from exactly that slot, which
+makes a run deterministic and equal to the in-process lockstep run
+(processes=False). With asynchronous=True the newest published slot is
+read instead. s = 0 with a small sync_period approaches the monolithic
+solve(), and larger periods or staleness model a communication delay.
+"""
+
+import multiprocessing
+import time
+
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.sparse import csgraph
+
+from .multiagent import MultiAgentProblem
+from .solve import SOLVE_IVP_METHODS, ROSolution
+
+
+def partition_agents(problem, n_parts):
+    """
+    Split the agents into n_parts parts of nearly equal size.
+
+    The agents are ordered by reverse Cuthill-McKee on the agent-agent
+    graph, which keeps neighbours close together, and the ordering is cut
+    into contiguous pieces. Returns the part label of each agent.
+    """
+    n = problem.n_agents
+    if not 1 <= n_parts <= n:
+        raise ValueError(f"n_parts must be between 1 and the number of "
+                         f"agents ({n}), got {n_parts}")
+    N1 = problem.n_anchors
+    agents = problem.adjacency_matrix()[N1:, N1:].tocsr()
+    order = csgraph.reverse_cuthill_mckee(agents, symmetric_mode=True)
+    labels = np.empty(n, dtype=np.intp)
+    for part, members in enumerate(np.array_split(order, n_parts)):
+        labels[members] = part
+    return labels
+
+
+def cut_edges(problem, labels):
+    """Number of agent-agent edges whose endpoints lie in different parts."""
+    N1 = problem.n_anchors
+    agents = problem.adjacency_matrix()[N1:, N1:].tocoo()
+    return int(np.count_nonzero(labels[agents.row] != labels[agents.col])) // 2
+
+
+class _HaloAnchors:
+    """Anchor motion of a part: the moving anchors, then its halo agents."""
+
+    def __init__(self, problem, n_halo):
+        self.problem = problem
+        self.positions = np.zeros((problem.n_anchors + n_halo,
+                                   problem.layout.dim))
+        self.halo = self.positions[problem.n_anchors:]
+
+    def __call__(self, t, anchor_positions):
+        self.positions[:self.problem.n_anchors] = self.problem.anchors_at(t)
+        return self.positions
+
+
+class _Part:
+    """
+    One part of a partitioned MultiAgentProblem and its local integrator.
+
+    The local problem has the original anchors followed by the halo agents
+    as anchors, and the own agents in increasing index order.
+    """
+
+    def __init__(self, problem, labels, part, epsilon, method, tolerances):
+        N1 = problem.n_anchors
+        self.agents = np.flatnonzero(labels == part)
+
+        adjacency = problem.adjacency_matrix()[N1:, N1:]
+        links = adjacency[self.agents].tocoo()
+        foreign = labels[links.col] != part
+        self.halo = np.unique(links.col[foreign])
+        self.halo_parts = labels[self.halo]
+        self.neighbour_parts = np.unique(self.halo_parts)
+        # Own agents with a neighbour in another part, as local indices
+        self._boundary_local = np.unique(links.row[foreign])
+        self.boundary = self.agents[self._boundary_local]
+
+        local_node = np.full(problem.n_nodes, -1, dtype=np.intp)
+        local_node[:N1] = np.arange(N1)
+        local_node[N1 + self.halo] = N1 + np.arange(len(self.halo))
+        local_node[N1 + self.agents] = (N1 + len(self.halo)
+                                        + np.arange(len(self.agents)))
+        edges = local_node[problem.edges]
+        own = np.isin(problem.edges - N1, self.agents).any(axis=1)
+        keep = own & (edges >= 0).all(axis=1)
+
+        def per_agent(value, ndim):
+            value = np.asarray(value)
+            return value[self.agents] if value.ndim == ndim else value
+
+        self.motion = _HaloAnchors(problem, len(self.halo))
+        self.problem = MultiAgentProblem(
+            self.motion.positions, len(self.agents), edges[keep],
+            a=per_agent(problem.a, 2), P=per_agent(problem.P, 2),
+            b=per_agent(problem.b, 1), rho=problem.rho,
+            w=problem.w if np.ndim(problem.w) == 0 else problem.w[keep],
+            anchor_motion=self.motion)
+        self.dynamics = self.problem.make_dynamics(epsilon=epsilon)
+        self.columns = problem.layout.agent_indices(self.agents).ravel()
+        self.method = method
+        self.tolerances = tolerances
+        self.state = None
+        self.nfev = 0
+
+    def read_halo(self, slots, slot_of_part):
+        """Copy halo positions from the slot each neighbour part gives."""
+        for neighbour in self.neighbour_parts:
+            rows = self.halo_parts == neighbour
+            self.motion.halo[rows] = slots[slot_of_part(neighbour),
+                                           self.halo[rows]]
+
+    def advance(self, t0, t1, t_eval):
+        """
+        Integrate the own agents over [t0, t1] with the halo held fixed and
+        return their states at t_eval.
+        """
+        times = t_eval
+        if not len(t_eval) or t_eval[-1] != t1:
+            times = np.append(t_eval, t1)
+        result = solve_ivp(self.dynamics.fun, (t0, t1), self.state,
+                           method=self.method, t_eval=times,
+                           **self.tolerances)
+        self.nfev += result.nfev
+        if not result.success:
+            raise RuntimeError(result.message)
+        self.state = result.y[:, -1].copy()
+        return result.y.T[:len(t_eval)]
+
+    def publish(self, slots, slot):
+        """Write the positions of the boundary agents to a slot."""
+        X = self.problem.layout.unpack(self.state)[0]
+        slots[slot, self.boundary] = X[self._boundary_local]
+
+
+def _windows(t_span, sync_period):
+    """Window edges and, per window, the indices of its output times."""
+    t_start, t_final = t_span[0], t_span[-1]
+    n_windows = max(int(np.ceil((t_final - t_start) / sync_period - 1e-9)), 1)
+    edges = t_start + sync_period * np.arange(n_windows + 1)
+    edges[-1] = t_final
+    window_of = np.searchsorted(edges, t_span, side='right') - 1
+    window_of = np.minimum(window_of, n_windows - 1)
+    return edges, [np.flatnonzero(window_of == k) for k in range(n_windows)]
+
+
+def solve_distributed(problem, x0, t_span, n_workers=2, sync_period=1.0,
+                      staleness=0, asynchronous=False, processes=True,
+                      labels=None, method='RK45', epsilon=0.0, rtol=None,
+                      atol=None):
+    """
+    Integrate a MultiAgentProblem with one worker process per agent part.
+
+    x0 and t_span are as in solve(). The agents are split by
+    partition_agents(problem, n_workers) unless part labels are given.
+    Positions of boundary agents are exchanged every sync_period through
+    shared memory, and a worker may run up to staleness windows ahead of
+    the positions it uses (see the module docstring). method is any
+    solve_ivp method and is restarted at every window.
+
+    processes=False runs the same windows in lockstep in this process; it
+    gives the same trajectory as the default deterministic reads and is
+    meant for checks and single-core measurements of the staleness effect.
+    Processes are started with fork, so the problem (rho and the anchor
+    motion) need not be picklable.
+
+    The solution additionally carries labels, cut_edges, and workers: per
+    part the number of agents, halo and boundary agents, RHS evaluations,
+    and the seconds spent integrating and waiting for neighbours.
+    """
+    if method not in SOLVE_IVP_METHODS:
+        raise ValueError(f"unknown method {method!r}; expected one of "
+                         f"{SOLVE_IVP_METHODS}")
+    if sync_period <= 0:
+        raise ValueError(f"sync_period must be positive, got {sync_period}")
+    if int(staleness) != staleness or staleness < 0:
+        raise ValueError(f"staleness must be a non-negative integer, got "
+                         f"{staleness}")
+    if asynchronous and not processes:
+        raise ValueError("asynchronous reads require processes=True")
+    staleness = int(staleness)
+
+    state0 = problem.initial_state(x0)
+    t_span = np.asarray(t_span, dtype=float)
+    if labels is None:
+        labels = partition_agents(problem, n_workers)
+    labels = np.asarray(labels, dtype=np.intp)
+    n_parts = int(labels.max()) + 1
+    tolerances = {}
+    if rtol is not None:
+        tolerances['rtol'] = rtol
+    if atol is not None:
+        tolerances['atol'] = atol
+    parts = [_Part(problem, labels, part, epsilon, method, tolerances)
+             for part in range(n_parts)]
+    for part in parts:
+        part.state = state0[part.columns]
+
+    edges, outputs = _windows(t_span, sync_period)
+    ring = 2 * staleness + 2
+    context = multiprocessing.get_context('fork')
+    dim, n = problem.layout.dim, problem.n_agents
+    slots_buffer = context.RawArray('d', ring * n * dim)
+    y_buffer = context.RawArray('d', len(t_span) * problem.layout.size)
+    slots = np.frombuffer(slots_buffer).reshape(ring, n, dim)
+    y = np.frombuffer(y_buffer).reshape(len(t_span), problem.layout.size)
+    slots[0] = problem.layout.unpack(state0)[0]
+
+    if not processes:
+        compute = np.zeros(n_parts)
+        for k in range(len(outputs)):
+            slot = max(k - staleness, 0) % ring
+            for index, part in enumerate(parts):
+                part.read_halo(slots, lambda neighbour: slot)
+                start = time.perf_counter()
+                y[outputs[k][:, None], part.columns] = part.advance(
+                    edges[k], edges[k + 1], t_span[outputs[k]])
+                compute[index] += time.perf_counter() - start
+            for part in parts:
+                part.publish(slots, (k + 1) % ring)
+        statistics = [_statistics(part, compute[index], 0.0)
+                      for index, part in enumerate(parts)]
+        return _solution(problem, t_span, y, labels, statistics, True, '')
+
+    published = context.RawArray('l', n_parts)
+    failed = context.RawValue('b', 0)
+    condition = context.Condition()
+    results = context.Queue()
+    shared = (edges, outputs, t_span, slots_buffer, y_buffer, published,
+              failed, condition, results, staleness, ring, asynchronous)
+    workers = [context.Process(target=_worker, args=(parts, index, shared))
+               for index in range(n_parts)]
+    for worker in workers:
+        worker.start()
+    reports = dict(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+
+    messages = [reports[index]['message'] for index in range(n_parts)
+                if reports[index]['message']]
+    statistics = [reports[index]['statistics'] for index in range(n_parts)]
+    return _solution(problem, t_span, y.copy(), labels, statistics,
+                     not messages, '; '.join(messages))
+
+
+def _worker(parts, index, shared):
+    (edges, outputs, t_span, slots_buffer, y_buffer, published, failed,
+     condition, results, staleness, ring, asynchronous) = shared
+    part = parts[index]
+    slots = np.frombuffer(slots_buffer).reshape(ring, -1,
+                                                part.problem.layout.dim)
+    y = np.frombuffer(y_buffer).reshape(len(t_span), -1)
+    compute = wait = 0.0
+    message = ''
+    try:
+        for k in range(len(outputs)):
+            need = max(k - staleness, 0)
+            start = time.perf_counter()
+            with condition:
+                condition.wait_for(lambda: failed.value or all(
+                    published[neighbour] >= need
+                    for neighbour in part.neighbour_parts))
+                newest = {neighbour: published[neighbour]
+                          for neighbour in part.neighbour_parts}
+            wait += time.perf_counter() - start
+            if failed.value:
+                message = f"part {index} stopped: another part failed"
+                break
+            if asynchronous:
+                part.read_halo(slots, lambda neighbour: newest[neighbour] % ring)
+            else:
+                part.read_halo(slots, lambda neighbour: need % ring)
+
+            start = time.perf_counter()
+            y[outputs[k][:, None], part.columns] = part.advance(
+                edges[k], edges[k + 1], t_span[outputs[k]])
+            part.publish(slots, (k + 1) % ring)
+            compute += time.perf_counter() - start
+            with condition:
+                published[index] = k + 1
+                condition.notify_all()
+    except Exception as error:
+        message = f"part {index} failed: {error}"
+        with condition:
+            failed.value = 1
+            condition.notify_all()
+    results.put((index, {'statistics': _statistics(part, compute, wait),
+                         'message': message}))
+
+
+def _statistics(part, compute, wait):
+    return {'agents': len(part.agents), 'halo': len(part.halo),
+            'boundary': len(part.boundary), 'nfev': part.nfev,
+            'compute': compute, 'wait': wait}
+
+
+def _solution(problem, t_span, y, labels, workers, success, message):
+    solution = ROSolution(t_span, y, problem.layout, success=success,
+                          message=message,
+                          nfev=sum(worker['nfev'] for worker in workers))
+    solution.labels = labels
+    solution.cut_edges = cut_edges(problem, labels)
+    solution.workers = workers
+    return solution
@@ -0,0 +1,568 @@
+"""
+Right-hand side of the projected RO saddle-point dynamics.
+
+    dx/dt      = -grad f(x) - (lambda + eps) grad_x g(x, u)
+    dlambda/dt = [g(x, u) - b - v^T h(u)]_+
+    du/dt      = grad_u g(x, u) - sum_j v_j grad h_j(u)
+    dv_j/dt    = [(lambda + eps) h_j(u)]_+
+
+where [z]_+ is the projection that keeps z unless the corresponding dual
+variable sits on the boundary (lambda + eps <= 0 or v_j <= 0) and z <= 0.
+
+The Jacobian of this vector field is assembled blockwise from the second
+derivatives of the problem. The projection is handled with its generalized
+Jacobian: rows of projected components are the plain derivatives while the
+projection is inactive and zero while it holds the component at zero.
+
+Positive per-block gains (a scalar or a diagonal per block) multiply the
+derivatives of x, lambda, u and v. They change the time scale of each
+component but not its sign, so the equilibria and the projections stay
+those of the unit-gain flow while poorly conditioned blocks can be sped up
+(see preconditioning.estimate_gains).
+
+For event-driven integration (see schedule.solve_scheduled) the active set
+of the projections can instead be frozen, which makes the vector field
+smooth between switching events located by root finding.
+"""
+
+import numpy as np
+from scipy import sparse
+
+# A Python scalar operand costs ufuncs a 0-d array per call, so zeros are
+# kept as 0-d arrays, one per dtype since putmask will not cast them down
+_ZEROS = {}
+
+
+def _zero(dtype):
+    try:
+        return _ZEROS[dtype]
+    except KeyError:
+        return _ZEROS.setdefault(dtype, np.zeros((), dtype=dtype))
+
+
+def project_positive(z, s, out, masks=None):
+    """
+    Write [z]_+ at s into out: zero where s <= 0 and z <= 0. masks is an
+    optional pair of boolean buffers shaped like z for the two tests.
+    """
+    if masks is None:
+        masks = (np.empty(np.shape(z), dtype=bool),
+                 np.empty(np.shape(z), dtype=bool))
+    on_boundary, nonpositive = masks
+    np.less_equal(s, _zero(s.dtype), out=on_boundary)
+    np.less_equal(z, _zero(z.dtype), out=nonpositive)
+    np.logical_and(on_boundary, nonpositive, out=on_boundary)
+    np.copyto(out, z)
+    np.putmask(out, on_boundary, _zero(out.dtype))
+    return out
+
+
+def fill_gains(gain, views, gains):
+    """
+    Write gains, a mapping of block names to positive scalars or diagonals,
+    into gain through views[name] and return it.
+    """
+    for name, value in gains.items():
+        if name not in views:
+            raise ValueError(f"unknown block {name!r} in gains; expected "
+                             f"one of {tuple(views)}")
+        value = np.asarray(value, dtype=float)
+        if not np.all(value > 0):
+            raise ValueError(f"gains must be positive, got {value} for "
+                             f"block {name!r}")
+        views[name][...] = value
+    return gain
+
+
+def project_frozen(z, clamped, out):
+    """Write z into out with the clamped components set to zero."""
+    np.copyto(out, z)
+    out[clamped] = 0.0
+    return out
+
+
+class ProjectionSwitching:
+    """
+    Switching functions of the projections, for event-driven integration.
+
+    The projected components are the dual variables listed in
+    projected_indices (lambda first, then v). For each, s is the distance
+    of the dual variable from boundary_values (lambda + eps, or v_j) and z
+    its unprojected derivative, so the projection is active where s <= 0
+    and z <= 0. Setting clamped to a boolean mask over these components
+    freezes the active set: clamped components have zero derivative and
+    the others follow z whatever its sign. The vector field is then smooth
+    until a component has to switch, which the caller detects as a zero
+    crossing of s (free) or z (clamped). clamped = None is the plain
+    projection.
+    """
+
+    clamped = None
+    _cache_t = None
+    _cache_state = None
+
+    def switching(self, state, t=0.0):
+        """Arrays (s, z) of the projected components at (state, t)."""
+        if not self._is_current(state, t):
+            self.evaluate(state, t)
+        s = state[self.projected_indices] - self.boundary_values
+        return s, self._unprojected()
+
+    def _remember(self, state, t):
+        # Integrators evaluate events at the state of their last RHS call;
+        # with a frozen active set that call is cached for switching()
+        if self._cache_state is None:
+            self._cache_state = np.empty_like(state)
+        np.copyto(self._cache_state, state)
+        self._cache_t = t
+
+    def _is_current(self, state, t):
+        return (self.clamped is not None and t == self._cache_t
+                and np.array_equal(state, self._cache_state))
+
+
+class RODynamics(ProjectionSwitching):
+    """
+    Preallocated RHS for an ROProblem.
+
+    __call__(state, t) follows the odeint convention and returns a buffer
+    that is reused between calls; fun(t, y) follows the solve_ivp
+    convention and returns a copy.
+
+    gains maps block names ('x', 'lambda', 'u', 'v') to positive gains on
+    their derivatives, a scalar or one per component. rate_limits maps
+    block names to symmetric bounds on the (scaled) derivatives, and
+    u_floor evaluates the problem at max(u, u_floor). Both reproduce the
+    safeguards of the original Example B script and are off by default.
+    Saturated rate limits and floored components of u contribute zero rows
+    and columns to the Jacobian, in the same generalized sense as the
+    projection.
+
+    jacobian(state, t) and Dfun(y, t) follow the odeint convention and
+    jac(t, y) the solve_ivp one; jac_sparsity() is the structural nonzero
+    pattern of the Jacobian for any state.
+    """
+
+    def __init__(self, problem, epsilon=0.0, rate_limits=None, u_floor=None,
+                 gains=None):
+        self.problem = problem
+        self.epsilon = float(epsilon)
+        self.rate_limits = dict(rate_limits or {})
+        self.u_floor = u_floor
+        self.gains = dict(gains or {})
+        self.layout = layout = problem.layout
+        self._gain = None
+        if self.gains:
+            self._gain = np.ones(layout.size)
+            fill_gains(self._gain, {name: self._gain[block] for name, block
+                                    in self._blocks().items()}, self.gains)
+
+        self._d_state = np.zeros(layout.size)
+        self._dx = self._d_state[layout.x]
+        self._du = self._d_state[layout.u]
+        self._dv = self._d_state[layout.v]
+        self._h = np.empty(layout.m)
+        self._grad_x = np.empty(layout.n_x)
+        self._grad_h = np.empty(layout.n_u)
+        self._u = np.empty(layout.n_u)
+        self._z_v = np.empty(layout.m)
+        self._masks_v = (np.empty(layout.m, dtype=bool),
+                         np.empty(layout.m, dtype=bool))
+        self._grad_f = np.empty(layout.n_x)
+        self._c = np.empty(layout.n_x)
+        self._lambda_dot = 0.0
+        self._jac = None
+        self.projected_indices = np.r_[layout.lam,
+                                       np.arange(layout.size)[layout.v]]
+        self.boundary_values = np.zeros(1 + layout.m)
+        self.boundary_values[0] = -self.epsilon
+
+    def __call__(self, state, t=0.0):
+        return self.evaluate(state, t)
+
+    def fun(self, t, y):
+        return self.evaluate(y, t).copy()
+
+    def evaluate(self, state, t=0.0):
+        x, lam_eps, u, v = self._unpack(state)
+        self._h_rows(u)
+        self._x_rows(x, lam_eps, u)
+        self._lambda_row(x, lam_eps, u, v)
+        self._u_rows(x, u, v)
+        self._v_rows(state, t, lam_eps, v)
+        if self._gain is not None:
+            np.multiply(self._d_state, self._gain, out=self._d_state)
+        if self.rate_limits:
+            self._apply_rate_limits()
+        return self._d_state
+
+    def evaluate_uncertainty(self, state, t=0.0):
+        """
+        Evaluate only the u and v rows of the RHS, for sub-cycling the
+        uncertainty block (see multirate). Returns the evaluate() buffer;
+        its x and lambda rows keep the values of the last full evaluation.
+        """
+        layout = self.layout
+        x, lam_eps, u, v = self._unpack(state)
+        self._h_rows(u)
+        self._u_rows(x, u, v)
+        self._v_rows(state, t, lam_eps, v)
+        if self._gain is not None:
+            rows = slice(layout.lam + 1, layout.size)
+            np.multiply(self._d_state[rows], self._gain[rows],
+                        out=self._d_state[rows])
+        if self.rate_limits:
+            self._apply_rate_limits()
+        return self._d_state
+
+    # The blocks of evaluate(), timed separately by instrument
+
+    def _unpack(self, state):
+        """Views (x, lambda + eps, u, v) of state, with u floored."""
+        layout = self.layout
+        u = state[layout.u]
+        if self.u_floor is not None:
+            u = np.maximum(u, self.u_floor, out=self._u)
+        return (state[layout.x], state[layout.lam] + self.epsilon, u,
+                state[layout.v])
+
+    def _h_rows(self, u):
+        self.problem.uncertainty_set.h(u, self._h)
+
+    def _x_rows(self, x, lam_eps, u):
+        self.problem.constraint.grad_x(x, u, self._grad_x)
+        np.multiply(self._grad_x, -lam_eps, out=self._dx)
+        self.problem.objective_gradient_into(x, self._grad_f)
+        np.subtract(self._dx, self._grad_f, out=self._dx)
+
+    def _lambda_row(self, x, lam_eps, u, v):
+        problem = self.problem
+        lambda_dot = (problem.constraint.value(x, u, out=self._c) - problem.b
+                      - v @ self._h)
+        self._lambda_dot = lambda_dot
+        if self._lambda_free(lam_eps):
+            self._d_state[self.layout.lam] = lambda_dot
+        else:
+            self._d_state[self.layout.lam] = 0.0
+
+    def _u_rows(self, x, u, v):
+        self.problem.constraint.grad_u(x, u, self._du)
+        self.problem.uncertainty_set.weighted_grad(u, v, self._grad_h)
+        np.subtract(self._du, self._grad_h, out=self._du)
+
+    def _v_rows(self, state, t, lam_eps, v):
+        # v dynamics, with h(u) already in self._h
+        np.multiply(self._h, lam_eps, out=self._z_v)
+        if self.clamped is None:
+            project_positive(self._z_v, v, self._dv, self._masks_v)
+        else:
+            project_frozen(self._z_v, self.clamped[1:], self._dv)
+            self._remember(state, t)
+
+    def residuals(self, state, t=0.0, evaluate=True):
+        """
+        KKT residual terms of state as an array ordered like RESIDUAL_TERMS.
+
+        The terms are ||grad f + (lambda + eps) grad_x g||, the violation
+        ||([g - b]_+, [h]_+)||, ||((lambda + eps)(g - b), v_j h_j)|| and
+        ||grad_u g - sum_j v_j grad h_j||. All four vanish at a saddle point
+        of the flow, whatever the state of the projections. evaluate=False
+        reuses h, grad_x g and sum_j v_j grad h_j from the last evaluate()
+        call, which must have been at the same (state, t).
+        """
+        problem = self.problem
+        layout = self.layout
+        if evaluate:
+            self.evaluate(state, t)
+        x = state[layout.x]
+        lam_eps = state[layout.lam] + self.epsilon
+        u = state[layout.u]
+        v = state[layout.v]
+        if self.u_floor is not None:
+            u = self._u
+        h = self._h
+
+        gap = problem.constraint.value(x, u) - problem.b
+        grad_u = np.empty(layout.n_u)
+        problem.constraint.grad_u(x, u, grad_u)
+        return np.array([
+            np.linalg.norm(problem.objective_gradient(x)
+                           + lam_eps * self._grad_x),
+            np.hypot(max(gap, 0.0), np.linalg.norm(np.maximum(h, 0.0))),
+            np.hypot(lam_eps * gap, np.linalg.norm(v * h)),
+            np.linalg.norm(grad_u - self._grad_h),
+        ])
+
+    def _lambda_free(self, lam_eps):
+        if self.clamped is None:
+            return lam_eps > 0 or self._lambda_dot > 0
+        return not self.clamped[0]
+
+    def _v_free(self, v):
+        if self.clamped is None:
+            return (v > 0) | (self._z_v > 0)
+        return ~self.clamped[1:]
+
+    def _unprojected(self):
+        return np.r_[self._lambda_dot, self._z_v]
+
+    def _blocks(self):
+        layout = self.layout
+        return {'x': layout.x, 'lambda': slice(layout.lam, layout.lam + 1),
+                'u': layout.u, 'v': layout.v}
+
+    def _apply_rate_limits(self):
+        blocks = self._blocks()
+        for name, bound in self.rate_limits.items():
+            block = self._d_state[blocks[name]]
+            np.clip(block, -bound, bound, out=block)
+
+    def _allocate_jacobian(self):
+        layout = self.layout
+        n_x, n_u, m = layout.n_x, layout.n_u, layout.m
+        self._jac = np.zeros((layout.size, layout.size))
+        self._hess_xx = np.empty((n_x, n_x))
+        self._hess_xu = np.empty((n_x, n_u))
+        self._hess_uu = np.empty((n_u, n_u))
+        self._jac_h = np.empty((m, n_u))
+        self._hess_h = np.empty((n_u, n_u))
+        self._grad_u = np.empty(n_u)
+
+    def jacobian(self, state, t=0.0):
+        """Generalized Jacobian of evaluate(state, t), in a reused buffer."""
+        if self._jac is None:
+            self._allocate_jacobian()
+        problem = self.problem
+        layout = self.layout
+        constraint = problem.constraint
+        uset = problem.uncertainty_set
+        ix, il, iu, iv = layout.x, layout.lam, layout.u, layout.v
+
+        # Also refreshes h, grad_x g and lambda_dot for the current state
+        d_state = self.evaluate(state, t)
+
+        x = state[ix]
+        lam_eps = state[il] + self.epsilon
+        u = state[iu]
+        v = state[iv]
+        if self.u_floor is not None:
+            u = np.maximum(u, self.u_floor, out=self._u)
+        h = self._h
+        grad_x = self._grad_x
+
+        constraint.grad_u(x, u, self._grad_u)
+        constraint.hess_xx(x, u, self._hess_xx)
+        constraint.hess_xu(x, u, self._hess_xu)
+        constraint.hess_uu(x, u, self._hess_uu)
+        uset.jacobian(u, self._jac_h)
+        uset.weighted_hessian(u, v, self._hess_h)
+
+        J = self._jac
+        J.fill(0.0)
+
+        # x rows
+        np.multiply(self._hess_xx, -lam_eps, out=J[ix, ix])
+        np.subtract(J[ix, ix], problem.objective_hessian_at(x), out=J[ix, ix])
+        np.negative(grad_x, out=J[ix, il])
+        np.multiply(self._hess_xu, -lam_eps, out=J[ix, iu])
+
+        # lambda row, zero while the projection is active
+        if self._lambda_free(lam_eps):
+            J[il, ix] = grad_x
+            np.matmul(v, self._jac_h, out=J[il, iu])
+            np.subtract(self._grad_u, J[il, iu], out=J[il, iu])
+            np.negative(h, out=J[il, iv])
+
+        # u rows
+        J[iu, ix] = self._hess_xu.T
+        np.subtract(self._hess_uu, self._hess_h, out=J[iu, iu])
+        J[iu, iv] = -self._jac_h.T
+
+        # v rows, zero where the projection is active
+        free = self._v_free(v)
+        J_v = J[iv]
+        J_v[:, il] = np.where(free, h, 0.0)
+        J_v[:, iu] = self._jac_h * (lam_eps * free)[:, None]
+
+        if self._gain is not None:
+            J *= self._gain[:, None]
+        if self.rate_limits:
+            blocks = self._blocks()
+            for name, bound in self.rate_limits.items():
+                rows = np.arange(layout.size)[blocks[name]]
+                J[rows[np.abs(d_state[rows]) >= bound]] = 0.0
+        if self.u_floor is not None:
+            cols = np.arange(layout.size)[iu]
+            J[:, cols[state[iu] < self.u_floor]] = 0.0
+        return J
+
+    def Dfun(self, y, t):
+        return self.jacobian(y, t)
+
+    def jac(self, t, y):
+        return self.jacobian(y, t).copy()
+
+    def jac_sparsity(self):
+        """Boolean (size, size) pattern covering the Jacobian at any state."""
+        problem = self.problem
+        layout = self.layout
+        ix, il, iu, iv = layout.x, layout.lam, layout.u, layout.v
+        xx, xu, uu = problem.constraint.sparsity()
+        jac_h, hess_h = problem.uncertainty_set.sparsity()
+
+        S = np.zeros((layout.size, layout.size), dtype=bool)
+        S[ix, ix] = problem.objective_hessian_sparsity() | xx
+        S[ix, il] = True
+        S[ix, iu] = xu
+        S[il, ix] = True
+        S[il, iu] = True
+        S[il, iv] = True
+        S[iu, ix] = xu.T
+        S[iu, iu] = uu | hess_h
+        S[iu, iv] = jac_h.T
+        S[iv, il] = True
+        S[iv, iu] = jac_h
+        return S
+
+
+class BatchRODynamics(RODynamics):
+    """
+    RO dynamics of batch_size independent systems integrated as one ODE.
+
+    The flat state stacks the members along a leading axis, (batch_size,
+    size) in row-major order. Problem components must broadcast over that
+    axis; problem.b may be a scalar or one bound per member, and parameters
+    captured by the problem functions (e.g. rho of Example B) may likewise
+    carry a leading batch axis. Members share the integrator's step size but
+    never interact, so the Jacobian is block diagonal and jac_sparsity()
+    lets Radau/BDF/LSODA difference all members together.
+    """
+
+    def __init__(self, problem, batch_size, epsilon=0.0, rate_limits=None,
+                 u_floor=None, gains=None):
+        self.problem = problem
+        self.batch_size = batch_size
+        self.epsilon = float(epsilon)
+        self.rate_limits = dict(rate_limits or {})
+        self.u_floor = u_floor
+        self.gains = dict(gains or {})
+        self.layout = layout = problem.layout
+        self._shape = (batch_size, layout.size)
+        self._gain = None
+        if self.gains:
+            # Gains may also carry the batch axis, one row per member
+            self._gain = np.ones(batch_size * layout.size)
+            G = self._gain.reshape(self._shape)
+            fill_gains(self._gain, {name: G[:, block] for name, block
+                                    in self._blocks().items()}, self.gains)
+
+        self._d_state = np.zeros(batch_size * layout.size)
+        D = self._d_state.reshape(self._shape)
+        self._dx = D[:, layout.x]
+        self._dlam = D[:, layout.lam]
+        self._du = D[:, layout.u]
+        self._dv = D[:, layout.v]
+        self._h = np.empty((batch_size, layout.m))
+        self._grad_x = np.empty((batch_size, layout.n_x))
+        self._grad_h = np.empty((batch_size, layout.n_u))
+        self._u = np.empty((batch_size, layout.n_u))
+        self._lambda_dot = np.empty(batch_size)
+        self._tmp = np.empty((batch_size, layout.m))
+        self._jac = None
+
+    def evaluate(self, state, t=0.0):
+        problem = self.problem
+        layout = self.layout
+        constraint = problem.constraint
+        uset = problem.uncertainty_set
+
+        S = state.reshape(self._shape)
+        x = S[:, layout.x]
+        lam_eps = S[:, layout.lam] + self.epsilon
+        u = S[:, layout.u]
+        v = S[:, layout.v]
+        if self.u_floor is not None:
+            u = np.maximum(u, self.u_floor, out=self._u)
+
+        h = self._h
+        uset.h(u, h)
+
+        # x dynamics
+        constraint.grad_x(x, u, self._grad_x)
+        np.multiply(self._grad_x, -lam_eps[:, None], out=self._dx)
+        np.subtract(self._dx, problem.objective_gradient(x), out=self._dx)
+
+        # lambda dynamics
+        lambda_dot = self._lambda_dot
+        np.multiply(v, h, out=self._tmp)
+        np.sum(self._tmp, axis=1, out=lambda_dot)
+        np.subtract(constraint.value(x, u) - problem.b, lambda_dot,
+                    out=lambda_dot)
+        project_positive(lambda_dot, lam_eps, self._dlam)
+
+        # u dynamics
+        constraint.grad_u(x, u, self._du)
+        uset.weighted_grad(u, v, self._grad_h)
+        np.subtract(self._du, self._grad_h, out=self._du)
+
+        # v dynamics
+        np.multiply(h, lam_eps[:, None], out=self._tmp)
+        project_positive(self._tmp, v, self._dv)
+
+        if self._gain is not None:
+            np.multiply(self._d_state, self._gain, out=self._d_state)
+        if self.rate_limits:
+            self._apply_rate_limits()
+        return self._d_state
+
+    def residuals(self, state, t=0.0, evaluate=True):
+        """KKT residual terms, shape (batch_size, len(RESIDUAL_TERMS))."""
+        problem = self.problem
+        layout = self.layout
+        if evaluate:
+            self.evaluate(state, t)
+        S = state.reshape(self._shape)
+        x = S[:, layout.x]
+        lam_eps = S[:, layout.lam] + self.epsilon
+        u = S[:, layout.u]
+        v = S[:, layout.v]
+        if self.u_floor is not None:
+            u = self._u
+        h = self._h
+
+        gap = problem.constraint.value(x, u) - problem.b
+        grad_u = np.empty((self.batch_size, layout.n_u))
+        problem.constraint.grad_u(x, u, grad_u)
+        norm = np.linalg.norm
+        return np.stack([
+            norm(problem.objective_gradient(x)
+                 + lam_eps[:, None] * self._grad_x, axis=1),
+            np.hypot(np.maximum(gap, 0.0), norm(np.maximum(h, 0.0), axis=1)),
+            np.hypot(lam_eps * gap, norm(v * h, axis=1)),
+            norm(grad_u - self._grad_h, axis=1),
+        ], axis=1)
+
+    def _apply_rate_limits(self):
+        D = self._d_state.reshape(self._shape)
+        blocks = self._blocks()
+        for name, bound in self.rate_limits.items():
+            block = D[:, blocks[name]]
+            np.clip(block, -bound, bound, out=block)
+
+    def _unprojected(self):
+        # After evaluate(), _tmp holds the unprojected v derivatives
+        return np.column_stack([self._lambda_dot, self._tmp])
+
+    def jacobian(self, state, t=0.0):
+        raise NotImplementedError(
+            "the analytic Jacobian is only assembled for a single system; "
+            "use jacobian='sparsity' for a batch")
+
+    def switching(self, state, t=0.0):
+        raise NotImplementedError(
+            "projection events are only supported for a single system")
+
+    def jac_sparsity(self):
+        """Block-diagonal sparse pattern, one block per member."""
+        block = sparse.csr_matrix(super().jac_sparsity())
+        return sparse.block_diag([block] * self.batch_size, format='csr')
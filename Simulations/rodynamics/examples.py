@@ -0,0 +1,453 @@
+"""
+Problem definitions for the three examples of Section VII of the paper.
+"""
+
+import contextvars
+
+import numpy as np
+
+from .multiagent import MultiAgentProblem, rotate_anchors
+from .problem import AffineConstraint, CallableConstraint, ROProblem
+from .schedule import Phase, Schedule
+from .trajectories import Rotation, Switched
+from .uncertainty import EllipsoidIntersection, SeparableSet
+
+# Example A: robust QP over an intersection of five ellipsoids
+
+EXAMPLE_A_Q = (
+    np.array([[2.0, 0.0], [0.0, 2.0]]),
+    np.array([[5.0, -2.0], [-2.0, 4.0]]),
+    np.array([[4.0, 4.0], [4.0, 6.0]]),
+    np.array([[3.0, 0.0], [0.0, 8.0]]),
+    np.array([[5.0, 2.0], [2.0, 4.0]]),
+)
+
+
+def example_a(a=(1.0, 1.0), P=np.eye(2), b=5.0, Q_matrices=EXAMPLE_A_Q):
+    """f(x) = -8x1 - 16x2 + x1^2 + 4x2^2 with (a + Pu)^T x <= b over U."""
+
+    def objective(x):
+        return -8*x[0] - 16*x[1] + x[0]**2 + 4*x[1]**2
+
+    hess = np.array([2.0, 8.0])
+    lin = np.array([8.0, 16.0])
+
+    def objective_gradient(x, out=None):
+        out = np.multiply(hess, x, out=out)
+        return np.subtract(out, lin, out=out)
+
+    return ROProblem(objective_gradient, AffineConstraint(a, P),
+                     EllipsoidIntersection(Q_matrices), b,
+                     objective=objective, objective_hessian=np.diag(hess),
+                     gradient_out=True)
+
+
+# Example B: nonlinear problem without robust counterpart
+
+# Safeguards of test_nonlinear_fixed.py: derivative rate limits and a floor
+# on u before evaluating the problem.
+EXAMPLE_B_SAFEGUARDS = {
+    'rate_limits': {'x': 10.0, 'lambda': 10.0, 'u': 5.0, 'v': 10.0},
+    'u_floor': 0.01,
+}
+
+
+# Instrumentation counting the exponents clipped by safe_exp while a run is
+# instrumented (see instrument), None otherwise. As a context variable it is
+# set per thread, and a nested run restores the outer one when it finishes.
+_exp_clipping = contextvars.ContextVar('exp_clipping', default=None)
+
+
+def _count_exp(z, low, high):
+    counter = _exp_clipping.get()
+    if counter is not None:
+        counter.count_exp(z, low, high)
+
+
+# safe_exp counts its exponents for instrumentation; the derivative helpers
+# use the uncounted _capped_exp_*, like _dexp_smooth
+def _capped_exp_basic(z):
+    return np.exp(np.minimum(z, 50))
+
+
+def _exp_basic(z):
+    _count_exp(z, None, 50)
+    return _capped_exp_basic(z)
+
+
+def _capped_exp_fixed(z):
+    return np.exp(np.clip(z, -30, 30))
+
+
+def _exp_fixed(z):
+    _count_exp(z, -30, 30)
+    return _capped_exp_fixed(z)
+
+
+# The values _exp_fixed saturates at, for the guards that use them directly
+_EXP_FIXED_LOW = np.exp(-30.0)
+_EXP_FIXED_HIGH = np.exp(30.0)
+
+
+# Smooth variant: exp continued above the cap by its second-order Taylor
+# polynomial, so it stays finite, convex and C^2 without a clipping kink
+_EXP_SMOOTH_CAP = 50.0
+
+
+def _exp_smooth(z):
+    _count_exp(z, None, _EXP_SMOOTH_CAP)
+    excess = np.maximum(z - _EXP_SMOOTH_CAP, 0.0)
+    return np.exp(np.minimum(z, _EXP_SMOOTH_CAP)) * (
+        1.0 + excess + 0.5 * excess**2)
+
+
+def _dexp_smooth(z):
+    excess = np.maximum(z - _EXP_SMOOTH_CAP, 0.0)
+    return np.exp(np.minimum(z, _EXP_SMOOTH_CAP)) * (1.0 + excess)
+
+
+def _d2exp_smooth(z):
+    return np.exp(np.minimum(z, _EXP_SMOOTH_CAP))
+
+
+def _dexp_basic(z):
+    return np.where(z < 50, _capped_exp_basic(z), 0.0)
+
+
+def _dexp_fixed(z):
+    return np.where(np.abs(z) < 30, _capped_exp_fixed(z), 0.0)
+
+
+def _safe_div(a, b, eps=1e-10):
+    return a / (b + eps * np.sign(b) + (b == 0) * eps)
+
+
+def _d2_exp_square(u, safe_exp, dexp):
+    """d^2/du^2 of safe_exp(u^2)."""
+    return 2 * safe_exp(u**2) + 4 * u**2 * dexp(u**2)
+
+
+def _d2_u_exp_inv(u, safe_exp, dexp):
+    """d^2/du^2 of u safe_exp(1/u), for u away from zero."""
+    return (safe_exp(1.0 / u) + dexp(1.0 / u) * (1.0 / u - 1.0)) / u**2
+
+
+def _h_basic(rho):
+    def phi(u):
+        near_zero = np.abs(u) < 1e-10
+        us = np.where(near_zero, 1.0, u)
+        h = _exp_basic(us**2) + us * _exp_basic(_safe_div(1.0, us)) - rho
+        return np.where(near_zero, 1.0 - rho, h)
+
+    def dphi(u):
+        near_zero = np.abs(u) < 1e-10
+        us = np.where(near_zero, 1.0, u)
+        exp_inv = _exp_basic(_safe_div(1.0, us))
+        grad = 2 * us * _exp_basic(us**2) + (exp_inv - _safe_div(exp_inv, us))
+        return np.where(near_zero, 0.0, grad)
+
+    def d2phi(u):
+        near_zero = np.abs(u) < 1e-10
+        us = np.where(near_zero, 1.0, u)
+        curv = (_d2_exp_square(us, _capped_exp_basic, _dexp_basic)
+                + _d2_u_exp_inv(us, _capped_exp_basic, _dexp_basic))
+        return np.where(near_zero, 0.0, curv)
+
+    return phi, dphi, d2phi
+
+
+def _h_fixed(rho):
+    def phi(u):
+        near_zero = np.abs(u) < 0.01
+        positive = u > 0
+        us = np.where(positive & ~near_zero, u, 1.0)
+        exp_inv = np.where(positive, _exp_fixed(1.0 / us), _EXP_FIXED_LOW)
+        h = _exp_fixed(u**2) + u * exp_inv - rho
+        return np.where(near_zero, 1.0 + _EXP_FIXED_HIGH * u - rho, h)
+
+    def dphi(u):
+        near_zero = np.abs(u) < 0.01
+        positive = u > 0
+        us = np.where(positive & ~near_zero, u, 1.0)
+        exp_inv = _exp_fixed(1.0 / us)
+        grad = 2 * u * _exp_fixed(u**2) + np.where(
+            positive, exp_inv - exp_inv / us, 0.0)
+        return np.where(near_zero, 0.0, grad)
+
+    def d2phi(u):
+        near_zero = np.abs(u) < 0.01
+        positive = u > 0
+        us = np.where(positive & ~near_zero, u, 1.0)
+        curv = _d2_exp_square(u, _capped_exp_fixed, _dexp_fixed) + np.where(
+            positive, _d2_u_exp_inv(us, _capped_exp_fixed, _dexp_fixed),
+            0.0)
+        return np.where(near_zero, 0.0, curv)
+
+    return phi, dphi, d2phi
+
+
+# Below this u_j, h_j of the smooth variant is continued by its second-order
+# Taylor polynomial: a smooth barrier that replaces the u floor. As long as
+# exp(0.01) + 0.1 exp(10) = 2.2e3 exceeds rho_j, the smooth U is the part of
+# the basic U with u_j > 0: the negative u_j it cuts off never maximize g,
+# which increases in u, so the saddle point is the same
+EXAMPLE_B_BARRIER = 0.1
+
+
+def _h_smooth(rho, barrier=EXAMPLE_B_BARRIER):
+    # exp(u^2) + u exp(1/u) and its first two derivatives for u >= barrier,
+    # with u exp(1/u) = exp(1/u + log u) formed in the log domain
+    def value(u):
+        return _exp_smooth(u**2) + np.exp(1.0 / u + np.log(u))
+
+    def slope(u):
+        return 2 * u * _dexp_smooth(u**2) + np.exp(1.0 / u) * (1.0 - 1.0 / u)
+
+    def curv(u):
+        return (2 * _dexp_smooth(u**2) + 4 * u**2 * _d2exp_smooth(u**2)
+                + np.exp(1.0 / u + np.log(u)) / u**4)
+
+    # Below the barrier: the expansion around it, which is convex and
+    # decreasing there, so no u_j < barrier is in U if it starts outside U
+    at_barrier = value(barrier), slope(barrier), curv(barrier)
+    if np.any(at_barrier[0] <= rho):
+        raise ValueError(f"the barrier at u = {barrier} must lie outside U; "
+                         f"rho must stay below {at_barrier[0]:.4g}")
+
+    def phi(u):
+        step = np.minimum(u - barrier, 0.0)
+        taylor = at_barrier[0] + step * (at_barrier[1]
+                                         + 0.5 * step * at_barrier[2])
+        return np.where(step < 0, taylor, value(np.maximum(u, barrier))) - rho
+
+    def dphi(u):
+        step = np.minimum(u - barrier, 0.0)
+        return np.where(step < 0, at_barrier[1] + step * at_barrier[2],
+                        slope(np.maximum(u, barrier)))
+
+    def d2phi(u):
+        return np.where(u < barrier, at_barrier[2],
+                        curv(np.maximum(u, barrier)))
+
+    return phi, dphi, d2phi
+
+
+_EXAMPLE_B_VARIANTS = {
+    'basic': (_exp_basic, _dexp_basic, _h_basic),
+    'fixed': (_exp_fixed, _dexp_fixed, _h_fixed),
+    'smooth': (_exp_smooth, _dexp_smooth, _h_smooth),
+}
+
+
+def _example_b_variant(variant):
+    try:
+        return _EXAMPLE_B_VARIANTS[variant]
+    except KeyError:
+        raise ValueError(f"unknown Example B variant {variant!r}") from None
+
+
+def example_b_uncertainty_set(rho=(10.0, 20.0), variant='basic'):
+    """U = {u : exp(u_j^2) + u_j exp(1/u_j) <= rho_j} as a SeparableSet."""
+    _, _, h_factory = _example_b_variant(variant)
+    phi, dphi, d2phi = h_factory(np.asarray(rho, dtype=float))
+    return SeparableSet(phi, dphi, 2, d2phi=d2phi)
+
+
+def example_b(b=5.0, rho=(10.0, 20.0), variant='basic'):
+    """
+    f(x) = 0.5(x1 - 1)^2 + 0.5(x2 - 2)^2 with u^T exp(x^2) <= b over
+    U = {u : exp(u_j^2) + u_j exp(1/u_j) <= rho_j}.
+
+    variant 'basic' reproduces test_nonlinear.py (exponentials capped at
+    exp(50)) and 'fixed' reproduces test_nonlinear_fixed.py (clipped to
+    exp(+-30)); the latter is meant to run with EXAMPLE_B_SAFEGUARDS.
+    'smooth' needs no safeguards: exponentials are continued past exp(50)
+    by their Taylor polynomial, u_j exp(1/u_j) is evaluated in the log
+    domain, and h_j is continued below u_j = EXAMPLE_B_BARRIER by its
+    Taylor polynomial, so f, g and h are C^2 and finite for every x and u.
+    Its U is that of the other variants without the u_j < 0 parts, which
+    leaves the saddle point unchanged since g increases in u.
+    """
+    safe_exp, dexp, _ = _example_b_variant(variant)
+
+    x_target = np.array([1.0, 2.0])
+
+    def objective(x):
+        return 0.5 * (x[0] - 1)**2 + 0.5 * (x[1] - 2)**2
+
+    def objective_gradient(x, out=None):
+        return np.subtract(x, x_target, out=out)
+
+    def g(x, u):
+        # matmul over explicit row/column axes broadcasts over a batch axis
+        # and rounds exactly like u @ exp(x^2) for a single system
+        E = safe_exp(x**2)
+        return np.matmul(u[..., None, :], E[..., :, None])[..., 0, 0]
+
+    def grad_g_x(x, u):
+        return 2 * x * safe_exp(x**2) * u
+
+    def grad_g_u(x, u):
+        return safe_exp(x**2)
+
+    # g is separable in (x_i, u_i), so all second derivatives are diagonal.
+    # They differentiate grad_g_x as written, which is exact wherever the
+    # exponent caps are inactive.
+    def hess_g_xx(x, u):
+        return np.diag((2 * safe_exp(x**2) + 4 * x**2 * dexp(x**2)) * u)
+
+    def hess_g_xu(x, u):
+        return np.diag(2 * x * safe_exp(x**2))
+
+    def hess_g_uu(x, u):
+        return np.zeros((2, 2))
+
+    diagonal = np.eye(2, dtype=bool)
+    constraint = CallableConstraint(
+        g, grad_g_x, grad_g_u, 2, 2,
+        hessians=(hess_g_xx, hess_g_xu, hess_g_uu),
+        sparsity=(diagonal, diagonal, np.zeros((2, 2), dtype=bool)))
+    return ROProblem(objective_gradient, constraint,
+                     example_b_uncertainty_set(rho, variant), b,
+                     objective=objective, objective_hessian=np.eye(2),
+                     gradient_out=True)
+
+
+def example_b_symbolic(b=5.0, rho=(10.0, 20.0), variant='basic'):
+    """
+    Example B declared symbolically (see symbolic.SymbolicProblem), with
+    the exponent caps and near-zero guards of the variant.
+
+    All derivatives are exact derivatives of the capped expressions. They
+    agree with the hand-written ones of example_b() wherever the caps are
+    inactive; the 'fixed' guard band |u_j| < 0.01 gets the slope of its
+    linear branch instead of zero, which the u floor of
+    EXAMPLE_B_SAFEGUARDS keeps out of reach. The 'smooth' variant matches
+    example_b() everywhere.
+    """
+    from .symbolic import SymbolicProblem, _import_sympy
+
+    sympy = _import_sympy()
+    _example_b_variant(variant)
+    x = sympy.symbols('x1 x2', real=True)
+    u = sympy.symbols('u1 u2', real=True)
+
+    if variant == 'basic':
+        def exp(z):
+            return sympy.exp(sympy.Min(z, 50))
+    elif variant == 'fixed':
+        def exp(z):
+            return sympy.exp(sympy.Min(sympy.Max(z, -30), 30))
+    else:
+        def exp(z):
+            excess = sympy.Max(z - _EXP_SMOOTH_CAP, 0)
+            return (sympy.exp(sympy.Min(z, _EXP_SMOOTH_CAP))
+                    * (1 + excess + excess**2 / 2))
+
+    def h(u_j, rho_j):
+        smooth = exp(u_j**2) + u_j * exp(1 / u_j)
+        if variant == 'basic':
+            return sympy.Piecewise((1 - rho_j, sympy.Abs(u_j) < 1e-10),
+                                   (smooth - rho_j, True))
+        if variant == 'smooth':
+            step = u_j - EXAMPLE_B_BARRIER
+            at_barrier = [smooth.diff(u_j, k).subs(u_j, EXAMPLE_B_BARRIER)
+                          for k in range(3)]
+            taylor = (at_barrier[0] + at_barrier[1] * step
+                      + at_barrier[2] * step**2 / 2)
+            return sympy.Piecewise(
+                (taylor - rho_j, u_j < EXAMPLE_B_BARRIER),
+                (exp(u_j**2) + sympy.exp(1 / u_j + sympy.log(u_j)) - rho_j,
+                 True))
+        return sympy.Piecewise(
+            (1 + sympy.exp(30) * u_j - rho_j, sympy.Abs(u_j) < 0.01),
+            (smooth - rho_j, u_j > 0),
+            (exp(u_j**2) + u_j * sympy.exp(-30) - rho_j, True))
+
+    objective = (x[0] - 1)**2 / 2 + (x[1] - 2)**2 / 2
+    constraint = sum(u_i * exp(x_i**2) for x_i, u_i in zip(x, u))
+    uncertainty = [h(u_j, float(rho_j)) for u_j, rho_j in zip(u, rho)]
+    return SymbolicProblem(objective, constraint, uncertainty, x, u, b)
+
+
+# Example C: robust dynamic location with anchors and agents
+
+EXAMPLE_C_ANCHORS = np.array([
+    [0.0, 3.0],
+    [1.5, 3.5],
+    [3.0, 3.0],
+    [1.0, 2.0],
+    [2.0, 2.0],
+])
+
+EXAMPLE_C_EDGES = (
+    (0, 3), (0, 5),
+    (1, 3), (1, 4), (1, 6),
+    (2, 4), (2, 8),
+    (3, 4), (3, 5), (3, 6),
+    (4, 6), (4, 7), (4, 8),
+    (5, 6),
+    (6, 7),
+    (7, 8),
+)
+
+
+EXAMPLE_C_CENTER = np.array([1.5, 2.5])
+
+
+def example_c_rho(t):
+    """rho^2 = 0.1 until t = 300, then rho^2 = 1."""
+    return np.sqrt(0.1) if t < 300 else 1.0
+
+
+def example_c_rotation(t, anchor_positions, center=EXAMPLE_C_CENTER):
+    """Anchors rotated by 0.01 (t - 100) rad, at any t."""
+    return rotate_anchors(anchor_positions, 0.01 * (t - 100), center)
+
+
+def example_c_anchor_motion(t, anchor_positions, center=EXAMPLE_C_CENTER):
+    """Anchors rotate at 0.01 rad per time unit for 100 < t < 250."""
+    if 100 < t < 250:
+        return example_c_rotation(t, anchor_positions, center)
+    return anchor_positions
+
+
+def example_c_trajectories(anchor_positions=EXAMPLE_C_ANCHORS,
+                           center=EXAMPLE_C_CENTER):
+    """
+    The anchor motion and rho of example_c as Trajectories: anchors
+    rotating at 0.01 rad per time unit for 100 < t < 250 and back in place
+    after, rho^2 = 0.1 until t = 300 and 1 from then on.
+    """
+    anchors = Switched([
+        (0.0, anchor_positions),
+        (100.0, Rotation(anchor_positions, center, 0.01, t0=100.0)),
+        (250.0, anchor_positions),
+    ])
+    rho = Switched([(0.0, np.sqrt(0.1)), (300.0, 1.0)])
+    return anchors, rho
+
+
+def example_c_schedule():
+    """
+    The scenario of example_c as phases: convergence until t = 100,
+    rotation until t = 250 (after which the anchors return), rest, and
+    rho^2 = 1 from t = 300. Each phase uses a smooth rho and anchor motion,
+    for solve_scheduled.
+    """
+    rho_1 = np.sqrt(0.1)
+    return Schedule([
+        Phase(0.0, rho=rho_1, anchor_motion=None),
+        Phase(100.0, rho=rho_1, anchor_motion=example_c_rotation),
+        Phase(250.0, rho=rho_1, anchor_motion=None),
+        Phase(300.0, rho=1.0, anchor_motion=None),
+    ])
+
+
+def example_c(n_agents=4, anchor_positions=EXAMPLE_C_ANCHORS,
+              edges=EXAMPLE_C_EDGES, a=(1.0, 1.0), P=(1.0, -1.0), b=2.5,
+              w=1.0):
+    """Three-phase location scenario: convergence, rotation, rho^2 change."""
+    anchors, rho = example_c_trajectories(anchor_positions)
+    return MultiAgentProblem(anchor_positions, n_agents, edges, a, P, b,
+                             rho=rho, w=w, anchor_motion=anchors)
@@ -0,0 +1,302 @@
+"""
+Size-bounded export of trajectory figures.
+
+A TrajectoryFigure holds the curves, reference lines and labels of a grid
+of panels as plain data, so that it can be hashed and rendered in another
+process. export_figures() renders a set of them to EPS, PDF, SVG or PNG:
+
+- each curve is simplified (Ramer-Douglas-Peucker, simplify_path) to the
+  fewest points that stay within tolerance of it, measured as a fraction
+  of the panel's data range, so the dense output of odeint is not written
+  point by point;
+- curves that still have more than rasterize_above points are rasterized
+  at dpi while axes, labels and legends stay vector;
+- figures are rendered serially or on a ProcessPoolExecutor with
+  max_workers processes (as in sweep);
+- a figure is skipped when its file exists and the content hash of its
+  data, style and export options matches the one recorded in the
+  directory's .figure_cache.json.
+
+trajectory_figure() lays out an ROSolution as the 2x2 x, lambda, u, v
+figure of the example notebooks. matplotlib is only needed for rendering.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CACHE_FILE = '.figure_cache.json'
+FIGURE_FORMATS = ('eps', 'pdf', 'svg', 'png')
+# Part of every hash, to be bumped when rendering changes
+PIPELINE_VERSION = 1
+
+
+def _import_matplotlib():
+    try:
+        from matplotlib.figure import Figure
+    except ImportError:
+        raise ImportError("exporting figures needs matplotlib "
+                          "(pip install matplotlib)") from None
+    return Figure
+
+
+def simplify_path(x, y, tolerance):
+    """
+    Indices of the points of the polyline (x, y) kept by Ramer-Douglas-
+    Peucker: every dropped point lies within tolerance of the line through
+    the two kept points around it. x and y should be scaled alike.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = np.hypot(dx, dy)
+        if length > 0:
+            distance = np.abs(px * dy - py * dx) / length
+        else:
+            distance = np.hypot(px, py)
+        k = int(np.argmax(distance))
+        if distance[k] > tolerance:
+            split = first + 1 + k
+            keep[split] = True
+            stack += [(first, split), (split, last)]
+    return np.flatnonzero(keep)
+
+
+class TrajectoryFigure:
+    """
+    A grid of panels with curves, kept as data.
+
+    shape is the (rows, columns) grid and figsize the size in inches;
+    panels are indexed row by row. curve() adds a line through (x, y) and
+    reference() a horizontal line at value. Their style keywords are
+    passed to matplotlib's plot and axhline and must be plain strings,
+    numbers or booleans, as they enter the content hash.
+    """
+
+    def __init__(self, name, shape=(1, 1), figsize=(6.0, 4.0)):
+        self.name = name
+        self.shape = tuple(shape)
+        self.figsize = tuple(figsize)
+        n_panels = self.shape[0] * self.shape[1]
+        self.panels = [{'xlabel': '', 'ylabel': '', 'title': '',
+                        'legend': None, 'grid': True}
+                       for _ in range(n_panels)]
+        self.curves = [[] for _ in range(n_panels)]
+        self.references = [[] for _ in range(n_panels)]
+
+    def panel(self, index, xlabel='', ylabel='', title='', legend=None,
+              grid=True):
+        """Labels of a panel; legend is a dict of legend() keywords."""
+        self.panels[index] = {'xlabel': xlabel, 'ylabel': ylabel,
+                              'title': title, 'legend': legend, 'grid': grid}
+        return self
+
+    def curve(self, index, x, y, **style):
+        x = np.ascontiguousarray(x, dtype=float)
+        y = np.ascontiguousarray(y, dtype=float)
+        if x.shape != y.shape or x.ndim != 1:
+            raise ValueError(f"curve needs x and y of the same 1-D shape, "
+                             f"got {x.shape} and {y.shape}")
+        self.curves[index].append((x, y, style))
+        return self
+
+    def reference(self, index, value, **style):
+        self.references[index].append((float(value), style))
+        return self
+
+    @property
+    def n_points(self):
+        return sum(len(x) for curves in self.curves for x, _, _ in curves)
+
+    def digest(self, options):
+        """Content hash of the figure and the export options."""
+        description = {
+            'version': PIPELINE_VERSION, 'options': options,
+            'shape': self.shape, 'figsize': self.figsize,
+            'panels': self.panels,
+            'curves': [[style for _, _, style in curves]
+                       for curves in self.curves],
+            'references': self.references}
+        digest = hashlib.sha1(json.dumps(description, sort_keys=True,
+                                         default=repr).encode())
+        for curves in self.curves:
+            for x, y, _ in curves:
+                digest.update(x.tobytes())
+                digest.update(y.tobytes())
+        return digest.hexdigest()
+
+
+class FigureExport:
+    """
+    Outcome of exporting one figure: its path and digest, whether it was
+    taken from the cache, and for rendered figures the wall time, file
+    size and the number of curve points before and after simplification.
+    """
+
+    seconds = 0.0
+    points_drawn = None
+
+    def __init__(self, name, path, digest, cached, points):
+        self.name = name
+        self.path = path
+        self.digest = digest
+        self.cached = cached
+        self.points = points
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+
+def _bounds(values):
+    low, high = min(values), max(values)
+    return low, (high - low) or 1.0
+
+
+def render_figure(figure, path, tolerance=5e-4, rasterize_above=None,
+                  dpi=300):
+    """
+    Render figure to path (format from the extension) and return the
+    number of curve points drawn.
+    """
+    Figure = _import_matplotlib()
+    fig = Figure(figsize=figure.figsize)
+    axes = fig.subplots(*figure.shape, squeeze=False).ravel()
+    drawn = 0
+    for ax, panel, curves, references in zip(axes, figure.panels,
+                                             figure.curves,
+                                             figure.references):
+        if curves:
+            x0, x_range = _bounds([v for x, _, _ in curves
+                                   for v in (x.min(), x.max())])
+            y0, y_range = _bounds([v for _, y, _ in curves
+                                   for v in (y.min(), y.max())]
+                                  + [value for value, _ in references])
+        for x, y, style in curves:
+            if tolerance and len(x) > 2:
+                kept = simplify_path((x - x0) / x_range, (y - y0) / y_range,
+                                     tolerance)
+                x, y = x[kept], y[kept]
+            line, = ax.plot(x, y, **style)
+            if rasterize_above is not None and len(x) > rasterize_above:
+                line.set_rasterized(True)
+            drawn += len(x)
+        for value, style in references:
+            ax.axhline(value, **style)
+        ax.set_xlabel(panel['xlabel'])
+        ax.set_ylabel(panel['ylabel'])
+        ax.set_title(panel['title'])
+        if panel['legend'] is not None:
+            ax.legend(**panel['legend'])
+        if panel['grid']:
+            ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    return drawn
+
+
+def _render(figure, path, options):
+    start = time.perf_counter()
+    drawn = render_figure(figure, path, **options)
+    return drawn, time.perf_counter() - start
+
+
+def export_figures(figures, directory, fmt='eps', tolerance=5e-4,
+                   rasterize_above=None, dpi=300, max_workers=None,
+                   force=False):
+    """
+    Render figures to directory/<name>.<fmt>, skipping those whose file
+    and content hash are unchanged unless force is set.
+
+    tolerance is the simplification tolerance as a fraction of each
+    panel's data range (None or 0 keeps every point), rasterize_above the
+    point count above which a curve is rasterized at dpi (None keeps all
+    curves vector). max_workers None renders in this process, otherwise on
+    that many worker processes. Returns one FigureExport per figure, in
+    order.
+    """
+    if fmt not in FIGURE_FORMATS:
+        raise ValueError(f"unknown format {fmt!r}; expected one of "
+                         f"{FIGURE_FORMATS}")
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, CACHE_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    options = {'tolerance': tolerance, 'rasterize_above': rasterize_above,
+               'dpi': dpi}
+    exports, pending = [], []
+    for figure in figures:
+        filename = f"{figure.name}.{fmt}"
+        path = os.path.join(directory, filename)
+        digest = figure.digest(dict(options, fmt=fmt))
+        cached = (not force and manifest.get(filename) == digest
+                  and os.path.exists(path))
+        exports.append(FigureExport(figure.name, path, digest, cached,
+                                    figure.n_points))
+        if not cached:
+            pending.append((figure, exports[-1]))
+
+    def record(export, result):
+        export.points_drawn, export.seconds = result
+        manifest[os.path.basename(export.path)] = export.digest
+
+    if max_workers is None:
+        for figure, export in pending:
+            record(export, _render(figure, export.path, options))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(executor.submit(_render, figure, export.path,
+                                        options), export)
+                       for figure, export in pending]
+            for future, export in futures:
+                record(export, future.result())
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return exports
+
+
+def trajectory_figure(name, solution, x_star=None, u_star=None,
+                      figsize=(10.0, 8.0)):
+    """
+    The 2x2 figure of the example notebooks for an ROSolution: x, lambda,
+    u and v over time, with dashed references at x_star and u_star if
+    given.
+    """
+    figure = TrajectoryFigure(name, (2, 2), figsize)
+    t = np.asarray(solution.t, dtype=float)
+    colors = ('b', 'r', 'g', 'm', 'c', 'y', 'k')
+    blocks = ((0, solution.x, 'x', 'Decision Variables $x(t)$', x_star),
+              (2, solution.u, 'u', 'Uncertainty Variables $u(t)$', u_star))
+    for index, values, symbol, title, star in blocks:
+        for k in range(values.shape[1]):
+            figure.curve(index, t, values[:, k], color=colors[k % 7],
+                         linewidth=2, label=f'${symbol}_{k + 1}$')
+            if star is not None:
+                figure.reference(index, star[k], color=colors[k % 7],
+                                 linestyle='--', alpha=0.5)
+        figure.panel(index, 'Time', f'${symbol}$', title, legend={})
+    figure.curve(1, t, np.ravel(solution.lam), color='g', linewidth=2)
+    figure.panel(1, 'Time', r'$\lambda$', r'Dual Variable $\lambda(t)$')
+    v = solution.v
+    for j in range(v.shape[1]):
+        figure.curve(3, t, v[:, j], linewidth=1.5, label=f'$v_{j + 1}$')
+    figure.panel(3, 'Time', '$v$', 'Dual Variables $v(t)$ for Ellipsoids',
+                 legend={'ncol': 2})
+    return figure
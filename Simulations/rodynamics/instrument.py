@@ -0,0 +1,407 @@
+"""
+Opt-in instrumentation of the RO dynamics and their integration.
+
+An Instrumentation passed as solve(..., instrument=...) or
+solve_scheduled(..., instrument=...) records, for that run:
+
+    - RHS and analytic Jacobian calls and the time spent in them, split
+      into the blocks of the flow (h(u), x, lambda, u, v and the
+      safeguards) for RODynamics; other dynamics report the total only
+    - accepted and rejected step sizes of solve_ivp methods; explicit
+      Runge-Kutta methods reveal every rejected trial through the times of
+      their stage evaluations, Radau and BDF only whether a step was
+      retried (the first rejected trial), LSODA nothing. odeint reports
+      the number of steps, the last step size at each output time and
+      whether LSODA was in its stiff (BDF) or nonstiff (Adams) mode
+    - how often each [.]_+ projection holds its component at zero, how
+      often rate limits saturate and u is floored
+    - how many exponents the safe_exp of the Example B variants clip in
+      RHS evaluations
+
+report() formats the counts and summary() returns them as a dict. With
+trace set, every RHS call, Jacobian call and step is also written as one
+JSON line to that file. Without an Instrumentation nothing is wrapped, so
+an uninstrumented run executes the same code as before apart from one
+check per safe_exp call.
+"""
+
+import json
+import time
+
+import numpy as np
+import scipy.integrate
+
+from . import examples
+from .dynamics import RODynamics
+
+BLOCKS = ('h', 'x', 'lambda', 'u', 'v', 'safeguards')
+
+
+def _timed(block, method):
+    """method of RODynamics adding its wall time to block_time[block]."""
+    def timed(self, *args):
+        start = time.perf_counter()
+        result = method(self, *args)
+        self.instrumentation.block_time[block] += time.perf_counter() - start
+        return result
+
+    return timed
+
+
+class TimedRODynamics(RODynamics):
+    """RODynamics that adds the time of each block to an Instrumentation."""
+
+    def __init__(self, problem, instrumentation, epsilon=0.0,
+                 rate_limits=None, u_floor=None, gains=None):
+        super().__init__(problem, epsilon=epsilon, rate_limits=rate_limits,
+                         u_floor=u_floor, gains=gains)
+        self.instrumentation = instrumentation
+
+    _h_rows = _timed('h', RODynamics._h_rows)
+    _x_rows = _timed('x', RODynamics._x_rows)
+    _lambda_row = _timed('lambda', RODynamics._lambda_row)
+    _u_rows = _timed('u', RODynamics._u_rows)
+    _v_rows = _timed('v', RODynamics._v_rows)
+    _apply_rate_limits = _timed('safeguards', RODynamics._apply_rate_limits)
+
+
+def _projection_labels(dynamics):
+    layout = dynamics.layout
+    if hasattr(layout, 'n_agents'):
+        return ['lambda'] * layout.n_agents + ['v'] * layout.n_agents
+    return ['lambda'] + [f'v_{j + 1}' for j in range(layout.m)]
+
+
+def _projection_active(dynamics, state):
+    """Boolean mask of the projections holding their component at zero."""
+    if hasattr(dynamics, 'batch_size'):
+        layout = dynamics.layout
+        S = state.reshape(dynamics._shape)
+        s = np.column_stack([S[:, layout.lam] + dynamics.epsilon,
+                             S[:, layout.v]])
+        return ((s <= 0) & (dynamics._unprojected() <= 0)).sum(axis=0)
+    if dynamics.clamped is not None:
+        return dynamics.clamped
+    s = state[dynamics.projected_indices] - dynamics.boundary_values
+    return (s <= 0) & (dynamics._unprojected() <= 0)
+
+
+class Instrumentation:
+    """
+    Counters, timings and step sizes of instrumented runs.
+
+    One Instrumentation may be reused over several runs, whose counts then
+    add up. trace is the path of a JSON lines file receiving one record
+    per event; it is truncated by the first run and appended to by later
+    ones.
+    """
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self.rhs_calls = 0
+        self.rhs_time = 0.0
+        self.jacobian_calls = 0
+        self.jacobian_time = 0.0
+        self.block_time = dict.fromkeys(BLOCKS, 0.0)
+        self.projection_labels = None
+        self.projection_active = None
+        self.projection_evaluations = 0
+        self.rate_limited = {}
+        self.u_floored = 0
+        self.exp_evaluations = 0
+        self.exp_clipped_low = 0
+        self.exp_clipped_high = 0
+        self.accepted_t = []
+        self.accepted_h = []
+        self.rejected_t = []
+        self.rejected_h = []
+        self.steps_exact = None
+        self.odeint_steps = 0
+        self.odeint_stiff = 0
+        self.odeint_outputs = 0
+        self._trace_file = None
+        self._trace_mode = 'w'
+        self._step_calls = None
+        self._exp_tokens = []
+
+    # Run lifecycle
+
+    def start(self):
+        """
+        Begin a run: open the trace and count the safe_exp calls of this
+        thread until finish().
+        """
+        if self.trace is not None:
+            self._trace_file = open(self.trace, self._trace_mode)
+            self._trace_mode = 'a'
+        self._exp_tokens.append(examples._exp_clipping.set(self))
+
+    def finish(self):
+        """End a run: close the trace and stop counting safe_exp calls."""
+        if self._exp_tokens:
+            examples._exp_clipping.reset(self._exp_tokens.pop())
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+
+    def _write(self, **record):
+        if self._trace_file is not None:
+            self._trace_file.write(json.dumps(record) + '\n')
+
+    # Dynamics
+
+    def wrap(self, dynamics):
+        """
+        Instrument dynamics in place (a plain RODynamics is replaced by a
+        TimedRODynamics) and return them.
+        """
+        if type(dynamics) is RODynamics:
+            dynamics = TimedRODynamics(
+                dynamics.problem, self, epsilon=dynamics.epsilon,
+                rate_limits=dynamics.rate_limits, u_floor=dynamics.u_floor,
+                gains=dynamics.gains)
+        evaluate = dynamics.evaluate
+        clock = time.perf_counter
+        has_projections = (hasattr(dynamics, 'batch_size')
+                           or hasattr(dynamics, 'projected_indices'))
+        if has_projections and self.projection_labels is None:
+            self.projection_labels = _projection_labels(dynamics)
+            self.projection_active = np.zeros(len(self.projection_labels),
+                                              dtype=np.int64)
+
+        def instrumented(state, t=0.0):
+            # Count safe_exp also inside a Jacobian, which evaluates the RHS
+            token = examples._exp_clipping.set(self)
+            start = clock()
+            try:
+                d_state = evaluate(state, t)
+            finally:
+                examples._exp_clipping.reset(token)
+            elapsed = clock() - start
+            self.rhs_calls += 1
+            self.rhs_time += elapsed
+            if self._step_calls is not None:
+                self._step_calls.append(t)
+            if has_projections:
+                self._count_projections(dynamics, state)
+            if getattr(dynamics, 'rate_limits', None):
+                self._count_safeguards(dynamics, state, d_state)
+            self._write(event='rhs', t=float(t), seconds=elapsed)
+            return d_state
+
+        dynamics.evaluate = instrumented
+        if hasattr(dynamics, 'jacobian'):
+            jacobian = dynamics.jacobian
+
+            def instrumented_jacobian(state, t=0.0):
+                # The derivatives share safe_exp with the RHS; only the
+                # exponents of RHS evaluations are counted
+                token = examples._exp_clipping.set(None)
+                start = clock()
+                try:
+                    J = jacobian(state, t)
+                finally:
+                    examples._exp_clipping.reset(token)
+                elapsed = clock() - start
+                self.jacobian_calls += 1
+                self.jacobian_time += elapsed
+                self._write(event='jacobian', t=float(t), seconds=elapsed)
+                return J
+
+            dynamics.jacobian = instrumented_jacobian
+        return dynamics
+
+    def _count_projections(self, dynamics, state):
+        active = _projection_active(dynamics, state)
+        self.projection_active += active
+        self.projection_evaluations += getattr(dynamics, 'batch_size', 1)
+
+    def _count_safeguards(self, dynamics, state, d_state):
+        size = dynamics.layout.size
+        D = d_state.reshape(-1, size)
+        blocks = dynamics._blocks()
+        for name, bound in dynamics.rate_limits.items():
+            hits = int(np.count_nonzero(np.abs(D[:, blocks[name]]) >= bound))
+            self.rate_limited[name] = self.rate_limited.get(name, 0) + hits
+        if dynamics.u_floor is not None:
+            U = state.reshape(-1, size)[:, dynamics.layout.u]
+            self.u_floored += int(np.count_nonzero(U < dynamics.u_floor))
+
+    def count_exp(self, z, low, high):
+        """Count the entries of z that safe_exp clips to [low, high]."""
+        z = np.asarray(z)
+        self.exp_evaluations += z.size
+        if low is not None:
+            self.exp_clipped_low += int(np.count_nonzero(z < low))
+        self.exp_clipped_high += int(np.count_nonzero(z > high))
+
+    # Integrators
+
+    def solver(self, method):
+        """
+        solve_ivp method class recording the accepted and rejected steps
+        of the named method.
+        """
+        base = getattr(scipy.integrate, method)
+        instrumentation = self
+        runge_kutta = hasattr(base, 'n_stages')
+        self.steps_exact = runge_kutta
+
+        class Recording(base):
+            def _step_impl(self):
+                t = self.t
+                h_trial = getattr(self, 'h_abs', None)
+                instrumentation._step_calls = []
+                try:
+                    success, message = super()._step_impl()
+                finally:
+                    calls = instrumentation._step_calls
+                    instrumentation._step_calls = None
+                if not success:
+                    return success, message
+                h = self.t - t
+                if runge_kutta:
+                    # Every trial evaluates n_stages stages, the last at
+                    # t + h_trial
+                    n = self.n_stages
+                    trials = [max(abs(tc - t) for tc in calls[k:k + n])
+                              for k in range(0, len(calls) - n + 1, n)]
+                    rejected = trials[:-1]
+                elif (h_trial is not None and self.t != self.t_bound
+                      and abs(h) < h_trial * (1 - 1e-9)):
+                    rejected = [h_trial]
+                else:
+                    rejected = []
+                instrumentation._record_steps(t, h, rejected)
+                return success, message
+
+        Recording.__name__ = base.__name__
+        return Recording
+
+    def _record_steps(self, t, h, rejected):
+        for h_rejected in rejected:
+            self.rejected_t.append(t)
+            self.rejected_h.append(h_rejected)
+            self._write(event='step', t=float(t), h=float(h_rejected),
+                        accepted=False)
+        self.accepted_t.append(t)
+        self.accepted_h.append(abs(h))
+        self._write(event='step', t=float(t), h=float(abs(h)), accepted=True)
+
+    def record_odeint(self, t, info):
+        """Record the full_output info of an odeint call over times t."""
+        n_steps = np.diff(np.r_[0, info['nst']])
+        stiff = info['mused'] == 2
+        self.odeint_steps += int(info['nst'][-1])
+        self.odeint_stiff += int(np.count_nonzero(stiff))
+        self.odeint_outputs += len(info['hu'])
+        for tk, hk, nk, sk in zip(t[1:], info['hu'], n_steps, stiff):
+            self.accepted_t.append(tk)
+            self.accepted_h.append(hk)
+            self._write(event='odeint_output', t=float(tk), h=float(hk),
+                        steps=int(nk), stiff=bool(sk))
+
+    # Results
+
+    def summary(self):
+        """The counts as a dict of plain Python values."""
+        summary = {
+            'rhs_calls': self.rhs_calls,
+            'rhs_time': self.rhs_time,
+            'jacobian_calls': self.jacobian_calls,
+            'jacobian_time': self.jacobian_time,
+            'block_time': (dict(self.block_time)
+                           if any(self.block_time.values()) else None),
+            'accepted_steps': (self.odeint_steps if self.odeint_outputs
+                               else len(self.accepted_h)),
+            'rejected_steps': (len(self.rejected_h) if self.steps_exact
+                               is not None and not self.odeint_outputs
+                               else None),
+            'rate_limited': dict(self.rate_limited),
+            'u_floored': self.u_floored,
+            'exp_evaluations': self.exp_evaluations,
+            'exp_clipped_low': self.exp_clipped_low,
+            'exp_clipped_high': self.exp_clipped_high,
+        }
+        if self.projection_labels is not None:
+            summary['projection_active'] = dict(zip(
+                self.projection_labels,
+                (self.projection_active
+                 / max(self.projection_evaluations, 1)).tolist()))
+        if self.odeint_outputs:
+            summary['odeint_stiff_fraction'] = (self.odeint_stiff
+                                                / self.odeint_outputs)
+        return summary
+
+    def report(self):
+        """Multi-line text report of the recorded run(s)."""
+        lines = []
+        per_call = self.rhs_time / max(self.rhs_calls, 1) * 1e6
+        lines.append(f"RHS calls          {self.rhs_calls} "
+                     f"({self.rhs_time:.3f} s, {per_call:.1f} us per call)")
+        if any(self.block_time.values()):
+            total = sum(self.block_time.values())
+            shares = '  '.join(f"{name} {value / total:.0%}"
+                               for name, value in self.block_time.items())
+            lines.append(f"  block time       {shares}")
+        if self.jacobian_calls:
+            lines.append(f"Jacobian calls     {self.jacobian_calls} "
+                         f"({self.jacobian_time:.3f} s)")
+        lines += self._step_report()
+        if self.projection_labels is not None:
+            lines.append("Projection active  " + self._projection_report())
+        if self.rate_limited:
+            hits = '  '.join(f"{name} {count}"
+                             for name, count in self.rate_limited.items())
+            lines.append(f"Rate limits hit    {hits}")
+        if self.u_floored:
+            lines.append(f"u floored          {self.u_floored}")
+        if self.exp_evaluations:
+            clipped = self.exp_clipped_low + self.exp_clipped_high
+            lines.append(f"safe_exp clipped   {clipped} of "
+                         f"{self.exp_evaluations} exponents (low "
+                         f"{self.exp_clipped_low}, high "
+                         f"{self.exp_clipped_high})")
+        return '\n'.join(lines)
+
+    def _step_report(self):
+        lines = []
+        accepted = np.array(self.accepted_h)
+        if self.odeint_outputs:
+            lines.append(f"odeint steps       {self.odeint_steps}, stiff "
+                         f"(BDF) mode at {self.odeint_stiff} of "
+                         f"{self.odeint_outputs} output times")
+            label = "  last h per output"
+        elif len(accepted):
+            rejected = len(self.rejected_h)
+            bound = '' if self.steps_exact else ' (at least)'
+            lines.append(f"Steps              accepted {len(accepted)}, "
+                         f"rejected {rejected}{bound}")
+            label = "  accepted h      "
+        else:
+            return lines
+        lines.append(f"{label} min {accepted.min():.2e}  median "
+                     f"{np.median(accepted):.2e}  max {accepted.max():.2e}")
+        if self.rejected_h:
+            rejected = np.array(self.rejected_h)
+            lines.append(f"  rejected h       min {rejected.min():.2e}  "
+                         f"median {np.median(rejected):.2e}  max "
+                         f"{rejected.max():.2e}")
+        return lines
+
+    def _projection_report(self):
+        n = max(self.projection_evaluations, 1)
+        shares = {}
+        for label, count in zip(self.projection_labels,
+                                self.projection_active):
+            shares.setdefault(label, []).append(count / n)
+        # One entry per label; repeated labels (one per agent) are averaged
+        return '  '.join(f"{label} {np.mean(values):.1%}"
+                         for label, values in shares.items())
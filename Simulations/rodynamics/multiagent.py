@@ -0,0 +1,493 @@
+"""
+Distributed RO dynamics for the multi-agent location problem (Example C).
+
+Each agent i carries [x_i (d), lambda_i, u_i (d), v_i] and runs
+
+    dx_i/dt      = -sum_j w (x_i - x_j) - (lambda_i + eps)(a + P u_i)
+    dlambda_i/dt = [(a + P u_i)^T x_i - b - v_i h_i]_+
+    du_i/dt      = P (1^T x_i) - 2 v_i u_i
+    dv_i/dt      = [(lambda_i + eps) h_i]_+,     h_i = ||u_i||^2 - rho(t)^2
+
+with P u_i taken elementwise, as in the original notebook. The graph is
+kept as a sparse (CSR) weighted Laplacian, so the consensus term
+sum_j w_ij (x_i - x_j) over agent and anchor neighbours is one sparse
+product, and the remaining updates are evaluated for all agents at once on
+(n_agents, d) and (n_agents,) views of the blocks of the state. One RHS
+call costs O(N + |E|).
+
+The state is interleaved agent by agent by default (MultiAgentLayout).
+With state_order='blocks' it is stored as contiguous x, lambda, u and v
+blocks instead (BlockMultiAgentLayout), so the per-block updates of large
+swarms run over contiguous memory. MultiAgentDynamics(dtype=np.float32)
+evaluates the RHS in single precision, with float32 buffers and Laplacian,
+for fixed-step runs (RealTimeStepper) where memory bandwidth dominates.
+
+Anchor positions and rho may be Trajectories (see trajectories), whose
+time derivatives MultiAgentDynamics(feedforward=True) adds as feed-forward
+terms. With lambda and u fixed, the x equilibrium of the flow solves
+L_xx x = A_xa anchors - (lambda + eps)(a + P u), so it moves at
+L_xx^{-1} A_xa d(anchors)/dt, with L_xx the agent block of the Laplacian
+and A_xa the agent-anchor adjacency; x gets this velocity. An active
+constraint ||u_i|| = rho is kept by scaling u_i with rho, so u gets
+(drho/dt / rho) u_i. Both terms vanish for fixed anchors and rho and leave
+the saddle point unchanged; they remove the lag of the flow behind it.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from .dynamics import (ProjectionSwitching, fill_gains, project_frozen,
+                       project_positive)
+from .trajectories import Trajectory
+
+
+def rotate_anchors(anchor_positions, angle, center):
+    """Rotate all anchor positions by angle around center."""
+    cos_a = np.cos(angle)
+    sin_a = np.sin(angle)
+    rotation_matrix = np.array([[cos_a, -sin_a], [sin_a, cos_a]])
+    return (anchor_positions - center) @ rotation_matrix.T + center
+
+
+class MultiAgentLayout:
+    """
+    Interleaved per-agent state [x_i (d), lambda_i, u_i (d), v_i].
+
+    x, lam, u and v index the components of one agent within its stride.
+    """
+
+    order = 'interleaved'
+
+    def __init__(self, n_agents, dim=2):
+        self.n_agents = n_agents
+        self.dim = dim
+        self.stride = 2 * dim + 2
+        self.size = n_agents * self.stride
+        self.x = slice(0, dim)
+        self.lam = dim
+        self.u = slice(dim + 1, 2 * dim + 1)
+        self.v = 2 * dim + 1
+
+    def agents(self, state):
+        """View a state (or trajectory) as (..., n_agents, stride)."""
+        state = np.asarray(state)
+        return state.reshape(state.shape[:-1] + (self.n_agents, self.stride))
+
+    def unpack(self, state):
+        """Return views (x, lambda, u, v), each with a leading agent axis."""
+        S = self.agents(state)
+        return S[..., self.x], S[..., self.lam], S[..., self.u], S[..., self.v]
+
+    def duals(self, state):
+        """Views (lambda, v) of a state, each with a leading agent axis."""
+        S = self.agents(state)
+        return S[..., self.lam], S[..., self.v]
+
+    def agent_indices(self, agents):
+        """
+        Flat state indices of the given agents, one row of stride indices
+        [x_i, lambda_i, u_i, v_i] per agent.
+        """
+        agents = np.asarray(agents)
+        return agents[..., None] * self.stride + np.arange(self.stride)
+
+    def pack(self, x, lam=0.0, u=0.0, v=0.0):
+        """Assemble a state vector; scalars broadcast over agents."""
+        state = np.zeros(self.size)
+        X, Lam, U, V = self.unpack(state)
+        X[:] = x
+        Lam[:] = lam
+        U[:] = u
+        V[:] = v
+        return state
+
+
+class BlockMultiAgentLayout(MultiAgentLayout):
+    """
+    Structure-of-arrays state [x (n_agents, d), lambda (n_agents),
+    u (n_agents, d), v (n_agents)], each block contiguous.
+
+    unpack() and duals() return views as for MultiAgentLayout, but
+    agents() gathers the interleaved (..., n_agents, stride) rows into a
+    read-only copy; write through unpack() or agent_indices() instead.
+    """
+
+    order = 'blocks'
+
+    def __init__(self, n_agents, dim=2):
+        super().__init__(n_agents, dim)
+        n = n_agents
+        self._blocks = (slice(0, n * dim), slice(n * dim, n * dim + n),
+                        slice(n * dim + n, 2 * n * dim + n),
+                        slice(2 * n * dim + n, self.size))
+
+    def agents(self, state):
+        X, lam, U, V = self.unpack(state)
+        S = np.concatenate([X, lam[..., None], U, V[..., None]], axis=-1)
+        S.flags.writeable = False
+        return S
+
+    def unpack(self, state):
+        state = np.asarray(state)
+        lead = state.shape[:-1]
+        x, lam, u, v = self._blocks
+        return (state[..., x].reshape(lead + (self.n_agents, self.dim)),
+                state[..., lam],
+                state[..., u].reshape(lead + (self.n_agents, self.dim)),
+                state[..., v])
+
+    def duals(self, state):
+        state = np.asarray(state)
+        return state[..., self._blocks[1]], state[..., self._blocks[3]]
+
+    def agent_indices(self, agents):
+        agents = np.asarray(agents)[..., None]
+        n, d = self.n_agents, self.dim
+        return np.concatenate([agents * d + np.arange(d), n * d + agents,
+                               n * d + n + agents * d + np.arange(d),
+                               2 * n * d + n + agents], axis=-1)
+
+
+LAYOUTS = {'interleaved': MultiAgentLayout, 'blocks': BlockMultiAgentLayout}
+
+
+class MultiAgentProblem:
+    """
+    Robust location problem over a network of fixed anchors and mobile agents.
+
+    Nodes 0..n_anchors-1 are anchors and the rest are agents, and edges are
+    (i, j) node index pairs (any sequence or an (n_edges, 2) array). w is
+    one weight for all edges or one per edge. a, P and b may be given per
+    agent with a leading agent axis. rho is a constant, a function rho(t)
+    or a Trajectory, and anchor_motion optionally moves the anchors: a
+    function anchor_motion(t, anchor_positions) returning the moved
+    anchors, or a Trajectory of the (n_anchors, d) positions. state_order
+    is 'interleaved' or 'blocks' (see the module docstring).
+    """
+
+    def __init__(self, anchor_positions, n_agents, edges, a, P, b, rho,
+                 w=1.0, anchor_motion=None, state_order='interleaved'):
+        self.anchor_positions = np.asarray(anchor_positions, dtype=float)
+        self.n_anchors, dim = self.anchor_positions.shape
+        self.n_agents = n_agents
+        self.edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+        self.a = np.asarray(a, dtype=float)
+        self.P = np.asarray(P, dtype=float)
+        self.b = float(b) if np.ndim(b) == 0 else np.asarray(b, dtype=float)
+        self.rho = rho if callable(rho) else (lambda t, r=float(rho): r)
+        self.w = float(w) if np.ndim(w) == 0 else np.asarray(w, dtype=float)
+        self.anchor_motion = anchor_motion
+        try:
+            self.layout = LAYOUTS[state_order](n_agents, dim)
+        except KeyError:
+            raise ValueError(f"unknown state_order {state_order!r}; expected "
+                             f"one of {tuple(LAYOUTS)}") from None
+        self.state_order = state_order
+
+    @property
+    def n_nodes(self):
+        return self.n_anchors + self.n_agents
+
+    def adjacency_matrix(self):
+        """
+        Sparse symmetric weighted adjacency matrix over all nodes (CSR).
+
+        An edge listed twice (in either direction) counts once, with the
+        weight of its first occurrence, and self-loops are ignored.
+        """
+        weights = np.broadcast_to(self.w, (len(self.edges),))
+        pairs = np.sort(self.edges, axis=1)
+        pairs, first = np.unique(pairs, axis=0, return_index=True)
+        weights = weights[first]
+        keep = pairs[:, 0] != pairs[:, 1]
+        i, j = pairs[keep].T
+        weights = weights[keep]
+        return sparse.coo_matrix(
+            (np.concatenate([weights, weights]),
+             (np.concatenate([i, j]), np.concatenate([j, i]))),
+            shape=(self.n_nodes, self.n_nodes)).tocsr()
+
+    def replace(self, **changes):
+        """Copy of the problem with some constructor arguments replaced."""
+        arguments = {'anchor_positions': self.anchor_positions,
+                     'n_agents': self.n_agents, 'edges': self.edges,
+                     'a': self.a, 'P': self.P, 'b': self.b, 'rho': self.rho,
+                     'w': self.w, 'anchor_motion': self.anchor_motion,
+                     'state_order': self.state_order}
+        arguments.update(changes)
+        return type(self)(**arguments)
+
+    def laplacian(self):
+        """Sparse weighted graph Laplacian D - A over all nodes (CSR)."""
+        A = self.adjacency_matrix()
+        degree = np.asarray(A.sum(axis=1)).ravel()
+        return (sparse.diags(degree) - A).tocsr()
+
+    def anchors_at(self, t):
+        """Anchor positions at time t."""
+        if self.anchor_motion is None:
+            return self.anchor_positions
+        if isinstance(self.anchor_motion, Trajectory):
+            return self.anchor_motion(t)
+        return self.anchor_motion(t, self.anchor_positions)
+
+    def initial_state(self, state0):
+        """Full state vector, or agent positions (n_agents, d) with zero duals."""
+        state0 = np.asarray(state0, dtype=float)
+        if state0.shape == (self.layout.size,):
+            return state0.copy()
+        if state0.size == self.n_agents * self.layout.dim:
+            return self.layout.pack(state0.reshape(self.n_agents, -1))
+        raise ValueError(
+            f"initial state must be the full state ({self.layout.size}) or "
+            f"agent positions ({self.n_agents}, {self.layout.dim}), got "
+            f"shape {state0.shape}")
+
+    def make_dynamics(self, epsilon=0.01, **options):
+        """Build the right-hand side of the multi-agent RO dynamics."""
+        return MultiAgentDynamics(self, epsilon=epsilon, **options)
+
+
+class MultiAgentDynamics(ProjectionSwitching):
+    """
+    Preallocated RHS for a MultiAgentProblem, vectorized across agents.
+
+    The consensus term is the agent rows of the Laplacian applied to the
+    stacked node positions [anchors(t); x], one CSR product per call. The
+    projected components for ProjectionSwitching are all lambda_i followed
+    by all v_i.
+
+    gains maps 'x', 'lambda', 'u' and 'v' to positive gains on the
+    derivatives that broadcast to the block over all agents: (n_agents, d)
+    for x and u, (n_agents,) for lambda and v, so a scalar, one gain per
+    coordinate or one per agent ((n_agents, 1) for x and u).
+
+    set_topology() swaps the Laplacian in place for a DynamicNetwork (see
+    topology), with pending corrections to its agent rows and a mask that
+    freezes the state of empty agent slots.
+
+    dtype is the precision of the buffers, the Laplacian and the returned
+    derivative; with np.float32, pass float32 states as well to avoid
+    conversions on every call.
+
+    feedforward=True adds the feed-forward terms of the module docstring
+    for the anchor_motion and rho of the problem that are Trajectories
+    (after the gains, which they do not scale). The anchor term factorizes
+    L_xx once, so every agent needs a path to an anchor, and the Laplacian
+    must stay fixed.
+    """
+
+    def __init__(self, problem, epsilon=0.01, gains=None, dtype=np.float64,
+                 feedforward=False):
+        self.problem = problem
+        self.epsilon = float(epsilon)
+        self.gains = dict(gains or {})
+        self.dtype = np.dtype(dtype)
+        self.layout = layout = problem.layout
+        n, d = problem.n_agents, layout.dim
+        self._gain = None
+        if self.gains:
+            self._gain = np.ones(layout.size, dtype=self.dtype)
+            fill_gains(self._gain, dict(zip(('x', 'lambda', 'u', 'v'),
+                                            layout.unpack(self._gain))),
+                       self.gains)
+        N1 = problem.n_anchors
+        self._a = problem.a.astype(self.dtype)
+        self._P = problem.P.astype(self.dtype)
+        self._b = np.asarray(problem.b, dtype=self.dtype)
+
+        self._L_agents = problem.laplacian()[N1:].tocsr().astype(self.dtype)
+        self._pending = None
+        self._mask = None
+        self.active = None
+        self._nodes = np.zeros((problem.n_nodes, d), dtype=self.dtype)
+
+        self._d_state = np.zeros(layout.size, dtype=self.dtype)
+        self._dx, self._dlam, self._du, self._dv = \
+            layout.unpack(self._d_state)
+
+        self._c = np.empty((n, d), dtype=self.dtype)
+        self._tmp = np.empty((n, d), dtype=self.dtype)
+        self._lam_eps = np.empty(n, dtype=self.dtype)
+        self._h = np.empty(n, dtype=self.dtype)
+        self._arg = np.empty(n, dtype=self.dtype)
+        # Unprojected lambda and v derivatives
+        self._z = np.empty(2 * n, dtype=self.dtype)
+        self._z_lam = self._z[:n]
+        self._z_v = self._z[n:]
+        self._masks = (np.empty(n, dtype=bool), np.empty(n, dtype=bool))
+
+        self.projected_indices = np.concatenate(
+            layout.duals(np.arange(layout.size)))
+        self.boundary_values = np.zeros(2 * n)
+        self.boundary_values[:n] = -self.epsilon
+
+        self.feedforward = feedforward
+        self._anchor_velocity = self._rho_rate = None
+        if feedforward:
+            self._init_feedforward()
+
+    def _init_feedforward(self):
+        problem = self.problem
+        moving = isinstance(problem.anchor_motion, Trajectory)
+        if not moving and not isinstance(problem.rho, Trajectory):
+            raise ValueError("feedforward needs an anchor_motion or rho "
+                             "given as a Trajectory")
+        n, d = problem.n_agents, self.layout.dim
+        self._ff_t = None
+        self._ff_x = np.zeros((n, d))
+        self._ff_scale = 0.0
+        self._ff_u = np.zeros((n, d), dtype=self.dtype)
+        if moving:
+            N1 = problem.n_anchors
+            L = problem.laplacian()
+            self._A_xa = -L[N1:, :N1]
+            try:
+                self._L_xx = splu(L[N1:, N1:].tocsc())
+            except RuntimeError:
+                raise ValueError("feedforward needs a path from every agent "
+                                 "to an anchor") from None
+            self._anchor_velocity = problem.anchor_motion.derivative
+        if isinstance(problem.rho, Trajectory):
+            self._rho_rate = problem.rho.derivative
+
+    def _update_feedforward(self, U, t):
+        """Feed-forward velocities of x (once per t) and u at t."""
+        if t != self._ff_t:
+            if self._anchor_velocity is not None:
+                self._ff_x[:] = self._L_xx.solve(
+                    self._A_xa @ self._anchor_velocity(t))
+            if self._rho_rate is not None:
+                rho = self.problem.rho(t)
+                self._ff_scale = self._rho_rate(t) / rho if rho else 0.0
+            self._ff_t = t
+        np.multiply(U, self._ff_scale, out=self._ff_u)
+
+    def __call__(self, state, t=0.0):
+        return self.evaluate(state, t)
+
+    def set_topology(self, laplacian=None, pending=None, mask=None):
+        """
+        Replace the agent rows of the Laplacian, the pending corrections to
+        them as (rows, columns, values) triplets, and the state mask (1 for
+        the components of active agents, 0 for empty slots), without
+        rebuilding the buffers. None leaves laplacian unchanged and clears
+        pending or mask; an empty triplet is dropped.
+        """
+        if self.feedforward:
+            raise ValueError("set_topology() needs feedforward=False")
+        if laplacian is not None:
+            self._L_agents = laplacian.astype(self.dtype, copy=False)
+        if pending is not None and not len(pending[0]):
+            pending = None
+        self._pending = pending
+        self._mask = mask
+        # The lambda entries of the mask, 1 for active agents and 0 else
+        self.active = None if mask is None else self.layout.duals(mask)[0]
+
+    def fun(self, t, y):
+        return self.evaluate(y, t).copy()
+
+    def evaluate(self, state, t=0.0):
+        problem = self.problem
+        X, lam, U, V = self.layout.unpack(state)
+        rho = problem.rho(t)
+        c, tmp = self._c, self._tmp
+        np.add(lam, self.epsilon, out=self._lam_eps)
+
+        # Consensus term sum_j w_ij (x_i - x_j) over anchor and agent
+        # neighbours: agent rows of L times the stacked node positions
+        nodes = self._nodes
+        nodes[:problem.n_anchors] = problem.anchors_at(t)
+        nodes[problem.n_anchors:] = X
+        np.negative(self._L_agents @ nodes, out=self._dx)
+        if self._pending is not None:
+            rows, columns, values = self._pending
+            for k in range(self.layout.dim):
+                self._dx[:, k] -= np.bincount(
+                    rows, values * nodes[columns, k],
+                    minlength=self.layout.n_agents)
+
+        # x dynamics: constraint gradient a + P u_i
+        np.multiply(U, self._P, out=c)
+        np.add(c, self._a, out=c)
+        np.multiply(c, self._lam_eps[:, None], out=tmp)
+        np.subtract(self._dx, tmp, out=self._dx)
+
+        # h_i = ||u_i||^2 - rho^2
+        np.multiply(U, U, out=tmp)
+        np.sum(tmp, axis=1, out=self._h)
+        np.subtract(self._h, rho**2, out=self._h)
+
+        # lambda dynamics
+        z_lam = self._z_lam
+        np.multiply(c, X, out=tmp)
+        np.sum(tmp, axis=1, out=z_lam)
+        np.subtract(z_lam, self._b, out=z_lam)
+        np.multiply(V, self._h, out=self._dlam)
+        np.subtract(z_lam, self._dlam, out=z_lam)
+
+        # u dynamics
+        np.sum(X, axis=1, out=self._arg)
+        np.multiply(self._arg[:, None], self._P, out=self._du)
+        np.multiply(U, V[:, None], out=tmp)
+        np.multiply(tmp, 2.0, out=tmp)
+        np.subtract(self._du, tmp, out=self._du)
+
+        # v dynamics
+        np.multiply(self._lam_eps, self._h, out=self._z_v)
+
+        # Projections of the lambda and v derivatives
+        if self.clamped is None:
+            project_positive(z_lam, self._lam_eps, self._dlam, self._masks)
+            project_positive(self._z_v, V, self._dv, self._masks)
+        else:
+            n = self.layout.n_agents
+            project_frozen(z_lam, self.clamped[:n], self._dlam)
+            project_frozen(self._z_v, self.clamped[n:], self._dv)
+            self._remember(state, t)
+        if self._gain is not None:
+            np.multiply(self._d_state, self._gain, out=self._d_state)
+        if self.feedforward:
+            self._update_feedforward(U, t)
+            np.add(self._dx, self._ff_x, out=self._dx)
+            np.add(self._du, self._ff_u, out=self._du)
+        if self._mask is not None:
+            np.multiply(self._d_state, self._mask, out=self._d_state)
+        return self._d_state
+
+    def residuals(self, state, t=0.0, evaluate=True):
+        """
+        KKT residual terms over all agents, ordered like RESIDUAL_TERMS.
+
+        The x and u terms are the norms of the stacked agent derivatives
+        (without the gains), which carry no projection; gap_i = g_i - b is
+        recovered from the unprojected lambda derivative. Empty agent slots
+        (see set_topology) do not count, nor do the feed-forward terms.
+        evaluate=False reuses the last evaluate() call, which must have
+        been at the same (state, t).
+        """
+        _, _, _, V = self.layout.unpack(state)
+        if evaluate:
+            self.evaluate(state, t)
+        h = self._h
+        gap = self._z_lam + V * h
+        if self.active is not None:
+            h, gap = h * self.active, gap * self.active
+        dx, du = self._dx, self._du
+        if self.feedforward:
+            dx, du = dx - self._ff_x, du - self._ff_u
+        if self._gain is not None:
+            G = self.layout.unpack(self._gain)
+            dx, du = dx / G[0], du / G[2]
+        norm = np.linalg.norm
+        return np.array([
+            norm(dx),
+            np.hypot(norm(np.maximum(gap, 0.0)), norm(np.maximum(h, 0.0))),
+            np.hypot(norm(self._lam_eps * gap), norm(V * h)),
+            norm(du),
+        ])
+
+    def _unprojected(self):
+        return self._z.copy()
@@ -0,0 +1,254 @@
+"""
+Multirate integration: the (u, v) block sub-cycled inside (x, lambda) steps.
+
+The uncertainty block of the flow can move on a faster time scale than
+the primal block (in Example B, u sees the gradients of exp(u^2) and
+exp(1/u) while x only sees exp(x^2)), and a single-rate integrator then
+takes the step size of the fastest block for the whole state.
+solve_multirate() advances the slow block (x, lambda) with outer steps H
+and the fast block (u, v) with inner steps h = H / ratio:
+
+1. a full RHS evaluation k at (t, y), reused from the end of the previous
+   step;
+2. an Euler prediction of the slow block at t + H;
+3. ratio Heun steps of the fast block, with the slow block interpolated
+   linearly between y and its prediction. These evaluate only the u and v
+   rows of the RHS (RODynamics.evaluate_uncertainty);
+4. a full evaluation at the predicted slow and sub-cycled fast block,
+   from which the slow block takes its Heun step.
+
+Each block has its own error estimate, the difference between its Heun
+and embedded Euler steps scaled by its own tolerances. The slow error
+controls H and the fast error controls h, so that ratio = ceil(H / h)
+follows the time scales; with adaptive=False the ratio stays fixed and
+both errors control H. After every (sub)step lambda and v are clamped to
+lambda >= -eps and v >= 0, as in RealTimeStepper. The output times are
+filled by cubic Hermite interpolation between the step ends.
+"""
+
+import numpy as np
+
+from .solve import ROSolution
+
+# Step-size control of the embedded Heun/Euler pair (local error O(h^2))
+_SAFETY = 0.9
+_MIN_FACTOR = 0.2
+_MAX_FACTOR = 5.0
+
+
+def _factor(error):
+    """Step-size factor for a scaled error estimate."""
+    if error == 0:
+        return _MAX_FACTOR
+    return min(_MAX_FACTOR, max(_MIN_FACTOR, _SAFETY * error ** -0.5))
+
+
+def _scaled_norm(error, y0, y1, rtol, atol):
+    """RMS norm of error relative to atol + rtol max(|y0|, |y1|)."""
+    scale = atol + rtol * np.maximum(np.abs(y0), np.abs(y1))
+    return np.sqrt(np.mean((error / scale) ** 2))
+
+
+class _MultirateIntegrator:
+    """Buffers and step of solve_multirate for one RHS."""
+
+    def __init__(self, dynamics, rtol, atol, fast_rtol, fast_atol):
+        layout = dynamics.layout
+        self.dynamics = dynamics
+        self.slow = slice(0, layout.lam + 1)
+        self.fast = slice(layout.lam + 1, layout.size)
+        self.lam = layout.lam
+        self.v = slice(layout.v.start - self.fast.start,
+                       layout.v.stop - self.fast.start)
+        self.lam_bound = -dynamics.epsilon
+        self.tolerances = ((rtol, atol), (fast_rtol, fast_atol))
+        self.nfev = 0
+        self.nfev_fast = 0
+        self._stage = np.empty(layout.size)
+
+    def full(self, y, t):
+        self.nfev += 1
+        return self.dynamics.evaluate(y, t).copy()
+
+    def partial(self, y, t):
+        self.nfev_fast += 1
+        return self.dynamics.evaluate_uncertainty(y, t)[self.fast].copy()
+
+    def project(self, y):
+        """Clamp lambda >= -eps and v >= 0 in a full state, in place."""
+        y[self.lam] = max(y[self.lam], self.lam_bound)
+        fast = y[self.fast]
+        np.maximum(fast[self.v], 0.0, out=fast[self.v])
+
+    def step(self, t, y, k, H, n):
+        """
+        One outer step of size H with n inner steps from (t, y) with
+        derivative k; returns the new state and the slow and fast errors.
+        """
+        slow, fast, v = self.slow, self.fast, self.v
+        (rtol, atol), (fast_rtol, fast_atol) = self.tolerances
+        y_slow = y[slow]
+        delta = H * k[slow]
+        if y[self.lam] + delta[-1] < self.lam_bound:
+            delta[-1] = self.lam_bound - y[self.lam]
+
+        stage = self._stage
+        stage_slow, stage_fast = stage[slow], stage[fast]
+        h = H / n
+        z = y[fast].copy()
+        a = k[fast]
+        fast_error = 0.0
+        for i in range(n):
+            tau = t + i * h
+            if i:
+                np.copyto(stage_slow, y_slow + (i / n) * delta)
+                np.copyto(stage_fast, z)
+                a = self.partial(stage, tau)
+            np.copyto(stage_slow, y_slow + ((i + 1) / n) * delta)
+            np.copyto(stage_fast, z + h * a)
+            np.maximum(stage_fast[v], 0.0, out=stage_fast[v])
+            b = self.partial(stage, tau + h)
+            z_new = z + 0.5 * h * (a + b)
+            np.maximum(z_new[v], 0.0, out=z_new[v])
+            fast_error = max(fast_error,
+                             _scaled_norm(0.5 * h * (b - a), z, z_new,
+                                          fast_rtol, fast_atol))
+            z = z_new
+
+        np.copyto(stage_slow, y_slow + delta)
+        np.copyto(stage_fast, z)
+        k_end = self.full(stage, t + H)
+        y_new = np.empty_like(y)
+        y_new[slow] = y_slow + 0.5 * H * (k[slow] + k_end[slow])
+        y_new[fast] = z
+        self.project(y_new)
+        slow_error = _scaled_norm(0.5 * H * (k_end[slow] - k[slow]), y_slow,
+                                  y_new[slow], rtol, atol)
+        return y_new, slow_error, fast_error
+
+
+def _hermite(t0, y0, k0, t1, y1, k1, t):
+    """Cubic Hermite interpolation of the step [t0, t1] at the times t."""
+    H = t1 - t0
+    s = ((t - t0) / H)[:, None]
+    s2, s3 = s * s, s * s * s
+    return ((2 * s3 - 3 * s2 + 1) * y0 + (s3 - 2 * s2 + s) * (H * k0)
+            + (3 * s2 - 2 * s3) * y1 + (s3 - s2) * (H * k1))
+
+
+def solve_multirate(problem, x0, t_span, ratio=4, adaptive=True,
+                    max_ratio=16, epsilon=0.0, rtol=1e-6, atol=1e-8,
+                    fast_rtol=None, fast_atol=None, dynamics_options=None,
+                    first_step=None, max_steps=100000):
+    """
+    Integrate the RO dynamics of problem from x0 over t_span with the
+    (u, v) block sub-cycled inside the (x, lambda) steps.
+
+    x0, t_span, epsilon and dynamics_options are as for solve(), for a
+    single system. ratio is the number of inner steps per outer step: the
+    initial one with adaptive=True, after which the inner step size is
+    controlled separately, up to max_ratio inner steps per outer step;
+    fixed with adaptive=False. rtol and atol apply to the slow block and
+    fast_rtol and fast_atol (by default the same) to the fast block.
+    first_step is the initial outer step, by default 1e-3 of the horizon.
+
+    The solution's nfev counts full RHS evaluations, nfev_fast the
+    evaluations of the (u, v) rows alone, n_steps the accepted outer steps,
+    inner_steps their inner steps and rejected the rejected outer steps
+    by the block whose error exceeded its tolerance. It is unsuccessful if
+    the step size underflows or max_steps is reached, and then ends at the
+    last output time reached.
+    """
+    if ratio < 1 or max_ratio < ratio:
+        raise ValueError(f"need 1 <= ratio <= max_ratio, got ratio {ratio} "
+                         f"and max_ratio {max_ratio}")
+    state0 = problem.initial_state(x0)
+    if state0.ndim != 1:
+        raise ValueError("solve_multirate integrates a single system; got "
+                         f"initial states of shape {state0.shape}")
+    t_span = np.asarray(t_span, dtype=float)
+    dynamics = problem.make_dynamics(epsilon=epsilon,
+                                     **(dynamics_options or {}))
+    integrator = _MultirateIntegrator(
+        dynamics, rtol, atol, rtol if fast_rtol is None else fast_rtol,
+        atol if fast_atol is None else fast_atol)
+
+    t0, t_end = t_span[0], t_span[-1]
+    y = state0
+    integrator.project(y)
+    k = integrator.full(y, t0)
+    H = 1e-3 * (t_end - t0) if first_step is None else float(first_step)
+    h = H / ratio
+    y_out = np.empty((len(t_span), len(y)))
+    y_out[0] = y
+    n_out = 1
+    t = t0
+    n_steps = inner_steps = 0
+    rejected = {'slow': 0, 'fast': 0}
+    success = True
+    message = 'The solver successfully reached the end of the integration ' \
+        'interval.'
+    while n_out < len(t_span):
+        if n_steps + sum(rejected.values()) >= max_steps:
+            success = False
+            message = f"Reached max_steps = {max_steps}."
+            break
+        H = min(H, t_end - t)
+        if adaptive:
+            n = int(np.ceil(H / h * (1 - 1e-12)))
+            if n > max_ratio:
+                n, H = max_ratio, max_ratio * h
+            n = max(n, 1)
+        else:
+            n = ratio
+        if H <= 16 * np.spacing(max(abs(t), 1.0)):
+            success = False
+            message = f"Step size underflow at t = {t}."
+            break
+
+        y_new, slow_error, fast_error = integrator.step(t, y, k, H, n)
+        if adaptive:
+            accepted = slow_error <= 1 and fast_error <= 1
+            H_next = H * _factor(slow_error)
+            h_next = H / n * _factor(fast_error)
+        else:
+            error = max(slow_error, fast_error)
+            accepted = error <= 1
+            H_next = H * _factor(error)
+        if not accepted:
+            rejected['slow'] += slow_error > 1
+            rejected['fast'] += fast_error > 1
+            H = min(H, H_next)
+            if adaptive:
+                h = min(H / n, h_next)
+            continue
+
+        t_new = t + H
+        k_new = integrator.full(y_new, t_new)
+        stop = n_out
+        while stop < len(t_span) and t_span[stop] <= t_new:
+            stop += 1
+        if stop == len(t_span) - 1 and t_end - t_new <= \
+                16 * np.spacing(max(abs(t_end), 1.0)):
+            stop += 1
+        if stop > n_out:
+            y_out[n_out:stop] = _hermite(t, y, k, t_new, y_new, k_new,
+                                         t_span[n_out:stop])
+            for row in y_out[n_out:stop]:
+                integrator.project(row)
+            n_out = stop
+        n_steps += 1
+        inner_steps += n
+        t, y, k = t_new, y_new, k_new
+        H = H_next
+        if adaptive:
+            h = h_next
+
+    solution = ROSolution(t_span[:n_out], y_out[:n_out], problem.layout,
+                          success=success, message=message,
+                          nfev=integrator.nfev)
+    solution.nfev_fast = integrator.nfev_fast
+    solution.n_steps = n_steps
+    solution.inner_steps = inner_steps
+    solution.rejected = rejected
+    return solution
@@ -0,0 +1,206 @@
+"""
+Worst-case oracle: the inner maximization max_{u in U} g(x, u) as a query.
+
+Checking whether a candidate x is robustly feasible, or drawing the robust
+feasible region, needs the worst case of the constraint over U for fixed
+x, without running the coupled flow. For a concave g(., u) and convex h_j
+this is a small convex program per x,
+
+    max_u g(x, u)   s.t.   h_j(u) <= 0,  j = 1..m,
+
+which WorstCaseOracle solves for a whole batch of x at once with a
+primal-dual interior-point method on slacks s_j = -h_j(u) >= 0. Every
+Newton step is one batched (n_u, n_u) solve, rows are dropped from the
+iteration as they converge, and the start may be infeasible, so the
+previous maximizers and multipliers serve as a warm start: along a
+trajectory, or from one row of a grid to the next. The result reports
+the worst-case value, the robust margin b - max_u g, the maximizer, the
+multipliers v_j and which constraints h_j are active at the maximizer.
+"""
+
+import numpy as np
+
+from .scenario import bounding_box
+
+# Fraction of the distance to the boundary of s, v > 0 a step may cover
+_BOUNDARY_FRACTION = 0.995
+
+
+class WorstCase:
+    """
+    Worst cases of the constraint for a batch of x (rows).
+
+    u are the maximizers, value = g(x, u) and margin = b - value, so x is
+    robustly feasible where margin >= 0. v are the multipliers of h_j and h
+    the constraint values at u; active marks the constraints with h_j(u)
+    within active_tol of zero. converged is False for rows that did not
+    reach tol within max_iter Newton steps, and iterations is the number
+    of steps each row took.
+    """
+
+    def __init__(self, x, u, v, value, margin, h, active, converged,
+                 iterations):
+        self.x = x
+        self.u = u
+        self.v = v
+        self.value = value
+        self.margin = margin
+        self.h = h
+        self.active = active
+        self.converged = converged
+        self.iterations = iterations
+
+    @property
+    def feasible(self):
+        """Whether each x satisfies the robust constraint."""
+        return self.margin >= 0
+
+
+class WorstCaseOracle:
+    """
+    Batched worst-case query max_{u in U} g(x, u) for an ROProblem.
+
+    The constraint must provide grad_u (and, optionally, hess_uu; without
+    it the Newton matrix keeps only the curvature of h, which is exact for
+    g affine in u), and the uncertainty set jacobian and weighted_hessian,
+    all broadcasting over a leading batch axis.
+
+    The oracle remembers the maximizers and multipliers of its last call
+    and, with warm_start=True, starts the next call of the same batch size
+    from them. The cold start is center (by default the middle of the
+    bounding box of U, or the origin where there is none). The method
+    follows the convex program from there, so center must lie where the
+    h_j are convex; the basic and fixed sets of Example B, for instance,
+    also extend to u_j < 0 where they are not, and need a positive center.
+    """
+
+    def __init__(self, problem, tol=1e-9, max_iter=60, active_tol=1e-6,
+                 center=None, regularization=1e-12):
+        self.problem = problem
+        self.tol = tol
+        self.max_iter = max_iter
+        self.active_tol = active_tol
+        self.regularization = regularization
+        uset = problem.uncertainty_set
+        if center is None:
+            try:
+                lower, upper = bounding_box(uset)
+                center = 0.5 * (lower + upper)
+            except ValueError:
+                center = np.zeros(uset.n_u)
+        self.center = np.asarray(center, dtype=float)
+        self.u = None
+        self.v = None
+
+    def __call__(self, x, u0=None, v0=None, warm_start=True):
+        """
+        Worst cases for x, one row per candidate (a single x gives one row).
+
+        u0 and v0 override the start; otherwise the previous call's result
+        is used when warm_start is set and the batch sizes match.
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        batch = len(x)
+        uset = self.problem.uncertainty_set
+        if u0 is None and warm_start and self.u is not None \
+                and len(self.u) == batch:
+            u0, v0 = self.u, self.v
+        u = np.array(np.broadcast_to(self.center if u0 is None else u0,
+                                     (batch, uset.n_u)), dtype=float)
+        h = np.empty((batch, uset.m))
+        uset.h(u, h)
+        if v0 is None:
+            s = np.maximum(-h, 1.0)
+            v = np.ones((batch, uset.m))
+        else:
+            # Warm start: slacks at the constraint values, and both kept
+            # a little inside the positive orthant so that the first steps
+            # are not cut short by the boundary
+            floor = np.sqrt(self.tol)
+            v = np.maximum(np.broadcast_to(v0, (batch, uset.m)), floor)
+            s = np.maximum(-h, floor)
+
+        iterations = np.zeros(batch, dtype=int)
+        converged = np.zeros(batch, dtype=bool)
+        rows = np.arange(batch)
+        for _ in range(self.max_iter):
+            done = self._newton_step(x, u, s, v, rows)
+            converged[rows[done]] = True
+            rows = rows[~done]
+            if not len(rows):
+                break
+            iterations[rows] += 1
+
+        uset.h(u, h)
+        value = self.problem.constraint.value(x, u)
+        self.u, self.v = u, v
+        return WorstCase(x, u, v, value, self.problem.b - value, h,
+                         h > -self.active_tol, converged, iterations)
+
+    def _newton_step(self, x, u, s, v, rows):
+        """
+        One primal-dual step on the given rows, in place; returns which of
+        them had already converged (and were left unchanged).
+        """
+        constraint = self.problem.constraint
+        uset = self.problem.uncertainty_set
+        n_u, m = uset.n_u, uset.m
+        X, U, S, V = x[rows], u[rows], s[rows], v[rows]
+        count = len(rows)
+
+        h = np.empty((count, m))
+        uset.h(U, h)
+        J = np.empty((count, m, n_u))
+        uset.jacobian(U, J)
+        grad = np.empty((count, n_u))
+        constraint.grad_u(X, U, grad)
+
+        # Residuals of the KKT conditions of min -g s.t. h + s = 0, s >= 0
+        dual = np.einsum('bjk,bj->bk', J, V) - grad
+        primal = h + S
+        gap = np.einsum('bj,bj->b', S, V) / m
+        done = ((np.abs(dual).max(axis=1) <= self.tol)
+                & (np.abs(primal).max(axis=1) <= self.tol)
+                & (gap <= self.tol))
+        if done.all():
+            return done
+        keep = ~done
+        X, U, S, V = X[keep], U[keep], S[keep], V[keep]
+        h, J, dual, primal, gap = h[keep], J[keep], dual[keep], primal[keep], \
+            gap[keep]
+        count = len(U)
+
+        H = np.empty((count, n_u, n_u))
+        uset.weighted_hessian(U, V, H)
+        try:
+            curvature = np.empty((count, n_u, n_u))
+            constraint.hess_uu(X, U, curvature)
+            H -= curvature
+        except NotImplementedError:
+            pass
+        H += self.regularization * np.eye(n_u)
+
+        # Newton step on the barrier KKT system, with ds and dv eliminated
+        complementarity = S * V - 0.1 * gap[:, None]
+        H += np.einsum('bji,bj,bjk->bik', J, V / S, J)
+        rhs = -dual + np.einsum('bji,bj->bi', J,
+                                (complementarity - V * primal) / S)
+        du = np.linalg.solve(H, rhs[..., None])[..., 0]
+        ds = -primal - np.einsum('bjk,bk->bj', J, du)
+        dv = (-complementarity - V * ds) / S
+
+        with np.errstate(divide='ignore'):
+            limits = np.where(ds < 0, -S / ds, np.inf).min(axis=1)
+            limits = np.minimum(limits, np.where(dv < 0, -V / dv,
+                                                 np.inf).min(axis=1))
+        alpha = np.minimum(1.0, _BOUNDARY_FRACTION * limits)[:, None]
+        index = rows[keep]
+        u[index] = U + alpha * du
+        s[index] = S + alpha * ds
+        v[index] = V + alpha * dv
+        return done
+
+
+def worst_case(problem, x, **options):
+    """One-off worst cases for x; options go to WorstCaseOracle."""
+    return WorstCaseOracle(problem, **options)(x)
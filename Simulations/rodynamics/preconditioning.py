@@ -0,0 +1,100 @@
+"""
+Diagonal gains for the RO dynamics from curvature estimates.
+
+With unit gains, the primal components relax at rates set by the diagonal
+of the Hessian of the Lagrangian, so the least curved directions dictate
+the time to convergence. estimate_gains() evaluates the diagonal
+
+    x:  hess f(x) + (lambda + eps) hess_xx g(x, u)
+    u:  sum_j v_j hess h_j(u) - hess_uu g(x, u)
+
+at a state (for Example C, the weighted degrees of the agents and 2 v_i)
+and returns the Jacobi gains d_max / d_i >= 1, which speed up every
+component, but to no faster than the most curved component of its block.
+lambda has no curvature of its own; once x has relaxed, it moves at the
+rate of the reduced curvature sum_i (grad_x g)_i^2 / d_i, and its gain
+lifts that rate to d_max of x as well. v gets a scalar gain from the
+caller. The result is the gains= option of the dynamics (e.g. solve(...,
+dynamics_options={'gains': gains})); positive gains keep the equilibria
+and the projections of the flow.
+"""
+
+import numpy as np
+
+
+def jacobi_gains(curvature, max_gain=100.0):
+    """
+    d_max / d_i over the positive entries of a curvature diagonal,
+    clipped to [1, max_gain]; entries without curvature get gain 1.
+    """
+    d = np.abs(np.asarray(curvature, dtype=float))
+    gains = np.ones_like(d)
+    if not np.any(d > 0):
+        return gains
+    curved = d > 0
+    gains[curved] = np.clip(d.max() / d[curved], 1.0, max_gain)
+    return gains
+
+
+def _curvature(problem, state, epsilon):
+    """
+    Diagonals of the x and u curvature of problem at state, and grad_x g
+    (one row per agent for a MultiAgentProblem).
+    """
+    layout = problem.layout
+    if hasattr(layout, 'n_agents'):
+        X, lam, U, V = layout.unpack(state)
+        degree = np.asarray(problem.laplacian().diagonal())[problem.n_anchors:]
+        return (np.repeat(degree[:, None], layout.dim, axis=1),
+                np.repeat(2.0 * V[:, None], layout.dim, axis=1),
+                problem.a + problem.P * U)
+
+    x, lam, u, v = layout.unpack(state)
+    constraint = problem.constraint
+    hess_xx = np.empty((layout.n_x, layout.n_x))
+    constraint.hess_xx(x, u, hess_xx)
+    d_x = (np.diag(problem.objective_hessian_at(x))
+           + (lam + epsilon) * np.diag(hess_xx))
+    hess_h = np.empty((layout.n_u, layout.n_u))
+    problem.uncertainty_set.weighted_hessian(u, v, hess_h)
+    hess_uu = np.empty((layout.n_u, layout.n_u))
+    constraint.hess_uu(x, u, hess_uu)
+    grad_x = np.empty(layout.n_x)
+    constraint.grad_x(x, u, grad_x)
+    return d_x, np.diag(hess_h) - np.diag(hess_uu), grad_x
+
+
+def estimate_gains(problem, state, epsilon=0.0, blocks=('x', 'lambda', 'u'),
+                   max_gain=100.0, v_gain=None):
+    """
+    Gains of the x, lambda and u blocks of problem at state.
+
+    state is a full state (or x, see problem.initial_state), typically the
+    initial state or a previous solution; the problem must provide the
+    second derivatives of f, g and h. blocks selects which of 'x',
+    'lambda' and 'u' get gains, max_gain caps them, and v_gain, if given,
+    is the scalar gain of v. For a MultiAgentProblem the gains are per
+    agent.
+    """
+    state = problem.initial_state(state)
+    d_x, d_u, grad_x = _curvature(problem, state, epsilon)
+    gains = {}
+    for name in blocks:
+        if name == 'x':
+            gains['x'] = jacobi_gains(d_x, max_gain)
+        elif name == 'u':
+            gains['u'] = jacobi_gains(d_u, max_gain)
+        elif name == 'lambda':
+            d = np.abs(d_x)
+            d_max = d.max()
+            d = np.maximum(d, 1e-12 * d_max)
+            reduced = np.sum(grad_x**2 / d, axis=-1)
+            gains['lambda'] = np.clip(d_max / np.maximum(reduced, d_max
+                                                         / max_gain),
+                                      1.0, max_gain)
+        else:
+            raise ValueError(f"unknown block {name!r}; expected 'x', "
+                             f"'lambda' or 'u'")
+    if v_gain is not None:
+        gains['v'] = v_gain
+    return gains
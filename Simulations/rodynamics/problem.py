@@ -0,0 +1,300 @@
+"""
+Problem specification for the RO saddle-point dynamics.
+
+    min_x f(x)   s.t.   max_{u in U} g(x, u) <= b,   U = {u : h(u) <= 0}
+
+The dynamics act on the state [x (n_x), lambda (1), u (n_u), v (m)].
+Constraints provide g with its gradients and, for the Jacobian of the
+dynamics, the second derivatives hess_xx g (n_x, n_x), hess_xu g = d(grad_x
+g)/du (n_x, n_u) and hess_uu g (n_u, n_u) together with their sparsity.
+value(x, u, out) takes an optional (n_x,) scratch buffer for a single
+system, so that evaluating the dynamics does not allocate arrays.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator
+
+from .dynamics import BatchRODynamics, RODynamics
+from .uncertainty import CallableSet
+
+
+class StateLayout:
+    """Slices of the flat state vector [x, lambda, u, v]."""
+
+    def __init__(self, n_x, n_u, m):
+        self.n_x = n_x
+        self.n_u = n_u
+        self.m = m
+        self.x = slice(0, n_x)
+        self.lam = n_x
+        self.u = slice(n_x + 1, n_x + 1 + n_u)
+        self.v = slice(n_x + 1 + n_u, n_x + 1 + n_u + m)
+        self.size = n_x + 1 + n_u + m
+
+    def pack(self, x, lam=0.0, u=None, v=None):
+        """Assemble a state vector; missing blocks default to zero."""
+        state = np.zeros(self.size)
+        state[self.x] = x
+        state[self.lam] = lam
+        if u is not None:
+            state[self.u] = u
+        if v is not None:
+            state[self.v] = v
+        return state
+
+    def unpack(self, state):
+        """Return views (x, lambda, u, v) of a state vector or trajectory."""
+        state = np.asarray(state)
+        return (state[..., self.x], state[..., self.lam],
+                state[..., self.u], state[..., self.v])
+
+    def duals(self, state):
+        """Views (lambda, v) of a state; lambda keeps a trailing axis."""
+        return state[..., self.lam:self.lam + 1], state[..., self.v]
+
+
+class AffineConstraint:
+    """
+    Uncertain affine constraint g(x, u) = (a + P u)^T x.
+
+    value and the gradients broadcast over leading batch axes of x and u.
+    P may also be a scipy sparse matrix or a LinearOperator, which are
+    applied as products (at the cost of their nonzeros) instead of being
+    stored densely; hess_xu and sparsity then materialize P and are meant
+    for moderate sizes only.
+    """
+
+    def __init__(self, a, P):
+        self.a = np.asarray(a, dtype=float)
+        if sparse.issparse(P):
+            self.P = sparse.csr_matrix(P, dtype=float)
+            self.PT = self.P.T.tocsr()
+        elif isinstance(P, LinearOperator):
+            self.P = P
+            self.PT = P.T
+        else:
+            self.P = np.asarray(P, dtype=float)
+            self.PT = np.ascontiguousarray(self.P.T)
+        self._dense = isinstance(self.P, np.ndarray)
+        self.n_x = self.a.shape[0]
+        self.n_u = self.P.shape[1]
+
+    def _apply(self, operator, w):
+        """operator @ w for a vector w or each row of a batch w."""
+        return operator @ w if w.ndim == 1 else (operator @ w.T).T
+
+    def value(self, x, u, out=None):
+        if self._dense and out is not None and x.ndim == 1:
+            np.matmul(u, self.PT, out=out)
+            np.add(out, self.a, out=out)
+            return np.dot(out, x)
+        if self._dense:
+            c = u @ self.PT + self.a
+        else:
+            c = self._apply(self.P, u) + self.a
+        return np.matmul(c[..., None, :], x[..., :, None])[..., 0, 0]
+
+    def grad_x(self, x, u, out):
+        if self._dense:
+            np.matmul(u, self.PT, out=out)
+        else:
+            out[:] = self._apply(self.P, u)
+        np.add(out, self.a, out=out)
+
+    def grad_u(self, x, u, out):
+        if self._dense:
+            np.matmul(x, self.P, out=out)
+        else:
+            out[:] = self._apply(self.PT, x)
+
+    def hess_xx(self, x, u, out):
+        out[:] = 0.0
+
+    def hess_xu(self, x, u, out):
+        if self._dense:
+            out[:] = self.P
+        elif sparse.issparse(self.P):
+            out[:] = self.P.toarray()
+        else:
+            out[:] = self.P @ np.eye(self.n_u)
+
+    def hess_uu(self, x, u, out):
+        out[:] = 0.0
+
+    def sparsity(self):
+        """Boolean nonzero patterns of (hess_xx, hess_xu, hess_uu)."""
+        if self._dense:
+            xu = self.P != 0
+        elif sparse.issparse(self.P):
+            xu = self.P.toarray() != 0
+        else:
+            xu = np.ones((self.n_x, self.n_u), dtype=bool)
+        return (np.zeros((self.n_x, self.n_x), dtype=bool), xu,
+                np.zeros((self.n_u, self.n_u), dtype=bool))
+
+
+class CallableConstraint:
+    """
+    Uncertain constraint from user functions g, grad_x g and grad_u g.
+
+    For batched dynamics the functions must broadcast over a leading batch
+    axis of x and u. hessians = (hess_xx, hess_xu, hess_uu) and their
+    boolean sparsity patterns are optional and only needed for the Jacobian of the dynamics;
+    without a pattern all three blocks are treated as dense.
+    """
+
+    def __init__(self, g, grad_x, grad_u, n_x, n_u, hessians=None,
+                 sparsity=None):
+        self._g = g
+        self._grad_x = grad_x
+        self._grad_u = grad_u
+        self._hessians = hessians
+        self._sparsity = sparsity
+        self.n_x = n_x
+        self.n_u = n_u
+
+    def value(self, x, u, out=None):
+        return self._g(x, u)
+
+    def grad_x(self, x, u, out):
+        out[:] = self._grad_x(x, u)
+
+    def grad_u(self, x, u, out):
+        out[:] = self._grad_u(x, u)
+
+    def _hessian(self, block):
+        if self._hessians is None:
+            raise NotImplementedError(
+                "CallableConstraint needs hessians for the Jacobian of the "
+                "dynamics")
+        return self._hessians[block]
+
+    def hess_xx(self, x, u, out):
+        out[:] = self._hessian(0)(x, u)
+
+    def hess_xu(self, x, u, out):
+        out[:] = self._hessian(1)(x, u)
+
+    def hess_uu(self, x, u, out):
+        out[:] = self._hessian(2)(x, u)
+
+    def sparsity(self):
+        if self._sparsity is not None:
+            return tuple(np.asarray(p, dtype=bool) for p in self._sparsity)
+        return (np.ones((self.n_x, self.n_x), dtype=bool),
+                np.ones((self.n_x, self.n_u), dtype=bool),
+                np.ones((self.n_u, self.n_u), dtype=bool))
+
+
+class ROProblem:
+    """
+    Robust optimization problem for the saddle-point flow.
+
+    objective_gradient(x) returns grad f(x); with gradient_out it also
+    accepts out= and writes grad f(x) of a single x into that buffer, which
+    the dynamics then reuse. objective(x) is optional and only used for
+    reporting. constraint provides g and its gradients and
+    uncertainty_set provides h and sum_j v_j grad h_j. objective_hessian is
+    either a constant (n_x, n_x) array or a function x -> hess f(x); it is
+    only needed for the Jacobian of the dynamics. b may be an array of one
+    bound per member when the problem is integrated as a batch.
+    """
+
+    def __init__(self, objective_gradient, constraint, uncertainty_set, b,
+                 objective=None, objective_hessian=None,
+                 gradient_out=False):
+        if constraint.n_u != uncertainty_set.n_u:
+            raise ValueError(
+                f"constraint expects u in R^{constraint.n_u} but uncertainty "
+                f"set is in R^{uncertainty_set.n_u}")
+        self.objective_gradient = objective_gradient
+        self.gradient_out = gradient_out
+        self.objective = objective
+        if objective_hessian is not None and not callable(objective_hessian):
+            objective_hessian = np.asarray(objective_hessian, dtype=float)
+        self.objective_hessian = objective_hessian
+        self.constraint = constraint
+        self.uncertainty_set = uncertainty_set
+        self.b = float(b) if np.ndim(b) == 0 else np.asarray(b, dtype=float)
+        self.layout = StateLayout(constraint.n_x, constraint.n_u,
+                                  uncertainty_set.m)
+
+    @classmethod
+    def from_functions(cls, objective_gradient, g, grad_g_x, grad_g_u, h,
+                       grad_h, b, n_x, n_u, m, objective=None,
+                       objective_hessian=None, hessians_g=None, hess_h=None):
+        """
+        Build a problem from plain callables; grad_h(u) returns (m, n_u).
+
+        hessians_g = (hess_xx, hess_xu, hess_uu) of g and hess_h(u) ->
+        (m, n_u, n_u) are only needed for the Jacobian of the dynamics.
+        """
+        constraint = CallableConstraint(g, grad_g_x, grad_g_u, n_x, n_u,
+                                        hessians=hessians_g)
+        uncertainty_set = CallableSet(h, grad_h, n_u, m, hess_h=hess_h)
+        return cls(objective_gradient, constraint, uncertainty_set, b,
+                   objective=objective, objective_hessian=objective_hessian)
+
+    def replace(self, **changes):
+        """Copy of the problem with some constructor arguments replaced."""
+        arguments = {'objective_gradient': self.objective_gradient,
+                     'constraint': self.constraint,
+                     'uncertainty_set': self.uncertainty_set, 'b': self.b,
+                     'objective': self.objective,
+                     'objective_hessian': self.objective_hessian,
+                     'gradient_out': self.gradient_out}
+        arguments.update(changes)
+        return type(self)(**arguments)
+
+    def initial_state(self, state0):
+        """
+        Expand state0 to a full state vector.
+
+        state0 may be the full [x, lambda, u, v] vector or only x, in which
+        case the dual and uncertainty blocks start at zero. A 2-D state0
+        holds one such row per member of a batch.
+        """
+        state0 = np.asarray(state0, dtype=float)
+        if state0.ndim == 2:
+            return np.stack([self.initial_state(row) for row in state0])
+        if state0.shape == (self.layout.size,):
+            return state0.copy()
+        if state0.shape == (self.layout.n_x,):
+            return self.layout.pack(state0)
+        raise ValueError(
+            f"initial state must have length {self.layout.n_x} (x only) or "
+            f"{self.layout.size} (full state), got shape {state0.shape}")
+
+    def objective_gradient_into(self, x, out):
+        """Write grad f(x) into out, in place if gradient_out is set."""
+        if self.gradient_out:
+            return self.objective_gradient(x, out=out)
+        out[...] = self.objective_gradient(x)
+        return out
+
+    def objective_hessian_at(self, x):
+        """hess f(x) as an (n_x, n_x) array."""
+        if self.objective_hessian is None:
+            raise NotImplementedError(
+                "ROProblem needs objective_hessian for the Jacobian of the "
+                "dynamics")
+        if callable(self.objective_hessian):
+            return self.objective_hessian(x)
+        return self.objective_hessian
+
+    def objective_hessian_sparsity(self):
+        """Nonzero pattern of hess f; dense unless the Hessian is constant."""
+        if self.objective_hessian is None or callable(self.objective_hessian):
+            return np.ones((self.layout.n_x, self.layout.n_x), dtype=bool)
+        return self.objective_hessian != 0
+
+    def make_dynamics(self, epsilon=0.0, batch_size=None, **options):
+        """
+        Build the right-hand side of the RO dynamics for this problem, or
+        of batch_size stacked copies of it (see BatchRODynamics).
+        """
+        if batch_size is not None:
+            return BatchRODynamics(self, batch_size, epsilon=epsilon,
+                                   **options)
+        return RODynamics(self, epsilon=epsilon, **options)
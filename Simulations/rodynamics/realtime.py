@@ -0,0 +1,135 @@
+"""
+Fixed-step, in-place stepping of the RO dynamics for online use.
+
+RealTimeStepper advances the primal-dual state by one tick of a fixed
+explicit Runge-Kutta scheme per step(dt) call. A step costs exactly one RHS
+evaluation per stage (1 for 'euler', 2 for 'heun', 4 for 'rk4'). There is
+no step-size control, Newton iteration or event search, so the work per
+tick is fixed. The state, the stage derivatives and the stage state are
+allocated once and updated in place. After every stage, lambda and v are
+clamped to lambda >= -eps and v >= 0: the projected Euler/RK counterpart of
+the [.]_+ projection in the flow.
+
+The buffers take the precision of the dynamics (its dtype attribute,
+float64 by default), so a float32 MultiAgentDynamics is stepped in float32
+throughout. RODynamics and MultiAgentDynamics write the RHS into
+preallocated buffers as well, including the masks of the projections and
+the a + P u of an AffineConstraint. The objective gradient is written in
+place when the problem declares gradient_out, as Examples A and B do, and
+into a fresh array otherwise. What a tick still allocates, and frees
+before it returns, is small objects: the views of the state blocks, numpy
+scalars, and the internal iterators of matmul and of reductions with out=.
+They take about 1.5-2.5 KB per tick for Examples A and C whatever the
+number of steps, and step_latencies() measures the resulting per-tick
+cost.
+"""
+
+import time
+
+import numpy as np
+
+# Explicit Runge-Kutta tableaus: (rows of the strictly lower triangular A,
+# weights b); the nodes are c_i = sum_j a_ij
+SCHEMES = {
+    'euler': ((), (1.0,)),
+    'heun': (((1.0,),), (0.5, 0.5)),
+    'rk4': (((0.5,), (0.0, 0.5), (0.0, 0.0, 1.0)),
+            (1.0 / 6, 1.0 / 3, 1.0 / 3, 1.0 / 6)),
+}
+
+
+class RealTimeStepper:
+    """
+    Fixed-step integrator that advances an RO state in place.
+
+    dynamics is the RHS of a single system, e.g. problem.make_dynamics(
+    epsilon=0.01), and state0 a full state vector, copied into self.state.
+    step(dt) advances self.state and self.t and returns self.state. The
+    array stays the same object across steps, so views such as
+    layout.unpack(stepper.state) remain valid.
+    """
+
+    def __init__(self, dynamics, state0, t0=0.0, scheme='euler'):
+        try:
+            self._a, self._b = SCHEMES[scheme]
+        except KeyError:
+            raise ValueError(f"unknown scheme {scheme!r}; expected one of "
+                             f"{tuple(SCHEMES)}") from None
+        layout = dynamics.layout
+        dtype = getattr(dynamics, 'dtype', float)
+        state0 = np.asarray(state0, dtype=dtype)
+        if state0.shape != (layout.size,):
+            raise ValueError(f"state0 must be a full state of length "
+                             f"{layout.size}, got shape {state0.shape}")
+        self.dynamics = dynamics
+        self.scheme = scheme
+        self.state = state0.copy()
+        self.t = float(t0)
+        self._c = (0.0,) + tuple(sum(row) for row in self._a)
+
+        self._k = np.zeros((len(self._b), layout.size), dtype=dtype)
+        self._stage = np.empty(layout.size, dtype=dtype)
+        self._tmp = np.empty(layout.size, dtype=dtype)
+        bounds = (-dynamics.epsilon, 0.0)
+        self._state_duals = tuple(zip(layout.duals(self.state), bounds))
+        self._stage_duals = tuple(zip(layout.duals(self._stage), bounds))
+
+    @property
+    def n_stages(self):
+        """RHS evaluations per step."""
+        return len(self._b)
+
+    def reset(self, state, t=0.0):
+        """Restart from state at time t without reallocating."""
+        np.copyto(self.state, state)
+        self.t = float(t)
+
+    def step(self, dt):
+        """Advance by dt in place and return the state."""
+        evaluate = self.dynamics.evaluate
+        y, k, t = self.state, self._k, self.t
+
+        np.copyto(k[0], evaluate(y, t))
+        for i, row in enumerate(self._a, start=1):
+            stage = self._stage
+            np.copyto(stage, y)
+            for j, a in enumerate(row):
+                if a:
+                    self._axpy(stage, a * dt, k[j])
+            self._project(self._stage_duals)
+            np.copyto(k[i], evaluate(stage, t + self._c[i] * dt))
+
+        for j, b in enumerate(self._b):
+            self._axpy(y, b * dt, k[j])
+        self._project(self._state_duals)
+        self.t = t + dt
+        return y
+
+    def _axpy(self, y, a, x):
+        """y += a x without temporaries."""
+        np.multiply(x, a, out=self._tmp)
+        np.add(y, self._tmp, out=y)
+
+    @staticmethod
+    def _project(duals):
+        for view, bound in duals:
+            np.maximum(view, bound, out=view)
+
+
+def step_latencies(stepper, dt, n_steps, record=None):
+    """
+    Run n_steps ticks and return the wall time of each step(dt) in seconds.
+
+    record(stepper), if given, is called after every tick outside the timed
+    region, e.g. to sample the trajectory.
+    """
+    latencies = np.empty(n_steps)
+    clock = time.perf_counter
+    step = stepper.step
+    for n in range(n_steps):
+        start = clock()
+        step(dt)
+        latencies[n] = clock() - start
+        if record is not None:
+            record(stepper)
+    return latencies
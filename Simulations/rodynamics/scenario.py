@@ -0,0 +1,308 @@
+"""
+Scenario-sampling baseline for the robust problems (Calafiore and Campi).
+
+The scenario approach replaces the robust constraint max_{u in U} g(x, u)
+<= b by g(x, u_k) <= b for N samples u_k of U, and solves the resulting
+program with finitely many constraints. ScenarioSampler draws the samples
+in bulk. Rejection sampling draws uniform candidates in a bounding box of U
+and keeps those with h(u) <= 0. Boundary sampling places samples where
+uniformly random rays from a center leave U, which is where the worst cases
+of a convex set lie. Samples come in chunks of chunk_size, each from its
+own seed, so a set of 10^6 scenarios can be regenerated chunk by chunk
+instead of being held in memory.
+
+solve_scenario() solves the sampled program by constraint generation:
+SLSQP solves it over a small working set of scenarios, all N constraints
+are then evaluated chunk by chunk as one (chunk, n_x) matrix, and the most
+violated ones join the working set until none is violated. The result is
+the solution of the full scenario program, while SLSQP only ever sees the
+few scenarios that matter. full=True hands all N constraints to SLSQP at
+once instead, like a modelling tool would.
+"""
+
+import time
+
+import numpy as np
+from scipy.optimize import minimize
+
+from .uncertainty import EllipsoidIntersection, NormBall, SeparableSet
+
+SAMPLING_METHODS = ('rejection', 'boundary')
+
+
+def bounding_box(uncertainty_set, extent=10.0, n_grid=20001):
+    """
+    (lower, upper) corners of a box containing the uncertainty set.
+
+    Exact for EllipsoidIntersection and NormBall. A SeparableSet is scanned
+    on a grid of [-extent, extent] per coordinate, widened by one grid step.
+    Other sets need an explicit box.
+    """
+    if isinstance(uncertainty_set, EllipsoidIntersection):
+        # max |u_i| over u^T Q u <= 1 is sqrt((Q^-1)_ii)
+        inverse = np.linalg.inv(uncertainty_set.Q)
+        upper = np.sqrt(np.diagonal(inverse, axis1=1, axis2=2)).min(axis=0)
+        return -upper, upper
+    if isinstance(uncertainty_set, NormBall):
+        upper = np.full(uncertainty_set.n_u, uncertainty_set.rho)
+        return -upper, upper
+    if isinstance(uncertainty_set, SeparableSet):
+        grid = np.linspace(-extent, extent, n_grid)
+        with np.errstate(all='ignore'):
+            feasible = uncertainty_set.phi(
+                np.repeat(grid[:, None], uncertainty_set.n_u, axis=1)) <= 0
+        if not feasible.any(axis=0).all():
+            raise ValueError(f"no feasible grid point in [-{extent}, "
+                             f"{extent}] for some coordinate")
+        step = grid[1] - grid[0]
+        lower = np.array([grid[column].min() for column in feasible.T])
+        upper = np.array([grid[column].max() for column in feasible.T])
+        return lower - step, upper + step
+    raise ValueError(f"no bounding box for {type(uncertainty_set).__name__}; "
+                     f"pass box=(lower, upper)")
+
+
+class ScenarioSampler:
+    """
+    n_samples samples of an uncertainty set, generated in chunks.
+
+    method 'rejection' samples uniformly from the set and 'boundary' from
+    its boundary along uniformly random directions from center, which
+    requires the set to be star-shaped with respect to center (true for
+    convex sets containing it, e.g. the ellipsoid intersection with the
+    origin). box defaults to bounding_box(uncertainty_set). Chunk k is drawn
+    from the k-th child of SeedSequence(seed), so chunks() yields the same
+    samples on every pass.
+    """
+
+    def __init__(self, uncertainty_set, n_samples, method='rejection',
+                 chunk_size=100000, seed=0, box=None, center=None):
+        if method not in SAMPLING_METHODS:
+            raise ValueError(f"unknown sampling method {method!r}; expected "
+                             f"one of {SAMPLING_METHODS}")
+        self.uncertainty_set = uncertainty_set
+        self.n_samples = int(n_samples)
+        self.method = method
+        self.chunk_size = int(chunk_size)
+        self.seed = seed
+        if box is None:
+            box = bounding_box(uncertainty_set)
+        self.lower, self.upper = (np.asarray(corner, dtype=float)
+                                  for corner in box)
+        n_u = uncertainty_set.n_u
+        self.center = (np.zeros(n_u) if center is None
+                       else np.asarray(center, dtype=float))
+
+    def __len__(self):
+        return self.n_samples
+
+    def chunks(self):
+        """Yield the samples as (chunk_size, n_u) arrays (the last shorter)."""
+        n_chunks = -(-self.n_samples // self.chunk_size)
+        seeds = np.random.SeedSequence(self.seed).spawn(n_chunks)
+        for k, seed in enumerate(seeds):
+            n = min(self.chunk_size, self.n_samples - k * self.chunk_size)
+            rng = np.random.default_rng(seed)
+            if self.method == 'rejection':
+                yield self._rejection(n, rng)
+            else:
+                yield self._boundary(n, rng)
+
+    def samples(self):
+        """All samples as one (n_samples, n_u) array."""
+        return np.concatenate(list(self.chunks()))
+
+    def _feasible(self, U):
+        h = np.empty((len(U), self.uncertainty_set.m))
+        with np.errstate(all='ignore'):
+            self.uncertainty_set.h(U, h)
+        return (h <= 0).all(axis=1)
+
+    def _rejection(self, n, rng):
+        samples = np.empty((n, len(self.lower)))
+        filled = 0
+        acceptance = 0.5
+        while filled < n:
+            # Oversample by the acceptance rate seen so far in this chunk, so
+            # that a chunk is the same on every pass
+            wanted = int(1.2 * (n - filled) / acceptance) + 16
+            candidates = rng.uniform(self.lower, self.upper,
+                                     size=(wanted, len(self.lower)))
+            accepted = candidates[self._feasible(candidates)]
+            acceptance = max(len(accepted) / wanted, 1e-3)
+            take = min(len(accepted), n - filled)
+            samples[filled:filled + take] = accepted[:take]
+            filled += take
+        return samples
+
+    def _boundary(self, n, rng, iterations=60):
+        directions = rng.standard_normal((n, len(self.lower)))
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+        uset = self.uncertainty_set
+        if isinstance(uset, EllipsoidIntersection) and not self.center.any():
+            # Exit distance 1 / max_j sqrt(d^T Q_j d) in closed form
+            quadratic = np.einsum('nk,jkl,nl->nj', directions, uset.Q,
+                                  directions)
+            return directions / np.sqrt(quadratic.max(axis=1))[:, None]
+        # Bisection on the exit distance; beyond the box diagonal every
+        # point is outside
+        low = np.zeros(n)
+        high = np.full(n, np.linalg.norm(np.maximum(
+            np.abs(self.lower - self.center),
+            np.abs(self.upper - self.center))))
+        for _ in range(iterations):
+            middle = 0.5 * (low + high)
+            inside = self._feasible(self.center + middle[:, None] * directions)
+            low = np.where(inside, middle, low)
+            high = np.where(inside, high, middle)
+        return self.center + low[:, None] * directions
+
+
+class ScenarioResult:
+    """
+    Solution of a scenario program.
+
+    x and objective are the solution and f(x). active holds the scenarios
+    whose constraints are active at x (within tol), max_violation the
+    largest g(x, u_k) - b over all samples, n_rounds the number of
+    constraint-generation rounds and n_working the size of the final
+    working set. sample_time is the time spent generating samples and
+    solve_time the rest.
+    """
+
+    def __init__(self, x, objective, active, max_violation, n_scenarios,
+                 n_rounds, n_working, success, message, sample_time,
+                 solve_time):
+        self.x = x
+        self.objective = objective
+        self.active = active
+        self.max_violation = max_violation
+        self.n_scenarios = n_scenarios
+        self.n_rounds = n_rounds
+        self.n_working = n_working
+        self.success = success
+        self.message = message
+        self.sample_time = sample_time
+        self.solve_time = solve_time
+
+
+def _constraint_values(problem, x, U):
+    """g(x, u_k) - b for all rows u_k of U, as one matrix product."""
+    return problem.constraint.value(x, U) - problem.b
+
+
+def _solve_working_set(problem, x, U, options):
+    """SLSQP on f subject to g(x, u) <= b for the rows u of U."""
+    constraint = problem.constraint
+    gradient = np.empty((len(U), constraint.n_x))
+
+    def slack(x):
+        return problem.b - constraint.value(x, U)
+
+    def slack_jacobian(x):
+        constraint.grad_x(x, U, gradient)
+        return -gradient
+
+    return minimize(problem.objective, x, jac=problem.objective_gradient,
+                    method='SLSQP',
+                    constraints={'type': 'ineq', 'fun': slack,
+                                 'jac': slack_jacobian},
+                    options=options)
+
+
+def _scan(problem, x, scenarios, keep):
+    """
+    Evaluate all scenario constraints at x chunk by chunk.
+
+    Returns (max violation, the keep scenarios with the largest values
+    and those values).
+    """
+    best_u, best_value = [], []
+    worst = -np.inf
+    sample_time = 0.0
+    start = time.perf_counter()
+    for U in _chunks(scenarios):
+        sample_time += time.perf_counter() - start
+        values = _constraint_values(problem, x, U)
+        worst = max(worst, values.max())
+        top = np.argpartition(-values, min(keep, len(U)) - 1)[:keep]
+        best_u.append(U[top])
+        best_value.append(values[top])
+        start = time.perf_counter()
+    sample_time += time.perf_counter() - start
+    best_u = np.concatenate(best_u)
+    best_value = np.concatenate(best_value)
+    order = np.argsort(-best_value)[:keep]
+    return worst, best_u[order], best_value[order], sample_time
+
+
+def _chunks(scenarios):
+    if isinstance(scenarios, ScenarioSampler):
+        return scenarios.chunks()
+    return [np.asarray(scenarios, dtype=float)]
+
+
+def solve_scenario(problem, scenarios, x0=None, full=False, batch=20,
+                   tol=1e-9, max_rounds=100, ftol=1e-12, maxiter=500):
+    """
+    Solve min f(x) s.t. g(x, u_k) <= b for all scenarios u_k.
+
+    problem is an ROProblem with objective and objective_gradient;
+    constraint.value and grad_x must broadcast over a leading axis of u
+    (true for AffineConstraint and Example B). scenarios is a
+    ScenarioSampler or an (N, n_u) array. x0 defaults to zero.
+
+    With full=False, constraint generation adds up to batch of the most
+    violated scenarios per round until no sample is violated by more than
+    tol; full=True solves over all samples at once. ftol and maxiter are
+    the SLSQP options.
+    """
+    if problem.objective is None:
+        raise ValueError("the scenario program needs problem.objective")
+    n_x = problem.layout.n_x
+    x = np.zeros(n_x) if x0 is None else np.asarray(x0, dtype=float)
+    options = {'ftol': ftol, 'maxiter': maxiter}
+    start = time.perf_counter()
+    sample_time = 0.0
+
+    if full:
+        sample_start = time.perf_counter()
+        working = np.concatenate(list(_chunks(scenarios)))
+        sample_time += time.perf_counter() - sample_start
+        n_rounds = 1
+        result = _solve_working_set(problem, x, working, options)
+        x = result.x
+        worst, _, _, scan_time = _scan(problem, x, scenarios, 1)
+        sample_time += scan_time
+    else:
+        # Start from the scenarios most binding at x0
+        _, working, _, scan_time = _scan(problem, x, scenarios, batch)
+        sample_time += scan_time
+        n_rounds = 0
+        while True:
+            n_rounds += 1
+            result = _solve_working_set(problem, x, working, options)
+            x = result.x
+            worst, candidates, values, scan_time = _scan(problem, x,
+                                                         scenarios, batch)
+            sample_time += scan_time
+            violated = candidates[values > tol]
+            if (len(violated) == 0 or not result.success
+                    or n_rounds >= max_rounds):
+                break
+            working = np.concatenate([working, violated])
+
+    success = bool(result.success and worst <= tol)
+    if not result.success:
+        message = result.message
+    elif success:
+        message = 'Solved the scenario program.'
+    else:
+        message = (f'{worst:.2e} constraint violation after {n_rounds} '
+                   f'rounds.')
+    values = _constraint_values(problem, x, working)
+    active = working[values >= -max(tol, 1e-7)]
+    return ScenarioResult(x, float(problem.objective(x)), active,
+                          float(worst), len(scenarios), n_rounds,
+                          len(working), success, message, sample_time,
+                          time.perf_counter() - start - sample_time)
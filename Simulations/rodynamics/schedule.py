@@ -0,0 +1,311 @@
+"""
+Scenario schedules and event-driven piecewise integration.
+
+A Schedule declares the phases of a scenario: at each breakpoint some
+problem parameters change (rho, the anchor motion, b, ...), possibly
+discontinuously. solve_scheduled() integrates each phase as its own
+initial value problem on problem.replace(**phase.parameters), so no step
+straddles a breakpoint, and carries the state across.
+
+Within a phase the projections of lambda and v are handled as events as
+well: the active set is frozen (see ProjectionSwitching), which leaves a
+smooth vector field, and one terminal solve_ivp event locates the first
+component that has to switch, a free dual variable reaching its boundary or
+the unprojected derivative of a clamped one turning positive. Integration
+restarts from that point with the updated active set. Without events the
+integrator only discovers these kinks through rejected steps.
+
+With kkt_tol, the last phase also stops once the KKT residual of the saddle
+point falls below the tolerance (see convergence). Earlier phases always
+run to their end, where the parameters change, but their residual history
+is recorded as well.
+"""
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from .convergence import (ConvergenceMonitor, convergence_message,
+                          kkt_residual)
+from .sinks import TrajectorySink
+from .solve import SOLVE_IVP_METHODS, ROSolution
+
+
+class Phase:
+    """Problem parameters that hold from start until the next phase."""
+
+    def __init__(self, start, **parameters):
+        self.start = float(start)
+        self.parameters = parameters
+
+    def __repr__(self):
+        names = ', '.join(self.parameters)
+        return f"Phase({self.start:g}; {names})"
+
+
+class Schedule:
+    """
+    Ordered phases of a scenario; the breakpoints are the phase starts.
+
+    Each phase lasts until the next one starts and the last one forever.
+    Parameters are keyword arguments of problem.replace(); a phase only
+    lists what differs from the problem being solved.
+    """
+
+    def __init__(self, phases):
+        self.phases = sorted(phases, key=lambda phase: phase.start)
+        if not self.phases:
+            raise ValueError("a schedule needs at least one phase")
+
+    @property
+    def breakpoints(self):
+        return np.array([phase.start for phase in self.phases[1:]])
+
+    def phase_at(self, t):
+        """The phase in force at time t."""
+        k = np.searchsorted([phase.start for phase in self.phases], t,
+                            side='right')
+        return self.phases[max(k - 1, 0)]
+
+    def segments(self, t0, t_final):
+        """(start, end, parameters) of each phase overlapping [t0, t_final]."""
+        cuts = [t for t in self.breakpoints if t0 < t < t_final]
+        bounds = [t0] + cuts + [t_final]
+        return [(start, end, self.phase_at(start).parameters)
+                for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _freeze_projections(dynamics, state, t, switch_tol):
+    """
+    Choose the active set at a (re)start and snap the duals onto it.
+
+    Components within switch_tol of their boundary are moved onto it, and
+    those among them whose derivative does not point inwards are clamped.
+    """
+    dynamics.clamped = None
+    s, z = dynamics.switching(state, t)
+    on_boundary = s <= switch_tol
+    state[dynamics.projected_indices[on_boundary]] = \
+        dynamics.boundary_values[on_boundary]
+    dynamics.clamped = on_boundary & (z <= 0)
+
+
+def _switching_event(dynamics, switch_tol):
+    """
+    Terminal event when a free dual variable passes its boundary or the
+    derivative of a clamped one turns positive, by more than switch_tol.
+
+    The margin keeps components that rest exactly on the switching surface
+    (e.g. v_i = 0 with lambda_i clamped, where z = 0 identically) from
+    firing at every step.
+    """
+    clamped = dynamics.clamped
+
+    def event(t, y):
+        s, z = dynamics.switching(y, t)
+        return np.min(np.where(clamped, -z, s)) + switch_tol
+
+    event.terminal = True
+    event.direction = -1
+    return event
+
+
+def solve_scheduled(problem, x0, t_span, schedule=None, method='RK45',
+                    epsilon=0.0, rtol=None, atol=None, projection_events=True,
+                    switch_tol=1e-10, max_events=10000, dynamics_options=None,
+                    kkt_tol=None, sinks=None, chunk_size=1000,
+                    instrument=None, **solver_options):
+    """
+    Integrate the RO dynamics of problem phase by phase with solve_ivp.
+
+    x0, t_span, epsilon, rtol, atol and dynamics_options are as in solve();
+    method is any solve_ivp method. Every phase of schedule overlapping
+    t_span starts a fresh integration on the phase's problem from the state
+    reached at its breakpoint; schedule=None integrates problem as a single
+    phase. With projection_events, projection switches restart the
+    integration as well, up to max_events of them, after which the plain
+    projection is integrated for the rest of the phase.
+
+    kkt_tol stops the last phase early as in solve(); the residual history
+    of all phases is recorded at the integrator's steps, with both phases'
+    residuals at each breakpoint. sinks stream the trajectory as in
+    solve(), with no integration spanning more than chunk_size output
+    times, and the solution then holds only the final state.
+
+    instrument records the run as in solve(), over all phases.
+
+    The returned ROSolution carries nfev, the number of evaluations of the
+    vector field including those made while locating events and
+    evaluating residuals, and the extra attributes n_events and
+    n_segments.
+    """
+    if instrument is not None:
+        with instrument:
+            return _solve_scheduled(
+                problem, x0, t_span, schedule, method, epsilon, rtol, atol,
+                projection_events, switch_tol, max_events, dynamics_options,
+                kkt_tol, sinks, chunk_size, instrument, solver_options)
+    return _solve_scheduled(
+        problem, x0, t_span, schedule, method, epsilon, rtol, atol,
+        projection_events, switch_tol, max_events, dynamics_options, kkt_tol,
+        sinks, chunk_size, None, solver_options)
+
+
+def _solve_scheduled(problem, x0, t_span, schedule, method, epsilon, rtol,
+                     atol, projection_events, switch_tol, max_events,
+                     dynamics_options, kkt_tol, sinks, chunk_size,
+                     instrument, solver_options):
+    if method not in SOLVE_IVP_METHODS:
+        raise ValueError(f"unknown method {method!r}; expected one of "
+                         f"{SOLVE_IVP_METHODS}")
+    state = problem.initial_state(x0)
+    if state.ndim != 1:
+        raise ValueError("solve_scheduled integrates a single system")
+    t_span = np.asarray(t_span, dtype=float)
+    t_final = t_span[-1]
+    dynamics_options = dict(dynamics_options or {})
+    if schedule is None:
+        segments = [(t_span[0], t_final, {})]
+    else:
+        segments = schedule.segments(t_span[0], t_final)
+
+    solver = method if instrument is None else instrument.solver(method)
+    tolerances = {}
+    if rtol is not None:
+        tolerances['rtol'] = rtol
+    if atol is not None:
+        tolerances['atol'] = atol
+
+    if isinstance(sinks, TrajectorySink):
+        sinks = [sinks]
+    for sink in sinks or ():
+        sink.open(len(t_span), len(state))
+    t_out, y_out = [], []
+    last = [None, None]
+
+    def emit(t, y):
+        if sinks is None:
+            t_out.append(t)
+            y_out.append(y)
+        else:
+            for sink in sinks:
+                sink.write(t, y)
+        last[:] = t[-1], y[-1]
+
+    n_out = 0
+    nfev = njev = n_events = n_segments = 0
+    success, message = True, 'The solver successfully reached the end of ' \
+                             'the integration interval.'
+    monitors = []
+    t_converged = None
+
+    for start, end, parameters in segments:
+        phase_problem = problem.replace(**parameters) if parameters else problem
+        dynamics = phase_problem.make_dynamics(epsilon=epsilon,
+                                               **dynamics_options)
+        if instrument is not None:
+            dynamics = instrument.wrap(dynamics)
+        count = [0]
+        evaluate = dynamics.evaluate
+
+        def counted(state, t=0.0, evaluate=evaluate, count=count):
+            count[0] += 1
+            return evaluate(state, t)
+
+        dynamics.evaluate = counted
+        monitor = None
+        if kkt_tol is not None:
+            monitor = ConvergenceMonitor(dynamics, kkt_tol,
+                                         armed=end == t_final)
+            monitors.append(monitor)
+            if (monitor.armed
+                    and kkt_residual(dynamics, state, start) < kkt_tol):
+                t_converged = start
+                nfev += count[0]
+                break
+        # Output times of this phase; a breakpoint sample belongs to the
+        # phase starting there
+        stop = np.searchsorted(t_span, end,
+                               side='right' if end == t_final else 'left')
+        t = start
+        while success and t < end:
+            events = []
+            if projection_events and n_events < max_events:
+                _freeze_projections(dynamics, state, t, switch_tol)
+                events.append(_switching_event(dynamics, switch_tol))
+            else:
+                dynamics.clamped = None
+            if monitor is not None:
+                events.append(monitor)
+
+            # With sinks, integrate at most chunk_size output times at once
+            segment_end, segment_stop = end, stop
+            if sinks is not None and stop - n_out > chunk_size:
+                segment_stop = n_out + chunk_size
+                segment_end = t_span[segment_stop - 1]
+
+            # The end of the segment is always evaluated to carry the state
+            # over, and only kept if it is an output time
+            t_eval = t_span[n_out:segment_stop]
+            extra = len(t_eval) == 0 or t_eval[-1] != segment_end
+            if extra:
+                t_eval = np.append(t_eval, segment_end)
+            fun = dynamics.fun
+            if monitor is not None and 'jac' not in solver_options:
+                fun = monitor.fun
+            result = solve_ivp(fun, (t, segment_end), state, method=solver,
+                               t_eval=t_eval, events=events or None,
+                               **tolerances,
+                               **solver_options)
+            n_segments += 1
+            njev += result.njev
+            keep = min(len(result.t), segment_stop - n_out)
+            if keep > 0:
+                emit(result.t[:keep], result.y[:, :keep].T)
+                n_out += keep
+
+            if not result.success:
+                success, message = False, result.message
+            elif result.status == 1:
+                # The monitor, if any, is the last event
+                converged = monitor is not None and len(result.t_events[-1])
+                fired = -1 if converged else 0
+                t = result.t_events[fired][-1]
+                state = result.y_events[fired][-1].copy()
+                if converged:
+                    t_converged = t
+                    break
+                n_events += 1
+                if monitor is not None:
+                    monitor.truncate(t)
+            else:
+                t = segment_end
+                state = result.y[:, -1].copy()
+        nfev += count[0]
+        if not success or t_converged is not None:
+            break
+
+    if t_converged is not None:
+        message = convergence_message(kkt_tol)
+        if last[0] != t_converged:
+            emit(np.array([t_converged]), state[None])
+
+    for sink in sinks or ():
+        sink.close()
+    if sinks is None:
+        t_out, y_out = np.concatenate(t_out), np.vstack(y_out)
+    else:
+        t_out, y_out = np.array([last[0]]), last[1][None]
+    solution = ROSolution(t_out, y_out, problem.layout, success=success,
+                          message=message, nfev=nfev, njev=njev)
+    solution.n_events = n_events
+    solution.n_segments = n_segments
+    if kkt_tol is not None:
+        histories = [monitor.history() for monitor in monitors[:-1]]
+        if t_converged is not None:
+            histories.append(monitors[-1].history(t_converged, state))
+        else:
+            histories.append(monitors[-1].history())
+        solution.residual_t = np.concatenate([h[0] for h in histories])
+        solution.residuals = np.concatenate([h[1] for h in histories])
+        solution.t_converged = t_converged
+    return solution
@@ -0,0 +1,458 @@
+"""
+Parametric sensitivities of the RO dynamics.
+
+For parameters theta of the problem (epsilon, b, a, P, the Q_j, ...), the
+sensitivities S(t) = dz(t)/dtheta of the state z = [x, lambda, u, v] solve
+the variational equation
+
+    dS/dt = J(z, t) S + F_theta(z, t),     S(t0) = 0,
+
+with J the generalized Jacobian of the flow (RODynamics.jacobian) and
+F_theta the derivative of the right-hand side with respect to theta, zero
+on the rows of active projections like J. solve_sensitivity() integrates
+it together with the flow as one augmented ODE (mode='forward'), which
+gives dx(t)/dtheta at every output time. mode='adjoint' integrates the
+flow once, then the adjoint equation dA/dt = -J^T A backward from the x
+rows at the final time, which gives dx(T)/dtheta with n_x adjoint columns
+however many parameters there are.
+
+At a saddle point z*, the sensitivity of the equilibrium follows from the
+implicit function theorem on the active set (equilibrium_sensitivity()):
+the free components solve J_ff dz_f = -(F_theta,f + J_fc dz_c), where the
+clamped duals stay on their boundary (dlambda = -deps for a clamped
+lambda). One linear solve replaces a re-solve per parameter.
+
+F_theta is analytic for 'epsilon', 'b', 'a' and a dense 'P' of an
+AffineConstraint and 'Q' of an EllipsoidIntersection. Any other name is
+looked up in params and differentiated by central differences of the RHS
+of problem_factory(**params), as continuation() builds its problems; that
+costs two RHS evaluations per entry but no re-integration. Between
+switches of the projections the active set is frozen. Where a dual enters
+its boundary, the integration is restarted and its rows of S are reset to
+d(boundary)/dtheta (the saltation of the projection, -1 for lambda in
+epsilon and 0 otherwise); the adjoint applies the same jump going
+backward, adding A_i^T d(boundary_i)/dtheta to the parameter part and
+zeroing A_i.
+"""
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from .problem import AffineConstraint
+from .schedule import _freeze_projections, _switching_event
+from .solve import SOLVE_IVP_METHODS
+from .uncertainty import EllipsoidIntersection
+
+SENSITIVITY_MODES = ('forward', 'adjoint')
+
+
+class Sensitivity:
+    """
+    Sensitivities of a run with respect to the named parameters.
+
+    Parameter entries are flattened along the last axis in the order of
+    names; split(values) undoes it. t and y are the output times and states
+    of the run. dstate (len(t), size, n_params) holds dz(t)/dtheta (forward
+    mode only), dx_final (n_x, n_params) dx(T)/dtheta and dstate_star
+    (size, n_params) the sensitivity of the saddle point at the final
+    state, whose KKT residual is kkt. success and message report the
+    integration as in ROSolution.
+    """
+
+    t = None
+    y = None
+    dstate = None
+    dx_final = None
+    dstate_star = None
+    kkt = None
+    nfev = None
+    mode = None
+    success = True
+    message = ''
+
+    def __init__(self, layout, names, shapes):
+        self.layout = layout
+        self.names = list(names)
+        self.shapes = dict(shapes)
+        self.slices = {}
+        start = 0
+        for name in self.names:
+            size = int(np.prod(self.shapes[name], dtype=int))
+            self.slices[name] = slice(start, start + size)
+            start += size
+        self.n_params = start
+
+    @property
+    def dx(self):
+        """dx(t)/dtheta at each output time."""
+        if self.dstate is None:
+            return None
+        return self.dstate[:, self.layout.x]
+
+    @property
+    def dx_star(self):
+        """dx*/dtheta of the saddle point."""
+        if self.dstate_star is None:
+            return None
+        return self.dstate_star[self.layout.x]
+
+    def split(self, values):
+        """values (..., n_params) as a dict of name -> (..., *shape)."""
+        values = np.asarray(values)
+        return {name: values[..., self.slices[name]].reshape(
+                    values.shape[:-1] + tuple(self.shapes[name]))
+                for name in self.names}
+
+
+class ParameterJacobian:
+    """
+    F_theta(z, t) = dF/dtheta of an RODynamics, in a reused buffer.
+
+    Reads h, grad_x g and the state of the projections from the last
+    evaluate() or jacobian() call of dynamics, which must have been at the
+    same (state, t).
+    """
+
+    def __init__(self, dynamics, names, problem_factory=None, params=None,
+                 step=1e-6):
+        if dynamics.rate_limits or dynamics.u_floor is not None:
+            raise ValueError("sensitivities need the flow without "
+                             "rate_limits and u_floor")
+        problem = dynamics.problem
+        layout = dynamics.layout
+        self.dynamics = dynamics
+        self.layout = layout
+        params = dict(params or {})
+        shapes = {}
+        self._analytic = []
+        self._differenced = []
+        for name in names:
+            if _analytic(problem, name):
+                shapes[name] = {
+                    'epsilon': (), 'b': (), 'a': (layout.n_x,),
+                    'P': (layout.n_x, layout.n_u),
+                    'Q': (layout.m, layout.n_u, layout.n_u)}[name]
+                self._analytic.append(name)
+            elif name in params and problem_factory is not None:
+                shapes[name] = np.shape(params[name])
+                self._differenced.append(name)
+            else:
+                raise ValueError(
+                    f"no derivative for parameter {name!r}: it is not one "
+                    f"of epsilon, b, a, P (dense) or Q (ellipsoids) of this "
+                    f"problem, so it needs problem_factory and params")
+        self.sensitivity = Sensitivity(layout, names, shapes)
+        self._out = np.zeros((layout.size, self.sensitivity.n_params))
+        self._eye_x = np.eye(layout.n_x)
+        self._eye_u = np.eye(layout.n_u)
+        self._eye_m = np.eye(layout.m)
+
+        # d(boundary)/dtheta of the projected duals: lambda = -eps, v_j = 0
+        self.boundary = np.zeros((1 + layout.m, self.sensitivity.n_params))
+        if 'epsilon' in self.sensitivity.slices:
+            self.boundary[0, self.sensitivity.slices['epsilon']] = -1.0
+
+        # (column, dynamics at theta + step, dynamics at theta - step, 2 step)
+        self._pairs = []
+        options = {'gains': dynamics.gains} if dynamics.gains else {}
+        for name in self._differenced:
+            value = np.asarray(params[name], dtype=float)
+            columns = np.arange(self.sensitivity.n_params)[
+                self.sensitivity.slices[name]]
+            for column, k in zip(columns, range(value.size)):
+                delta = step * max(1.0, abs(value.flat[k]))
+                pair = []
+                for sign in (1.0, -1.0):
+                    perturbed = value.copy()
+                    perturbed.flat[k] += sign * delta
+                    if perturbed.ndim == 0:
+                        perturbed = float(perturbed)
+                    pair.append(problem_factory(
+                        **dict(params, **{name: perturbed})).make_dynamics(
+                            epsilon=dynamics.epsilon, **options))
+                self._pairs.append((column, pair[0], pair[1], 2.0 * delta))
+
+    def __call__(self, state, t=0.0):
+        dynamics = self.dynamics
+        layout = self.layout
+        ix, il, iu, iv = layout.x, layout.lam, layout.u, layout.v
+        x = state[ix]
+        lam_eps = state[il] + dynamics.epsilon
+        u = state[iu]
+        v = state[iv]
+        lam_free = float(dynamics._lambda_free(lam_eps))
+        v_free = dynamics._v_free(v).astype(float)
+        slices = self.sensitivity.slices
+        F = self._out
+        F.fill(0.0)
+
+        for name in self._analytic:
+            cols = slices[name]
+            if name == 'epsilon':
+                F[ix, cols.start] = -dynamics._grad_x
+                F[iv, cols.start] = dynamics._h * v_free
+            elif name == 'b':
+                F[il, cols.start] = -lam_free
+            elif name == 'a':
+                np.fill_diagonal(F[ix, cols], -lam_eps)
+                F[il, cols] = lam_free * x
+            elif name == 'P':
+                # dP_kl: x_k row -(lambda + eps) u_l, lambda row x_k u_l,
+                # u_l row x_k
+                F[ix, cols] = -lam_eps * (
+                    self._eye_x[:, :, None] * u).reshape(layout.n_x, -1)
+                F[il, cols] = lam_free * np.outer(x, u).ravel()
+                F[iu, cols] = (self._eye_u[:, None, :]
+                               * x[:, None]).reshape(layout.n_u, -1)
+            elif name == 'Q':
+                # dQ_j,kl: dh_j = u_k u_l and d(2 Q_j u)_i = 2 delta_ik u_l
+                uu = np.outer(u, u).ravel()
+                F[il, cols] = -lam_free * (v[:, None] * uu).ravel()
+                F[iu, cols] = (-2.0 * v[None, :, None, None]
+                               * self._eye_u[:, None, :, None]
+                               * u).reshape(layout.n_u, -1)
+                F[iv, cols] = ((self._eye_m * (lam_eps * v_free))[:, :, None]
+                               * uu).reshape(layout.m, -1)
+        if dynamics._gain is not None:
+            F *= dynamics._gain[:, None]
+
+        for column, plus, minus, width in self._pairs:
+            np.subtract(plus.evaluate(state, t), minus.evaluate(state, t),
+                        out=F[:, column])
+            F[:, column] /= width
+        return F
+
+
+def _analytic(problem, name):
+    constraint = problem.constraint
+    affine = isinstance(constraint, AffineConstraint)
+    return (name in ('epsilon', 'b')
+            or (name == 'a' and affine)
+            or (name == 'P' and affine and constraint._dense)
+            or (name == 'Q' and isinstance(problem.uncertainty_set,
+                                           EllipsoidIntersection)))
+
+
+def equilibrium_sensitivity(problem, state, parameters=('epsilon',),
+                            epsilon=0.0, problem_factory=None, params=None,
+                            step=1e-6, dynamics_options=None):
+    """
+    Sensitivity dz*/dtheta of the saddle point near state.
+
+    The active set is read off state: lambda is clamped where lambda + eps
+    < |g - b - v^T h| and v_j where v_j < |(lambda + eps) h_j|, so state
+    should be well converged. Returns a Sensitivity with dstate_star and
+    kkt set; raises ValueError if the free block of the Jacobian is
+    singular (e.g. at a degenerate active set).
+    """
+    dynamics = problem.make_dynamics(epsilon=epsilon,
+                                     **dict(dynamics_options or {}))
+    jacobian = ParameterJacobian(dynamics, parameters, problem_factory,
+                                 params, step)
+    sensitivity = jacobian.sensitivity
+    state = np.asarray(state, dtype=float)
+    sensitivity.dstate_star = _equilibrium(dynamics, jacobian, state)
+    sensitivity.kkt = float(np.max(dynamics.residuals(state)))
+    return sensitivity
+
+
+def _equilibrium(dynamics, parameter_jacobian, state):
+    layout = dynamics.layout
+    J = dynamics.jacobian(state).copy()
+    F = parameter_jacobian(state)
+    lam_eps = state[layout.lam] + dynamics.epsilon
+    distance = np.r_[lam_eps, state[layout.v]]
+    clamped = distance < np.abs(dynamics._unprojected())
+    clamped_rows = dynamics.projected_indices[clamped]
+    free_rows = np.setdiff1d(np.arange(layout.size), clamped_rows)
+
+    # Clamped duals stay on their boundary
+    dz_c = parameter_jacobian.boundary[clamped]
+
+    rhs = F[free_rows] + J[np.ix_(free_rows, clamped_rows)] @ dz_c
+    try:
+        dz_f = np.linalg.solve(J[np.ix_(free_rows, free_rows)], -rhs)
+    except np.linalg.LinAlgError as error:
+        raise ValueError(f"singular Jacobian on the free components "
+                         f"{free_rows}: {error}") from None
+    dz = np.empty((layout.size, F.shape[1]))
+    dz[free_rows] = dz_f
+    dz[clamped_rows] = dz_c
+    return dz
+
+
+def _solve_segments(dynamics, fun, y0, t_span, on_entry=None,
+                    dense_output=False, switch_tol=1e-10, max_events=10000,
+                    **options):
+    """
+    solve_ivp of fun, whose first layout.size entries are the state of
+    dynamics, with the active set frozen and restarted at projection
+    switches as in solve_scheduled. on_entry(y, entered) may modify y in
+    place where the components of the mask entered have just been clamped.
+
+    Returns (t, y, segments, nfev, success, message); segments holds
+    (t_start, t_end, clamped mask, dense output) per restart.
+    """
+    size = dynamics.layout.size
+    ts, ys, segments = [], [], []
+    t, y = t_span[0], np.array(y0, dtype=float)
+    t_eval = t_span
+    clamped = np.zeros(len(dynamics.projected_indices), dtype=bool)
+    nfev = n_events = 0
+    while True:
+        if n_events < max_events:
+            previous = clamped
+            _freeze_projections(dynamics, y[:size], t, switch_tol)
+            clamped = dynamics.clamped.copy()
+            entered = clamped & ~previous
+            if on_entry is not None and n_events and entered.any():
+                on_entry(y, entered)
+            switching = _switching_event(dynamics, switch_tol)
+
+            def event(t, y):
+                return switching(t, y[:size])
+
+            event.terminal = True
+            event.direction = -1
+            events = [event]
+        else:
+            dynamics.clamped = clamped = None
+            events = None
+        result = solve_ivp(fun, (t, t_span[-1]), y, t_eval=t_eval,
+                           events=events, dense_output=dense_output,
+                           **options)
+        nfev += result.nfev
+        # solve_ivp returns lists if no output time was reached
+        ts.append(np.asarray(result.t, dtype=float))
+        ys.append(np.asarray(result.y, dtype=float).reshape(len(y), -1))
+        if result.status != 1:
+            segments.append((t, t_span[-1], clamped, result.sol))
+            break
+        t_switch = float(result.t_events[0][-1])
+        segments.append((t, t_switch, clamped, result.sol))
+        t = t_switch
+        y = result.y_events[0][-1].copy()
+        t_eval = t_span[t_span > t]
+        n_events += 1
+    dynamics.clamped = None
+    return (np.concatenate(ts), np.concatenate(ys, axis=1), segments, nfev,
+            result.success, result.message)
+
+
+def solve_sensitivity(problem, x0, t_span, parameters=('epsilon',),
+                      mode='forward', method='RK45', epsilon=0.0, rtol=1e-6,
+                      atol=1e-9, problem_factory=None, params=None,
+                      step=1e-6, equilibrium=True, dynamics_options=None,
+                      **solver_options):
+    """
+    Integrate the RO dynamics of problem from x0 over t_span together with
+    their sensitivities to parameters.
+
+    mode 'forward' integrates [z, S] as one ODE of size size * (1 +
+    n_params) and fills dstate at every output time; 'adjoint' integrates
+    z and then n_x adjoint columns backward from t_span[-1] and fills only
+    dx_final, which is cheaper when n_params exceeds n_x. Both stop the
+    integrator where a dual enters its boundary, to reset the rows of S (or
+    A) of that dual (the saltation of the projection). method is any
+    solve_ivp method; rtol and atol apply to the state and the
+    sensitivities alike. Names other than epsilon, b, a, P and Q are
+    differenced through problem_factory(**params) (see ParameterJacobian).
+    With equilibrium, dstate_star is also computed at the final state (see
+    equilibrium_sensitivity).
+    """
+    if mode not in SENSITIVITY_MODES:
+        raise ValueError(f"unknown mode {mode!r}; expected one of "
+                         f"{SENSITIVITY_MODES}")
+    if method not in SOLVE_IVP_METHODS:
+        raise ValueError(f"unknown method {method!r}; expected one of "
+                         f"{SOLVE_IVP_METHODS}")
+    state0 = problem.initial_state(x0)
+    if state0.ndim != 1:
+        raise ValueError("solve_sensitivity integrates a single run, not a "
+                         "batch")
+    t_span = np.asarray(t_span, dtype=float)
+    dynamics = problem.make_dynamics(epsilon=epsilon,
+                                     **dict(dynamics_options or {}))
+    jacobian = ParameterJacobian(dynamics, parameters, problem_factory,
+                                 params, step)
+    sensitivity = jacobian.sensitivity
+    sensitivity.mode = mode
+    layout = problem.layout
+    size, n_params = layout.size, sensitivity.n_params
+    rows = dynamics.projected_indices
+    options = dict(method=method, rtol=rtol, atol=atol, **solver_options)
+
+    if mode == 'forward':
+        out = np.empty(size * (1 + n_params))
+
+        def augmented(t, y):
+            z = y[:size]
+            J = dynamics.jacobian(z, t)
+            out[:size] = dynamics._d_state
+            F = jacobian(z, t)
+            np.matmul(J, y[size:].reshape(size, n_params),
+                      out=out[size:].reshape(size, n_params))
+            out[size:] += F.ravel()
+            return out.copy()
+
+        def enter(y, entered):
+            S = y[size:].reshape(size, n_params)
+            S[rows[entered]] = jacobian.boundary[entered]
+
+        y0 = np.concatenate([state0, np.zeros(size * n_params)])
+        t, y, _, nfev, success, message = _solve_segments(
+            dynamics, augmented, y0, t_span, on_entry=enter, **options)
+        sensitivity.dstate = y[size:].T.reshape(-1, size, n_params)
+        sensitivity.dx_final = sensitivity.dstate[-1, layout.x]
+    else:
+        t, y, segments, nfev, success, message = _solve_segments(
+            dynamics, dynamics.fun, state0, t_span, dense_output=True,
+            **options)
+        n_x = layout.n_x
+        adjoint_size = size * n_x
+        out = np.empty(adjoint_size + n_x * n_params)
+
+        def backward(t, w, trajectory):
+            z = trajectory(t)
+            J = dynamics.jacobian(z, t)
+            F = jacobian(z, t)
+            A = w[:adjoint_size].reshape(size, n_x)
+            np.matmul(J.T, A, out=out[:adjoint_size].reshape(size, n_x))
+            np.negative(out[:adjoint_size], out=out[:adjoint_size])
+            np.matmul(A.T, F, out=out[adjoint_size:].reshape(n_x, n_params))
+            np.negative(out[adjoint_size:], out=out[adjoint_size:])
+            return out.copy()
+
+        # A(T) selects the x rows and q(T) = 0. Going back over the entry
+        # of duals into their boundary adds A_i^T d(boundary_i)/dtheta to q
+        # and zeroes A_i; q(t0) = dx(T)/dtheta.
+        w = np.zeros(adjoint_size + n_x * n_params)
+        A = w[:adjoint_size].reshape(size, n_x)
+        q = w[adjoint_size:].reshape(n_x, n_params)
+        A[np.arange(size)[layout.x], np.arange(n_x)] = 1.0
+        for k in range(len(segments) - 1, -1, -1):
+            t_start, t_end, clamped, trajectory = segments[k]
+            dynamics.clamped = clamped
+            if success and t_end > t_start:
+                result = solve_ivp(backward, (t_end, t_start), w,
+                                   args=(trajectory,), **options)
+                nfev += result.nfev
+                success, message = result.success, result.message
+                w[:] = result.y[:, -1]
+            if k and clamped is not None and segments[k - 1][2] is not None:
+                entered = clamped & ~segments[k - 1][2]
+                q += A[rows[entered]].T @ jacobian.boundary[entered]
+                A[rows[entered]] = 0.0
+        dynamics.clamped = None
+        sensitivity.dx_final = q.copy()
+
+    sensitivity.t = t
+    sensitivity.y = y[:size].T
+    sensitivity.nfev = nfev
+    sensitivity.success = success
+    sensitivity.message = message
+    final = sensitivity.y[-1]
+    if equilibrium:
+        sensitivity.dstate_star = _equilibrium(dynamics, jacobian, final)
+    sensitivity.kkt = float(np.max(dynamics.residuals(final, t_span[-1])))
+    return sensitivity
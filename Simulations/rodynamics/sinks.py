@@ -0,0 +1,190 @@
+"""
+Streaming trajectory output.
+
+By default solve() returns the whole trajectory as one (len(t_span), size)
+array. With sinks, the integrators instead run over windows of chunk_size
+output times, and each window is handed to the sinks and dropped, so peak
+memory is set by the window and not by the horizon. The returned solution
+then only holds the final state.
+
+Every sink keeps every every-th output time and the state components
+listed in select, e.g. select=layout_indices(problem.layout, 'x') for the
+positions only. CallbackSink passes the samples to a function,
+RingBufferSink keeps the most recent ones in memory and MemmapSink writes
+them to an .npy file on disk that load_trajectory() opens as a memmap.
+"""
+
+import os
+
+import numpy as np
+
+
+def layout_indices(layout, *blocks):
+    """
+    Flat state indices of the named blocks ('x', 'lambda', 'u', 'v').
+
+    Works for any layout with unpack(), so for a MultiAgentLayout the
+    indices run over all agents, agent by agent within each block.
+    """
+    names = ('x', 'lambda', 'u', 'v')
+    unknown = set(blocks) - set(names)
+    if unknown:
+        raise ValueError(f"unknown blocks {sorted(unknown)}; expected some "
+                         f"of {names}")
+    views = dict(zip(names, layout.unpack(np.arange(layout.size))))
+    return np.concatenate([np.ravel(views[name]) for name in blocks])
+
+
+class TrajectorySink:
+    """
+    Base class of trajectory sinks.
+
+    The integrator calls open(n_samples, size) once with the number of
+    output times it will produce at most, then write(t, y) with
+    consecutive blocks of output times and flat states, and close() at the
+    end. Subclasses implement _open(capacity, width) and _write(t, values)
+    for the decimated and selected samples.
+    """
+
+    def __init__(self, select=None, every=1):
+        if every < 1:
+            raise ValueError(f"every must be at least 1, got {every}")
+        self.select = None if select is None else np.asarray(select)
+        self.every = int(every)
+        self.n_written = 0
+        self._n_seen = 0
+
+    def open(self, n_samples, size):
+        """Prepare for at most n_samples output times of states of size."""
+        self.n_written = 0
+        self._n_seen = 0
+        width = size if self.select is None else len(np.arange(size)[
+            self.select])
+        self._open(-(-n_samples // self.every), width)
+
+    def write(self, t, y):
+        """Take the output times t (k,) with the flat states y (k, size)."""
+        # Samples at every every-th output time counted from the first
+        first = -self._n_seen % self.every
+        self._n_seen += len(t)
+        if first >= len(t):
+            return
+        t = t[first::self.every]
+        y = y[first::self.every]
+        if self.select is not None:
+            y = y[:, self.select]
+        self._write(t, y)
+        self.n_written += len(t)
+
+    def close(self):
+        """Finish writing."""
+
+    def _open(self, capacity, width):
+        pass
+
+    def _write(self, t, values):
+        raise NotImplementedError
+
+
+class CallbackSink(TrajectorySink):
+    """Call callback(t, values) with each block of kept samples."""
+
+    def __init__(self, callback, select=None, every=1):
+        super().__init__(select=select, every=every)
+        self.callback = callback
+
+    def _write(self, t, values):
+        self.callback(t, values)
+
+
+class RingBufferSink(TrajectorySink):
+    """Keep the last capacity samples in memory; t and y are oldest first."""
+
+    def __init__(self, capacity, select=None, every=1):
+        super().__init__(select=select, every=every)
+        self.capacity = int(capacity)
+        self._t = np.empty(0)
+        self._y = np.empty((0, 0))
+
+    def _open(self, capacity, width):
+        self._t = np.empty(self.capacity)
+        self._y = np.empty((self.capacity, width))
+
+    def _write(self, t, values):
+        # Only the last capacity samples of a long block survive anyway
+        offset = self.n_written + max(len(t) - self.capacity, 0)
+        t = t[-self.capacity:]
+        values = values[-self.capacity:]
+        rows = (offset + np.arange(len(t))) % self.capacity
+        self._t[rows] = t
+        self._y[rows] = values
+
+    def _order(self):
+        n = min(self.n_written, self.capacity)
+        return (self.n_written - n + np.arange(n)) % self.capacity
+
+    @property
+    def t(self):
+        return self._t[self._order()]
+
+    @property
+    def y(self):
+        return self._y[self._order()]
+
+
+class MemmapSink(TrajectorySink):
+    """
+    Write the samples to an .npy file as rows [t, values...].
+
+    The file is created for the largest number of samples at open() and
+    cut to the samples actually written at close(), e.g. after a run
+    stopped at convergence. load_trajectory(path) reads it back as a
+    memmap.
+    """
+
+    def __init__(self, path, select=None, every=1, dtype=np.float64):
+        super().__init__(select=select, every=every)
+        self.path = os.fspath(path)
+        self.dtype = np.dtype(dtype)
+        self._array = None
+
+    def _open(self, capacity, width):
+        self._array = np.lib.format.open_memmap(
+            self.path, mode='w+', dtype=self.dtype,
+            shape=(capacity, 1 + width))
+
+    def _write(self, t, values):
+        rows = self._array[self.n_written:self.n_written + len(t)]
+        rows[:, 0] = t
+        rows[:, 1:] = values
+
+    def close(self):
+        if self._array is None:
+            return
+        capacity, columns = self._array.shape
+        offset = self._array.offset
+        self._array.flush()
+        self._array = None
+        if self.n_written < capacity:
+            _truncate_npy(self.path, offset, (self.n_written, columns),
+                          self.dtype)
+
+
+def _truncate_npy(path, offset, shape, dtype):
+    """Cut an .npy file of C-ordered rows to shape, keeping its header size."""
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                   'fortran_order': False, 'shape': shape})
+    with open(path, 'r+b') as f:
+        magic = f.read(8)
+        # Version 1.0 has a 2-byte and later versions a 4-byte header length
+        length_bytes = 2 if magic[6] == 1 else 4
+        start = 8 + length_bytes
+        f.seek(start)
+        f.write(header.ljust(offset - start - 1).encode('latin1') + b'\n')
+        f.truncate(offset + int(np.prod(shape)) * dtype.itemsize)
+
+
+def load_trajectory(path, mmap_mode='r'):
+    """(t, values) of a MemmapSink file, as memmaps by default."""
+    data = np.load(path, mmap_mode=mmap_mode)
+    return data[:, 0], data[:, 1:]
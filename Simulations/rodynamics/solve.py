@@ -0,0 +1,357 @@
+"""
+Integrators for the RO dynamics.
+
+solve() accepts any problem exposing layout, initial_state() and
+make_dynamics(), and integrates it with odeint or any solve_ivp method,
+either over the whole of t_span or until the KKT residual of the saddle
+point falls below kkt_tol (see convergence).
+"""
+
+import numpy as np
+from scipy.integrate import odeint, solve_ivp
+
+from .convergence import (ConvergenceMonitor, convergence_message,
+                          residual_history)
+from .sinks import TrajectorySink
+
+SOLVE_IVP_METHODS = ('RK45', 'RK23', 'DOP853', 'Radau', 'BDF', 'LSODA')
+IMPLICIT_METHODS = ('odeint', 'Radau', 'BDF', 'LSODA')
+JACOBIAN_OPTIONS = (None, 'analytic', 'sparsity')
+ODEINT_SUCCESS = 'Integration successful.'
+
+
+class ROSolution:
+    """
+    Trajectory of the RO dynamics sampled at times t (rows of y).
+
+    For a batch y has shape (len(t), batch_size, size), so x, lam, u, v
+    and final carry the batch axis after the time axis.
+
+    Runs with kkt_tol also carry the residual history: residuals holds the
+    KKT residual terms at the times residual_t, ordered like
+    convergence.RESIDUAL_TERMS (with the batch axis before the terms), and
+    t_converged is the time at which the residual fell below kkt_tol, or
+    None if it never did.
+    """
+
+    residual_t = None
+    residuals = None
+    t_converged = None
+
+    def __init__(self, t, y, layout, success=True, message='', nfev=None,
+                 njev=None):
+        self.t = t
+        self.y = y
+        self.layout = layout
+        self.success = success
+        self.message = message
+        self.nfev = nfev
+        self.njev = njev
+
+    @property
+    def x(self):
+        return self.layout.unpack(self.y)[0]
+
+    @property
+    def lam(self):
+        return self.layout.unpack(self.y)[1]
+
+    @property
+    def u(self):
+        return self.layout.unpack(self.y)[2]
+
+    @property
+    def v(self):
+        return self.layout.unpack(self.y)[3]
+
+    @property
+    def residual(self):
+        """KKT residual at each residual_t: the largest residual term."""
+        if self.residuals is None:
+            return None
+        return self.residuals.max(axis=-1)
+
+    @property
+    def final(self):
+        """Final state split into (x, lambda, u, v)."""
+        return self.layout.unpack(self.y[-1])
+
+
+def solve(problem, x0, t_span, method='odeint', epsilon=0.0, rtol=None,
+          atol=None, dynamics_options=None, jacobian=None, kkt_tol=None,
+          check_every=100, sinks=None, chunk_size=1000, instrument=None,
+          **solver_options):
+    """
+    Integrate the RO dynamics of problem from x0 over t_span.
+
+    x0 is either the full initial state or only x (see
+    problem.initial_state); a 2-D x0 holds one initial condition per row
+    and integrates all of them as one batched system. t_span is the array
+    of output times. method is 'odeint' (LSODA through
+    scipy.integrate.odeint) or any solve_ivp method name. dynamics_options
+    are passed to problem.make_dynamics and solver_options to the
+    integrator.
+
+    jacobian selects how implicit methods obtain the Jacobian: None leaves
+    it to the integrator's finite differences, 'analytic' passes the exact
+    generalized Jacobian (Dfun for odeint, jac for solve_ivp) and
+    'sparsity' passes the structural pattern as jac_sparsity so that
+    Radau/BDF/LSODA difference only the nonzero columns together.
+
+    With kkt_tol set, integration stops as soon as the KKT residual (for a
+    batch, that of the slowest member) falls below kkt_tol, and the
+    solution ends with the state reached there. solve_ivp methods locate
+    that time with a terminal event. odeint has no events, so it is
+    restarted every check_every output times, where the residual is
+    checked, and stops at the first output time below the tolerance. The
+    solution carries the residual history, recorded at the integrator's
+    steps for solve_ivp and at the checked output times for odeint, and
+    t_converged.
+
+    sinks (a TrajectorySink or a list of them, see sinks) stream the
+    trajectory instead of returning it: the integrator runs over windows
+    of chunk_size output times, hands each window to every sink and
+    keeps only the state reached, so the returned solution holds just the
+    final state and peak memory does not grow with the horizon.
+
+    instrument (an instrument.Instrumentation) records call counts, block
+    timings, step sizes and projection and clipping counts of the run; see
+    instrument.report().
+    """
+    if jacobian not in JACOBIAN_OPTIONS:
+        raise ValueError(f"unknown jacobian {jacobian!r}; expected one of "
+                         f"{JACOBIAN_OPTIONS}")
+    if jacobian is not None and method not in IMPLICIT_METHODS:
+        raise ValueError(f"jacobian={jacobian!r} requires one of "
+                         f"{IMPLICIT_METHODS}, got method {method!r}")
+    if jacobian == 'sparsity' and method == 'odeint':
+        raise ValueError("odeint does not accept a sparsity pattern; use a "
+                         "solve_ivp method or jacobian='analytic'")
+    if method != 'odeint' and method not in SOLVE_IVP_METHODS:
+        raise ValueError(f"unknown method {method!r}; expected 'odeint' or "
+                         f"one of {SOLVE_IVP_METHODS}")
+
+    state0 = problem.initial_state(x0)
+    t_span = np.asarray(t_span, dtype=float)
+    dynamics_options = dict(dynamics_options or {})
+    state_shape = state0.shape
+    if state0.ndim == 2:
+        dynamics_options['batch_size'] = state_shape[0]
+        state0 = state0.ravel()
+    dynamics = problem.make_dynamics(epsilon=epsilon, **dynamics_options)
+    if instrument is None:
+        return _solve(dynamics, problem, method, state0, state_shape, t_span,
+                      rtol, atol, jacobian, kkt_tol, check_every, sinks,
+                      chunk_size, None, solver_options)
+
+    dynamics = instrument.wrap(dynamics)
+    if method != 'odeint':
+        method = instrument.solver(method)
+    with instrument:
+        return _solve(dynamics, problem, method, state0, state_shape, t_span,
+                      rtol, atol, jacobian, kkt_tol, check_every, sinks,
+                      chunk_size, instrument, solver_options)
+
+
+def _odeint_reached(t, y, info):
+    """
+    The rows of an odeint call over t that it reached, and its full_output
+    info cut to the calls it made. A failed call still fills its info row,
+    but its output row holds the state where it stopped and the rows after
+    it are uninitialized.
+    """
+    if info['message'] == ODEINT_SUCCESS:
+        return y, info
+    failed = np.flatnonzero(info['tcur'] < t[1:])
+    if len(failed) == 0:
+        return y, info
+    calls = failed[0] + 1
+    info = dict(info)
+    for key, value in info.items():
+        if isinstance(value, np.ndarray) and len(value) == len(t) - 1:
+            info[key] = value[:calls]
+    return y[:calls], info
+
+
+def _solve(dynamics, problem, method, state0, state_shape, t_span, rtol,
+           atol, jacobian, kkt_tol, check_every, sinks, chunk_size,
+           instrument, solver_options):
+    tolerances = {}
+    if rtol is not None:
+        tolerances['rtol'] = rtol
+    if atol is not None:
+        tolerances['atol'] = atol
+
+    if jacobian == 'analytic':
+        if method == 'odeint':
+            solver_options['Dfun'] = dynamics.Dfun
+        else:
+            solver_options['jac'] = dynamics.jac
+    elif jacobian == 'sparsity':
+        solver_options['jac_sparsity'] = dynamics.jac_sparsity()
+
+    def make_solution(t, y, **info):
+        return ROSolution(t, y.reshape((-1,) + state_shape), problem.layout,
+                          **info)
+
+    if kkt_tol is not None or sinks is not None:
+        if method == 'odeint' and kkt_tol is not None:
+            window = check_every
+        elif sinks is not None:
+            window = chunk_size
+        else:
+            window = len(t_span)
+        return _solve_in_windows(dynamics, method, state0, t_span, window,
+                                 kkt_tol, sinks, make_solution, tolerances,
+                                 solver_options, instrument)
+
+    if method == 'odeint':
+        y, info = odeint(dynamics, state0, t_span, full_output=True,
+                         **tolerances, **solver_options)
+        y, info = _odeint_reached(t_span, y, info)
+        if instrument is not None:
+            instrument.record_odeint(t_span, info)
+        return make_solution(t_span[:len(y)], y,
+                             success=info['message'] == ODEINT_SUCCESS,
+                             message=info['message'],
+                             nfev=int(info['nfe'][-1]),
+                             njev=int(info['nje'][-1]))
+
+    result = solve_ivp(dynamics.fun, (t_span[0], t_span[-1]), state0,
+                       method=method, t_eval=t_span, **tolerances,
+                       **solver_options)
+    return make_solution(result.t, result.y.T, success=result.success,
+                         message=result.message, nfev=result.nfev,
+                         njev=result.njev)
+
+
+def _solve_in_windows(dynamics, method, state0, t_span, window, kkt_tol,
+                      sinks, make_solution, tolerances, solver_options,
+                      instrument=None):
+    """
+    Integrate window output times per integrator call, for convergence
+    checks and streaming.
+
+    odeint checks the KKT residual at the end of each window; in the first
+    window ending below kkt_tol the run stops at the first output time
+    below it. solve_ivp stops on a ConvergenceMonitor event instead. The
+    samples go to the sinks, or are collected for the solution without.
+    """
+    if isinstance(sinks, TrajectorySink):
+        sinks = [sinks]
+    for sink in sinks or ():
+        sink.open(len(t_span), len(state0))
+    t_out, y_out = [], []
+    last = [t_span[0], state0]
+
+    def emit(t, y):
+        if len(t) == 0:
+            return
+        if sinks is None:
+            t_out.append(t)
+            y_out.append(y)
+        else:
+            for sink in sinks:
+                sink.write(t, y)
+        last[:] = t[-1], y[-1]
+
+    monitor = None
+    residual_t, residuals = [], []
+    fun = dynamics.fun
+    if kkt_tol is not None:
+        residuals0 = dynamics.residuals(state0, t_span[0])
+        residual_t.append(t_span[:1])
+        residuals.append(residuals0[None])
+        if method != 'odeint':
+            monitor = ConvergenceMonitor(dynamics, kkt_tol)
+            solver_options = dict(solver_options, events=monitor)
+            if 'jac' not in solver_options:
+                fun = monitor.fun
+
+    emit(t_span[:1], state0[None])
+    nfev = njev = 0
+    success = True
+    message = ODEINT_SUCCESS if method == 'odeint' else \
+        'The solver successfully reached the end of the integration interval.'
+    t_converged = None
+    if kkt_tol is not None and residuals0.max() < kkt_tol:
+        t_converged = t_span[0]
+    state = state0
+    start = 0
+    while t_converged is None and start < len(t_span) - 1:
+        stop = min(start + window, len(t_span) - 1)
+        if method == 'odeint':
+            t = t_span[start + 1:stop + 1]
+            y, info = odeint(dynamics, state, t_span[start:stop + 1],
+                             full_output=True, **tolerances,
+                             **solver_options)
+            y, info = _odeint_reached(t_span[start:stop + 1], y, info)
+            if instrument is not None:
+                instrument.record_odeint(t_span[start:stop + 1], info)
+            nfev += int(info['nfe'][-1])
+            njev += int(info['nje'][-1])
+            t, y = t[:len(y) - 1], y[1:]
+            if info['message'] != ODEINT_SUCCESS:
+                success, message = False, info['message']
+            elif kkt_tol is not None:
+                terms = dynamics.residuals(y[-1], t[-1])
+                if terms.max() < kkt_tol:
+                    terms = residual_history(dynamics, t, y)
+                    keep = np.argmax(terms.reshape(len(t), -1).max(axis=1)
+                                     < kkt_tol) + 1
+                    t, y, terms = t[:keep], y[:keep], terms[:keep]
+                    t_converged = t[-1]
+                    residual_t.append(t)
+                    residuals.append(terms)
+                else:
+                    residual_t.append(t[-1:])
+                    residuals.append(terms[None])
+        else:
+            result = solve_ivp(fun, (t_span[start], t_span[stop]), state,
+                               method=method,
+                               t_eval=t_span[start + 1:stop + 1],
+                               **tolerances, **solver_options)
+            nfev += result.nfev
+            njev += result.njev
+            t, y = result.t, result.y.T
+            message = result.message
+            if not result.success:
+                success = False
+            elif result.status == 1:
+                # The outputs stop before the event; end with the converged
+                # state
+                t_converged = result.t_events[0][-1]
+                if len(t) == 0 or t[-1] != t_converged:
+                    t = np.append(t, t_converged)
+                    y = np.vstack([y, result.y_events[0][-1]])
+        emit(t, y)
+        if not success:
+            break
+        state = last[1]
+        start = stop
+
+    for sink in sinks or ():
+        sink.close()
+    if t_converged is not None:
+        message = convergence_message(kkt_tol)
+    info = {'success': success, 'message': message, 'nfev': nfev,
+            'njev': njev}
+    if sinks is None:
+        solution = make_solution(np.concatenate(t_out), np.vstack(y_out),
+                                 **info)
+    else:
+        solution = make_solution(np.array([last[0]]), last[1][None], **info)
+    if kkt_tol is not None:
+        if monitor is not None and monitor.t:
+            if t_converged is not None and t_converged > t_span[0]:
+                monitor_t, monitor_residuals = monitor.history(t_converged,
+                                                               last[1])
+            else:
+                monitor_t, monitor_residuals = monitor.history()
+            # The monitor's first record is the initial state again
+            residual_t.append(monitor_t[1:])
+            residuals.append(monitor_residuals[1:])
+        solution.residual_t = np.concatenate(residual_t)
+        solution.residuals = np.concatenate(residuals)
+        solution.t_converged = t_converged
+    return solution
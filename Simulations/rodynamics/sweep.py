@@ -0,0 +1,237 @@
+"""
+Multi-start and parameter sweeps of the RO dynamics.
+
+A sweep runs many problems that share their structure but differ in
+parameters (e.g. b and rho of Example B) and initial conditions. Runs are
+split into chunks. Each chunk is integrated as one batched ODE with the
+state stacked along a leading batch axis (BatchRODynamics), and chunks can
+be spread over a ProcessPoolExecutor. A chunk whose batched integration
+fails is rerun member by member, so one bad run cannot take the others
+down, and every failure is recorded in the results table with its message.
+"""
+
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .solve import solve
+
+MESSAGE_LENGTH = 80
+
+# Exceptions an integration may raise for a bad run (overflow, singular
+# Newton matrices, non-finite steps); anything else is a bug and propagates.
+INTEGRATION_ERRORS = (ArithmeticError, RuntimeError, ValueError)
+
+
+def parameter_grid(x0, **params):
+    """
+    Cartesian product of parameter values and initial conditions.
+
+    Each keyword maps a parameter name to a sequence of values (scalars or
+    arrays). Returns (params, x0) with one row per run, ordered like nested
+    loops over the parameters in keyword order with x0 innermost.
+    """
+    x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+    names = list(params)
+    values = [[np.asarray(v, dtype=float) for v in params[name]]
+              for name in names]
+    combos = list(itertools.product(*values, range(len(x0))))
+    grid = {name: np.array([combo[k] for combo in combos])
+            for k, name in enumerate(names)}
+    return grid, x0[[combo[-1] for combo in combos]]
+
+
+def settling_time(t, x, tol):
+    """
+    First time after which x stays within tol of its final value.
+
+    x has shape (len(t), ...) with the coordinates on the last axis; the
+    result has the remaining batch shape.
+    """
+    outside = np.linalg.norm(x - x[-1], axis=-1) > tol
+    first_inside = len(t) - np.argmax(outside[::-1], axis=0)
+    return np.where(outside.any(axis=0),
+                    t[np.minimum(first_inside, len(t) - 1)], t[0])
+
+
+class SweepResult:
+    """
+    Results table of a sweep.
+
+    table is a numpy structured array with one row per run and the fields
+    run, chunk, one field per swept parameter, x0, status ('ok', 'failed'
+    or 'skipped'), message, error (||x_final - x_reference||), t_converged
+    (settling time of x, see settling_time), final (the final state) and
+    chunk_time (wall time of the chunk that produced the run).
+    layout.unpack(row['final']) splits a final state into (x, lambda, u,
+    v). stopped_early is set when the tolerance was met before all chunks
+    ran.
+    """
+
+    def __init__(self, table, layout):
+        self.table = table
+        self.layout = layout
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def stopped_early(self):
+        return bool((self.table['status'] == 'skipped').any())
+
+    @property
+    def ok(self):
+        return self.table[self.table['status'] == 'ok']
+
+    @property
+    def best(self):
+        """Successful run with the smallest error, or None."""
+        ok = self.ok
+        if len(ok) == 0:
+            return None
+        return ok[np.argmin(ok['error'])]
+
+
+def _empty_table(params, x0, size):
+    dtype = [('run', 'i8'), ('chunk', 'i8')]
+    dtype += [(name, 'f8', values.shape[1:])
+              for name, values in params.items()]
+    dtype += [('x0', 'f8', x0.shape[1:]),
+              ('status', 'U7'),
+              ('message', f'U{MESSAGE_LENGTH}'),
+              ('error', 'f8'),
+              ('t_converged', 'f8'),
+              ('final', 'f8', (size,)),
+              ('chunk_time', 'f8')]
+    table = np.zeros(len(x0), dtype=dtype)
+    table['run'] = np.arange(len(x0))
+    for name, values in params.items():
+        table[name] = values
+    table['x0'] = x0
+    table['status'] = 'skipped'
+    for field in ('error', 't_converged', 'final', 'chunk_time'):
+        table[field] = np.nan
+    return table
+
+
+def _chunk_params(params, index):
+    return {name: values[index] for name, values in params.items()}
+
+
+def _run_chunk(problem_factory, params, x0, size, t_span, x_reference,
+               convergence_tol, solve_options):
+    """
+    Integrate one chunk as a batch, falling back to one run at a time if
+    the batch fails. Returns a dict of per-run result columns.
+    """
+    n = len(x0)
+    result = {'status': np.full(n, 'failed', dtype='U7'),
+              'message': np.full(n, '', dtype=f'U{MESSAGE_LENGTH}'),
+              'error': np.full(n, np.nan),
+              't_converged': np.full(n, np.nan),
+              'final': np.full((n, size), np.nan)}
+
+    def attempt(index):
+        problem = problem_factory(**_chunk_params(params, index))
+        try:
+            solution = solve(problem, x0[index], t_span, **solve_options)
+        except INTEGRATION_ERRORS as exc:
+            return f"{type(exc).__name__}: {exc}"
+        x = solution.x
+        result['final'][index] = solution.y[-1]
+        result['error'][index] = np.linalg.norm(x[-1] - x_reference, axis=-1)
+        if not solution.success:
+            return str(solution.message)
+        if not np.isfinite(solution.y).all():
+            return "state became non-finite"
+        result['status'][index] = 'ok'
+        result['t_converged'][index] = settling_time(solution.t, x,
+                                                     convergence_tol)
+        return ''
+
+    start = time.perf_counter()
+    message = attempt(np.arange(n))
+    if message and n > 1:
+        for i in range(n):
+            result['message'][i] = attempt(np.array([i]))
+    else:
+        result['message'][:] = message
+    result['chunk_time'] = time.perf_counter() - start
+    return result
+
+
+def sweep(problem_factory, x0, t_span, x_reference, params=None,
+          chunk_size=64, max_workers=None, tolerance=None,
+          convergence_tol=1e-3, method='Radau', jacobian='sparsity',
+          **solve_options):
+    """
+    Integrate one run per row of x0 and collect a results table.
+
+    problem_factory(**chunk_params) builds the problem for a chunk, where
+    chunk_params maps each name in params to that chunk's values (leading
+    run axis), e.g. functools.partial(example_b, variant='fixed') with
+    params={'b': ...}. It must broadcast those values over the batch axis
+    and be picklable when max_workers is set.
+
+    Chunks of chunk_size runs are integrated as batches, serially or on a
+    ProcessPoolExecutor with max_workers processes. With tolerance set, no
+    further chunks are started once a successful run is within tolerance of
+    x_reference; the remaining runs are marked 'skipped'. The remaining
+    keywords go to solve(). Radau with the block-diagonal sparsity pattern
+    is the default: members share step sizes, so the method must cope with
+    the stiffest member without forming dense Jacobians of the whole batch,
+    and batched odeint tends to give up with 'Excess work done' instead.
+    """
+    x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+    n_runs = len(x0)
+    params = {name: np.asarray(values, dtype=float)
+              for name, values in (params or {}).items()}
+    for name, values in params.items():
+        if len(values) != n_runs:
+            raise ValueError(f"parameter {name!r} has {len(values)} values "
+                             f"for {n_runs} runs")
+    x_reference = np.asarray(x_reference, dtype=float)
+    t_span = np.asarray(t_span, dtype=float)
+    solve_options = dict(solve_options, method=method, jacobian=jacobian)
+
+    chunks = [np.arange(start, min(start + chunk_size, n_runs))
+              for start in range(0, n_runs, chunk_size)]
+    layout = problem_factory(**_chunk_params(params, chunks[0])).layout
+    table = _empty_table(params, x0, layout.size)
+
+    def chunk_args(chunk):
+        return (problem_factory, _chunk_params(params, chunk), x0[chunk],
+                layout.size, t_span, x_reference, convergence_tol,
+                solve_options)
+
+    def record(k, result):
+        rows = chunks[k]
+        table['chunk'][rows] = k
+        for field, values in result.items():
+            table[field][rows] = values
+        return tolerance is not None and np.any(
+            (result['status'] == 'ok') & (result['error'] <= tolerance))
+
+    if max_workers is None:
+        for k, chunk in enumerate(chunks):
+            if record(k, _run_chunk(*chunk_args(chunk))):
+                break
+        return SweepResult(table, layout)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_run_chunk, *chunk_args(chunk)): k
+                   for k, chunk in enumerate(chunks)}
+        found = False
+        while pending and not found:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found |= record(pending.pop(future), future.result())
+        for future in pending:
+            future.cancel()
+    # Chunks that were already running when the tolerance was met
+    for future, k in pending.items():
+        if not future.cancelled():
+            record(k, future.result())
+    return SweepResult(table, layout)
@@ -0,0 +1,469 @@
+"""
+Symbolic problem specification with generated RHS and Jacobian kernels.
+
+SymbolicProblem takes f(x), g(x, u) and h_j(u) as sympy expressions and
+derives everything the dynamics need from them: the unprojected vector
+field
+
+    F(x, lambda, u, v) = (-grad f - (lambda + eps) grad_x g,
+                          g - b - v^T h,
+                          grad_u g - sum_j v_j grad h_j,
+                          (lambda + eps) h)
+
+and its Jacobian dF/dy. Each is emitted as one Python function over the
+state components with common subexpressions eliminated (sympy.cse), so a
+term like exp(x_i^2) or exp(1/u_j) is computed once per call no matter how
+many derivatives share it. The dynamics then only apply the projections,
+rate limits and u floor of RODynamics to the kernel's output.
+
+A single system runs a kernel on Python floats with the math module; a
+batch runs the same expressions on the columns of the (batch_size, size)
+state with numpy. The pieces of ROProblem (objective_gradient, constraint,
+uncertainty_set and their second derivatives) are generated as well, for
+reporting and for code that uses them directly.
+
+sympy is an optional dependency and only needed to build a problem.
+"""
+
+import copy
+import functools
+import math
+
+import numpy as np
+from scipy import sparse
+
+from .dynamics import (BatchRODynamics, RODynamics, project_frozen,
+                       project_positive)
+from .problem import CallableConstraint, ROProblem
+from .uncertainty import CallableSet
+
+
+def _import_sympy():
+    try:
+        import sympy
+    except ImportError:
+        raise ImportError("symbolic problems need sympy "
+                          "(pip install sympy)") from None
+    return sympy
+
+
+def _compile(name, source):
+    namespace = {'math': math, 'numpy': np, 'functools': functools}
+    exec(compile(source, f'<rodynamics.symbolic.{name}>', 'exec'), namespace)
+    function = namespace[name]
+    function.source = source
+    return function
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy_printer_class():
+    """
+    NumPyPrinter with elementwise Heaviside, Min, Max and Piecewise.
+
+    The stock printer turns them into numpy.select or functools.reduce
+    calls, which cost several times more per call on short columns.
+    """
+    from sympy.printing.numpy import NumPyPrinter
+
+    class ElementwisePrinter(NumPyPrinter):
+        def _print_Heaviside(self, expr):
+            return f"numpy.heaviside({self._print(expr.args[0])}, 0.5)"
+
+        def _nested(self, function, args):
+            text = self._print(args[-1])
+            for arg in reversed(args[:-1]):
+                text = f"{function}({self._print(arg)}, {text})"
+            return text
+
+        def _print_Min(self, expr):
+            return self._nested('numpy.minimum', expr.args)
+
+        def _print_Max(self, expr):
+            return self._nested('numpy.maximum', expr.args)
+
+        def _print_Piecewise(self, expr):
+            *branches, (last, condition) = expr.args
+            text = self._print(last)
+            if condition != True:
+                text = (f"numpy.where({self._print(condition)}, {text}, "
+                        f"numpy.nan)")
+            for value, condition in reversed(branches):
+                text = (f"numpy.where({self._print(condition)}, "
+                        f"{self._print(value)}, {text})")
+            return text
+
+    return ElementwisePrinter
+
+
+def generate_kernel(name, symbols, outputs, batch=False):
+    """
+    Compile name(y, b, epsilon, out) writing the expressions outputs of the
+    state symbols into out.
+
+    symbols name the components of y in order, and the expressions may also
+    use the symbols 'b' and 'epsilon'. Common subexpressions of all outputs
+    are computed once. With batch, y is (batch_size, len(symbols)), out is
+    (batch_size, len(outputs)) and b may be one bound per member; otherwise
+    both are flat and the kernel computes on Python floats.
+    """
+    sympy = _import_sympy()
+    from sympy.printing.pycode import PythonCodePrinter
+
+    printer = _numpy_printer_class()() if batch else PythonCodePrinter()
+    replacements, reduced = sympy.cse(
+        list(outputs), symbols=sympy.numbered_symbols('_c'))
+    names = ', '.join(str(symbol) for symbol in symbols)
+    lines = [f"def {name}(y, b, epsilon, out):"]
+    lines.append(f"    {names}, = y.T" if batch
+                 else f"    {names}, = y.tolist()")
+    for symbol, expression in replacements:
+        lines.append(f"    {symbol} = {printer.doprint(expression)}")
+    if batch:
+        for k, expression in enumerate(reduced):
+            lines.append(f"    out[:, {k}] = {printer.doprint(expression)}")
+    else:
+        values = ',\n        '.join(printer.doprint(expression)
+                                    for expression in reduced)
+        lines.append(f"    out[:] = (\n        {values},\n    )")
+    return _compile(name, '\n'.join(lines) + '\n')
+
+
+def _generate_function(name, arguments, expressions, shape):
+    """
+    Compile name(*arrays) returning expressions over the symbols in
+    arguments, one sequence of symbols per array argument.
+
+    Arrays may carry leading batch axes; the result has shape (...,) +
+    shape, and the CSE is shared over all entries.
+    """
+    sympy = _import_sympy()
+    printer = _numpy_printer_class()()
+    replacements, reduced = sympy.cse(
+        list(expressions), symbols=sympy.numbered_symbols('_c'))
+    parameters = [f'_a{k}' for k in range(len(arguments))]
+    lines = [f"def {name}({', '.join(parameters)}):"]
+    for parameter, symbols in zip(parameters, arguments):
+        for k, symbol in enumerate(symbols):
+            lines.append(f"    {symbol} = {parameter}[..., {k}]")
+    for symbol, expression in replacements:
+        lines.append(f"    {symbol} = {printer.doprint(expression)}")
+    values = ', '.join(printer.doprint(expression) for expression in reduced)
+    if shape == ():
+        lines.append(f"    return {values}")
+    else:
+        lines.append(f"    values = numpy.broadcast_arrays({values}, "
+                     f"{parameters[0]}[..., 0])[:-1]")
+        lines.append(f"    return numpy.stack(values, axis=-1).reshape("
+                     f"numpy.shape(values[0]) + {shape!r})")
+    return _compile(name, '\n'.join(lines) + '\n')
+
+
+def _drop_impulses(matrix):
+    """
+    Remove the DiracDelta terms that differentiating Heaviside (from Min,
+    Max or Abs) produces; they vanish almost everywhere.
+    """
+    sympy = _import_sympy()
+    return matrix.replace(sympy.DiracDelta, lambda *args: sympy.S.Zero)
+
+
+def _nonzero(matrix):
+    return np.array([[entry != 0 for entry in row]
+                     for row in matrix.tolist()], dtype=bool)
+
+
+class SymbolicProblem(ROProblem):
+    """
+    ROProblem declared by sympy expressions, with generated kernels.
+
+    objective is f(x), constraint g(x, u) and uncertainty the sequence of
+    h_j(u); x and u are the sequences of symbols they depend on, in state
+    order. Expressions may use any sympy function the numpy and math
+    printers know, including Min/Max caps and Piecewise guards, whose
+    derivatives are taken exactly. Common subexpressions are evaluated
+    eagerly, also those only needed by a Piecewise branch that is not
+    taken.
+
+    b is numeric, as in ROProblem; replace(b=...) reuses the generated
+    kernels while any other change regenerates them.
+    """
+
+    def __init__(self, objective, constraint, uncertainty, x, u, b):
+        sympy = _import_sympy()
+        self.expressions = {'objective': objective, 'constraint': constraint,
+                            'uncertainty': tuple(uncertainty), 'x': tuple(x),
+                            'u': tuple(u)}
+        n_x, n_u, m = len(x), len(u), len(uncertainty)
+
+        # Internal names for the state components, b and eps
+        y = sympy.symbols(f'y0:{n_x + 1 + n_u + m}', real=True)
+        ys_x, ys_lam = y[:n_x], y[n_x]
+        ys_u, ys_v = y[n_x + 1:n_x + 1 + n_u], y[n_x + 1 + n_u:]
+        b_symbol, eps_symbol = sympy.symbols('b epsilon', real=True)
+        names = dict(zip(tuple(x) + tuple(u), ys_x + ys_u))
+        f = sympy.sympify(objective).xreplace(names)
+        g = sympy.sympify(constraint).xreplace(names)
+        h = sympy.Matrix([sympy.sympify(h_j).xreplace(names)
+                          for h_j in uncertainty])
+
+        X, U, V = sympy.Matrix(ys_x), sympy.Matrix(ys_u), sympy.Matrix(ys_v)
+        lam_eps = ys_lam + eps_symbol
+        grad_f = sympy.Matrix([f]).jacobian(X).T
+        grad_x = sympy.Matrix([g]).jacobian(X).T
+        grad_u = sympy.Matrix([g]).jacobian(U).T
+        jac_h = h.jacobian(U)
+        field = sympy.Matrix.vstack(
+            -grad_f - lam_eps * grad_x,
+            sympy.Matrix([g - b_symbol - (V.T * h)[0]]),
+            grad_u - jac_h.T * V,
+            lam_eps * h)
+        jacobian = _drop_impulses(field.jacobian(sympy.Matrix(y)))
+        self.jacobian_pattern = _nonzero(jacobian)
+        rows, cols = np.nonzero(self.jacobian_pattern)
+        self._jacobian_index = (rows, cols)
+        jacobian_entries = [jacobian[i, j] for i, j in zip(rows, cols)]
+
+        # Fused kernels: [F, g, h] for the RHS and the nonzeros of dF/dy
+        rhs_outputs = list(field) + [g] + list(h)
+        self.kernels = {
+            'rhs': generate_kernel('rhs', y, rhs_outputs),
+            'jacobian': generate_kernel('jacobian', y, jacobian_entries),
+            'batch_rhs': generate_kernel('batch_rhs', y, rhs_outputs,
+                                         batch=True),
+        }
+
+        # ROProblem pieces
+        hess_f = _drop_impulses(grad_f.jacobian(X))
+        hess_xx = _drop_impulses(grad_x.jacobian(X))
+        hess_xu = _drop_impulses(grad_x.jacobian(U))
+        hess_uu = _drop_impulses(grad_u.jacobian(U))
+        hess_h = [_drop_impulses(sympy.hessian(h_j, ys_u)) for h_j in h]
+        on_x, on_xu, on_u = [ys_x], [ys_x, ys_u], [ys_u]
+
+        def piece(name, arguments, matrix, shape):
+            return _generate_function(name, arguments, list(matrix), shape)
+
+        if hess_f.free_symbols:
+            objective_hessian = piece('hess_f', on_x, hess_f, (n_x, n_x))
+        else:
+            objective_hessian = np.array(hess_f.tolist(), dtype=float)
+        sparsity = (_nonzero(hess_xx), _nonzero(hess_xu), _nonzero(hess_uu))
+        generated_constraint = CallableConstraint(
+            _generate_function('g', on_xu, [g], ()),
+            piece('grad_x', on_xu, grad_x, (n_x,)),
+            piece('grad_u', on_xu, grad_u, (n_u,)), n_x, n_u,
+            hessians=(piece('hess_xx', on_xu, hess_xx, (n_x, n_x)),
+                      piece('hess_xu', on_xu, hess_xu, (n_x, n_u)),
+                      piece('hess_uu', on_xu, hess_uu, (n_u, n_u))),
+            sparsity=sparsity)
+        generated_set = CallableSet(
+            piece('h', on_u, h, (m,)), piece('grad_h', on_u, jac_h, (m, n_u)),
+            n_u, m,
+            hess_h=_generate_function(
+                'hess_h', on_u, [entry for H in hess_h for entry in H],
+                (m, n_u, n_u)))
+        super().__init__(piece('grad_f', on_x, grad_f, (n_x,)),
+                         generated_constraint, generated_set, b,
+                         objective=_generate_function('f', on_x, [f], ()),
+                         objective_hessian=objective_hessian)
+
+    def replace(self, **changes):
+        """Copy with some of objective, constraint, uncertainty, x, u, b."""
+        if set(changes) <= {'b'}:
+            problem = copy.copy(self)
+            b = changes.get('b', self.b)
+            problem.b = float(b) if np.ndim(b) == 0 else np.asarray(
+                b, dtype=float)
+            return problem
+        arguments = dict(self.expressions, b=self.b)
+        arguments.update(changes)
+        return type(self)(**arguments)
+
+    def make_dynamics(self, epsilon=0.0, batch_size=None, **options):
+        """Dynamics running the generated kernels (see GeneratedRODynamics)."""
+        if batch_size is not None:
+            return GeneratedBatchRODynamics(self, batch_size, epsilon=epsilon,
+                                            **options)
+        return GeneratedRODynamics(self, epsilon=epsilon, **options)
+
+
+class GeneratedRODynamics(RODynamics):
+    """
+    RODynamics of a SymbolicProblem evaluated by its fused kernels.
+
+    One kernel call yields F, g and h at the state (with u floored if
+    u_floor is set), from which evaluate() applies the projections and rate
+    limits exactly like RODynamics. jacobian() fills the nonzeros of dF/dy
+    from the second kernel and zeroes the same rows and columns as the
+    generalized Jacobian of RODynamics.
+    """
+
+    def __init__(self, problem, epsilon=0.0, rate_limits=None, u_floor=None,
+                 gains=None):
+        super().__init__(problem, epsilon=epsilon, rate_limits=rate_limits,
+                         u_floor=u_floor, gains=gains)
+        size = self.layout.size
+        self._values = np.empty(size + 1 + self.layout.m)
+        self._field = self._values[:size]
+        self._z_v = self._field[self.layout.v]
+        self._h = self._values[size + 1:]
+        self._y = np.empty(size)
+        self._jac_values = np.empty(len(problem._jacobian_index[0]))
+        self._rhs = problem.kernels['rhs']
+        self._jacobian_kernel = problem.kernels['jacobian']
+
+    def _point(self, state):
+        """state, or a copy with u floored at u_floor."""
+        if self.u_floor is None:
+            return state
+        y = self._y
+        np.copyto(y, state)
+        u = y[self.layout.u]
+        np.maximum(u, self.u_floor, out=u)
+        return y
+
+    def evaluate(self, state, t=0.0):
+        layout = self.layout
+        self._rhs(self._point(state), self.problem.b, self.epsilon,
+                  self._values)
+        field = self._field
+        lam_eps = state[layout.lam] + self.epsilon
+        self._lambda_dot = field[layout.lam]
+        np.copyto(self._d_state, field)
+        if not self._lambda_free(lam_eps):
+            self._d_state[layout.lam] = 0.0
+        v = state[layout.v]
+        if self.clamped is None:
+            project_positive(self._z_v, v, self._dv)
+        else:
+            project_frozen(self._z_v, self.clamped[1:], self._dv)
+            self._remember(state, t)
+
+        if self._gain is not None:
+            np.multiply(self._d_state, self._gain, out=self._d_state)
+        if self.rate_limits:
+            self._apply_rate_limits()
+        return self._d_state
+
+    def evaluate_uncertainty(self, state, t=0.0):
+        # The fused kernel has no cheaper partial evaluation
+        return self.evaluate(state, t)
+
+    def residuals(self, state, t=0.0, evaluate=True):
+        """KKT residual terms as in RODynamics.residuals, from the kernel."""
+        layout = self.layout
+        if evaluate:
+            self.evaluate(state, t)
+        field = self._field
+        lam_eps = state[layout.lam] + self.epsilon
+        v = state[layout.v]
+        h = self._h
+        gap = self._values[layout.size] - self.problem.b
+        return np.array([
+            np.linalg.norm(field[layout.x]),
+            np.hypot(max(gap, 0.0), np.linalg.norm(np.maximum(h, 0.0))),
+            np.hypot(lam_eps * gap, np.linalg.norm(v * h)),
+            np.linalg.norm(field[layout.u]),
+        ])
+
+    def jacobian(self, state, t=0.0):
+        """Generalized Jacobian of evaluate(state, t), in a reused buffer."""
+        if self._jac is None:
+            self._jac = np.zeros((self.layout.size, self.layout.size))
+        layout = self.layout
+        d_state = self.evaluate(state, t)
+        self._jacobian_kernel(self._point(state), self.problem.b,
+                              self.epsilon, self._jac_values)
+        J = self._jac
+        J.fill(0.0)
+        J[self.problem._jacobian_index] = self._jac_values
+
+        if not self._lambda_free(state[layout.lam] + self.epsilon):
+            J[layout.lam] = 0.0
+        J[np.arange(layout.size)[layout.v][~self._v_free(
+            state[layout.v])]] = 0.0
+        if self._gain is not None:
+            J *= self._gain[:, None]
+        if self.rate_limits:
+            blocks = self._blocks()
+            for name, bound in self.rate_limits.items():
+                rows = np.arange(layout.size)[blocks[name]]
+                J[rows[np.abs(d_state[rows]) >= bound]] = 0.0
+        if self.u_floor is not None:
+            cols = np.arange(layout.size)[layout.u]
+            J[:, cols[state[layout.u] < self.u_floor]] = 0.0
+        return J
+
+    def jac_sparsity(self):
+        """Nonzero pattern of the symbolic Jacobian dF/dy."""
+        return self.problem.jacobian_pattern.copy()
+
+
+class GeneratedBatchRODynamics(BatchRODynamics):
+    """
+    BatchRODynamics of a SymbolicProblem, running the batch kernel on the
+    columns of the stacked states.
+    """
+
+    def __init__(self, problem, batch_size, epsilon=0.0, rate_limits=None,
+                 u_floor=None, gains=None):
+        super().__init__(problem, batch_size, epsilon=epsilon,
+                         rate_limits=rate_limits, u_floor=u_floor,
+                         gains=gains)
+        size = self.layout.size
+        self._values = np.empty((batch_size, size + 1 + self.layout.m))
+        self._field = self._values[:, :size]
+        self._y = np.empty(self._shape)
+        self._rhs = problem.kernels['batch_rhs']
+
+    def evaluate(self, state, t=0.0):
+        layout = self.layout
+        S = state.reshape(self._shape)
+        y = S
+        if self.u_floor is not None:
+            y = self._y
+            np.copyto(y, S)
+            np.maximum(y[:, layout.u], self.u_floor, out=y[:, layout.u])
+        self._rhs(y, self.problem.b, self.epsilon, self._values)
+        field = self._field
+
+        D = self._d_state.reshape(self._shape)
+        np.copyto(D, field)
+        np.copyto(self._lambda_dot, field[:, layout.lam])
+        project_positive(self._lambda_dot, S[:, layout.lam] + self.epsilon,
+                         self._dlam)
+        project_positive(field[:, layout.v], S[:, layout.v], self._dv)
+
+        if self._gain is not None:
+            np.multiply(self._d_state, self._gain, out=self._d_state)
+        if self.rate_limits:
+            self._apply_rate_limits()
+        return self._d_state
+
+    def _unprojected(self):
+        return np.column_stack([self._lambda_dot,
+                                self._field[:, self.layout.v]])
+
+    def residuals(self, state, t=0.0, evaluate=True):
+        """KKT residual terms, shape (batch_size, len(RESIDUAL_TERMS))."""
+        layout = self.layout
+        if evaluate:
+            self.evaluate(state, t)
+        S = state.reshape(self._shape)
+        field = self._field
+        lam_eps = S[:, layout.lam] + self.epsilon
+        v = S[:, layout.v]
+        h = self._values[:, layout.size + 1:]
+        gap = self._values[:, layout.size] - self.problem.b
+        norm = np.linalg.norm
+        return np.stack([
+            norm(field[:, layout.x], axis=1),
+            np.hypot(np.maximum(gap, 0.0), norm(np.maximum(h, 0.0), axis=1)),
+            np.hypot(lam_eps * gap, norm(v * h, axis=1)),
+            norm(field[:, layout.u], axis=1),
+        ], axis=1)
+
+    def jac_sparsity(self):
+        """Block-diagonal symbolic pattern, one block per member."""
+        block = sparse.csr_matrix(self.problem.jacobian_pattern)
+        return sparse.block_diag([block] * self.batch_size, format='csr')
@@ -0,0 +1,499 @@
+"""
+Dynamic topology for the multi-agent problem: agents, anchors and edges
+that join or leave during a run.
+
+A DynamicNetwork starts from a MultiAgentProblem and keeps every node in a
+slot: anchors in the first anchor_capacity node indices and agents in the
+agent_capacity after them. An agent keeps its slot, and so its place in
+the state, while others join and leave, and a node that leaves frees its
+slot for the next one to join. Node ids are those of the problem (anchors
+0..n_anchors-1, then the agents); joining nodes bring their own.
+
+The agent rows of the Laplacian are a compressed CSR matrix plus pending
+corrections stored as (row, column, value) triplets, which the RHS adds
+with one bincount per coordinate (MultiAgentDynamics.set_topology).
+Adding or removing an edge appends four triplets, removing a node costs
+O(its degree), and agents joining or leaving flip their entries of the
+state mask, so a change costs O(changed edges) instead of a rebuild. Once
+the pending triplets exceed compact_fraction of the stored nonzeros they
+are merged into the CSR matrix, which keeps merging amortized O(1) per
+change. Only an exhausted capacity is doubled, by rebuilding the network.
+The slots are laid out in the state_order of the initial problem.
+
+solve_dynamic() integrates a run with NetworkChanges at given times. At
+each change the integration stops, the network and the dynamics are
+updated in place, joining agents start at their given positions with zero
+duals, and the integration resumes from the state the other agents
+reached.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.integrate import solve_ivp
+
+from .multiagent import MultiAgentProblem
+from .solve import SOLVE_IVP_METHODS, ROSolution
+from .trajectories import Trajectory
+
+
+class NetworkChange:
+    """
+    Changes to a DynamicNetwork at time t.
+
+    add_agents maps new agent ids to their initial positions and
+    add_anchors new anchor ids to their positions. remove lists the ids of
+    agents or anchors that leave, together with their edges. add_edges
+    holds (i, j) or (i, j, w) id pairs, by default with the weight of the
+    network, and remove_edges (i, j) pairs. Nodes are removed first, then
+    added, and the edges changed last, so edges may refer to nodes joining
+    in the same change.
+    """
+
+    def __init__(self, t, add_agents=None, add_anchors=None, remove=(),
+                 add_edges=(), remove_edges=()):
+        self.t = float(t)
+        self.add_agents = dict(add_agents or {})
+        self.add_anchors = dict(add_anchors or {})
+        self.remove = list(remove)
+        self.add_edges = [tuple(edge) for edge in add_edges]
+        self.remove_edges = [tuple(edge) for edge in remove_edges]
+
+    def __repr__(self):
+        return (f"NetworkChange({self.t:g}; +{len(self.add_agents)} agents, "
+                f"+{len(self.add_anchors)} anchors, -{len(self.remove)} "
+                f"nodes, +{len(self.add_edges)}/-{len(self.remove_edges)} "
+                f"edges)")
+
+
+class _SlotAnchors:
+    """
+    Anchor motion over anchor slots from a Trajectory of the anchors of the
+    initial problem: a slot holding anchor id i < n_anchors follows row i
+    of the trajectory and any other slot keeps its position.
+    """
+
+    def __init__(self, trajectory, anchor_ids):
+        self.trajectory = trajectory
+        self.anchor_ids = anchor_ids
+
+    def __call__(self, t, anchor_positions):
+        rows = self.trajectory(t)
+        ids = self.anchor_ids
+        moving = (ids >= 0) & (ids < len(rows))
+        positions = anchor_positions.copy()
+        positions[moving] = rows[ids[moving]]
+        return positions
+
+
+class DynamicNetwork:
+    """
+    Mutable anchors, agents and edges of a MultiAgentProblem.
+
+    a, P, b and w must be shared by all agents and edges, since joining
+    agents and edges take them over. An anchor_motion given as a Trajectory
+    moves the initial anchors by id, and anchors joining later stay where
+    they were placed. Capacities default to the initial numbers of agents
+    and anchors plus 25% (at least 4 more), since empty agent slots still
+    cost RHS work, and double when exhausted. anchor_ids and agent_ids hold
+    the id in each slot, -1 for an empty one, and mask is 1 on the state
+    components of occupied agent slots and 0 elsewhere. rebuilds counts
+    the rebuilds after a capacity was exhausted, after which dynamics from
+    make_dynamics() have to be made anew.
+    """
+
+    def __init__(self, problem, agent_capacity=None, anchor_capacity=None,
+                 compact_fraction=0.25):
+        if problem.a.ndim > 1 or problem.P.ndim > 1 or np.ndim(problem.b) \
+                or np.ndim(problem.w):
+            raise ValueError("DynamicNetwork needs a, P, b and w shared by "
+                             "all agents and edges")
+        self.template = problem
+        self.dim = problem.layout.dim
+        self.compact_fraction = compact_fraction
+        n_anchors, n_agents = problem.n_anchors, problem.n_agents
+        anchor_capacity = anchor_capacity or n_anchors + max(n_anchors // 4,
+                                                             4)
+        agent_capacity = agent_capacity or n_agents + max(n_agents // 4, 4)
+        if anchor_capacity < n_anchors or agent_capacity < n_agents:
+            raise ValueError("capacities must hold the initial anchors and "
+                             "agents")
+        self.anchor_ids = np.full(anchor_capacity, -1)
+        self.anchor_ids[:n_anchors] = np.arange(n_anchors)
+        self.agent_ids = np.full(agent_capacity, -1)
+        self.agent_ids[:n_agents] = np.arange(n_anchors, problem.n_nodes)
+        self.anchor_positions = np.zeros((anchor_capacity, self.dim))
+        self.anchor_positions[:n_anchors] = problem.anchor_positions
+
+        # Symmetric weighted neighbour lists by node id
+        self._neighbours = {node: {} for node in range(problem.n_nodes)}
+        self.rebuilds = -1
+        upper = sparse.triu(problem.adjacency_matrix(), 1).tocoo()
+        for i, j, w in zip(upper.row.tolist(), upper.col.tolist(),
+                           upper.data.tolist()):
+            self._neighbours[i][j] = w
+            self._neighbours[j][i] = w
+        self._rebuild()
+
+    @property
+    def n_agents(self):
+        return len(self.agent_ids) - len(self._free_agents)
+
+    @property
+    def n_anchors(self):
+        return len(self.anchor_ids) - len(self._free_anchors)
+
+    @property
+    def pending(self):
+        """Pending Laplacian corrections as (rows, columns, values) views."""
+        n = self._n_pending
+        return self._rows[:n], self._columns[:n], self._values[:n]
+
+    def _rebuild(self):
+        """Slots, mask, layout and compressed Laplacian from scratch."""
+        anchor_capacity = len(self.anchor_ids)
+        self._free_anchors = \
+            np.flatnonzero(self.anchor_ids < 0)[::-1].tolist()
+        self._free_agents = np.flatnonzero(self.agent_ids < 0)[::-1].tolist()
+        self._slot = {int(node): s for s, node in enumerate(self.anchor_ids)
+                      if node >= 0}
+        self._slot.update({int(node): anchor_capacity + k
+                           for k, node in enumerate(self.agent_ids)
+                           if node >= 0})
+
+        template = self.template
+        edges = self.edges()
+        self._problem = MultiAgentProblem(
+            self.anchor_positions, len(self.agent_ids),
+            [(self._slot[int(i)], self._slot[int(j)])
+             for i, j in edges[:, :2]],
+            template.a, template.P, template.b, template.rho,
+            w=edges[:, 2] if len(edges) else template.w,
+            anchor_motion=self._anchor_motion(self.anchor_ids),
+            state_order=template.state_order)
+        self.layout = self._problem.layout
+        self.mask = np.zeros(self.layout.size)
+        self.mask[self.layout.agent_indices(
+            np.flatnonzero(self.agent_ids >= 0))] = 1.0
+        self.laplacian = self._problem.laplacian()[anchor_capacity:].tocsr()
+        self._rows = np.empty(64, dtype=np.intp)
+        self._columns = np.empty(64, dtype=np.intp)
+        self._values = np.empty(64)
+        self._n_pending = 0
+        self.rebuilds += 1
+
+    def _anchor_motion(self, anchor_ids):
+        """anchor_motion of the template for anchors with these ids."""
+        motion = self.template.anchor_motion
+        if isinstance(motion, Trajectory):
+            return _SlotAnchors(motion, anchor_ids)
+        return motion
+
+    def _index(self, node):
+        try:
+            return self._slot[node]
+        except KeyError:
+            raise ValueError(f"no node {node!r} in the network") from None
+
+    def edges(self):
+        """Current edges as an (n_edges, 3) array of (i, j, w), i < j."""
+        return np.array([(i, j, w)
+                         for i, neighbours in self._neighbours.items()
+                         for j, w in neighbours.items() if i < j],
+                        dtype=float).reshape(-1, 3)
+
+    def make_dynamics(self, epsilon=0.01, **options):
+        """MultiAgentDynamics over all agent slots of the current network."""
+        dynamics = self._problem.make_dynamics(epsilon=epsilon, **options)
+        self.update(dynamics)
+        return dynamics
+
+    def update(self, dynamics):
+        """Point dynamics at the current Laplacian, corrections and mask."""
+        dynamics.set_topology(self.laplacian, self.pending, self.mask)
+
+    def _append(self, row, column, value):
+        n = self._n_pending
+        if n == len(self._values):
+            self._rows = np.resize(self._rows, 2 * n)
+            self._columns = np.resize(self._columns, 2 * n)
+            self._values = np.resize(self._values, 2 * n)
+        self._rows[n] = row
+        self._columns[n] = column
+        self._values[n] = value
+        self._n_pending = n + 1
+
+    def _change_edge(self, i, j, w):
+        """Add w to the weight of edge (i, j) in the Laplacian."""
+        anchor_capacity = len(self.anchor_ids)
+        index_i, index_j = self._slot[i], self._slot[j]
+        for a, b in ((index_i, index_j), (index_j, index_i)):
+            if a >= anchor_capacity:
+                self._append(a - anchor_capacity, a, w)
+                self._append(a - anchor_capacity, b, -w)
+        if self._n_pending > self.compact_fraction * max(self.laplacian.nnz,
+                                                         256):
+            self.compact()
+
+    def compact(self):
+        """Merge the pending corrections into the compressed Laplacian."""
+        rows, columns, values = self.pending
+        correction = sparse.coo_matrix((values, (rows, columns)),
+                                       shape=self.laplacian.shape)
+        self.laplacian = (self.laplacian + correction).tocsr()
+        self.laplacian.eliminate_zeros()
+        self._n_pending = 0
+
+    def add_edge(self, i, j, w=None):
+        """
+        Link nodes i and j; an existing edge or a self-loop is ignored, as
+        in MultiAgentProblem.
+        """
+        self._index(i)
+        self._index(j)
+        if i == j or j in self._neighbours[i]:
+            return
+        w = float(self.template.w if w is None else w)
+        self._neighbours[i][j] = w
+        self._neighbours[j][i] = w
+        self._change_edge(i, j, w)
+
+    def remove_edge(self, i, j):
+        """Unlink nodes i and j."""
+        w = self._neighbours.get(i, {}).pop(j, None)
+        if w is None:
+            raise ValueError(f"no edge ({i!r}, {j!r}) in the network")
+        del self._neighbours[j][i]
+        self._change_edge(i, j, -w)
+
+    def add_agent(self, node):
+        """Give agent node a slot (doubling the capacity if needed)."""
+        if node in self._slot:
+            raise ValueError(f"node {node!r} is already in the network")
+        if not self._free_agents:
+            self.agent_ids = np.concatenate(
+                [self.agent_ids, np.full(len(self.agent_ids), -1)])
+            self._rebuild()
+        k = self._free_agents.pop()
+        self.agent_ids[k] = node
+        self._slot[node] = len(self.anchor_ids) + k
+        self._neighbours[node] = {}
+        self.mask[self.layout.agent_indices(k)] = 1.0
+        return k
+
+    def add_anchor(self, node, position):
+        """Place anchor node at position (doubling the capacity if needed)."""
+        if node in self._slot:
+            raise ValueError(f"node {node!r} is already in the network")
+        if not self._free_anchors:
+            capacity = len(self.anchor_ids)
+            self.anchor_ids = np.concatenate([self.anchor_ids,
+                                              np.full(capacity, -1)])
+            self.anchor_positions = np.concatenate(
+                [self.anchor_positions, np.zeros((capacity, self.dim))])
+            self._rebuild()
+        s = self._free_anchors.pop()
+        self.anchor_ids[s] = node
+        self.anchor_positions[s] = position
+        self._slot[node] = s
+        self._neighbours[node] = {}
+        return s
+
+    def remove_node(self, node):
+        """
+        Remove an agent or anchor with its edges; returns the agent slot
+        it freed, or None for an anchor.
+        """
+        index = self._index(node)
+        for neighbour in list(self._neighbours[node]):
+            self.remove_edge(node, neighbour)
+        del self._neighbours[node], self._slot[node]
+        anchor_capacity = len(self.anchor_ids)
+        if index < anchor_capacity:
+            self.anchor_ids[index] = -1
+            self._free_anchors.append(index)
+            return None
+        k = index - anchor_capacity
+        self.agent_ids[k] = -1
+        self.mask[self.layout.agent_indices(k)] = 0.0
+        self._free_agents.append(k)
+        return k
+
+    def apply(self, change, state):
+        """
+        Apply a NetworkChange to the network and to a state over its agent
+        slots; returns the state, enlarged if a capacity grew. Slots freed
+        are zeroed and joining agents start at their positions with zero
+        duals.
+        """
+        for node in change.remove:
+            k = self.remove_node(node)
+            if k is not None:
+                state[self.layout.agent_indices(k)] = 0.0
+        for node, position in change.add_anchors.items():
+            self.add_anchor(node, position)
+        for node, position in change.add_agents.items():
+            layout = self.layout
+            k = self.add_agent(node)
+            if self.layout is not layout:
+                state = _relayout(state, layout, self.layout)
+            state[self.layout.agent_indices(k)] = 0.0
+            self.layout.unpack(state)[0][k] = position
+        for edge in change.remove_edges:
+            self.remove_edge(*edge)
+        for edge in change.add_edges:
+            self.add_edge(*edge)
+        return state
+
+    def initial_state(self, state0):
+        """
+        Full state over the agent slots, from one, or from the positions
+        (n_agents, d) of the agents in slot order.
+        """
+        state0 = np.asarray(state0, dtype=float)
+        if state0.shape == (self.layout.size,):
+            return state0.copy()
+        occupied = self.agent_ids >= 0
+        if state0.size != occupied.sum() * self.dim:
+            raise ValueError(
+                f"initial state must be the full state ({self.layout.size}) "
+                f"or agent positions ({occupied.sum()}, {self.dim}), got "
+                f"shape {state0.shape}")
+        state = np.zeros(self.layout.size)
+        self.layout.unpack(state)[0][occupied] = state0.reshape(-1, self.dim)
+        return state
+
+    def to_problem(self):
+        """
+        The current network as a MultiAgentProblem without empty slots,
+        anchors and agents in slot order, and the agent slots it keeps
+        (for layout.agents(state)[slots]).
+        """
+        anchors = np.flatnonzero(self.anchor_ids >= 0)
+        slots = np.flatnonzero(self.agent_ids >= 0)
+        index = {int(node): i for i, node in enumerate(
+            np.concatenate([self.anchor_ids[anchors], self.agent_ids[slots]]))}
+        edges = [(index[i], index[j]) for i, neighbours
+                 in self._neighbours.items() for j in neighbours if i < j]
+        weights = [w for i, neighbours in self._neighbours.items()
+                   for j, w in neighbours.items() if i < j]
+        template = self.template
+        problem = MultiAgentProblem(
+            self.anchor_positions[anchors], len(slots),
+            np.reshape(edges, (-1, 2)), template.a, template.P, template.b,
+            template.rho, w=weights if weights else template.w,
+            anchor_motion=self._anchor_motion(self.anchor_ids[anchors]),
+            state_order=template.state_order)
+        return problem, slots
+
+
+def _relayout(values, layout, new_layout):
+    """
+    States (or a trajectory) over the agent slots of layout, moved to the
+    larger new_layout with its extra slots zeroed.
+    """
+    out = np.zeros(np.shape(values)[:-1] + (new_layout.size,))
+    n = layout.n_agents
+    X, lam, U, V = new_layout.unpack(out)
+    X_old, lam_old, U_old, V_old = layout.unpack(values)
+    X[..., :n, :] = X_old
+    lam[..., :n] = lam_old
+    U[..., :n, :] = U_old
+    V[..., :n] = V_old
+    return out
+
+
+def solve_dynamic(network, x0, t_span, changes=(), method='RK45',
+                  epsilon=0.01, rtol=None, atol=None, dynamics_options=None,
+                  **solver_options):
+    """
+    Integrate the multi-agent RO dynamics on a DynamicNetwork that changes
+    at the times of changes (NetworkChanges).
+
+    x0 is a full state over the agent slots or the positions of the agents
+    present at t_span[0]; method is any solve_ivp method, and epsilon,
+    rtol, atol and dynamics_options are as in solve(). Changes at or
+    before t_span[0] are applied before the start, changes after its end
+    ignored. The network is left in its final configuration.
+
+    The returned ROSolution is over the agent slots of the final capacity
+    (zero before a slot was occupied) and carries agent_ids, the id in
+    each slot at each output time (-1 if empty), nfev and n_changes.
+    """
+    if method not in SOLVE_IVP_METHODS:
+        raise ValueError(f"unknown method {method!r}; expected one of "
+                         f"{SOLVE_IVP_METHODS}")
+    t_span = np.asarray(t_span, dtype=float)
+    t0, t_final = t_span[0], t_span[-1]
+    state = network.initial_state(x0)
+    changes = sorted(changes, key=lambda change: change.t)
+    n_changes = 0
+    for change in changes:
+        if change.t <= t0:
+            state = network.apply(change, state)
+            n_changes += 1
+    changes = [change for change in changes if t0 < change.t < t_final]
+    tolerances = {}
+    if rtol is not None:
+        tolerances['rtol'] = rtol
+    if atol is not None:
+        tolerances['atol'] = atol
+    dynamics_options = dict(dynamics_options or {})
+    dynamics = network.make_dynamics(epsilon=epsilon, **dynamics_options)
+
+    t_out, y_out, ids_out, layouts = [], [], [], []
+    n_out = nfev = 0
+    success, message = True, 'The solver successfully reached the end of ' \
+                             'the integration interval.'
+    t = t0
+    k = 0
+    while t < t_final:
+        end = changes[k].t if k < len(changes) else t_final
+        # Output times of this segment; a change time belongs to the
+        # segment starting there
+        stop = np.searchsorted(t_span, end,
+                               side='right' if end == t_final else 'left')
+        t_eval = t_span[n_out:stop]
+        if len(t_eval) == 0 or t_eval[-1] != end:
+            t_eval = np.append(t_eval, end)
+        result = solve_ivp(dynamics.fun, (t, end), state, method=method,
+                           t_eval=t_eval, **tolerances, **solver_options)
+        nfev += result.nfev
+        keep = min(len(result.t), stop - n_out)
+        if keep > 0:
+            t_out.append(result.t[:keep])
+            y_out.append(result.y[:, :keep].T)
+            ids_out.append(np.broadcast_to(network.agent_ids.copy(),
+                                           (keep, len(network.agent_ids))))
+            layouts.append(network.layout)
+            n_out += keep
+        if not result.success:
+            success, message = False, result.message
+            break
+        t = end
+        state = result.y[:, -1].copy()
+        rebuilds = network.rebuilds
+        while k < len(changes) and changes[k].t == end:
+            state = network.apply(changes[k], state)
+            n_changes += 1
+            k += 1
+        if network.rebuilds != rebuilds:
+            dynamics = network.make_dynamics(epsilon=epsilon,
+                                             **dynamics_options)
+        else:
+            network.update(dynamics)
+
+    # Pad the output of segments before a capacity grew
+    size, capacity = network.layout.size, len(network.agent_ids)
+    y = np.zeros((n_out, size))
+    agent_ids = np.full((n_out, capacity), -1)
+    row = 0
+    for times, values, ids, layout in zip(t_out, y_out, ids_out, layouts):
+        y[row:row + len(times)] = _relayout(values, layout, network.layout)
+        agent_ids[row:row + len(times), :ids.shape[1]] = ids
+        row += len(times)
+    solution = ROSolution(np.concatenate(t_out) if t_out else t_span[:0], y,
+                          network.layout, success=success, message=message,
+                          nfev=nfev)
+    solution.agent_ids = agent_ids
+    solution.n_changes = n_changes
+    return solution
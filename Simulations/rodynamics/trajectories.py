@@ -0,0 +1,210 @@
+"""
+Time-varying parameters: anchor trajectories and uncertainty radii.
+
+A Trajectory is a parameter given as a function of time, evaluated for all
+of its entries at once: the (n_anchors, d) anchor positions, or a scalar
+such as rho. Constant, Rotation (closed form), Waypoints (piecewise
+linear), Track (cubic spline through a recorded track) and Switched (one
+of these per time interval) cover the scenarios of the paper and recorded
+anchor paths. Each evaluation is a fixed number of numpy operations on the
+whole array, so its Python-level cost does not grow with the number of
+anchors.
+
+A trajectory remembers the time of its last call and returns the cached
+value (and derivative) when asked again at the same t, as happens for the
+stages of one step, an event search or the residual after a RHS call. The
+returned arrays are read-only views of the cache.
+
+derivative(t) is the time derivative. MultiAgentProblem accepts
+trajectories as anchor_motion and rho, and MultiAgentDynamics(
+feedforward=True) uses their derivatives as a feed-forward term (see
+multiagent).
+"""
+
+import bisect
+import math
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+
+class Trajectory:
+    """
+    A parameter as a function of time; call it for the value at t.
+
+    Subclasses implement _value(t) and _derivative(t) for all entries at
+    once; scalars come back as floats and arrays read-only.
+    """
+
+    def __init__(self):
+        self._t = None
+        self._value_t = None
+        self._t_dot = None
+        self._derivative_t = None
+
+    def __call__(self, t):
+        if t != self._t:
+            self._value_t = _freeze(self._value(float(t)))
+            self._t = t
+        return self._value_t
+
+    def derivative(self, t):
+        """Time derivative at t."""
+        if t != self._t_dot:
+            self._derivative_t = _freeze(self._derivative(float(t)))
+            self._t_dot = t
+        return self._derivative_t
+
+    def _value(self, t):
+        raise NotImplementedError
+
+    def _derivative(self, t):
+        raise NotImplementedError
+
+
+def _freeze(value):
+    if isinstance(value, float):
+        return value
+    if isinstance(value, np.ndarray) and value.ndim:
+        if value.flags.writeable:
+            value.flags.writeable = False
+        return value
+    if np.ndim(value) == 0:
+        return float(value)
+    return _freeze(np.asarray(value, dtype=float))
+
+
+class Constant(Trajectory):
+    """A parameter that does not change."""
+
+    def __init__(self, value):
+        super().__init__()
+        self.value = _freeze(value)
+        self._zero = _freeze(np.zeros_like(self.value))
+
+    def __call__(self, t):
+        return self.value
+
+    def derivative(self, t):
+        return self._zero
+
+
+class Rotation(Trajectory):
+    """
+    Planar positions (n, 2) rotated around center at rate rad per time
+    unit, by angle0 + rate (t - t0) at time t.
+    """
+
+    def __init__(self, positions, center, rate, t0=0.0, angle0=0.0):
+        super().__init__()
+        positions = np.asarray(positions, dtype=float)
+        if positions.shape[-1] != 2:
+            raise ValueError(f"Rotation needs planar positions, got shape "
+                             f"{positions.shape}")
+        self.center = np.asarray(center, dtype=float)
+        self.offsets = positions - self.center
+        self.rate = float(rate)
+        self.t0 = float(t0)
+        self.angle0 = float(angle0)
+
+    def _rotated(self, t, quarter=0.0):
+        angle = self.angle0 + self.rate * (t - self.t0) + quarter
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        return self.offsets @ np.array([[cos_a, sin_a], [-sin_a, cos_a]])
+
+    def _value(self, t):
+        return self._rotated(t) + self.center
+
+    def _derivative(self, t):
+        return self.rate * self._rotated(t, 0.5 * np.pi)
+
+
+class Waypoints(Trajectory):
+    """
+    Piecewise-linear interpolation of values (k, ...) at increasing times
+    (k,), held constant before the first and after the last.
+    """
+
+    def __init__(self, times, values):
+        super().__init__()
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        if len(self.times) < 2 or len(self.values) != len(self.times) \
+                or np.any(np.diff(self.times) <= 0):
+            raise ValueError("Waypoints need at least two increasing times "
+                             "and one value per time")
+        steps = np.diff(self.times).reshape((-1,) + (1,) * (
+            self.values.ndim - 1))
+        self.slopes = np.diff(self.values, axis=0) / steps
+        self._zero = np.zeros_like(self.values[0])
+
+    def _segment(self, t):
+        return min(max(np.searchsorted(self.times, t, side='right') - 1, 0),
+                   len(self.times) - 2)
+
+    def _value(self, t):
+        i = self._segment(t)
+        s = min(max(t, self.times[0]), self.times[-1]) - self.times[i]
+        return self.values[i] + s * self.slopes[i]
+
+    def _derivative(self, t):
+        if not self.times[0] <= t < self.times[-1]:
+            return self._zero
+        return self.slopes[self._segment(t)]
+
+
+class Track(Trajectory):
+    """
+    Cubic spline through a recorded track, values (k, ...) at increasing
+    times (k,), held constant outside [times[0], times[-1]].
+    """
+
+    def __init__(self, times, values):
+        super().__init__()
+        self.times = np.asarray(times, dtype=float)
+        self.spline = CubicSpline(self.times, np.asarray(values, dtype=float),
+                                  axis=0)
+
+    def _value(self, t):
+        return self.spline(min(max(t, self.times[0]), self.times[-1]))
+
+    def _derivative(self, t):
+        if not self.times[0] <= t <= self.times[-1]:
+            return 0.0 * self.spline(self.times[0])
+        return self.spline(t, 1)
+
+
+class Switched(Trajectory):
+    """
+    One trajectory (or constant value) per time interval: phases are
+    (start, trajectory) pairs, each in force from its start until the
+    next, the first one also before its start. A switch may jump; its
+    derivative is that of the phase in force.
+    """
+
+    def __init__(self, phases):
+        super().__init__()
+        phases = sorted(phases, key=lambda phase: phase[0])
+        if not phases:
+            raise ValueError("Switched needs at least one phase")
+        self.starts = [float(start) for start, _ in phases]
+        self.pieces = [as_trajectory(piece) for _, piece in phases]
+
+    @property
+    def breakpoints(self):
+        return np.array(self.starts[1:])
+
+    def piece_at(self, t):
+        """The trajectory in force at time t."""
+        return self.pieces[max(bisect.bisect_right(self.starts, t) - 1, 0)]
+
+    def _value(self, t):
+        return self.piece_at(t)(t)
+
+    def _derivative(self, t):
+        return self.piece_at(t).derivative(t)
+
+
+def as_trajectory(value):
+    """value itself if it is a Trajectory, else a Constant of it."""
+    return value if isinstance(value, Trajectory) else Constant(value)
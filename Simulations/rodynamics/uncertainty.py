@@ -0,0 +1,367 @@
+"""
+Uncertainty sets U = {u : h_j(u) <= 0, j = 1..m} for the RO dynamics.
+
+Each set evaluates h(u) and the weighted gradient sum sum_j v_j grad h_j(u)
+into caller-provided arrays, so the RHS can run without reallocating. For
+the Jacobian of the dynamics, sets also provide the constraint Jacobian
+dh/du, the weighted Hessian sum_j v_j hess h_j(u) and the sparsity of both.
+
+h and weighted_grad also accept u and v with a leading batch axis (shapes
+(B, n_u) and (B, m)) for BatchRODynamics, and jacobian and
+weighted_hessian accept it for the batched worst-case oracle (see oracle).
+
+OperatorEllipsoidIntersection takes each Q_j as a sparse matrix, a
+LowRankDiagonal or any scipy LinearOperator, for u in R^n with n in the
+thousands where the dense (m, n, n) stack of EllipsoidIntersection no
+longer fits.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator, aslinearoperator
+
+
+class UncertaintySet:
+    """
+    Base class for uncertainty sets described by m constraints h_j(u) <= 0.
+
+    The dynamics always call h(u) before weighted_grad(u, v) with the same u,
+    so subclasses may reuse intermediates computed in h.
+    """
+
+    n_u = 0
+    m = 0
+
+    def h(self, u, out):
+        """Write h_j(u), j = 1..m, into out."""
+        raise NotImplementedError
+
+    def weighted_grad(self, u, v, out):
+        """Write sum_j v_j grad h_j(u) into out."""
+        raise NotImplementedError
+
+    def jacobian(self, u, out):
+        """Write dh/du, shape (..., m, n_u), into out."""
+        raise NotImplementedError
+
+    def weighted_hessian(self, u, v, out):
+        """Write sum_j v_j hess h_j(u), shape (..., n_u, n_u), into out."""
+        raise NotImplementedError
+
+    def sparsity(self):
+        """Boolean nonzero patterns of (dh/du, sum_j v_j hess h_j)."""
+        return (np.ones((self.m, self.n_u), dtype=bool),
+                np.ones((self.n_u, self.n_u), dtype=bool))
+
+    def h_values(self, u):
+        """Return h(u) as a new array (convenience for reporting)."""
+        out = np.empty(self.m)
+        self.h(np.asarray(u, dtype=float), out)
+        return out
+
+
+class EllipsoidIntersection(UncertaintySet):
+    """
+    Intersection of ellipsoids h_j(u) = u^T Q_j u - 1.
+
+    All Q_j are stored as one stacked (m, n, n) array so h(u) and
+    sum_j v_j Q_j u are evaluated with matmul calls instead of a loop.
+    """
+
+    def __init__(self, Q_matrices):
+        self.Q = np.ascontiguousarray(
+            np.stack([np.asarray(Q, dtype=float) for Q in Q_matrices]))
+        self.m, self.n_u, _ = self.Q.shape
+        self._Qu = np.empty((self.m, self.n_u))
+
+    def h(self, u, out):
+        if u.ndim > 1:
+            # (B, m, n) stack of Q_j u_b, kept for weighted_grad
+            self._Qu_batch = np.matmul(self.Q, u[:, None, :, None])[..., 0]
+            np.einsum('bjk,bk->bj', self._Qu_batch, u, out=out)
+            np.subtract(out, 1.0, out=out)
+            return
+        np.matmul(self.Q, u, out=self._Qu)
+        np.matmul(self._Qu, u, out=out)
+        np.subtract(out, 1.0, out=out)
+
+    def weighted_grad(self, u, v, out):
+        # Reuses Q_j u from the preceding h(u) call on the same u
+        if u.ndim > 1:
+            np.einsum('bj,bjk->bk', v, self._Qu_batch, out=out)
+        else:
+            np.matmul(v, self._Qu, out=out)
+        np.multiply(out, 2.0, out=out)
+
+    def jacobian(self, u, out):
+        if u.ndim > 1:
+            out[:] = np.matmul(self.Q, u[:, None, :, None])[..., 0]
+        else:
+            np.matmul(self.Q, u, out=out)
+        np.multiply(out, 2.0, out=out)
+
+    def weighted_hessian(self, u, v, out):
+        np.einsum('...j,jik->...ik', v, self.Q, out=out)
+        np.multiply(out, 2.0, out=out)
+
+    def sparsity(self):
+        nonzero = self.Q != 0
+        return nonzero.any(axis=2), nonzero.any(axis=0)
+
+
+class LowRankDiagonal(LinearOperator):
+    """
+    Symmetric Q = diag(d) + F F^T with F of shape (n, r), stored in O(n r).
+
+    Without a factor (r = 0) Q is diagonal.
+    """
+
+    def __init__(self, diagonal, factor=None):
+        self.diagonal = np.asarray(diagonal, dtype=float)
+        n = len(self.diagonal)
+        self.factor = (np.zeros((n, 0)) if factor is None
+                       else np.asarray(factor, dtype=float).reshape(n, -1))
+        super().__init__(float, (n, n))
+
+    def _matvec(self, u):
+        u = u.reshape(-1)
+        return self.diagonal * u + self.factor @ (self.factor.T @ u)
+
+    def _matmat(self, U):
+        return self.diagonal[:, None] * U + self.factor @ (self.factor.T @ U)
+
+    def _adjoint(self):
+        return self
+
+    def _transpose(self):
+        return self
+
+    def toarray(self):
+        """Q as a dense (n, n) array."""
+        return np.diag(self.diagonal) + self.factor @ self.factor.T
+
+
+class OperatorEllipsoidIntersection(UncertaintySet):
+    """
+    Intersection of ellipsoids h_j(u) = u^T Q_j u - 1 with Q_j given as
+    operators instead of dense matrices.
+
+    If every Q_j is a LowRankDiagonal, the diagonals are stacked into an
+    (m, n) array D and the factors, padded to the largest rank r, into an
+    (m, n, r) array F, so h(u) = D (u * u) + ||F_j^T u||^2 - 1 and
+    sum_j v_j Q_j u take a few einsum calls and O(m n r) work. Sparse
+    matrices (and dense arrays, which are converted) are stacked into one
+    (m n, n) CSR matrix whose product with u gives all Q_j u at once in
+    O(nnz). Other LinearOperators, or a mix of kinds, are applied one Q_j at
+    a time. As in EllipsoidIntersection, weighted_grad reuses the products
+    of the preceding h call. The Jacobian dh/du is (m, n); weighted_hessian
+    and sparsity are dense (n, n) and meant for moderate n only.
+    """
+
+    def __init__(self, Q_operators):
+        Q_operators = list(Q_operators)
+        self.m = len(Q_operators)
+        self.n_u = Q_operators[0].shape[0]
+        for Q in Q_operators:
+            if Q.shape != (self.n_u, self.n_u):
+                raise ValueError(f"every Q_j must be ({self.n_u}, "
+                                 f"{self.n_u}); got {Q.shape}")
+        if all(isinstance(Q, LowRankDiagonal) for Q in Q_operators):
+            self.kind = 'lowrank'
+            rank = max(Q.factor.shape[1] for Q in Q_operators)
+            self.D = np.stack([Q.diagonal for Q in Q_operators])
+            self.F = np.zeros((self.m, self.n_u, rank))
+            for j, Q in enumerate(Q_operators):
+                self.F[j, :, :Q.factor.shape[1]] = Q.factor
+        elif all(sparse.issparse(Q) or isinstance(Q, np.ndarray)
+                 for Q in Q_operators):
+            self.kind = 'sparse'
+            self._stack = sparse.vstack(
+                [sparse.csr_matrix(Q, dtype=float) for Q in Q_operators],
+                format='csr')
+        else:
+            self.kind = 'operator'
+            self._operators = [aslinearoperator(Q) for Q in Q_operators]
+
+    @property
+    def Q(self):
+        """The Q_j, rebuilt from the stacks for low-rank and sparse Q_j."""
+        if self.kind == 'lowrank':
+            return [LowRankDiagonal(D, F) for D, F in zip(self.D, self.F)]
+        if self.kind == 'sparse':
+            n = self.n_u
+            return [self._stack[j * n:(j + 1) * n] for j in range(self.m)]
+        return self._operators
+
+    def _products(self, u):
+        """Q_j u as (m, n), or (m, n, B) for a batch of rows u."""
+        if self.kind == 'sparse':
+            return (self._stack @ u.T).reshape(self.m, self.n_u, *u.shape[:-1])
+        if u.ndim > 1:
+            return np.stack([Q.matmat(u.T) for Q in self._operators])
+        return np.stack([Q.matvec(u) for Q in self._operators])
+
+    def h(self, u, out):
+        if self.kind == 'lowrank':
+            # F_j^T u, kept for weighted_grad
+            self._W = np.einsum('jnr,...n->...jr', self.F, u)
+            np.matmul(u * u, self.D.T, out=out)
+            out += np.einsum('...jr,...jr->...j', self._W, self._W)
+        else:
+            self._Qu = self._products(u)
+            if u.ndim > 1:
+                np.einsum('jnb,bn->bj', self._Qu, u, out=out)
+            else:
+                np.matmul(self._Qu, u, out=out)
+        np.subtract(out, 1.0, out=out)
+
+    def weighted_grad(self, u, v, out):
+        # Reuses F_j^T u or Q_j u from the preceding h(u) call on the same u
+        if self.kind == 'lowrank':
+            np.multiply(v @ self.D, u, out=out)
+            out += np.einsum('jnr,...jr->...n', self.F, v[..., None] * self._W)
+        elif u.ndim > 1:
+            np.einsum('bj,jnb->bn', v, self._Qu, out=out)
+        else:
+            np.matmul(v, self._Qu, out=out)
+        np.multiply(out, 2.0, out=out)
+
+    def jacobian(self, u, out):
+        if self.kind == 'lowrank':
+            W = np.einsum('jnr,...n->...jr', self.F, u)
+            np.multiply(self.D, u[..., None, :], out=out)
+            out += np.einsum('jnr,...jr->...jn', self.F, W)
+        elif u.ndim > 1:
+            out[:] = self._products(u).transpose(2, 0, 1)
+        else:
+            out[:] = self._products(u)
+        np.multiply(out, 2.0, out=out)
+
+    def weighted_hessian(self, u, v, out):
+        if self.kind == 'lowrank':
+            np.einsum('jnr,...j,jkr->...nk', self.F, v, self.F, out=out)
+            diagonal = np.arange(self.n_u)
+            out[..., diagonal, diagonal] += v @ self.D
+        else:
+            if self.kind == 'sparse':
+                operators = self.Q
+            else:
+                identity = np.eye(self.n_u)
+                operators = [Q @ identity for Q in self.Q]
+            for index in np.ndindex(v.shape[:-1]):
+                weighted = sum(w * Q for w, Q in zip(v[index], operators))
+                out[index] = (weighted.toarray() if sparse.issparse(weighted)
+                              else weighted)
+        np.multiply(out, 2.0, out=out)
+
+    def sparsity(self):
+        if self.kind == 'lowrank':
+            coupled = (self.F != 0).astype(float)
+            hess = np.einsum('jnr,jkr->nk', coupled, coupled) > 0
+            hess[np.diag_indices(self.n_u)] |= (self.D != 0).any(axis=0)
+            return (self.D != 0) | (self.F != 0).any(axis=2), hess
+        if self.kind == 'sparse':
+            jac = (np.diff(self._stack.indptr) > 0).reshape(self.m, self.n_u)
+            blocks = self.Q
+            pattern = sum((abs(Q) for Q in blocks[1:]), abs(blocks[0]))
+            return jac, pattern.toarray() != 0
+        return super().sparsity()
+
+
+class NormBall(UncertaintySet):
+    """Euclidean ball h(u) = ||u||^2 - rho^2."""
+
+    m = 1
+
+    def __init__(self, rho, n_u=2):
+        self.rho = float(rho)
+        self.n_u = n_u
+
+    def h(self, u, out):
+        out[..., 0] = np.einsum('...i,...i->...', u, u) - self.rho**2
+
+    def weighted_grad(self, u, v, out):
+        np.multiply(u, 2.0 * v[..., :1], out=out)
+
+    def jacobian(self, u, out):
+        np.multiply(u, 2.0, out=out[..., 0, :])
+
+    def weighted_hessian(self, u, v, out):
+        out[:] = 0.0
+        diagonal = np.arange(self.n_u)
+        out[..., diagonal, diagonal] = 2.0 * v[..., :1]
+
+    def sparsity(self):
+        return (np.ones((1, self.n_u), dtype=bool),
+                np.eye(self.n_u, dtype=bool))
+
+
+class SeparableSet(UncertaintySet):
+    """
+    Coordinate-wise constraints h_j(u) = phi_j(u_j), one per component of u.
+
+    phi, dphi and the optional second derivative d2phi act elementwise on
+    the whole vector u, so the gradient of sum_j v_j h_j(u) is simply
+    dphi(u) * v and both dh/du and the weighted Hessian are diagonal.
+    """
+
+    def __init__(self, phi, dphi, n_u, d2phi=None):
+        self.phi = phi
+        self.dphi = dphi
+        self.d2phi = d2phi
+        self.n_u = n_u
+        self.m = n_u
+
+    def h(self, u, out):
+        out[:] = self.phi(u)
+
+    def weighted_grad(self, u, v, out):
+        np.multiply(self.dphi(u), v, out=out)
+
+    def jacobian(self, u, out):
+        out[:] = 0.0
+        diagonal = np.arange(self.n_u)
+        out[..., diagonal, diagonal] = self.dphi(u)
+
+    def weighted_hessian(self, u, v, out):
+        if self.d2phi is None:
+            raise NotImplementedError(
+                "SeparableSet needs d2phi for the Jacobian of the dynamics")
+        out[:] = 0.0
+        diagonal = np.arange(self.n_u)
+        out[..., diagonal, diagonal] = self.d2phi(u) * v
+
+    def sparsity(self):
+        diagonal = np.eye(self.n_u, dtype=bool)
+        return diagonal, diagonal
+
+
+class CallableSet(UncertaintySet):
+    """
+    General set from user functions h(u) -> (m,) and grad_h(u) -> (m, n_u).
+
+    hess_h(u) -> (m, n_u, n_u) is optional and only needed for the
+    Jacobian of the dynamics.
+    """
+
+    def __init__(self, h, grad_h, n_u, m, hess_h=None):
+        self._h = h
+        self._grad_h = grad_h
+        self._hess_h = hess_h
+        self.n_u = n_u
+        self.m = m
+
+    def h(self, u, out):
+        out[:] = self._h(u)
+
+    def weighted_grad(self, u, v, out):
+        np.einsum('...j,...jk->...k', v, self._grad_h(u), out=out)
+
+    def jacobian(self, u, out):
+        out[:] = self._grad_h(u)
+
+    def weighted_hessian(self, u, v, out):
+        if self._hess_h is None:
+            raise NotImplementedError(
+                "CallableSet needs hess_h for the Jacobian of the dynamics")
+        np.einsum('...j,...jik->...ik', v, self._hess_h(u), out=out)
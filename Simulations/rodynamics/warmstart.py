@@ -0,0 +1,202 @@
+"""
+Warm starts for re-solving perturbed RO problems.
+
+SolutionCache stores saddle points (final states of converged runs) keyed by
+the parameters of the problem that produced them, such as a, P, b, the Q_j,
+rho and epsilon. A new instance starts from the cached state whose
+parameters are nearest to its own instead of from zero. The cache evicts
+the least recently used entry beyond maxsize and can mirror itself to a
+directory of .npz files so that it survives between sessions.
+
+solve_warm() wraps solve() around a cache, and continuation() walks one
+parameter (epsilon, or a problem parameter such as rho) through a sequence
+of values, starting each solve from the previous solution.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .solve import solve
+
+
+def _flatten(params):
+    """(signature, vector) of a dict of named scalars or arrays."""
+    names = sorted(params)
+    arrays = [np.asarray(params[name], dtype=float) for name in names]
+    signature = tuple((name, a.shape) for name, a in zip(names, arrays))
+    vector = np.concatenate([a.ravel() for a in arrays]) if arrays \
+        else np.zeros(0)
+    return signature, vector
+
+
+def _entry_id(signature, vector):
+    digest = hashlib.sha1(repr(signature).encode())
+    digest.update(vector.tobytes())
+    return digest.hexdigest()
+
+
+class SolutionCache:
+    """
+    LRU cache of saddle points keyed by problem parameters.
+
+    params are dicts of named scalars or arrays. Only entries with the same
+    names and shapes are compared, by the Euclidean distance between their
+    concatenated values. With directory set, every entry is also written
+    there as <hash>.npz, entries found there are loaded on construction, and
+    evicted entries are deleted.
+    """
+
+    def __init__(self, maxsize=128, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._entries = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, params, state):
+        """Store state as the solution for params."""
+        signature, vector = _flatten(params)
+        key = _entry_id(signature, vector)
+        state = np.array(state, dtype=float)
+        self._entries[key] = (signature, vector, state)
+        self._entries.move_to_end(key)
+        if self.directory is not None:
+            np.savez(self._path(key), signature=json.dumps(signature),
+                     vector=vector, state=state)
+        self._evict()
+
+    def get(self, params):
+        """Cached state for exactly these params, or None."""
+        key = _entry_id(*_flatten(params))
+        if key not in self._entries:
+            return None
+        self._touch(key)
+        return self._entries[key][2].copy()
+
+    def nearest(self, params, shape=None):
+        """
+        (state, distance) of the entry nearest to params, or (None, inf).
+
+        With shape set, only states of that shape are considered.
+        """
+        signature, vector = _flatten(params)
+        best_key, best_distance = None, np.inf
+        for key, (sig, vec, state) in self._entries.items():
+            if sig != signature or (shape is not None
+                                    and state.shape != tuple(shape)):
+                continue
+            distance = np.linalg.norm(vec - vector)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        if best_key is None:
+            return None, np.inf
+        self._touch(best_key)
+        return self._entries[best_key][2].copy(), best_distance
+
+    def initial_state(self, params, default):
+        """The nearest cached state of default's shape, else default."""
+        default = np.asarray(default, dtype=float)
+        state, _ = self.nearest(params, default.shape)
+        return default.copy() if state is None else state
+
+    def clear(self):
+        for key in list(self._entries):
+            self._remove(key)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def _touch(self, key):
+        self._entries.move_to_end(key)
+        if self.directory is not None:
+            os.utime(self._path(key))
+
+    def _remove(self, key):
+        del self._entries[key]
+        if self.directory is not None:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def _load(self):
+        files = [os.path.join(self.directory, name)
+                 for name in os.listdir(self.directory)
+                 if name.endswith('.npz')]
+        # Oldest first, so that the most recently used entries survive
+        for path in sorted(files, key=os.path.getmtime):
+            with np.load(path) as data:
+                signature = tuple((name, tuple(shape)) for name, shape
+                                  in json.loads(str(data['signature'])))
+                self._entries[os.path.basename(path)[:-4]] = (
+                    signature, data['vector'], data['state'])
+        self._evict()
+
+
+def solve_warm(problem, params, x0, t_span, cache, epsilon=0.0,
+               **solve_options):
+    """
+    solve() from the cached saddle point nearest to params.
+
+    params describes the problem instance (e.g. {'a': a, 'P': P, 'b': b,
+    'Q': Q_matrices}); epsilon is added to it for the cache key. x0 is the
+    cold start used when the cache has no comparable entry. A successful
+    run is stored under its parameters.
+    """
+    key = dict(params, epsilon=epsilon)
+    state0 = cache.initial_state(key, problem.initial_state(x0))
+    solution = solve(problem, state0, t_span, epsilon=epsilon,
+                     **solve_options)
+    if solution.success:
+        cache.put(key, solution.y[-1])
+    return solution
+
+
+def continuation(problem_factory, x0, t_span, values, name='epsilon',
+                 params=None, cache=None, **solve_options):
+    """
+    Solve along values of one parameter, warm-starting each solve from the
+    previous solution.
+
+    name 'epsilon' is passed to solve() and any other name to
+    problem_factory(**params, name=value) together with the fixed params.
+    The first solve starts from the nearest cache entry if a cache is given,
+    else from x0, and every successful solve is stored in the cache. Returns
+    the list of ROSolutions; the walk stops at the first failed solve.
+    """
+    params = dict(params or {})
+    epsilon = solve_options.pop('epsilon', 0.0)
+    solutions = []
+    state = None
+    for value in values:
+        if name == 'epsilon':
+            epsilon = value
+            problem = problem_factory(**params)
+        else:
+            problem = problem_factory(**dict(params, **{name: value}))
+        key = dict(params, **{name: value, 'epsilon': epsilon})
+        if state is None:
+            state = problem.initial_state(x0)
+            if cache is not None:
+                state = cache.initial_state(key, state)
+        solution = solve(problem, state, t_span, epsilon=epsilon,
+                         **solve_options)
+        solutions.append(solution)
+        if not solution.success:
+            break
+        state = solution.y[-1]
+        if cache is not None:
+            cache.put(key, state)
+    return solutions